@@ -0,0 +1,37 @@
+"""
+Pipeline de agregação que regenera os arquivos de ``data/`` a partir do
+flights.csv bruto do DOT (Kaggle: usdot/flight-delays).
+
+Os nomes abaixo são importados no primeiro acesso: ``import pipeline.x`` de
+um módulo leve (ex.: ``pipeline.startup``, usado antes do primeiro paint do
+dashboard) não carrega NumPy e pandas.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'DEFAULT_CHUNKSIZE': 'aggregation',
+    'FlightAggregates': 'aggregation',
+    'OUTPUT_FILES': 'reports',
+    'aggregate_flights': 'aggregation',
+    'aggregate_flights_parallel': 'parallel',
+    'build_outputs': 'reports',
+    'load_reference': 'reports',
+    'load_state': 'state',
+    'save_state': 'state',
+    'write_outputs': 'reports',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
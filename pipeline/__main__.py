@@ -0,0 +1,149 @@
+"""
+Uso:
+    python -m pipeline --flights raw/flights.csv --airlines raw/airlines.csv \\
+        --airports raw/airports.csv --output data
+
+Atualização incremental (incorpora só o arquivo novo ao estado salvo; o
+arquivo tem de ser do mesmo ano do estado):
+    python -m pipeline --flights raw/2015_12.csv --state state/flights_state.npz \\
+        --airlines raw/airlines.csv --airports raw/airports.csv --output data
+
+Com --propagation, também gera a propagação de atrasos pelas rotações das
+aeronaves (ver pipeline.propagation); exige o flights.csv completo do período
+e por isso é recusado no modo incremental.
+Com --series, grava as séries horárias por companhia (ver pipeline.timeseries);
+como a propagação, exige o arquivo completo e é recusado no modo incremental.
+Com --bootstrap, gera os intervalos de confiança dos rankings de companhias e
+rotas (ver pipeline.bootstrap).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from .aggregation import DEFAULT_CHUNKSIZE, aggregate_flights
+from .bootstrap import bootstrap_reports
+from .cube import CubeBuilder, load_cube, save_cube
+from .manifest import update_manifest
+from .parallel import aggregate_flights_parallel
+from .propagation import build_propagation
+from .reports import build_outputs, load_reference, write_outputs
+from .snapshot import current_snapshot, write_snapshot
+from .startup import write_summary
+from .state import load_state, save_state, source_id
+from .timeseries import build_series, save_series
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline',
+        description='Regenera os relatórios e dados de gráficos a partir do flights.csv bruto',
+    )
+    parser.add_argument('--flights', required=True, help='Caminho do flights.csv do DOT')
+    parser.add_argument('--airlines', help='Caminho do airlines.csv (nomes das companhias)')
+    parser.add_argument('--airports', help='Caminho do airports.csv (cidades e estados)')
+    parser.add_argument('--output', default='data', help='Pasta de saída (padrão: data)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Linhas por chunk; define o pico de memória (padrão: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processos de agregação; 0 usa todas as CPUs (padrão: 1)')
+    parser.add_argument('--state',
+                        help='Arquivo .npz de estado agregado: se existir, os voos de --flights '
+                             'são somados a ele (modo incremental); o estado atualizado é gravado')
+    parser.add_argument('--cube',
+                        help='Grava também o cubo OLAP (companhia × origem × destino × mês × '
+                             'dia da semana × hora) neste arquivo .npz, ex.: data/cube.npz')
+    parser.add_argument('--propagation', action='store_true',
+                        help='Gera também a propagação de atrasos pelas rotações das aeronaves '
+                             '(lê o --flights mais uma vez)')
+    parser.add_argument('--series',
+                        help='Grava também as séries horárias por companhia neste arquivo .npz, '
+                             'ex.: data/series.npz (lê o --flights mais uma vez)')
+    parser.add_argument('--bootstrap', action='store_true',
+                        help='Gera também os intervalos de confiança (bootstrap) dos rankings '
+                             'de companhias e rotas')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+
+    def progress(rows):
+        print(f"  {rows:,} voos processados ({time.perf_counter() - start:.1f}s)", flush=True)
+
+    previous, sources = None, []
+    if args.state and os.path.exists(args.state):
+        try:
+            previous, sources = load_state(args.state)
+        except ValueError as e:
+            sys.exit(str(e))
+        if source_id(args.flights) in sources:
+            sys.exit(f"{args.flights} já foi incorporado ao estado {args.state}")
+        # Propagação e séries são recalculadas a partir dos voos: o arquivo
+        # novo sozinho sobrescreveria as do período inteiro
+        for flag, given in (('--propagation', args.propagation), ('--series', args.series)):
+            if given:
+                sys.exit(f"{flag} precisa do flights.csv completo do período e não pode ser "
+                         "usado no modo incremental; rode sem --state sobre o arquivo completo")
+        print(f"Estado carregado de {args.state} ({previous.rows:,} voos)")
+
+    cube = None
+    if args.cube:
+        # No modo incremental o cubo existente é a base das novas células;
+        # sem ele, o cubo cobriria só o arquivo novo
+        if previous is not None and not os.path.exists(args.cube):
+            sys.exit(f"{args.cube} não existe: no modo incremental o cubo tem de cobrir o "
+                     f"período do estado {args.state}; refaça a agregação completa com --cube")
+        cube = CubeBuilder.from_cube(load_cube(args.cube)) if previous is not None else CubeBuilder()
+
+    print(f"Agregando {args.flights} em chunks de {args.chunksize:,} linhas...")
+    try:
+        if args.workers == 1:
+            state = aggregate_flights(args.flights, chunksize=args.chunksize, progress=progress,
+                                      cube=cube)
+        else:
+            state = aggregate_flights_parallel(args.flights, workers=args.workers or None,
+                                               chunksize=args.chunksize, progress=progress,
+                                               cube=cube)
+    except ValueError as e:  # voos de mais de um ano
+        sys.exit(f"{args.flights}: {e}")
+
+    if previous is not None:
+        if state.year is not None and previous.year is not None and state.year != previous.year:
+            sys.exit(f"{args.flights} tem voos de {state.year}, mas o estado {args.state} é de "
+                     f"{previous.year}; use um estado por ano (ou pipeline.partitions)")
+        state = previous.merge(state)
+    if args.state:
+        save_state(state, args.state, sources + [source_id(args.flights)])
+    airlines, airports = load_reference(args.airlines, args.airports)
+    if cube is not None:
+        save_cube(cube.build(), args.cube, airports)
+
+    outputs = build_outputs(state, airlines, airports)
+    if args.bootstrap:
+        print("Calculando intervalos de confiança dos rankings (bootstrap)...")
+        outputs.update(bootstrap_reports(state, airlines, airports))
+    if args.propagation:
+        print(f"Montando rotações das aeronaves de {args.flights}...")
+        outputs.update(build_propagation(args.flights, airlines, airports, args.chunksize,
+                                         progress))
+    if args.series:
+        print(f"Montando séries horárias de {args.flights}...")
+        save_series(build_series(args.flights, args.chunksize, progress), args.series)
+    written = write_outputs(outputs, args.output)
+    write_snapshot({key: df for key, df in outputs.items()
+                    if key in written or current_snapshot(args.output, key) is None},
+                   args.output)
+    # Resumo do primeiro paint do dashboard
+    write_summary(outputs, args.output)
+    # Por último: um hash novo no manifesto indica artefato completo em disco
+    update_manifest(args.output, outputs)
+
+    print(f"{len(written)} arquivos atualizados em {args.output}/ "
+          f"({state.rows:,} voos no total, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
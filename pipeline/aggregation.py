@@ -0,0 +1,362 @@
+"""
+Agregação em streaming do arquivo bruto de voos do DOT (flights.csv).
+
+O arquivo é lido em chunks de tamanho fixo e cada chunk é reduzido a
+acumuladores NumPy de inteiros (contagens e somas). Como os atrasos, as
+distâncias e os tempos de voo do DOT são minutos/milhas inteiros, todas as
+somas são exatas: o resultado não depende do tamanho do chunk nem da ordem
+de leitura, e o pico de memória depende apenas do ``chunksize``.
+
+Medianas e percentis de atraso vêm de sketches de quantis mergeáveis
+(ver ``pipeline.sketch``) por mês, companhia, rota e hora.
+"""
+
+import numpy as np
+import pandas as pd
+
+from . import sketch
+
+
+# Colunas do flights.csv efetivamente usadas na agregação
+FLIGHT_COLUMNS = {
+    'YEAR': 'int16',
+    'MONTH': 'int8',
+    'DAY_OF_WEEK': 'int8',
+    'AIRLINE': 'category',
+    'ORIGIN_AIRPORT': 'category',
+    'DESTINATION_AIRPORT': 'category',
+    'SCHEDULED_DEPARTURE': 'int16',
+    'DEPARTURE_DELAY': 'float32',
+    'ELAPSED_TIME': 'float32',
+    'DISTANCE': 'int32',
+    'ARRIVAL_DELAY': 'float32',
+    'DIVERTED': 'int8',
+    'CANCELLED': 'int8',
+    'CANCELLATION_REASON': 'category',
+    'AIR_SYSTEM_DELAY': 'float32',
+    'SECURITY_DELAY': 'float32',
+    'AIRLINE_DELAY': 'float32',
+    'LATE_AIRCRAFT_DELAY': 'float32',
+    'WEATHER_DELAY': 'float32',
+}
+
+DEFAULT_CHUNKSIZE = 200_000
+
+# Critério de pontualidade: atraso na chegada ≤ 15 minutos
+ON_TIME_THRESHOLD = 15
+
+# Medidas acumuladas para cada grupo (mês, companhia, rota, dia × hora)
+MEASURES = (
+    'flights', 'cancelled', 'diverted', 'distance_sum',
+    'arr_count', 'arr_sum', 'arr_sumsq',
+    'dep_count', 'dep_sum',
+    'elapsed_count', 'elapsed_sum',
+    'on_time', 'late',
+)
+M = {name: i for i, name in enumerate(MEASURES)}
+
+# Tipos de atraso do DOT e códigos de cancelamento
+DELAY_CAUSES = (
+    'AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY',
+    'LATE_AIRCRAFT_DELAY', 'WEATHER_DELAY',
+)
+CANCELLATION_CODES = ('A', 'B', 'C', 'D')
+
+N_MONTHS = 12
+N_HOURS = 24
+N_DAY_HOUR = 7 * N_HOURS
+
+
+class KeyIndex:
+    """
+    Dicionário incremental chave -> posição, usado para codificar companhias,
+    aeroportos e rotas como inteiros contíguos
+    """
+
+    def __init__(self, keys=()):
+        self.keys = []
+        self._pos = {}
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        pos = self._pos.get(key)
+        if pos is None:
+            pos = len(self.keys)
+            self._pos[key] = pos
+            self.keys.append(key)
+        return pos
+
+    def lookup(self, keys):
+        return np.fromiter((self.add(k) for k in keys), dtype=np.int64, count=len(keys))
+
+
+def _grow(table, rows):
+    """
+    Garante que a tabela tenha pelo menos ``rows`` linhas (preenchidas com zero)
+    """
+    if table.shape[0] >= rows:
+        return table
+    extra = np.zeros((rows - table.shape[0],) + table.shape[1:], dtype=table.dtype)
+    return np.concatenate([table, extra])
+
+
+def _bincount_2d(codes, values, n_groups):
+    """
+    Soma as colunas de ``values`` por grupo. As somas passam por float64 no
+    bincount, o que é exato enquanto cada soma parcial do chunk for < 2**53
+    (folga ampla: chunk de 1M linhas × 2700² minutos² ≈ 7e12).
+    """
+    out = np.empty((n_groups, values.shape[1]), dtype=np.int64)
+    for j in range(values.shape[1]):
+        out[:, j] = np.rint(np.bincount(codes, weights=values[:, j], minlength=n_groups))
+    return out
+
+
+def _int_column(series):
+    """
+    Converte uma coluna numérica com NaN em (valores inteiros, máscara de válidos)
+    """
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    return np.where(valid, values, 0).astype(np.int64), valid
+
+
+def flight_measures(chunk):
+    """
+    Matriz voos × ``MEASURES`` (inteiros) de um chunk do flights.csv
+    """
+    cancelled = chunk['CANCELLED'].to_numpy(dtype=np.int64)
+    arr, arr_ok = _int_column(chunk['ARRIVAL_DELAY'])
+    dep, dep_ok = _int_column(chunk['DEPARTURE_DELAY'])
+    elapsed, elapsed_ok = _int_column(chunk['ELAPSED_TIME'])
+
+    values = np.empty((len(chunk), len(MEASURES)), dtype=np.int64)
+    values[:, M['flights']] = 1
+    values[:, M['cancelled']] = cancelled
+    values[:, M['diverted']] = chunk['DIVERTED'].to_numpy(dtype=np.int64)
+    values[:, M['distance_sum']] = chunk['DISTANCE'].to_numpy(dtype=np.int64)
+    values[:, M['arr_count']] = arr_ok
+    values[:, M['arr_sum']] = arr
+    values[:, M['arr_sumsq']] = arr * arr
+    values[:, M['dep_count']] = dep_ok
+    values[:, M['dep_sum']] = dep
+    values[:, M['elapsed_count']] = elapsed_ok
+    values[:, M['elapsed_sum']] = elapsed
+    values[:, M['on_time']] = arr_ok & (arr <= ON_TIME_THRESHOLD)
+    values[:, M['late']] = arr_ok & (arr > ON_TIME_THRESHOLD)
+    return values
+
+
+class FlightAggregates:
+    """
+    Estado agregado de um conjunto de voos.
+
+    Todas as tabelas são arrays int64 indexados por códigos inteiros; as
+    chaves de companhias, aeroportos e rotas ficam nos ``KeyIndex``
+    correspondentes.
+
+    Um estado cobre um único ano: as tabelas mensais são indexadas só pelo
+    mês, então voos de outro ano (num chunk ou num ``merge``) levantam
+    ``ValueError`` em vez de somar janeiro de 2016 ao de 2015.
+
+    ``cube`` opcional (``pipeline.cube.CubeBuilder``) é alimentado com os
+    mesmos chunks, na mesma passada de leitura.
+    """
+
+    def __init__(self, cube=None):
+        self.year = None
+        self.rows = 0
+        self.cube = cube
+
+        self.airlines = KeyIndex()
+        self.airports = KeyIndex()
+        self.routes = KeyIndex()  # chaves (origem, destino)
+
+        n_measures = len(MEASURES)
+        self.by_month = np.zeros((N_MONTHS, n_measures), dtype=np.int64)
+        self.by_airline = np.zeros((0, n_measures), dtype=np.int64)
+        self.by_route = np.zeros((0, n_measures), dtype=np.int64)
+        self.by_day_hour = np.zeros((N_DAY_HOUR, n_measures), dtype=np.int64)
+
+        self.route_airline = np.zeros((0, 0), dtype=np.int64)
+
+        # Sketches de quantis do atraso na chegada
+        self.month_sketch = sketch.empty(N_MONTHS)
+        self.airline_sketch = sketch.empty(0)
+        self.route_sketch = sketch.empty(0)
+        self.hour_sketch = sketch.empty(N_HOURS)
+
+        self.cause_count = np.zeros((N_MONTHS, len(DELAY_CAUSES)), dtype=np.int64)
+        self.cause_minutes = np.zeros((N_MONTHS, len(DELAY_CAUSES)), dtype=np.int64)
+        self.cancel_reason = np.zeros((N_MONTHS, len(CANCELLATION_CODES)), dtype=np.int64)
+
+    def update(self, chunk):
+        """
+        Incorpora um chunk do flights.csv ao estado
+        """
+        n = len(chunk)
+        if n == 0:
+            return
+        years = chunk['YEAR']
+        year = int(years.max())
+        if int(years.min()) != year:
+            raise ValueError(f"voos de {int(years.min())} a {year} no mesmo estado; "
+                             "agregue um ano por vez")
+        self._check_year(year)
+        self.rows += n
+        self.year = year
+
+        month = chunk['MONTH'].to_numpy(dtype=np.int64) - 1
+        # Hora extraída do HHMM de scheduled_departure (2400 conta como 23h)
+        hour = np.minimum(chunk['SCHEDULED_DEPARTURE'].to_numpy(dtype=np.int64) // 100, 23)
+        day_hour = (chunk['DAY_OF_WEEK'].to_numpy(dtype=np.int64) - 1) * 24 + hour
+
+        values = flight_measures(chunk)
+        cancelled = values[:, M['cancelled']]
+        arr, arr_ok = values[:, M['arr_sum']], values[:, M['arr_count']].astype(bool)
+
+        airline = self._encode(self.airlines, chunk['AIRLINE'])
+        route = self._encode_routes(chunk['ORIGIN_AIRPORT'], chunk['DESTINATION_AIRPORT'])
+
+        self.by_airline = _grow(self.by_airline, len(self.airlines))
+        self.by_route = _grow(self.by_route, len(self.routes))
+        self.airline_sketch = _grow(self.airline_sketch, len(self.airlines))
+        self.route_sketch = _grow(self.route_sketch, len(self.routes))
+
+        self.by_month += _bincount_2d(month, values, N_MONTHS)
+        self.by_airline += _bincount_2d(airline, values, len(self.airlines))
+        self.by_route += _bincount_2d(route, values, len(self.routes))
+
+        # Mapa de calor: apenas voos não cancelados
+        flown = cancelled == 0
+        self.by_day_hour += _bincount_2d(day_hour[flown], values[flown], N_DAY_HOUR)
+
+        self._update_route_airline(route, airline)
+        self._update_sketches(month, airline, route, hour, arr, arr_ok)
+        self._update_causes(chunk, month, cancelled)
+        if self.cube is not None:
+            self.cube.update(chunk)
+
+    def _check_year(self, year):
+        if self.year is not None and year != self.year:
+            raise ValueError(f"voos de {year} não podem ser somados ao estado de {self.year}; "
+                             "agregue um ano por vez")
+
+    def _encode(self, index, column):
+        codes, uniques = pd.factorize(column)
+        return index.lookup(uniques)[codes]
+
+    def _encode_routes(self, origin, dest):
+        o = self._encode(self.airports, origin)
+        d = self._encode(self.airports, dest)
+        packed = o * len(self.airports) + d
+        uniques, inverse = np.unique(packed, return_inverse=True)
+        keys = [(self.airports.keys[p // len(self.airports)], self.airports.keys[p % len(self.airports)])
+                for p in uniques.tolist()]
+        return self.routes.lookup(keys)[inverse.ravel()]
+
+    def _grow_route_airline(self):
+        n_routes, n_airlines = len(self.routes), len(self.airlines)
+        table = _grow(self.route_airline, n_routes)
+        if table.shape[1] < n_airlines:
+            table = np.concatenate(
+                [table, np.zeros((n_routes, n_airlines - table.shape[1]), dtype=np.int64)], axis=1)
+        self.route_airline = table
+
+    def _update_route_airline(self, route, airline):
+        self._grow_route_airline()
+        n_routes, n_airlines = self.route_airline.shape
+        counts = np.bincount(route * n_airlines + airline, minlength=n_routes * n_airlines)
+        self.route_airline += counts.reshape(n_routes, n_airlines)
+
+    def _update_sketches(self, month, airline, route, hour, arr, arr_ok):
+        delays = arr[arr_ok]
+        sketch.update(self.month_sketch, month[arr_ok], delays)
+        sketch.update(self.airline_sketch, airline[arr_ok], delays)
+        sketch.update(self.route_sketch, route[arr_ok], delays)
+        sketch.update(self.hour_sketch, hour[arr_ok], delays)
+
+    def _update_causes(self, chunk, month, cancelled):
+        for j, column in enumerate(DELAY_CAUSES):
+            minutes, valid = _int_column(chunk[column])
+            hit = valid & (minutes > 0)
+            self.cause_count[:, j] += np.bincount(month[hit], minlength=N_MONTHS)
+            self.cause_minutes[:, j] += np.rint(
+                np.bincount(month[hit], weights=minutes[hit], minlength=N_MONTHS)).astype(np.int64)
+
+        reason = chunk['CANCELLATION_REASON'].to_numpy(dtype=object)
+        for j, code in enumerate(CANCELLATION_CODES):
+            hit = (cancelled == 1) & (reason == code)
+            self.cancel_reason[:, j] += np.bincount(month[hit], minlength=N_MONTHS)
+
+    def merge(self, other):
+        """
+        Soma outro estado parcial a este, remapeando as chaves de companhias,
+        aeroportos e rotas. Como todos os acumuladores são inteiros, o
+        resultado é idêntico ao de uma agregação única, em qualquer ordem.
+        """
+        if other.year is not None:
+            self._check_year(other.year)
+            self.year = other.year
+        self.rows += other.rows
+
+        self.airports.lookup(other.airports.keys)
+        airline_map = self.airlines.lookup(other.airlines.keys)
+        route_map = self.routes.lookup(other.routes.keys)
+
+        self.by_airline = _grow(self.by_airline, len(self.airlines))
+        self.by_route = _grow(self.by_route, len(self.routes))
+        self.airline_sketch = _grow(self.airline_sketch, len(self.airlines))
+        self.route_sketch = _grow(self.route_sketch, len(self.routes))
+        self._grow_route_airline()
+
+        self.by_month += other.by_month
+        self.by_day_hour += other.by_day_hour
+        self.by_airline[airline_map] += other.by_airline
+        self.by_route[route_map] += other.by_route
+        self.route_airline[np.ix_(route_map, airline_map)] += other.route_airline
+        self.month_sketch += other.month_sketch
+        self.airline_sketch[airline_map] += other.airline_sketch
+        self.route_sketch[route_map] += other.route_sketch
+        self.hour_sketch += other.hour_sketch
+        self.cause_count += other.cause_count
+        self.cause_minutes += other.cause_minutes
+        self.cancel_reason += other.cancel_reason
+        if self.cube is not None and other.cube is not None:
+            self.cube.merge(other.cube)
+        return self
+
+
+def read_flights(path, chunksize=DEFAULT_CHUNKSIZE, names=None):
+    """
+    Itera sobre o flights.csv em chunks, lendo apenas as colunas necessárias
+    com tipos explícitos (sem inferência).
+
+    ``path`` pode ser um arquivo aberto sem cabeçalho; nesse caso ``names``
+    informa as colunas do arquivo original.
+    """
+    return pd.read_csv(
+        path,
+        names=names,
+        header=None if names else 'infer',
+        usecols=list(FLIGHT_COLUMNS),
+        dtype=FLIGHT_COLUMNS,
+        chunksize=chunksize,
+        low_memory=False,
+    )
+
+
+def aggregate_flights(path, chunksize=DEFAULT_CHUNKSIZE, progress=None, cube=None):
+    """
+    Agrega o flights.csv inteiro em uma única passada de leitura
+    """
+    state = FlightAggregates(cube=cube)
+    for chunk in read_flights(path, chunksize=chunksize):
+        state.update(chunk)
+        if progress is not None:
+            progress(state.rows)
+    return state
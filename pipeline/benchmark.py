@@ -0,0 +1,390 @@
+"""
+Benchmarks de escala do pipeline e do dashboard sobre voos sintéticos.
+
+Para cada escala (número de voos), o benchmark gera uma vez o flights.csv
+sintético (``pipeline.synthetic``, em cache na pasta de trabalho) e mede as
+etapas abaixo, cada uma num processo novo:
+
+* ``agregacao``: ``aggregate_flights`` + ``build_outputs``;
+* ``propagacao``: rotações e relatórios de ``pipeline.propagation``;
+* ``snapshot``: leitura de todos os datasets do snapshot Arrow;
+* ``load_data``: ``load_data()`` do dashboard + leitura de todos os
+  datasets;
+* ``grafico:<nome>``: cada ``create_*_chart`` do dashboard, sem o cache de
+  figuras.
+
+O processo novo isola o pico de memória de cada etapa. O pico é o RSS
+máximo do processo, e ``base`` é o RSS antes da etapa (interpretador, NumPy
+e pandas). Também são
+reportados o tempo (o menor de ``--repeat`` execuções, nas etapas de leitura)
+e a vazão em linhas por segundo. Com ``--baseline``, etapas mais lentas ou
+com mais memória que a baseline (além da tolerância) são marcadas como
+regressão, e o comando sai com código 1.
+
+Uso:
+    python -m pipeline.benchmark --scales 1M 5M --workdir /tmp/bench
+    python -m pipeline.benchmark --scales 1M --save-baseline bench_baseline.json
+    python -m pipeline.benchmark --scales 1M --baseline bench_baseline.json
+"""
+
+import argparse
+import inspect
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+from .synthetic import DEFAULT_SEED, DEFAULT_YEAR, generate
+
+STAGES = ('agregacao', 'propagacao', 'snapshot', 'load_data', 'graficos')
+DEFAULT_REPEAT = 3
+# Regressão: mais lento/mais memória que a baseline além da tolerância e
+# de um mínimo absoluto (evita ruído em etapas de milissegundos)
+DEFAULT_TOLERANCE = 0.20
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 20
+
+_SUFFIXES = {'k': 1_000, 'm': 1_000_000, 'g': 1_000_000_000}
+
+
+def parse_scale(text):
+    """
+    '1M' -> 1_000_000, '500k' -> 500_000, '2500000' -> 2_500_000
+    """
+    text = str(text).strip().lower().replace('_', '')
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def peak_rss_mb():
+    """
+    RSS máximo do processo até agora, em MB (None sem o módulo resource)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed(function, repeat=1):
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+def _paths(scale_dir):
+    raw = os.path.join(scale_dir, 'raw')
+    return {
+        'flights': os.path.join(raw, 'flights.csv'),
+        'airlines': os.path.join(raw, 'airlines.csv'),
+        'airports': os.path.join(raw, 'airports.csv'),
+        'data': os.path.join(scale_dir, 'data'),
+    }
+
+
+def _import_app():
+    """
+    Importa o streamlit_app fora do ``streamlit run`` (modo bare)
+    """
+    import streamlit.logger
+    streamlit.logger.set_log_level('error')
+    import streamlit_app
+    return streamlit_app
+
+
+def _point_app(app, data_dir):
+    # Dashboard lendo os arquivos gerados pelo benchmark (sem warehouse nem cubo)
+    app.DATA_DIR = data_dir
+    app.WAREHOUSE_PATH = os.path.join(data_dir, 'warehouse.db')
+    app.CUBE_PATH = os.path.join(data_dir, 'cube.npz')
+    app.get_registry.clear()
+    app.get_warehouse_pool.clear()
+
+
+def _read_all(app, data):
+    frames = []
+    for key in data:
+        try:
+            frames.append(data[key])
+        except app.DatasetError:
+            pass
+    return frames
+
+
+def _stage_agregacao(paths, rows, repeat):
+    from .aggregation import aggregate_flights
+    from .manifest import update_manifest
+    from .reports import build_outputs, load_reference, write_outputs
+    from .snapshot import write_snapshot
+
+    airlines, airports = load_reference(paths['airlines'], paths['airports'])
+
+    def run():
+        return build_outputs(aggregate_flights(paths['flights']), airlines, airports)
+
+    seconds, outputs = _timed(run)
+    write_outputs(outputs, paths['data'])
+    write_snapshot(outputs, paths['data'])
+    update_manifest(paths['data'], outputs)
+    return [{'stage': 'agregacao', 'seconds': seconds, 'rows': rows}]
+
+
+def _stage_propagacao(paths, rows, repeat):
+    from .manifest import update_manifest
+    from .propagation import build_propagation
+    from .reports import load_reference, write_outputs
+    from .snapshot import write_snapshot
+
+    airlines, airports = load_reference(paths['airlines'], paths['airports'])
+    seconds, outputs = _timed(lambda: build_propagation(paths['flights'], airlines, airports))
+    write_outputs(outputs, paths['data'])
+    write_snapshot(outputs, paths['data'])
+    update_manifest(paths['data'])
+    return [{'stage': 'propagacao', 'seconds': seconds, 'rows': rows}]
+
+
+def _stage_snapshot(paths, rows, repeat):
+    from .reports import OUTPUT_FILES
+    from .snapshot import read_snapshot
+
+    def run():
+        frames = [read_snapshot(paths['data'], key) for key in OUTPUT_FILES]
+        return sum(len(df) for df in frames if df is not None)
+
+    seconds, total = _timed(run, repeat)
+    return [{'stage': 'snapshot', 'seconds': seconds, 'rows': total}]
+
+
+def _stage_load_data(paths, rows, repeat):
+    app = _import_app()
+
+    def run():
+        _point_app(app, paths['data'])
+        return sum(len(df) for df in _read_all(app, app.load_data()))
+
+    seconds, total = _timed(run, repeat)
+    return [{'stage': 'load_data', 'seconds': seconds, 'rows': total}]
+
+
+def chart_builders(app):
+    """
+    Funções ``create_*_chart(data)`` do dashboard, por nome (as que recebem
+    outros argumentos, como a de séries, ficam de fora)
+    """
+    return {name: getattr(app, name) for name in sorted(vars(app))
+            if name.startswith('create_') and name.endswith('_chart')
+            and list(inspect.signature(getattr(app, name)).parameters) == ['data']}
+
+
+def _stage_graficos(paths, rows, repeat):
+    app = _import_app()
+    _point_app(app, paths['data'])
+    data = app.load_data()
+    _read_all(app, data)
+    results = []
+    for name, builder in chart_builders(app).items():
+        try:
+            seconds, fig = _timed(lambda: builder(data), repeat)
+        except app.DatasetError as e:
+            print(f"  {name}: ignorado ({e})", flush=True)
+            continue
+        payload = len(fig.to_json())
+        results.append({'stage': f'grafico:{name}', 'seconds': seconds, 'rows': None,
+                        'payload_bytes': payload})
+    return results
+
+
+_STAGE_FUNCTIONS = {
+    'agregacao': _stage_agregacao,
+    'propagacao': _stage_propagacao,
+    'snapshot': _stage_snapshot,
+    'load_data': _stage_load_data,
+    'graficos': _stage_graficos,
+}
+
+
+def _run_stage(stage, paths, rows, repeat):
+    # Executado no processo filho
+    base = peak_rss_mb()
+    results = _STAGE_FUNCTIONS[stage](paths, rows, repeat)
+    peak = peak_rss_mb()
+    for result in results:
+        result.update(base_mb=base, peak_mb=peak)
+    return results
+
+
+def run_stage(stage, paths, rows, repeat=DEFAULT_REPEAT):
+    """
+    Executa a etapa num processo novo; retorna a lista de medições
+    """
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_stage, stage, paths, rows, repeat).result()
+
+
+def prepare(scale_dir, rows, seed=DEFAULT_SEED, year=DEFAULT_YEAR):
+    """
+    Gera os dados sintéticos da escala, se ainda não existirem com os mesmos
+    parâmetros
+    """
+    paths = _paths(scale_dir)
+    marker = os.path.join(scale_dir, 'synthetic.json')
+    params = {'rows': rows, 'seed': seed, 'year': year}
+    current = None
+    if os.path.exists(marker) and os.path.exists(paths['flights']):
+        with open(marker, encoding='utf-8') as f:
+            current = json.load(f)
+    if current != params:
+        start = time.perf_counter()
+        print(f"Gerando {rows:,} voos sintéticos em {scale_dir}...", flush=True)
+        generate(os.path.dirname(paths['flights']), rows, seed, year)
+        os.makedirs(scale_dir, exist_ok=True)
+        with open(marker, 'w', encoding='utf-8') as f:
+            json.dump(params, f)
+        print(f"  gerados em {time.perf_counter() - start:.1f}s", flush=True)
+    return paths
+
+
+def run_benchmarks(scales, workdir, stages=STAGES, repeat=DEFAULT_REPEAT, seed=DEFAULT_SEED):
+    """
+    Mede as etapas em cada escala; retorna o documento de resultados
+    """
+    results = []
+    for rows in scales:
+        paths = prepare(os.path.join(workdir, str(rows)), rows, seed)
+        # As etapas de leitura dependem dos arquivos gravados pela agregação
+        needs_data = not os.path.exists(os.path.join(paths['data'], 'manifest.json'))
+        for stage in STAGES:
+            if stage not in stages and not (needs_data and stage == 'agregacao'):
+                continue
+            print(f"[{rows:,}] {stage}...", flush=True)
+            for result in run_stage(stage, paths, rows, repeat):
+                if stage not in stages:
+                    continue
+                seconds = result['seconds']
+                result['scale'] = rows
+                result['throughput'] = result['rows'] / seconds if result['rows'] and seconds else None
+                results.append(result)
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'seed': seed,
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Variação em relação à baseline por (escala, etapa) e lista das
+    regressões (tempo ou memória acima da tolerância)
+    """
+    base = {(r['scale'], r['stage']): r for r in baseline.get('results', [])}
+    changes, regressions = {}, []
+    for result in results['results']:
+        key = result['scale'], result['stage']
+        old = base.get(key)
+        if old is None:
+            continue
+        change = {'seconds': result['seconds'] / old['seconds'] - 1 if old['seconds'] else None}
+        if (result['seconds'] > old['seconds'] * (1 + tolerance)
+                and result['seconds'] - old['seconds'] > MIN_SECONDS_DELTA):
+            regressions.append((key, 'tempo', old['seconds'], result['seconds']))
+        if result.get('peak_mb') and old.get('peak_mb'):
+            change['peak_mb'] = result['peak_mb'] / old['peak_mb'] - 1
+            if (result['peak_mb'] > old['peak_mb'] * (1 + tolerance)
+                    and result['peak_mb'] - old['peak_mb'] > MIN_MEMORY_DELTA_MB):
+                regressions.append((key, 'memória', old['peak_mb'], result['peak_mb']))
+        changes[key] = change
+    return changes, regressions
+
+
+def format_report(results, changes=None):
+    changes = changes or {}
+    lines = [f"{'Escala':>12}  {'Etapa':<42} {'Tempo (s)':>10} {'Linhas/s':>14} "
+             f"{'Pico (MB)':>10} {'Base (MB)':>10} {'Δ tempo':>9} {'Δ pico':>8}"]
+
+    def pct(value):
+        return f"{value:+.1%}" if value is not None else '-'
+
+    def num(value, fmt):
+        return format(value, fmt) if value is not None else '-'
+
+    for r in results['results']:
+        change = changes.get((r['scale'], r['stage']), {})
+        lines.append(f"{r['scale']:>12,}  {r['stage']:<42} {r['seconds']:>10.3f} "
+                     f"{num(r['throughput'], ',.0f'):>14} {num(r['peak_mb'], '.1f'):>10} "
+                     f"{num(r['base_mb'], '.1f'):>10} {pct(change.get('seconds')):>9} "
+                     f"{pct(change.get('peak_mb')):>8}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.benchmark',
+        description='Benchmarks de escala sobre voos sintéticos',
+    )
+    parser.add_argument('--scales', nargs='+', default=['1M'],
+                        help='Números de voos, ex.: 1M 10M 100M (padrão: 1M)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help='Etapas medidas (padrão: todas)')
+    parser.add_argument('--workdir', default=os.path.join('raw', 'benchmark'),
+                        help='Pasta dos dados sintéticos e saídas (padrão: %(default)s)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Semente do gerador')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Execuções das etapas de leitura; vale a menor (padrão: %(default)s)')
+    parser.add_argument('--output', help='Grava os resultados neste arquivo JSON')
+    parser.add_argument('--baseline', help='Compara com os resultados deste arquivo JSON')
+    parser.add_argument('--save-baseline', help='Grava os resultados como nova baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Piora relativa aceita antes de acusar regressão (padrão: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def _write_json(document, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scales = [parse_scale(s) for s in args.scales]
+    results = run_benchmarks(scales, args.workdir, args.stages, args.repeat, args.seed)
+
+    changes, regressions = {}, []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            changes, regressions = compare(results, json.load(f), args.tolerance)
+    print()
+    print(format_report(results, changes))
+
+    if args.output:
+        _write_json(results, args.output)
+    if args.save_baseline:
+        _write_json(results, args.save_baseline)
+        print(f"\nBaseline gravada em {args.save_baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}:")
+        for (scale, stage), kind, old, new in regressions:
+            print(f"  {scale:,} {stage}: {kind} {old:.3f} -> {new:.3f}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
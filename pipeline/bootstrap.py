@@ -0,0 +1,324 @@
+"""
+Intervalos de confiança por bootstrap e estabilidade dos rankings de
+companhias (relatório 1) e rotas críticas (relatório 2).
+
+Reamostrar os voos um a um custaria (voos × reamostras) sorteios. Aqui cada
+companhia ou rota é reamostrada a partir dos seus contadores agregados e do
+histograma de atrasos (o sketch do ``FlightAggregates``), com arrays
+(reamostras × entidades) e sem laço por entidade:
+
+* a situação dos n voos (cancelado, pontual, atrasado, sem chegada) é
+  sorteada de uma multinomial com as proporções observadas. Isso é
+  exatamente o que o bootstrap por voo faz com esses contadores;
+* dado o número de voos pontuais e atrasados da reamostra, a soma dos
+  atrasos de cada classe é sorteada com a mesma média e variância da soma no
+  bootstrap por voo: normal para os pontuais e gama para os atrasados, que
+  são positivos e assimétricos. As somas exatas (``arr_sum``,
+  ``arr_sumsq``) e o histograma dão os momentos de cada classe.
+
+Em cada reamostra, as métricas do relatório (pontualidade, atraso médio,
+cancelamento e score) são recalculadas e as entidades são reordenadas. Os
+intervalos são os percentis 2,5% e 97,5% das reamostras. A estabilidade do
+ranking é dada pelo intervalo da posição, pela chance de manter a posição
+observada e pela chance de ficar no topo. As rotas seguem o critério do
+relatório 2 (pelo menos ``MIN_ROUTE_FLIGHTS`` voos). As reamostras são
+geradas em blocos, e a memória fica em (reamostras × entidades) float32 por
+métrica: 1.000 reamostras sobre 7 mil rotas levam alguns segundos.
+
+Uso:
+    python -m pipeline --flights raw/flights.csv ... --bootstrap
+    python -m pipeline.bootstrap --state state/flights_state.npz \\
+        --airlines raw/airlines.csv --airports raw/airports.csv --output data
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from . import sketch
+from .aggregation import ON_TIME_THRESHOLD, M
+from .reports import (
+    CANCELLATION_WEIGHT_AIRLINE,
+    CANCELLATION_WEIGHT_ROUTE,
+    MIN_ROUTE_FLIGHTS,
+    TOP_CRITICAL_ROUTES,
+    airline_metrics,
+    airline_ranking,
+    load_reference,
+    route_metrics,
+)
+
+DEFAULT_RESAMPLES = 1000
+DEFAULT_SEED = 2015
+CONFIDENCE = 0.95
+# Reamostras geradas por vez (limita os temporários a bloco × entidades × 4)
+BLOCK_RESAMPLES = 100
+TOP_AIRLINES = 3
+
+METRICS = ('on_time_rate', 'avg_arrival_delay', 'cancellation_rate', 'score')
+# Situação de cada voo na multinomial
+CANCELLED, ON_TIME, LATE, OTHER = range(4)
+
+
+def delay_classes(table, sketches):
+    """
+    Probabilidades das situações (entidades × 4) e média e variância do
+    atraso dos voos pontuais e dos atrasados de cada entidade
+    """
+    n = table[:, M['flights']].astype(np.float64)
+    counts = np.zeros((len(table), 4))
+    counts[:, CANCELLED] = table[:, M['cancelled']]
+    counts[:, ON_TIME] = table[:, M['on_time']]
+    counts[:, LATE] = table[:, M['late']]
+    counts[:, OTHER] = np.maximum(n - counts[:, :OTHER].sum(axis=1), 0)
+    probs = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+    # Pontuais pelo histograma (buckets exatos até o limite de 15 min);
+    # atrasados pelo que falta das somas exatas
+    punctual = sketch.BUCKET_VALUES <= ON_TIME_THRESHOLD
+    values = sketch.BUCKET_VALUES[punctual]
+    hist = sketches[:, punctual].astype(np.float64)
+    on_sum, on_sumsq = hist @ values, hist @ values ** 2
+    late_sum = table[:, M['arr_sum']] - on_sum
+    late_sumsq = table[:, M['arr_sumsq']] - on_sumsq
+
+    def moments(count, total, total_sq):
+        count = np.maximum(count, 1)
+        mean = total / count
+        return mean, np.maximum(total_sq / count - mean ** 2, 0)
+
+    on_mean, on_var = moments(counts[:, ON_TIME], on_sum, on_sumsq)
+    late_mean, late_var = moments(counts[:, LATE], late_sum, late_sumsq)
+    # Atrasados têm atraso > 15 min; o limite protege de arredondamentos
+    late_mean = np.maximum(late_mean, ON_TIME_THRESHOLD + 1)
+    return n.astype(np.int64), probs, (on_mean, on_var), (late_mean, late_var)
+
+
+def resample_blocks(table, sketches, resamples, rng, block=BLOCK_RESAMPLES):
+    """
+    Métricas do relatório (sem score) de cada reamostra, em blocos de
+    (reamostras × entidades)
+    """
+    n, probs, (on_mean, on_var), (late_mean, late_var) = delay_classes(table, sketches)
+    late_scale = late_var / late_mean
+    with np.errstate(divide='ignore', invalid='ignore'):
+        late_shape = np.where(late_var > 0, late_mean ** 2 / late_var, np.inf)
+
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        counts = rng.multinomial(n, probs, size=(size, len(n))).astype(np.float64)
+        on_time, late = counts[..., ON_TIME], counts[..., LATE]
+
+        on_sum = on_time * on_mean + np.sqrt(on_time * on_var) * rng.standard_normal(on_time.shape)
+        # Soma de k atrasos: gama com a mesma média e variância (constante
+        # quando todos os atrasos da entidade são iguais)
+        constant = np.isinf(late_shape)
+        late_sum = rng.gamma(np.where(constant, 0.0, late * late_shape),
+                             np.where(constant, 0.0, late_scale))
+        late_sum = np.where(constant, late * late_mean, late_sum)
+
+        arrived = on_time + late
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delay = np.where(arrived > 0, (on_sum + late_sum) / arrived, np.nan)
+        flights = np.maximum(n, 1)
+        yield {
+            'on_time_rate': 100 * on_time / flights,
+            'avg_arrival_delay': delay,
+            'cancellation_rate': 100 * counts[..., CANCELLED] / flights,
+        }
+
+
+def rank_rows(score, descending=False):
+    """
+    Posição (1 = primeira) de cada coluna em cada linha; NaN vai para o fim
+    """
+    key = -score if descending else score
+    order = np.argsort(key, axis=-1, kind='stable')
+    ranks = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.arange(1, order.shape[-1] + 1, dtype=np.int32), axis=-1)
+    return ranks
+
+
+def bootstrap(table, sketches, score, observed_rank, resamples=DEFAULT_RESAMPLES,
+              seed=DEFAULT_SEED, descending=False, top=1, confidence=CONFIDENCE):
+    """
+    Intervalos das métricas e do score e estabilidade do ranking das
+    entidades de ``table``; ``score(metrics)`` calcula o score das reamostras
+    """
+    rng = np.random.default_rng(seed)
+    samples = {name: np.empty((resamples, len(table)), dtype=np.float32) for name in METRICS}
+    ranks = np.empty((resamples, len(table)), dtype=np.int32)
+    done = 0
+    for metrics in resample_blocks(table, sketches, resamples, rng):
+        metrics['score'] = score(metrics)
+        size = len(metrics['score'])
+        for name in METRICS:
+            samples[name][done:done + size] = metrics[name]
+        ranks[done:done + size] = rank_rows(metrics['score'], descending)
+        done += size
+
+    tail = (1 - confidence) / 2 * 100
+    result = {}
+    for name, values in samples.items():
+        low, high = np.nanpercentile(values, [tail, 100 - tail], axis=0)
+        result[f'{name}_low'], result[f'{name}_high'] = low, high
+    result['rank_low'], result['rank_high'] = np.percentile(ranks, [tail, 100 - tail], axis=0,
+                                                            method='nearest')
+    result['rank_same'] = (ranks == observed_rank).mean(axis=0) * 100
+    result['rank_top'] = (ranks <= top).mean(axis=0) * 100
+    return result
+
+
+def airline_score(metrics):
+    """
+    Score do relatório 1 (menor = melhor)
+    """
+    return (metrics['avg_arrival_delay']
+            + metrics['cancellation_rate'] * CANCELLATION_WEIGHT_AIRLINE
+            + (100 - metrics['on_time_rate']))
+
+
+def route_score(metrics):
+    """
+    Score de criticidade do relatório 2 (maior = pior)
+    """
+    return metrics['avg_arrival_delay'] + metrics['cancellation_rate'] * CANCELLATION_WEIGHT_ROUTE
+
+
+def _interval_columns(result, order, labels):
+    columns = {}
+    for name, (label, value) in labels.items():
+        columns[label] = value
+        columns[f'{label} IC95 Inf'] = np.round(result[f'{name}_low'][order], 2)
+        columns[f'{label} IC95 Sup'] = np.round(result[f'{name}_high'][order], 2)
+    return columns
+
+
+def airline_uncertainty(state, airlines, resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED):
+    """
+    Ranking de companhias (relatório 1) com intervalos de confiança e
+    estabilidade da posição
+    """
+    metrics = airline_metrics(state, airlines)
+    ranking = airline_ranking(metrics)
+    codes = np.array(state.airlines.keys, dtype=object)
+    order = np.argsort(codes, kind='stable')
+    # Posição de cada companhia (na ordem do código) no relatório 1
+    position = dict(zip(ranking['Código'], ranking['Ranking']))
+    observed = np.array([position[c] for c in codes[order]], dtype=np.int32)
+
+    result = bootstrap(state.by_airline[order], state.airline_sketch[order], airline_score,
+                       observed, resamples, seed, top=TOP_AIRLINES)
+    # Linhas na ordem do relatório 1
+    rows = np.argsort(observed, kind='stable')
+    df = pd.DataFrame({
+        'Ranking': observed[rows],
+        'Código': codes[order][rows],
+        'Companhia Aérea': ranking['Companhia Aérea'].to_numpy(),
+        'Total Voos': ranking['Total Voos'].to_numpy(),
+        **_interval_columns(result, rows, {
+            'on_time_rate': ('Taxa Pontualidade (%)', ranking['Taxa Pontualidade (%)'].to_numpy()),
+            'avg_arrival_delay': ('Atraso Médio (min)', ranking['Atraso Médio (min)'].to_numpy()),
+            'cancellation_rate': ('Taxa Cancelamento (%)',
+                                  ranking['Taxa Cancelamento (%)'].to_numpy()),
+            'score': ('Score Performance', ranking['Score Performance'].to_numpy()),
+        }),
+        'Ranking IC95 Inf': result['rank_low'][rows].astype(np.int64),
+        'Ranking IC95 Sup': result['rank_high'][rows].astype(np.int64),
+        'Prob. Mesma Posição (%)': np.round(result['rank_same'][rows], 1),
+        f'Prob. Top {TOP_AIRLINES} (%)': np.round(result['rank_top'][rows], 1),
+    })
+    return df
+
+
+def route_uncertainty(state, airports, resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED):
+    """
+    Todas as rotas com ``MIN_ROUTE_FLIGHTS`` voos, na ordem de criticidade
+    do relatório 2, com intervalos de confiança e estabilidade da posição
+    """
+    routes = route_metrics(state, airports)
+    index = state.routes.lookup(list(zip(routes['origin'], routes['dest'])))
+    eligible = (routes['total_flights'] >= MIN_ROUTE_FLIGHTS).to_numpy()
+    routes, index = routes[eligible], index[eligible]
+    # Mesma ordenação do relatório 2 (score arredondado, desempate estável)
+    ranked = np.argsort(-routes['criticality_score'].to_numpy(), kind='stable')
+    observed = np.empty(len(routes), dtype=np.int32)
+    observed[ranked] = np.arange(1, len(routes) + 1)
+
+    result = bootstrap(state.by_route[index], state.route_sketch[index], route_score,
+                       observed, resamples, seed, descending=True, top=TOP_CRITICAL_ROUTES)
+    df = routes.iloc[ranked]
+    return pd.DataFrame({
+        'Ranking': observed[ranked],
+        'Origem': df['origin'].to_numpy(),
+        'Cidade Origem': df['origin_city'].to_numpy(),
+        'Destino': df['dest'].to_numpy(),
+        'Cidade Destino': df['dest_city'].to_numpy(),
+        'Total Voos': df['total_flights'].to_numpy(),
+        **_interval_columns(result, ranked, {
+            'avg_arrival_delay': ('Atraso Médio (min)', df['avg_arrival_delay'].to_numpy()),
+            'cancellation_rate': ('Taxa Cancelamento (%)', df['cancellation_rate'].to_numpy()),
+            'score': ('Score Criticidade', df['criticality_score'].to_numpy()),
+        }),
+        'Ranking IC95 Inf': result['rank_low'][ranked].astype(np.int64),
+        'Ranking IC95 Sup': result['rank_high'][ranked].astype(np.int64),
+        'Prob. Mesma Posição (%)': np.round(result['rank_same'][ranked], 1),
+        f'Prob. Top {TOP_CRITICAL_ROUTES} (%)': np.round(result['rank_top'][ranked], 1),
+    })
+
+
+def bootstrap_reports(state, airlines, airports, resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED):
+    """
+    DataFrames ``incerteza_companhias`` e ``incerteza_rotas``
+    """
+    return {
+        'incerteza_companhias': airline_uncertainty(state, airlines, resamples, seed),
+        'incerteza_rotas': route_uncertainty(state, airports, resamples, seed),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.bootstrap',
+        description='Intervalos de confiança (bootstrap) dos rankings de companhias e rotas',
+    )
+    parser.add_argument('--state', required=True,
+                        help='Estado agregado (.npz) gravado com python -m pipeline --state')
+    parser.add_argument('--airlines', help='Caminho do airlines.csv (nomes das companhias)')
+    parser.add_argument('--airports', help='Caminho do airports.csv (cidades e estados)')
+    parser.add_argument('--output', default='data', help='Pasta de saída (padrão: data)')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES,
+                        help='Reamostras (padrão: %(default)s)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='Semente do gerador (padrão: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from .manifest import update_manifest
+    from .reports import write_outputs
+    from .snapshot import write_snapshot
+    from .state import load_state
+
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        state, _ = load_state(args.state)
+    except ValueError as e:
+        sys.exit(str(e))
+    airlines, airports = load_reference(args.airlines, args.airports)
+    print(f"Bootstrap de {args.resamples:,} reamostras ({len(state.airlines)} companhias, "
+          f"{len(state.routes):,} rotas)...")
+    outputs = bootstrap_reports(state, airlines, airports, args.resamples, args.seed)
+    written = write_outputs(outputs, args.output)
+    write_snapshot({key: outputs[key] for key in written}, args.output)
+    update_manifest(args.output)
+    print(f"{len(written)} arquivos atualizados em {args.output}/ "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,531 @@
+"""
+Cubo OLAP pré-agregado: companhia × origem × destino × mês × dia da semana × hora.
+
+O cubo é esparso: cada célula não vazia é uma linha com os códigos inteiros
+das seis dimensões e uma matriz de medidas int64 (contagens e somas). Um
+roll-up ou slice em qualquer combinação de dimensões é uma máscara
+vetorizada seguida de ``np.bincount`` por medida, sem reler os voos.
+
+A partir das consultas, ``cube_datasets`` monta os mesmos DataFrames que os
+``create_*_chart`` do dashboard leem dos CSVs.
+"""
+
+import calendar
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import (
+    CANCELLATION_CODES,
+    DELAY_CAUSES,
+    ON_TIME_THRESHOLD,
+    KeyIndex,
+    _int_column,
+)
+from .reports import (
+    DAY_NAMES,
+    MIN_ROUTE_FLIGHTS,
+    TOP_CRITICAL_ROUTES,
+    airline_ranking,
+    causes_chart_data,
+    causes_report,
+    cause_metrics,
+    critical_routes,
+    route_criticality,
+    score_airlines,
+    seasonality_report,
+)
+
+DIMENSIONS = ('airline', 'origin', 'dest', 'month', 'weekday', 'hour')
+
+BASE_MEASURES = (
+    'flights', 'cancelled', 'diverted', 'distance_sum',
+    'arr_count', 'arr_sum', 'on_time', 'late',
+)
+CUBE_MEASURES = (
+    BASE_MEASURES
+    + tuple(f'cause_count:{c}' for c in DELAY_CAUSES)
+    + tuple(f'cause_minutes:{c}' for c in DELAY_CAUSES)
+    + tuple(f'cancel_reason:{c}' for c in CANCELLATION_CODES)
+)
+CM = {name: i for i, name in enumerate(CUBE_MEASURES)}
+
+# Capacidade de cada dimensão no empacotamento da chave em int64
+_AIRLINE_CAP = 256
+_AIRPORT_CAP = 8192
+_SIZES = (_AIRLINE_CAP, _AIRPORT_CAP, _AIRPORT_CAP, 12, 7, 24)
+
+# Linhas parciais acumuladas antes de uma compactação
+_COMPACT_ROWS = 4_000_000
+
+# Acima deste número de grupos possíveis, a consulta agrupa só os presentes
+_DENSE_GROUPS = 1 << 20
+
+
+def _pack(codes):
+    key = np.zeros(len(codes[0]), dtype=np.int64)
+    for values, size in zip(codes, _SIZES):
+        key = key * size + values
+    return key
+
+
+def _unpack(keys):
+    codes = []
+    for size in reversed(_SIZES):
+        codes.append(keys % size)
+        keys = keys // size
+    return codes[::-1]
+
+
+def _reduce(keys, values):
+    """
+    Soma as linhas de ``values`` com a mesma chave
+    """
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    out = np.empty((len(uniques), values.shape[1]), dtype=np.int64)
+    for j in range(values.shape[1]):
+        out[:, j] = np.rint(np.bincount(inverse, weights=values[:, j], minlength=len(uniques)))
+    return uniques, out
+
+
+def _sorted_positions(keys, labels):
+    pos = {k: i for i, k in enumerate(labels)}
+    return np.array([pos[k] for k in keys], dtype=np.int64)
+
+
+class CubeBuilder:
+    """
+    Acumula o cubo a partir dos chunks do flights.csv, compactando as
+    células parciais periodicamente (memória limitada ao número de células)
+    """
+
+    def __init__(self):
+        self.airlines = KeyIndex()
+        self.airports = KeyIndex()
+        self._keys = []
+        self._values = []
+        self._pending = 0
+        self.airport_info = {}
+
+    def update(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return
+        airline = self._encode(self.airlines, chunk['AIRLINE'])
+        origin = self._encode(self.airports, chunk['ORIGIN_AIRPORT'])
+        dest = self._encode(self.airports, chunk['DESTINATION_AIRPORT'])
+        month = chunk['MONTH'].to_numpy(dtype=np.int64) - 1
+        weekday = chunk['DAY_OF_WEEK'].to_numpy(dtype=np.int64) - 1
+        hour = np.minimum(chunk['SCHEDULED_DEPARTURE'].to_numpy(dtype=np.int64) // 100, 23)
+
+        cancelled = chunk['CANCELLED'].to_numpy(dtype=np.int64)
+        arr, arr_ok = _int_column(chunk['ARRIVAL_DELAY'])
+
+        values = np.zeros((n, len(CUBE_MEASURES)), dtype=np.int64)
+        values[:, CM['flights']] = 1
+        values[:, CM['cancelled']] = cancelled
+        values[:, CM['diverted']] = chunk['DIVERTED'].to_numpy(dtype=np.int64)
+        values[:, CM['distance_sum']] = chunk['DISTANCE'].to_numpy(dtype=np.int64)
+        values[:, CM['arr_count']] = arr_ok
+        values[:, CM['arr_sum']] = arr
+        values[:, CM['on_time']] = arr_ok & (arr <= ON_TIME_THRESHOLD)
+        values[:, CM['late']] = arr_ok & (arr > ON_TIME_THRESHOLD)
+        for column in DELAY_CAUSES:
+            minutes, valid = _int_column(chunk[column])
+            hit = valid & (minutes > 0)
+            values[:, CM[f'cause_count:{column}']] = hit
+            values[:, CM[f'cause_minutes:{column}']] = np.where(hit, minutes, 0)
+        reason = chunk['CANCELLATION_REASON'].to_numpy(dtype=object)
+        for code in CANCELLATION_CODES:
+            values[:, CM[f'cancel_reason:{code}']] = (cancelled == 1) & (reason == code)
+
+        keys, values = _reduce(_pack([airline, origin, dest, month, weekday, hour]), values)
+        self._keys.append(keys)
+        self._values.append(values)
+        self._pending += len(keys)
+        if self._pending > _COMPACT_ROWS:
+            self._compact()
+
+    @classmethod
+    def from_cube(cls, cube):
+        """
+        Builder semeado com as células de um cubo existente (modo incremental)
+        """
+        builder = cls()
+        builder.airlines = KeyIndex(cube.labels['airline'])
+        builder.airports = KeyIndex(cube.labels['origin'])
+        builder._keys = [_pack([cube.dims[d].astype(np.int64) for d in DIMENSIONS])]
+        builder._values = [cube.values.astype(np.int64)]
+        builder._pending = len(cube)
+        builder.airport_info = dict(cube.airport_info)
+        return builder
+
+    def _encode(self, index, column):
+        codes, uniques = pd.factorize(column)
+        return index.lookup(uniques)[codes]
+
+    def _compact(self):
+        if len(self._keys) > 1:
+            keys, values = _reduce(np.concatenate(self._keys), np.concatenate(self._values))
+            self._keys, self._values = [keys], [values]
+        self._pending = sum(len(k) for k in self._keys)
+
+    def merge(self, other):
+        """
+        Incorpora as células de outro builder (processos paralelos)
+        """
+        other._compact()
+        for keys, values in zip(other._keys, other._values):
+            codes = _unpack(keys)
+            codes[0] = self.airlines.lookup(other.airlines.keys)[codes[0]]
+            airport_map = self.airports.lookup(other.airports.keys)
+            codes[1] = airport_map[codes[1]]
+            codes[2] = airport_map[codes[2]]
+            self._keys.append(_pack(codes))
+            self._values.append(values)
+        self._compact()
+        return self
+
+    def build(self):
+        """
+        Finaliza o cubo com rótulos ordenados (códigos determinísticos)
+        """
+        self._compact()
+        keys = self._keys[0] if self._keys else np.zeros(0, dtype=np.int64)
+        values = self._values[0] if self._values else np.zeros((0, len(CUBE_MEASURES)), np.int64)
+        airline, origin, dest, month, weekday, hour = _unpack(keys)
+
+        airline_labels = sorted(self.airlines.keys)
+        airport_labels = sorted(self.airports.keys)
+        airline_map = _sorted_positions(self.airlines.keys, airline_labels)
+        airport_map = _sorted_positions(self.airports.keys, airport_labels)
+
+        dims = {
+            'airline': airline_map[airline] if len(airline_map) else airline,
+            'origin': airport_map[origin] if len(airport_map) else origin,
+            'dest': airport_map[dest] if len(airport_map) else dest,
+            'month': month,
+            'weekday': weekday,
+            'hour': hour,
+        }
+        labels = {
+            'airline': airline_labels,
+            'origin': airport_labels,
+            'dest': airport_labels,
+            'month': list(range(1, 13)),
+            'weekday': list(range(1, 8)),
+            'hour': list(range(24)),
+        }
+        return FlightCube(dims, labels, values, self.airport_info)
+
+
+class FlightCube:
+    """
+    Cubo esparso: ``dims[nome]`` são os códigos de cada célula,
+    ``labels[nome]`` os rótulos de cada código e ``values`` a matriz
+    células × ``CUBE_MEASURES``. Um cubo pode ter só parte das
+    ``DIMENSIONS`` (ver ``rollup``); ``airport_info`` mapeia cada aeroporto
+    em (cidade, estado) quando a referência de aeroportos foi informada.
+    """
+
+    def __init__(self, dims, labels, values, airport_info=None):
+        self.dimensions = tuple(d for d in DIMENSIONS if d in dims)
+        order = np.lexsort([dims[d] for d in reversed(self.dimensions)])
+        self.dims = {d: np.ascontiguousarray(dims[d][order]).astype(_dim_dtype(len(labels[d])))
+                     for d in self.dimensions}
+        self.labels = {d: list(labels[d]) for d in self.dimensions}
+        # int64 como no FlightAggregates: somas de um ano (ex.: distance_sum) passam de 2**31
+        self.values = np.asfortranarray(values[order].astype(np.int64))
+        self.airport_info = dict(airport_info or {})
+        self._positions = {d: {v: i for i, v in enumerate(self.labels[d])}
+                           for d in self.dimensions}
+        self._label_arrays = {d: np.array(self.labels[d]) for d in self.dimensions}
+
+    def __len__(self):
+        return len(self.values)
+
+    def codes(self, dimension, values):
+        """
+        Converte rótulos (ex.: 'AA', 'ATL', 7) em códigos da dimensão
+        """
+        pos = self._positions[dimension]
+        return np.array([pos[v] for v in values if v in pos], dtype=np.int64)
+
+    def mask(self, where=None):
+        """
+        Máscara das células que satisfazem ``where`` ({dimensão: rótulos})
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for dimension, values in (where or {}).items():
+            if values is None:
+                continue
+            mask &= np.isin(self.dims[dimension], self.codes(dimension, values))
+        return mask
+
+    def _group(self, by, rows):
+        """
+        Grupo de cada célula de ``rows`` e os códigos das dimensões ``by`` de
+        cada grupo. Combinações pequenas usam todos os grupos possíveis; as
+        grandes (ex.: rota × companhia) só os grupos presentes.
+        """
+        sizes = [len(self.labels[d]) for d in by]
+        group = np.zeros(len(rows), dtype=np.int64)
+        for d, size in zip(by, sizes):
+            group = group * size + self.dims[d][rows]
+        n_groups = int(np.prod(sizes)) if by else 1
+        if n_groups <= _DENSE_GROUPS:
+            keys = np.arange(n_groups)
+        else:
+            keys, group = np.unique(group, return_inverse=True)
+            group = group.ravel()
+
+        codes = []
+        for size in reversed(sizes):
+            codes.append(keys % size)
+            keys = keys // size
+        return group, codes[::-1]
+
+    def _sums(self, group, n_groups, rows, measures):
+        out = np.empty((n_groups, len(measures)), dtype=np.int64)
+        for j, name in enumerate(measures):
+            column = self.values[rows, CM[name]]
+            out[:, j] = np.rint(np.bincount(group, weights=column, minlength=n_groups))
+        return out
+
+    def table(self, by=(), where=None, measures=CUBE_MEASURES, rows=None):
+        """
+        Roll-up das medidas pelas dimensões ``by``, restrito a ``where``.
+        ``rows`` (índices de células) substitui a máscara quando já conhecido.
+        Retorna {coluna: array} com os rótulos das dimensões e as medidas
+        somadas (grupos sem voos são descartados quando 'flights' é medida).
+        """
+        if rows is None:
+            rows = np.flatnonzero(self.mask(where))
+        group, codes = self._group(by, rows)
+        n_groups = len(codes[0]) if by else 1
+        sums = self._sums(group, n_groups, rows, measures)
+        keep = sums[:, list(measures).index('flights')] > 0 if 'flights' in measures else slice(None)
+
+        out = {d: self._label_arrays[d][values[keep]] for d, values in zip(by, codes)}
+        out.update({name: sums[keep, j] for j, name in enumerate(measures)})
+        return out
+
+    def query(self, by=(), where=None, measures=CUBE_MEASURES, rows=None):
+        """
+        ``table`` como DataFrame
+        """
+        return pd.DataFrame(self.table(by, where, measures, rows))
+
+    def rollup(self, by):
+        """
+        Novo cubo só com as dimensões ``by`` (todas as medidas somadas),
+        usado como tabela resumida para consultas que não precisam das demais
+        """
+        rows = np.arange(len(self))
+        group, codes = self._group(by, rows)
+        values = self._sums(group, len(codes[0]), rows, CUBE_MEASURES)
+        keep = values[:, CM['flights']] > 0
+        return FlightCube({d: c[keep] for d, c in zip(by, codes)},
+                          {d: self.labels[d] for d in by},
+                          values[keep], self.airport_info)
+
+
+def _dim_dtype(size):
+    return np.int8 if size < 128 else np.int16 if size < 32768 else np.int32
+
+
+def save_cube(cube, path, airports=None):
+    """
+    Grava o cubo em .npz (somente arrays). Com ``airports`` (airports.csv),
+    grava também cidade e estado de cada aeroporto do cubo.
+    """
+    arrays = {f'dim_{d}': cube.dims[d] for d in DIMENSIONS}
+    arrays.update({f'labels_{d}': np.array([str(v) for v in cube.labels[d]]) for d in DIMENSIONS})
+    arrays['values'] = cube.values
+    arrays['measures'] = np.array(CUBE_MEASURES)
+    info = dict(cube.airport_info)
+    if airports is not None:
+        info.update(zip(airports['IATA_CODE'], zip(airports['CITY'], airports['STATE'])))
+    if info:
+        codes = [code for code in cube.labels['origin'] if code in info]
+        arrays['airport_info'] = np.array([[code, *map(str, info[code])] for code in codes]).reshape(-1, 3)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez(path, **arrays)
+
+
+def load_cube(path):
+    with np.load(path, allow_pickle=False) as f:
+        if tuple(f['measures'].tolist()) != CUBE_MEASURES:
+            raise ValueError(f"{path} foi gravado com outras medidas; gere o cubo novamente")
+        dims = {d: f[f'dim_{d}'] for d in DIMENSIONS}
+        labels = {d: f[f'labels_{d}'].tolist() for d in DIMENSIONS}
+        for d in ('month', 'weekday', 'hour'):
+            labels[d] = [int(v) for v in labels[d]]
+        values = f['values']
+        info = f['airport_info'].tolist() if 'airport_info' in f else []
+    return FlightCube(dims, labels, values, {code: (city, state) for code, city, state in info})
+
+
+def _rates(t):
+    """
+    Acrescenta as taxas usuais a ``t`` ({coluna: array} ou DataFrame)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t['total_flights'] = t['flights']
+        t['avg_arrival_delay'] = np.round(t['arr_sum'] / t['arr_count'], 2)
+        t['on_time_rate'] = np.round(t['on_time'] / t['flights'] * 100, 2)
+        t['cancellation_rate'] = np.round(t['cancelled'] / t['flights'] * 100, 2)
+        t['diversion_rate'] = np.round(t['diverted'] / t['flights'] * 100, 2)
+    return t
+
+
+def monthly_frame(cube, where=None, rows=None):
+    """
+    Série mensal no formato de grafico_01 (colunas usadas pelo gráfico 1)
+    """
+    t = _rates(cube.table(('month',), where, BASE_MEASURES, rows))
+    t['month_name'] = [calendar.month_name[m] for m in t['month']]
+    t['on_time_flights'] = t['on_time']
+    t['total_cancelled'] = t['cancelled']
+    return pd.DataFrame(t)
+
+
+def airline_metrics_frame(cube, airline_names=None, where=None, rows=None):
+    """
+    Métricas por companhia no formato de ``reports.airline_metrics``
+    """
+    t = _rates(cube.table(('airline',), where, BASE_MEASURES, rows))
+    names = airline_names or {}
+    t['airline_code'] = t['airline']
+    t['airline_name'] = [names.get(c, c) for c in t['airline']]
+    return pd.DataFrame(t)
+
+
+def airline_frame(cube, airline_names=None, where=None, rows=None):
+    """
+    Métricas e score por companhia no formato de grafico_02
+    """
+    df = airline_metrics_frame(cube, airline_names, where, rows)
+    if df.empty:
+        df['performance_score'] = []
+        df['performance_category'] = []
+        return df
+    return score_airlines(df)
+
+
+def day_hour_frame(cube, where=None, rows=None):
+    """
+    Matriz 7 × 24 de atraso médio (voos não cancelados), como grafico_03
+    """
+    t = cube.table(('weekday', 'hour'), where, ('flights', 'arr_count', 'arr_sum'), rows)
+    matrix = np.full((7, 24), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrix[t['weekday'] - 1, t['hour']] = np.round(t['arr_sum'] / t['arr_count'], 2)
+    out = pd.DataFrame(matrix, columns=[str(h) for h in range(24)])
+    out.insert(0, 'day_name', DAY_NAMES)
+    return out
+
+
+def month_totals(cube, where=None, rows=None):
+    """
+    Voos, atrasados e medidas de causa por mês (12 linhas, meses sem voos
+    zerados), no formato aceito por ``reports.cause_metrics``
+    """
+    measures = ('flights', 'late') + tuple(m for m in CUBE_MEASURES if ':' in m)
+    t = cube.table(('month',), where, measures, rows)
+    full = {name: np.zeros(12, dtype=np.int64) for name in measures}
+    for name in measures:
+        full[name][t['month'] - 1] = t[name]
+
+    def matrix(prefix, keys):
+        return np.column_stack([full[f'{prefix}:{k}'] for k in keys])
+
+    return SimpleNamespace(
+        flights=full['flights'],
+        late=full['late'],
+        cause_count=matrix('cause_count', DELAY_CAUSES),
+        cause_minutes=matrix('cause_minutes', DELAY_CAUSES),
+        cancel_reason=matrix('cancel_reason', CANCELLATION_CODES),
+    )
+
+
+def causes_frame(cube, where=None, rows=None, causes=None):
+    """
+    Causas principais e menores no formato de grafico_04. ``causes``
+    (``reports.cause_metrics``) evita recalcular quando já conhecido.
+    """
+    if causes is None:
+        causes = cause_metrics(month_totals(cube, where, rows))
+    return causes_chart_data(causes)
+
+
+def route_frame(cube, where=None, rows=None, min_flights=0, top=None):
+    """
+    Métricas das rotas com pelo menos ``min_flights`` voos, no formato de
+    ``reports.route_metrics``. Com ``top``, mantém só as ``top`` rotas de
+    maior score de criticidade (as companhias operadoras são a parte cara).
+    """
+    if rows is None:
+        rows = np.flatnonzero(cube.mask(where))
+    t = cube.table(('origin', 'dest'), measures=BASE_MEASURES, rows=rows)
+    keep = t['flights'] >= min_flights
+    df = pd.DataFrame(_rates({name: values[keep] for name, values in t.items()}))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['avg_distance'] = np.round(df['distance_sum'] / df['flights'], 2)
+    df['criticality_score'] = route_criticality(df)
+    if top is not None:
+        df = df.sort_values('criticality_score', ascending=False, kind='stable')
+        df = df.head(top).sort_values(['origin', 'dest'], kind='stable').reset_index(drop=True)
+
+    # Companhias de cada rota selecionada, em ordem alfabética
+    origin, dest = cube.codes('origin', df['origin']), cube.codes('dest', df['dest'])
+    wanted = np.isin(cube.dims['origin'][rows].astype(np.int64) * len(cube.labels['dest'])
+                     + cube.dims['dest'][rows], origin * len(cube.labels['dest']) + dest)
+    operators = cube.query(('origin', 'dest', 'airline'), measures=('flights',), rows=rows[wanted])
+    joined = operators.groupby(['origin', 'dest'], sort=False)['airline'].agg(', '.join)
+    df['airlines'] = joined.reindex(pd.MultiIndex.from_frame(df[['origin', 'dest']])).to_numpy()
+
+    info = cube.airport_info
+    for side in ('origin', 'dest'):
+        df[f'{side}_city'] = [info.get(code, (np.nan, np.nan))[0] for code in df[side]]
+        df[f'{side}_state'] = [info.get(code, (np.nan, np.nan))[1] for code in df[side]]
+    return df
+
+
+def cube_reports(cube, airline_names=None, where=None, rows=None, causes=None):
+    """
+    Os quatro relatórios tabulares (relatorio_01..04) calculados a partir do cubo
+    """
+    if rows is None:
+        rows = np.flatnonzero(cube.mask(where))
+    monthly = monthly_frame(cube, rows=rows)
+    totals = month_totals(cube, rows=rows)
+    if causes is None:
+        causes = cause_metrics(totals)
+    months = monthly['month'].to_numpy() - 1
+    routes = route_frame(cube, rows=rows, min_flights=MIN_ROUTE_FLIGHTS, top=TOP_CRITICAL_ROUTES)
+    return {
+        'relatorio_01': airline_ranking(airline_metrics_frame(cube, airline_names, rows=rows)),
+        'relatorio_02': critical_routes(routes),
+        'relatorio_03': seasonality_report(monthly, totals.late[months], totals.cause_minutes[months]),
+        'relatorio_04': causes_report(causes, int(totals.flights.sum())),
+    }
+
+
+def cube_datasets(cube, airline_names=None, where=None, rows=None):
+    """
+    DataFrames dos quatro gráficos do dashboard, calculados a partir do cubo
+    """
+    if rows is None:
+        rows = np.flatnonzero(cube.mask(where))
+    main_causes, minor_causes = causes_frame(cube, rows=rows)
+    return {
+        'grafico_01': monthly_frame(cube, rows=rows),
+        'grafico_02': airline_frame(cube, airline_names, rows=rows),
+        'grafico_03_atrasos': day_hour_frame(cube, rows=rows),
+        'grafico_04_principais': main_causes,
+        'grafico_04_menores': minor_causes,
+    }
@@ -0,0 +1,363 @@
+"""
+Exportação em partes das tabelas do dashboard (CSV, Parquet e XLSX).
+
+As tabelas nunca são montadas inteiras para exportar. Uma fonte de partes
+entrega DataFrames de até ``CHUNK_ROWS`` linhas, e ``TableWriter`` grava
+cada parte ao chegar:
+
+* CSV: cabeçalho na primeira parte e anexação das seguintes;
+* Parquet: um row group por parte (``pyarrow.parquet.ParquetWriter``);
+* XLSX: planilha ``write_only`` do openpyxl, que descarrega as linhas em
+  disco. Passando de ``XLSX_MAX_ROWS`` linhas, a tabela continua numa nova
+  aba.
+
+Fontes de partes:
+
+* ``frame_chunks``: fatias de um DataFrame já em memória (relatórios
+  filtrados pelo dashboard);
+* ``dataset_chunks``: um dataset de ``data/``, lido em fatias do snapshot
+  Arrow (memory map) ou, sem snapshot atual, do CSV com ``chunksize``;
+* ``RouteTable.chunks``: a seleção e a ordem atuais do explorador de rotas.
+
+A memória fica limitada a uma parte por exportação, mais o buffer de cada
+formato. O arquivo é gravado num ``.tmp`` e só aparece completo (os.replace).
+``pyarrow.parquet`` e openpyxl são importados só ao gravar Parquet ou XLSX.
+
+No dashboard, ``ExportJobs`` roda as exportações num pool de threads. O
+script só dispara o job e consulta o progresso, então nem o script nem o
+servidor ficam parados esperando a gravação. Os arquivos ficam numa pasta
+temporária e são apagados ``KEEP_SECONDS`` depois de prontos.
+
+Uso:
+    from pipeline.download import ExportJobs, dataset_chunks, write_table
+    write_table(dataset_chunks('data', 'relatorio_02'), 'rotas.parquet', 'parquet')
+    jobs = ExportJobs('/tmp/exportacoes')
+    job = jobs.submit('rotas', table.chunks(mask, 'Total Voos'), 'xlsx', total)
+"""
+
+import importlib.util
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .reports import CSV_DTYPES, OUTPUT_FILES
+from .snapshot import current_snapshot
+
+TABLE_FORMATS = ('csv', 'parquet', 'xlsx')
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Módulo exigido por cada formato (None = só pandas)
+FORMAT_MODULES = {'csv': None, 'parquet': 'pyarrow.parquet', 'xlsx': 'openpyxl'}
+CHUNK_ROWS = 50_000
+# Linhas de dados por aba do Excel (1.048.576 menos o cabeçalho)
+XLSX_MAX_ROWS = 1_048_575
+DEFAULT_WORKERS = 2
+KEEP_SECONDS = 3600
+
+
+class ExportCancelled(Exception):
+    """
+    Exportação interrompida a pedido do usuário
+    """
+
+
+def available_formats():
+    """
+    Formatos com as dependências instaladas
+    """
+    formats = []
+    for fmt in TABLE_FORMATS:
+        module = FORMAT_MODULES[fmt]
+        try:
+            found = module is None or importlib.util.find_spec(module) is not None
+        except ModuleNotFoundError:  # pacote pai ausente (pyarrow)
+            found = False
+        if found:
+            formats.append(fmt)
+    return formats
+
+
+class TableWriter:
+    """
+    Arquivo CSV, Parquet ou XLSX gravado parte por parte (``write``)
+    """
+
+    def __init__(self, path, fmt, sheet='dados'):
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"formato desconhecido: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.sheet = sheet[:28]
+        self.rows = 0
+        self._tmp = path + '.tmp'
+        self._writer = None
+        self._sheet_rows = 0
+        self._sheets = 0
+        self._columns = None
+        self._started = False
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self._tmp, mode='a' if self._started else 'w', index=False,
+                      header=not self._started)
+        elif self.fmt == 'parquet':
+            self._write_parquet(df)
+        else:
+            self._write_xlsx(df)
+        self._started = True
+        self.rows += len(df)
+
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            # Dicionários (categorias) viram o tipo dos valores: cada parte
+            # traz o próprio dicionário
+            self._schema = pa.schema([
+                field.with_type(field.type.value_type) if pa.types.is_dictionary(field.type)
+                else field for field in table.schema])
+            self._writer = pq.ParquetWriter(self._tmp, self._schema, compression='zstd')
+        self._writer.write_table(table.cast(self._schema))
+
+    def _new_sheet(self):
+        self._sheets += 1
+        name = self.sheet if self._sheets == 1 else f"{self.sheet} {self._sheets}"
+        self._ws = self._writer.create_sheet(name)
+        self._ws.append(self._columns)
+        self._sheet_rows = 0
+
+    def next_sheet(self, sheet):
+        """
+        XLSX: as próximas partes vão para uma nova aba ``sheet``
+        """
+        self.sheet = sheet[:28]
+        self._sheets = 0
+        self._columns = None
+
+    def _write_xlsx(self, df):
+        if self._writer is None:
+            from openpyxl import Workbook
+
+            self._writer = Workbook(write_only=True)
+        if self._columns is None:
+            self._columns = [str(c) for c in df.columns]
+            self._new_sheet()
+        # NaN vira célula vazia (o Excel não tem NaN)
+        values = df.astype(object)
+        values = values.where(values.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            if self._sheet_rows == XLSX_MAX_ROWS:
+                self._new_sheet()
+            self._ws.append(row)
+            self._sheet_rows += 1
+
+    def close(self):
+        """
+        Fecha o arquivo e o publica no caminho final
+        """
+        if self.fmt == 'parquet':
+            if self._writer is None:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                pq.write_table(pa.table({}), self._tmp)
+            else:
+                self._writer.close()
+        elif self.fmt == 'xlsx':
+            if self._writer is None:
+                from openpyxl import Workbook
+
+                self._writer = Workbook(write_only=True)
+                self._writer.create_sheet(self.sheet)
+            self._writer.save(self._tmp)
+        elif not os.path.exists(self._tmp):
+            open(self._tmp, 'w').close()
+        self._writer = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """
+        Descarta o arquivo parcial
+        """
+        if self.fmt == 'parquet' and self._writer is not None:
+            self._writer.close()
+        self._writer = None
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def write_table(chunks, path, fmt, sheet='dados', progress=None):
+    """
+    Grava as partes em ``path`` e retorna o número de linhas; ``progress``
+    recebe o total de linhas gravadas após cada parte
+    """
+    writer = TableWriter(path, fmt, sheet)
+    try:
+        for df in chunks:
+            writer.write(df)
+            if progress is not None:
+                progress(writer.rows)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.rows
+
+
+def frame_chunks(df, rows=CHUNK_ROWS):
+    """
+    Fatias de até ``rows`` linhas de um DataFrame (ao menos uma, para o
+    arquivo ter o cabeçalho)
+    """
+    for start in range(0, max(len(df), 1), rows):
+        yield df.iloc[start:start + rows]
+
+
+def dataset_chunks(data_dir, key, rows=CHUNK_ROWS):
+    """
+    Partes de um dataset de ``data_dir``: do snapshot Arrow, sem copiá-lo
+    para a memória, ou do CSV lido em blocos (sem snapshot ou com snapshot
+    defasado). Dataset vazio gera uma parte vazia, com as colunas.
+    """
+    path = current_snapshot(data_dir, key)
+    if path is not None:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        with pa.memory_map(path) as source:
+            reader = ipc.open_file(source)
+            empty = True
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for start in range(0, batch.num_rows, rows):
+                    empty = False
+                    yield batch.slice(start, rows).to_pandas()
+            if empty:
+                yield reader.schema.empty_table().to_pandas()
+        return
+    import pandas as pd
+
+    yield from pd.read_csv(os.path.join(data_dir, OUTPUT_FILES[key]), dtype=CSV_DTYPES.get(key),
+                           chunksize=rows)
+
+
+class ExportJob:
+    """
+    Uma exportação em segundo plano: progresso, erro e arquivo final
+    """
+
+    def __init__(self, name, fmt, path, total=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.fmt = fmt
+        self.path = path
+        self.total = total
+        self.rows = 0
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.cancelled = False
+        self.future = None
+
+    @property
+    def file_name(self):
+        return f"{self.name}.{self.fmt}"
+
+    @property
+    def mime(self):
+        return MIME_TYPES[self.fmt]
+
+    @property
+    def done(self):
+        return self.finished is not None
+
+    @property
+    def ok(self):
+        return self.done and self.error is None
+
+    @property
+    def fraction(self):
+        if self.done:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.rows / self.total, 1.0)
+
+    @property
+    def size(self):
+        return os.path.getsize(self.path) if self.ok else 0
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _progress(self, rows):
+        self.rows = rows
+        if self.cancelled:
+            raise ExportCancelled(self.name)
+
+
+class ExportJobs:
+    """
+    Exportações do dashboard rodando num pool de threads, com os arquivos
+    em ``directory``
+    """
+
+    def __init__(self, directory, workers=DEFAULT_WORKERS, keep=KEEP_SECONDS):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, chunks, fmt, total=None):
+        """
+        Agenda a gravação das partes ``chunks`` (iterável preguiçoso) no
+        formato ``fmt``; retorna o ``ExportJob``
+        """
+        if fmt not in TABLE_FORMATS:
+            raise ValueError(f"formato desconhecido: {fmt}")
+        self.cleanup()
+        job = ExportJob(name, fmt, None, total)
+        folder = os.path.join(self.directory, job.id)
+        os.makedirs(folder, exist_ok=True)
+        job.path = os.path.join(folder, job.file_name)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, chunks)
+        return job
+
+    @staticmethod
+    def _run(job, chunks):
+        try:
+            job.rows = write_table(chunks, job.path, job.fmt, job.name, job._progress)
+        except BaseException as e:
+            job.error = e
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cleanup(self):
+        """
+        Remove jobs (e arquivos) terminados há mais de ``keep`` segundos
+        """
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.done and now - job.finished > self.keep]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(os.path.dirname(job.path), ignore_errors=True)
+        return len(expired)
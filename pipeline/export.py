@@ -0,0 +1,362 @@
+"""
+Exportação em lote das figuras e relatórios do dashboard, sem servidor.
+
+Cada figura ``create_*_chart`` do dashboard vira PNG, SVG e/ou HTML. Cada
+dataset de ``OUTPUT_FILES`` presente na pasta de dados vira CSV e/ou
+Parquet, e todos juntos viram uma planilha XLSX (uma aba por dataset). Os
+datasets são copiados em partes (``pipeline.download``), sem carregar a
+tabela inteira. Os artefatos são
+independentes e rodam em um pool de processos. Cada processo importa o
+``streamlit_app`` em modo bare, uma vez, e só se for gerar figuras.
+
+Um artefato só é refeito quando a sua impressão digital muda. Ela reúne:
+
+* as versões (hash do manifesto) dos datasets que o artefato leu da última
+  vez;
+* o hash do código que gera o artefato (``streamlit_app.py`` nas figuras);
+* as opções de exportação (formatos, tamanho e limite das imagens).
+
+As impressões ficam em ``export_state.json`` na pasta de saída. A
+exportação semanal regrava só o que mudou.
+
+As imagens estáticas usam o ``plotly.io.to_image`` (kaleido). O PNG é
+reotimizado com o Pillow (paleta de 256 cores, ``optimize``) e, se passar de
+``--max-kb``, reduzido em passos de 20% até caber. Sem o kaleido (ou sem o
+navegador que ele usa), PNG e SVG são ignorados com um aviso, e HTML, CSV,
+Parquet e XLSX seguem normalmente.
+
+Uso:
+    python -m pipeline.export --data data --output export
+    python -m pipeline.export --data data/2016 --output export/2016 --formats png html parquet xlsx
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from .download import TableWriter, dataset_chunks, write_table
+from .manifest import artifact_versions
+from .reports import OUTPUT_FILES
+
+FIGURE_FORMATS = ('png', 'svg', 'html')
+REPORT_FORMATS = ('csv', 'parquet', 'xlsx')
+# Formatos gravados um arquivo por dataset
+TABLE_FILE_FORMATS = ('csv', 'parquet')
+DEFAULT_FORMATS = FIGURE_FORMATS + REPORT_FORMATS
+
+STATE_FILE = 'export_state.json'
+WORKBOOK_FILE = 'relatorios.xlsx'
+DEFAULT_WIDTH = 1200
+DEFAULT_HEIGHT = 600
+DEFAULT_MAX_KB = 300
+# Menor fator de redução aceito para caber no limite de tamanho
+MIN_IMAGE_SCALE = 0.4
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'streamlit_app.py')
+
+_app = None
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fingerprint(inputs, versions, code, options):
+    """
+    Impressão digital de um artefato: versões das entradas, código e opções
+    """
+    payload = {'inputs': {key: versions.get(key) for key in sorted(inputs)},
+               'code': code, 'options': options}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _write_bytes(path, content):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def optimize_png(content, max_bytes):
+    """
+    PNG reotimizado (paleta + optimize) e reduzido até caber em
+    ``max_bytes``; retorna (bytes, (largura, altura))
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(content)).convert('RGB')
+    width, height = image.size
+    scale = 1.0
+    while True:
+        size = (max(round(width * scale), 1), max(round(height * scale), 1))
+        candidate = image if scale == 1.0 else image.resize(size, Image.LANCZOS)
+        out = io.BytesIO()
+        candidate.quantize(colors=256).save(out, 'PNG', optimize=True)
+        if out.tell() <= max_bytes or scale * 0.8 < MIN_IMAGE_SCALE:
+            return out.getvalue(), size
+        scale *= 0.8
+
+
+class _Recorder(Mapping):
+    """
+    Visão dos datasets que registra as chaves lidas pela figura
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.keys = set()
+
+    def __getitem__(self, key):
+        self.keys.add(key)
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def _load_app(data_dir):
+    global _app
+    from .benchmark import _import_app, _point_app
+
+    if _app is None:
+        _app = _import_app()
+    if _app.data_dir() != data_dir:
+        _point_app(_app, data_dir)
+    return _app
+
+
+def _check_inputs(app, data, data_dir):
+    """
+    Garante que a figura leu os datasets de ``data_dir``: a versão de cada
+    dataset lido tem de ser a do manifesto da pasta (com warehouse, as
+    versões são as marcas de refresh e não são comparáveis)
+    """
+    if app.warehouse_versions():
+        return
+    expected = artifact_versions(data_dir)
+    for key in data.keys:
+        version = data.data.version(key)
+        if key in expected and version != expected[key]:
+            raise RuntimeError(f"{key} lido de outra pasta (versão {version}, "
+                               f"esperada {expected[key]} em {data_dir})")
+
+
+def _export_figure(job):
+    app = _load_app(job['data_dir'])
+    from .benchmark import chart_builders
+
+    builder = chart_builders(app)[job['name']]
+    data = _Recorder(app.load_data())
+    try:
+        fig = builder(data)
+    except app.DatasetError as e:
+        return {'files': [], 'inputs': sorted(data.keys), 'skipped': f"dados indisponíveis ({e.key})"}
+    _check_inputs(app, data, job['data_dir'])
+
+    base = os.path.join(job['output'], job['name'].removeprefix('create_').removesuffix('_chart'))
+    files, skipped = [], None
+    for fmt in job['formats']:
+        path = f"{base}.{fmt}"
+        if fmt == 'html':
+            # plotly.js via CDN: a página fica com dezenas de KB
+            _write_bytes(path, fig.to_html(include_plotlyjs='cdn', full_html=True).encode('utf-8'))
+        else:
+            try:
+                content = fig.to_image(format=fmt, width=job['width'], height=job['height'])
+            except Exception as e:  # kaleido ausente ou sem navegador
+                skipped = f"{fmt.upper()} ignorado: {str(e).strip().splitlines()[0]}"
+                continue
+            if fmt == 'png':
+                content, _ = optimize_png(content, job['max_kb'] * 1024)
+            _write_bytes(path, content)
+        files.append(path)
+    return {'files': files, 'inputs': sorted(data.keys), 'skipped': skipped}
+
+
+def _export_report(job):
+    name = os.path.splitext(OUTPUT_FILES[job['name']])[0]
+    path = os.path.join(job['output'], f"{name}.{job['format']}")
+    try:
+        write_table(dataset_chunks(job['data_dir'], job['name']), path, job['format'], job['name'])
+    except ImportError as e:  # sem pyarrow
+        return {'files': [], 'inputs': [job['name']],
+                'skipped': f"{job['format'].upper()} ignorado: {e}"}
+    return {'files': [path], 'inputs': [job['name']], 'skipped': None}
+
+
+def _export_workbook(job):
+    path = os.path.join(job['output'], WORKBOOK_FILE)
+    writer = TableWriter(path, 'xlsx')
+    try:
+        for key in job['keys']:
+            writer.next_sheet(key)
+            for df in dataset_chunks(job['data_dir'], key):
+                writer.write(df)
+    except ImportError as e:  # sem openpyxl
+        writer.abort()
+        return {'files': [], 'inputs': job['keys'], 'skipped': f"XLSX ignorado: {e}"}
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return {'files': [path], 'inputs': job['keys'], 'skipped': None}
+
+
+def run_job(job):
+    """
+    Executa um artefato no processo do pool; retorna arquivos gravados,
+    datasets lidos e, se for o caso, o motivo de um formato ignorado
+    """
+    start = time.perf_counter()
+    runner = {'figura': _export_figure, 'relatorio': _export_report,
+              'planilha': _export_workbook}[job['kind']]
+    result = runner(job)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def plan_jobs(data_dir, output, formats, width, height, max_kb, figure_names):
+    """
+    Lista de artefatos: (id, job, código, opções)
+    """
+    available = [key for key in OUTPUT_FILES if os.path.exists(os.path.join(data_dir, OUTPUT_FILES[key]))]
+    common = {'data_dir': data_dir, 'output': output}
+    jobs = []
+
+    figure_formats = [f for f in formats if f in FIGURE_FORMATS]
+    if figure_formats:
+        code = file_hash(APP_FILE)
+        options = {'formats': figure_formats, 'width': width, 'height': height, 'max_kb': max_kb}
+        for name in figure_names:
+            jobs.append((f"figura:{name}", {**common, 'kind': 'figura', 'name': name, **options},
+                         code, options))
+
+    report_code = file_hash(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download.py'))
+    for fmt in TABLE_FILE_FORMATS:
+        if fmt not in formats:
+            continue
+        for key in available:
+            artifact = f"relatorio:{key}" if fmt == 'csv' else f"relatorio:{key}:{fmt}"
+            jobs.append((artifact, {**common, 'kind': 'relatorio', 'name': key, 'format': fmt},
+                         report_code, {'format': fmt}))
+    if 'xlsx' in formats and available:
+        jobs.append(("planilha", {**common, 'kind': 'planilha', 'keys': available},
+                     report_code, {'format': 'xlsx'}))
+    return jobs
+
+
+def figure_names():
+    """
+    Nomes das figuras do dashboard, lidos do código (sem importar o app)
+    """
+    import ast
+
+    with open(APP_FILE, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return sorted(node.name for node in tree.body if isinstance(node, ast.FunctionDef)
+                  and node.name.startswith('create_') and node.name.endswith('_chart')
+                  and [a.arg for a in node.args.args] == ['data'])
+
+
+def load_export_state(output):
+    path = os.path.join(output, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_export_state(state, output):
+    path = os.path.join(output, STATE_FILE)
+    _write_bytes(path, (json.dumps(state, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+                 .encode('utf-8'))
+
+
+def export(data_dir, output, formats=DEFAULT_FORMATS, workers=None, width=DEFAULT_WIDTH,
+           height=DEFAULT_HEIGHT, max_kb=DEFAULT_MAX_KB, force=False, progress=print):
+    """
+    Exporta os artefatos que mudaram; retorna {id: resultado} dos executados
+    e a lista dos que foram pulados
+    """
+    os.makedirs(output, exist_ok=True)
+    versions = artifact_versions(data_dir)
+    state = {} if force else load_export_state(output)
+    jobs = plan_jobs(data_dir, output, formats, width, height, max_kb, figure_names())
+
+    pending, unchanged = [], []
+    for artifact, job, code, options in jobs:
+        previous = state.get(artifact)
+        if (previous and previous['fingerprint'] == fingerprint(previous['inputs'], versions, code, options)
+                and all(os.path.exists(os.path.join(output, p)) for p in previous['files'])):
+            unchanged.append(artifact)
+        else:
+            pending.append((artifact, job, code, options))
+
+    results = {}
+    if pending:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {artifact: (pool.submit(run_job, job), code, options)
+                       for artifact, job, code, options in pending}
+            for artifact, (future, code, options) in futures.items():
+                result = future.result()
+                results[artifact] = result
+                if progress:
+                    note = f" ({result['skipped']})" if result['skipped'] else ''
+                    progress(f"  {artifact}: {len(result['files'])} arquivo(s), "
+                             f"{result['seconds']:.2f}s{note}")
+                # Formato ignorado não entra no estado: a próxima execução tenta de novo
+                if result['skipped'] is None:
+                    state[artifact] = {'fingerprint': fingerprint(result['inputs'], versions, code, options),
+                                       'inputs': result['inputs'],
+                                       'files': [os.path.relpath(p, output) for p in result['files']]}
+                else:
+                    state.pop(artifact, None)
+        save_export_state(state, output)
+    return results, unchanged
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.export',
+        description='Exporta figuras (PNG/SVG/HTML) e relatórios (CSV/Parquet/XLSX) do dashboard',
+    )
+    parser.add_argument('--data', default='data', help='Pasta dos datasets (padrão: data)')
+    parser.add_argument('--output', default='export', help='Pasta de saída (padrão: export)')
+    parser.add_argument('--formats', nargs='+', default=list(DEFAULT_FORMATS),
+                        choices=DEFAULT_FORMATS, help='Formatos (padrão: todos)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Processos do pool; 0 usa todas as CPUs (padrão: 0)')
+    parser.add_argument('--width', type=int, default=DEFAULT_WIDTH, help='Largura das imagens (px)')
+    parser.add_argument('--height', type=int, default=DEFAULT_HEIGHT, help='Altura das imagens (px)')
+    parser.add_argument('--max-kb', type=int, default=DEFAULT_MAX_KB,
+                        help='Tamanho máximo de cada PNG em KB (padrão: %(default)s)')
+    parser.add_argument('--force', action='store_true', help='Refaz tudo, ignorando o estado salvo')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    if not os.path.isdir(args.data):
+        sys.exit(f"{args.data} não é uma pasta")
+    results, unchanged = export(args.data, args.output, args.formats, args.workers or None,
+                                args.width, args.height, args.max_kb, args.force)
+    print(f"{len(results)} artefatos exportados e {len(unchanged)} sem mudanças em "
+          f"{args.output}/ ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
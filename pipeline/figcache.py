@@ -0,0 +1,94 @@
+"""
+Cache das figuras Plotly do dashboard.
+
+Cada rerun do Streamlit reconstruía as quatro figuras (o ``make_subplots``
+da tendência temporal é o mais caro). ``FigureCache`` guarda a figura pronta
+sob a chave (função construtora, impressão digital dos DataFrames de
+entrada, filtros ativos), com descarte LRU ao atingir ``maxsize`` e
+contadores de acertos e faltas. A figura é devolvida sem cópia: o
+``st.plotly_chart`` só a lê (serializa uma cópia via ``to_dict``).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAXSIZE = 64
+
+
+def frame_fingerprint(*frames):
+    """
+    Hash do conteúdo (colunas, índice e valores) dos DataFrames informados
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for df in frames:
+        digest.update(repr(list(df.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _freeze(params):
+    if isinstance(params, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(_freeze(v) for v in params)
+    return params
+
+
+class FigureCache:
+    """
+    Cache LRU de figuras, seguro para as sessões (threads) do Streamlit
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def key(self, builder, frames, params=None):
+        return builder.__name__, frame_fingerprint(*frames), _freeze(params)
+
+    def figure(self, builder, data, keys, params=None):
+        """
+        Figura de ``builder(data)``, construída só se a combinação das
+        entradas ``data[k]`` (k em ``keys``) e ``params`` ainda não estiver
+        no cache
+        """
+        key = self.key(builder, [data[k] for k in keys], params)
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return fig
+            self.misses += 1
+
+        fig = builder(data)
+        with self._lock:
+            self._figures[key] = fig
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.maxsize:
+                self._figures.popitem(last=False)
+        return fig
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._figures),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.hits = self.misses = 0
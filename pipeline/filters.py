@@ -0,0 +1,193 @@
+"""
+Filtros interativos do dashboard (companhia, faixa de meses, aeroporto)
+respondidos a partir do cubo, sem reler os voos.
+
+Cada dimensão filtrável tem um índice invertido (listas de células por
+código, em formato CSR). Um filtro começa pela lista mais curta entre as
+dimensões selecionadas e confere as demais só nessas células, então o custo
+é proporcional às células selecionadas e não ao tamanho do cubo.
+
+``DashboardFilters`` mantém três visões com índices próprios:
+
+* o resumo companhia × origem × destino × mês, que alimenta os relatórios e
+  os gráficos 1, 2 e 4;
+* o resumo companhia × mês × dia da semana × hora, para o mapa de calor
+  quando não há filtro de aeroporto;
+* o cubo completo, para o mapa de calor de um aeroporto (o índice de
+  aeroporto já restringe a poucas células).
+
+Os resultados das últimas ``CACHE_ENTRIES`` combinações ficam em memória. A
+instância é uma por versão do cubo (o dashboard a guarda com
+``st.cache_resource`` pela versão), então o cache vale por (versão do cubo,
+filtros): voltar a uma combinação ou trocar de aba não recalcula nada. Os
+DataFrames devolvidos são compartilhados e não devem ser alterados.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .cube import (
+    airline_frame,
+    causes_frame,
+    cube_reports,
+    day_hour_frame,
+    month_totals,
+    monthly_frame,
+    route_frame,
+)
+from .reports import cause_metrics
+from .routes import RouteTable
+
+FILTER_DIMENSIONS = ('airline', 'origin', 'dest', 'month')
+SUMMARY_DIMENSIONS = ('airline', 'origin', 'dest', 'month')
+HEATMAP_DIMENSIONS = ('airline', 'month', 'weekday', 'hour')
+CACHE_ENTRIES = 32
+
+
+class PostingIndex:
+    """
+    Índice invertido das células de um cubo: para cada dimensão,
+    ``rows[offsets[c]:offsets[c + 1]]`` são as células (em ordem) com código c
+    """
+
+    def __init__(self, cube, dimensions=FILTER_DIMENSIONS):
+        self.cube = cube
+        self.rows = {}
+        self.offsets = {}
+        for d in dimensions:
+            if d not in cube.dims:
+                continue
+            codes = cube.dims[d]
+            counts = np.bincount(codes, minlength=len(cube.labels[d]))
+            self.rows[d] = np.argsort(codes, kind='stable').astype(np.int32)
+            self.offsets[d] = np.concatenate([[0], np.cumsum(counts)])
+
+    def _postings(self, dimension, codes):
+        rows, offsets = self.rows[dimension], self.offsets[dimension]
+        return [rows[offsets[c]:offsets[c + 1]] for c in codes]
+
+    def _size(self, dimension, codes):
+        offsets = self.offsets[dimension]
+        return int((offsets[codes + 1] - offsets[codes]).sum())
+
+    def select(self, airlines=None, months=None, airports=None):
+        """
+        Índices (ordenados) das células dos filtros informados; ``None``
+        significa sem filtro na dimensão e ``airports`` casa origem ou destino
+        """
+        filters = []
+        if airlines is not None:
+            filters.append((('airline',), self.cube.codes('airline', airlines)))
+        if months is not None:
+            filters.append((('month',), self.cube.codes('month', months)))
+        if airports is not None:
+            filters.append((('origin', 'dest'), self.cube.codes('origin', airports)))
+        if not filters:
+            return np.arange(len(self.cube))
+
+        # Começa pelo filtro mais seletivo
+        filters.sort(key=lambda f: sum(self._size(d, f[1]) for d in f[0]))
+        dimensions, codes = filters[0]
+        postings = [p for d in dimensions for p in self._postings(d, codes)]
+        if len(dimensions) > 1:
+            # União (origem ou destino): marcar é mais barato que ordenar
+            selected = np.zeros(len(self.cube), dtype=bool)
+            for p in postings:
+                selected[p] = True
+            rows = np.flatnonzero(selected)
+        else:
+            rows = np.sort(np.concatenate(postings)) if postings else np.zeros(0, dtype=np.int64)
+
+        for dimensions, codes in filters[1:]:
+            keep = np.zeros(len(rows), dtype=bool)
+            for d in dimensions:
+                allowed = np.zeros(len(self.cube.labels[d]), dtype=bool)
+                allowed[codes] = True
+                keep |= allowed[self.cube.dims[d][rows]]
+            rows = rows[keep]
+        return rows
+
+
+class DashboardFilters:
+    """
+    Recalcula os dados dos quatro gráficos e dos quatro relatórios para uma
+    combinação de filtros
+    """
+
+    def __init__(self, cube, airline_names=None):
+        self.cube = cube
+        self.summary = cube.rollup(SUMMARY_DIMENSIONS)
+        self.airline_names = airline_names or {}
+        self.heatmap = cube.rollup(HEATMAP_DIMENSIONS)
+        self.cube_index = PostingIndex(cube)
+        self.summary_index = PostingIndex(self.summary)
+        self.heatmap_index = PostingIndex(self.heatmap)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def airlines(self):
+        return self.cube.labels['airline']
+
+    @property
+    def airports(self):
+        return self.cube.labels['origin']
+
+    @property
+    def months(self):
+        return self.cube.labels['month']
+
+    @property
+    def airport_info(self):
+        return self.cube.airport_info
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = build()
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return value
+
+    def datasets(self, airlines=None, months=None, airports=None):
+        """
+        DataFrames com as mesmas chaves de ``load_data`` (exceto volumes)
+        para o subconjunto filtrado; combinações recentes vêm do cache
+        """
+        key = tuple(None if values is None else tuple(values)
+                    for values in (airlines, months, airports))
+        return self._cached(key, lambda: self._datasets(airlines, months, airports))
+
+    def route_table(self, airlines=None, months=None, airports=None):
+        """
+        ``RouteTable`` de todas as rotas do subconjunto filtrado (base do
+        relatorio_02 recalculado pelos pesos do what-if)
+        """
+        key = ('rotas',) + tuple(None if values is None else tuple(values)
+                                 for values in (airlines, months, airports))
+        return self._cached(key, lambda: RouteTable(route_frame(
+            self.summary, rows=self.summary_index.select(airlines, months, airports))))
+
+    def _datasets(self, airlines, months, airports):
+        rows = self.summary_index.select(airlines, months, airports)
+        if airports is None:
+            heatmap = self.heatmap, self.heatmap_index.select(airlines, months)
+        else:
+            heatmap = self.cube, self.cube_index.select(airlines, months, airports)
+        causes = cause_metrics(month_totals(self.summary, rows=rows))
+        main_causes, minor_causes = causes_frame(self.summary, causes=causes)
+        data = cube_reports(self.summary, self.airline_names, rows=rows, causes=causes)
+        data.update({
+            'grafico_01': monthly_frame(self.summary, rows=rows),
+            'grafico_02': airline_frame(self.summary, self.airline_names, rows=rows),
+            'grafico_03_atrasos': day_hour_frame(heatmap[0], rows=heatmap[1]),
+            'grafico_04_principais': main_causes,
+            'grafico_04_menores': minor_causes,
+        })
+        return data
@@ -0,0 +1,236 @@
+"""
+Manifesto dos artefatos de ``data/`` (data/manifest.json).
+
+Para cada dataset de ``OUTPUT_FILES`` (e para o cubo e a série horária,
+se existirem) o manifesto registra o arquivo, o SHA-256 do conteúdo, o
+tamanho, o número de linhas, o schema (coluna -> dtype) e a data de
+geração. A data só muda quando o hash muda. As descrições que ficavam nos
+``*_metadata.txt`` (título, resumo e seções de metodologia) ficam em
+``descriptions``.
+
+O pipeline grava o manifesto por último, de forma atômica, depois dos CSVs,
+do snapshot e do cubo. Assim, um hash novo no manifesto garante que o
+artefato correspondente já está completo em disco. O dashboard compara os
+hashes para recarregar só os datasets alterados (ver
+``pipeline.registry``).
+
+Uso (gera o manifesto a partir dos arquivos existentes, absorvendo os
+``*_metadata.txt``):
+    python -m pipeline.manifest data
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from .reports import OUTPUT_FILES
+from .snapshot import read_dataset
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+CUBE_FILE = 'cube.npz'
+SERIES_FILE = 'series.npz'
+
+# Artefatos .npz opcionais: chave -> (arquivo, array que dá o número de linhas)
+NPZ_ARTIFACTS = {'cube': (CUBE_FILE, 'values'), 'series': (SERIES_FILE, 'hour')}
+
+_METADATA_SUFFIX = '_metadata.txt'
+_SECTION = re.compile(r'^([^•\-\s].*):$')
+
+
+def manifest_path(data_dir):
+    return os.path.join(data_dir, MANIFEST_FILE)
+
+
+def file_checksum(path, block_size=1 << 20):
+    """
+    SHA-256 (hex) do conteúdo do arquivo, lido em blocos
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def artifact_entry(path, df=None, rows=None, previous=None):
+    """
+    Entrada do manifesto para ``path``; ``df`` fornece linhas e schema
+    (sem ele, só ``rows`` se informado). Mantém a data de ``previous`` se o
+    hash não mudou.
+    """
+    checksum = file_checksum(path)
+    entry = {
+        'file': os.path.basename(path),
+        'sha256': checksum,
+        'bytes': os.path.getsize(path),
+        'rows': int(len(df)) if df is not None else rows,
+        'schema': {str(c): str(t) for c, t in df.dtypes.items()} if df is not None else None,
+    }
+    if previous and previous.get('sha256') == checksum:
+        entry['generated_at'] = previous.get('generated_at')
+    else:
+        entry['generated_at'] = _now()
+    return entry
+
+
+def parse_metadata(text):
+    """
+    Estrutura um ``*_metadata.txt``: título, pares "Chave: valor" do
+    cabeçalho e itens de cada seção (linhas iniciadas por • ou -)
+    """
+    lines = [line.rstrip() for line in text.splitlines()]
+    doc = {'title': lines[0].strip() if lines else '', 'summary': {}, 'sections': {}}
+    section = None
+    for line in lines[1:]:
+        stripped = line.strip()
+        if not stripped or set(stripped) <= set('=-'):
+            continue
+        match = _SECTION.match(stripped)
+        if match and match.group(1).upper() == match.group(1):
+            section = doc['sections'].setdefault(match.group(1), [])
+        elif section is not None:
+            section.append(stripped.lstrip('•').strip())
+        elif ':' in stripped:
+            key, value = stripped.split(':', 1)
+            doc['summary'][key.strip()] = value.strip()
+    return doc
+
+
+def read_metadata_files(data_dir):
+    """
+    Descrições dos ``*_metadata.txt`` de ``data_dir``, por prefixo
+    (ex.: ``grafico_03``)
+    """
+    descriptions = {}
+    for name in sorted(os.listdir(data_dir)):
+        if name.endswith(_METADATA_SUFFIX):
+            with open(os.path.join(data_dir, name), encoding='utf-8') as f:
+                descriptions[name[:-len(_METADATA_SUFFIX)]] = parse_metadata(f.read())
+    return descriptions
+
+
+def load_manifest(data_dir):
+    """
+    Manifesto de ``data_dir`` ou None se não existir
+    """
+    path = manifest_path(data_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"{path}: versão de manifesto {manifest.get('version')} não suportada")
+    return manifest
+
+
+def build_manifest(data_dir, outputs=None, previous=None):
+    """
+    Manifesto dos arquivos presentes em ``data_dir``. ``outputs`` (os
+    DataFrames recém-gravados) evita reler os CSVs para linhas e schema;
+    descrições vêm de ``previous`` e dos ``*_metadata.txt``.
+    """
+    outputs = outputs or {}
+    old = (previous or {}).get('artifacts', {})
+    artifacts = {}
+    for key, name in OUTPUT_FILES.items():
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            continue
+        df = outputs.get(key)
+        if df is None:
+            # O hash do CSV em disco, não o do manifesto anterior: o CSV
+            # pode ter sido regenerado depois do snapshot
+            df = read_dataset(data_dir, key, file_checksum(path))
+        artifacts[key] = artifact_entry(path, df, previous=old.get(key))
+
+    for key, (name, rows_array) in NPZ_ARTIFACTS.items():
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            with np.load(path) as arrays:
+                rows = int(arrays[rows_array].shape[0])
+            artifacts[key] = artifact_entry(path, rows=rows, previous=old.get(key))
+
+    descriptions = dict((previous or {}).get('descriptions', {}))
+    descriptions.update(read_metadata_files(data_dir))
+    return {
+        'version': MANIFEST_VERSION,
+        'generated_at': _now(),
+        'artifacts': artifacts,
+        'descriptions': descriptions,
+    }
+
+
+def write_manifest(manifest, data_dir):
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + rename)
+    """
+    path = manifest_path(data_dir)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+    return path
+
+
+def update_manifest(data_dir, outputs=None):
+    """
+    Regenera o manifesto de ``data_dir`` preservando datas e descrições
+    """
+    try:
+        previous = load_manifest(data_dir)
+    except ValueError:
+        previous = None
+    return write_manifest(build_manifest(data_dir, outputs, previous), data_dir)
+
+
+def changed_artifacts(old, new):
+    """
+    Chaves cujo hash difere entre dois manifestos (ou que surgiram)
+    """
+    old = (old or {}).get('artifacts', {})
+    return [key for key, entry in new.get('artifacts', {}).items()
+            if old.get(key, {}).get('sha256') != entry['sha256']]
+
+
+def artifact_versions(data_dir):
+    """
+    Versão de cada artefato: o hash do manifesto ou, sem manifesto, tamanho e
+    mtime do arquivo
+    """
+    manifest = load_manifest(data_dir)
+    if manifest is not None:
+        return {key: entry['sha256'] for key, entry in manifest['artifacts'].items()}
+    versions = {}
+    npz = {key: name for key, (name, _) in NPZ_ARTIFACTS.items()}
+    for key, name in {**OUTPUT_FILES, **npz}.items():
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            versions[key] = f"{stat.st_size}:{stat.st_mtime_ns}"
+    return versions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    data_dir = argv[0] if argv else 'data'
+    if not os.path.isdir(data_dir):
+        sys.exit(f"{data_dir} não é uma pasta")
+    path = update_manifest(data_dir)
+    manifest = load_manifest(data_dir)
+    print(f"{len(manifest['artifacts'])} artefatos e {len(manifest['descriptions'])} "
+          f"descrições registrados em {path}")
+
+
+if __name__ == '__main__':
+    main()
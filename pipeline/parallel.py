@@ -0,0 +1,102 @@
+"""
+Agregação paralela do flights.csv em um pool de processos.
+
+O arquivo é dividido em faixas de bytes alinhadas em quebras de linha; cada
+processo agrega a sua faixa em chunks (mesmo código do modo sequencial) e
+devolve um ``FlightAggregates`` parcial, que o processo pai combina com
+``FlightAggregates.merge``. Os acumuladores são inteiros, então o resultado
+é idêntico, bit a bit, ao da execução em um único processo.
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .aggregation import DEFAULT_CHUNKSIZE, FlightAggregates, read_flights
+from .cube import CubeBuilder
+
+
+class _ByteRange(io.RawIOBase):
+    """
+    Arquivo somente leitura restrito ao intervalo [start, end)
+    """
+
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        read = self._file.readinto(memoryview(buffer)[:size])
+        self._remaining -= read
+        return read
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def read_header(path):
+    """
+    Retorna (nomes das colunas, tamanho do cabeçalho em bytes)
+    """
+    with open(path, 'rb') as f:
+        line = f.readline()
+    return line.decode('utf-8').strip().split(','), len(line)
+
+
+def split_ranges(path, parts):
+    """
+    Divide o corpo do CSV em até ``parts`` faixas de bytes que começam e
+    terminam em fronteiras de linha
+    """
+    size = os.path.getsize(path)
+    _, start = read_header(path)
+    bounds = [start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(start + (size - start) * i // parts, bounds[-1]))
+            f.readline()
+            bounds.append(max(f.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def aggregate_range(path, start, end, names, chunksize=DEFAULT_CHUNKSIZE, cube=False):
+    """
+    Agrega somente as linhas contidas na faixa [start, end) do arquivo
+    """
+    state = FlightAggregates(cube=CubeBuilder() if cube else None)
+    with io.TextIOWrapper(io.BufferedReader(_ByteRange(path, start, end)), encoding='utf-8') as f:
+        for chunk in read_flights(f, chunksize=chunksize, names=names):
+            state.update(chunk)
+    return state
+
+
+def aggregate_flights_parallel(path, workers=None, chunksize=DEFAULT_CHUNKSIZE, progress=None,
+                               cube=None):
+    """
+    Agrega o flights.csv com ``workers`` processos (padrão: número de CPUs).
+    Se ``cube`` for um ``CubeBuilder``, as células de cada processo são
+    combinadas nele.
+    """
+    workers = workers or os.cpu_count() or 1
+    names, _ = read_header(path)
+    ranges = split_ranges(path, workers)
+
+    state = FlightAggregates(cube=cube)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_range, path, start, end, names, chunksize, cube is not None)
+                   for start, end in ranges]
+        # Combina na ordem das faixas; a ordem não altera o resultado
+        for future in futures:
+            state.merge(future.result())
+            if progress is not None:
+                progress(state.rows)
+    return state
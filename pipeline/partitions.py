@@ -0,0 +1,446 @@
+"""
+Armazenamento de voos de vários anos particionado por ano e mês.
+
+Layout do store::
+
+    store/catalog.json            catálogo (partições, estatísticas, fontes)
+    store/2015/01/part-000.arrow  voos do mês (colunas usadas pelo pipeline)
+    store/2015/01/state.npz       FlightAggregates do mês (pipeline.state)
+
+Cada partição registra no catálogo o número de voos e de cancelamentos, o
+mínimo e o máximo das colunas de ``STATS_COLUMNS`` e as companhias
+presentes. As consultas descartam, pelo catálogo, as partições fora do
+intervalo (ano, mês) pedido ou cujas estatísticas não podem satisfazer o
+filtro. Sobram só as partições relevantes.
+
+Os relatórios de um intervalo são a soma (``FlightAggregates.merge``) dos
+estados mensais. Não é preciso reler os voos, e um ano num store de dez anos
+custa as mesmas 12 partições de um store de um ano. Cubo e propagação leem
+os voos, mas só os das partições selecionadas.
+
+Uso:
+    python -m pipeline.partitions ingest --flights raw/2016.csv --store store
+    python -m pipeline.partitions list --store store
+    python -m pipeline.partitions build --store store --per-year --output data \\
+        --airlines raw/airlines.csv --airports raw/airports.csv --series
+    python -m pipeline.partitions build --store store --from 2016-01 --to 2016-06 \\
+        --output data
+
+Um build sem ``--per-year`` cobre um único ano: os estados agregados são
+indexados só pelo mês, então intervalos de vários anos são recusados.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import DEFAULT_CHUNKSIZE, FLIGHT_COLUMNS, FlightAggregates
+from .bootstrap import bootstrap_reports
+from .cube import CubeBuilder, save_cube
+from .manifest import update_manifest
+from .propagation import LEG_COLUMNS, Legs, propagate, propagation_reports
+from .reports import build_outputs, load_reference, write_outputs
+from .snapshot import current_snapshot, write_snapshot
+from .startup import write_summary
+from .state import load_state, save_state, source_id
+from .timeseries import SeriesBuilder, save_series
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+CATALOG_FILE = 'catalog.json'
+CATALOG_VERSION = 1
+STATE_FILE = 'state.npz'
+
+# Colunas guardadas: as da agregação e as das rotações (propagação)
+STORE_COLUMNS = {**FLIGHT_COLUMNS, **LEG_COLUMNS}
+# Schema fixo das partes Arrow: um chunk com coluna toda vazia (ex.:
+# CANCELLATION_REASON) inferiria o tipo null e travaria os chunks seguintes
+STORE_SCHEMA = None if pa is None else pa.schema([
+    (name, pa.string() if dtype == 'category' else pa.from_numpy_dtype(np.dtype(dtype)))
+    for name, dtype in STORE_COLUMNS.items()])
+# Colunas com mínimo/máximo por partição
+STATS_COLUMNS = ('DAY', 'SCHEDULED_DEPARTURE', 'DEPARTURE_DELAY', 'ARRIVAL_DELAY', 'DISTANCE')
+
+
+def partition_key(year, month):
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def parse_period(text):
+    """
+    'AAAA' ou 'AAAA-MM' -> (ano, mês); 'AAAA' vale o ano inteiro, então
+    devolve (ano, None)
+    """
+    year, _, month = str(text).partition('-')
+    return int(year), int(month) if month else None
+
+
+def _merge_stats(old, new):
+    if old is None:
+        return new
+    merged = {'rows': old['rows'] + new['rows'], 'cancelled': old['cancelled'] + new['cancelled'],
+              'airlines': sorted(set(old['airlines']) | set(new['airlines'])), 'columns': {}}
+    for column in set(old['columns']) | set(new['columns']):
+        a, b = old['columns'].get(column), new['columns'].get(column)
+        if a is None or b is None:
+            merged['columns'][column] = a or b
+        else:
+            merged['columns'][column] = [min(a[0], b[0]), max(a[1], b[1])]
+    return merged
+
+
+def _chunk_stats(df):
+    stats = {'rows': int(len(df)), 'cancelled': int(df['CANCELLED'].sum()),
+             'airlines': sorted(df['AIRLINE'].dropna().astype(str).unique().tolist()), 'columns': {}}
+    for column in STATS_COLUMNS:
+        values = df[column].dropna()
+        if len(values):
+            stats['columns'][column] = [float(values.min()), float(values.max())]
+    return stats
+
+
+class _PartWriter:
+    """
+    Arquivo de uma parte de partição: Arrow IPC (com pyarrow) ou CSV
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._writer = None
+        self._sink = None
+
+    def write(self, df):
+        if pa is None:
+            df.to_csv(self.path, mode='a', index=False, header=self.rows == 0)
+        else:
+            # Categorias viram strings: o formato de arquivo IPC não aceita
+            # dicionários diferentes entre batches
+            df = df.astype({c: object for c in df.columns if df[c].dtype == 'category'})
+            table = pa.Table.from_pandas(df, schema=STORE_SCHEMA, preserve_index=False)
+            if self._writer is None:
+                self._sink = pa.OSFile(self.path, 'wb')
+                self._writer = ipc.new_file(self._sink, STORE_SCHEMA)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+
+
+class PartitionStore:
+    """
+    Store de voos particionado por (ano, mês), com catálogo e estados
+    agregados por partição
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.catalog = self._load_catalog()
+
+    @property
+    def partitions(self):
+        return self.catalog['partitions']
+
+    def _catalog_path(self):
+        return os.path.join(self.root, CATALOG_FILE)
+
+    def _load_catalog(self):
+        path = self._catalog_path()
+        if not os.path.exists(path):
+            return {'version': CATALOG_VERSION, 'partitions': {}, 'sources': []}
+        with open(path, encoding='utf-8') as f:
+            catalog = json.load(f)
+        if catalog.get('version') != CATALOG_VERSION:
+            raise ValueError(f"{path}: versão de catálogo {catalog.get('version')} não suportada")
+        return catalog
+
+    def _save_catalog(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._catalog_path()
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.catalog, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        os.replace(tmp, path)
+
+    def _dir(self, year, month):
+        return os.path.join(self.root, f"{int(year):04d}", f"{int(month):02d}")
+
+    def years(self):
+        return sorted({p['year'] for p in self.partitions.values()})
+
+    def ingest(self, path, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+        """
+        Distribui os voos de ``path`` pelas partições (ano, mês), gravando uma
+        parte nova em cada partição tocada e somando o estado agregado e as
+        estatísticas. Retorna as chaves das partições alteradas.
+        """
+        source = source_id(path)
+        if source in self.catalog['sources']:
+            raise ValueError(f"{path} já foi incorporado ao store {self.root}")
+
+        writers, states, stats = {}, {}, {}
+        rows = 0
+        try:
+            for chunk in pd.read_csv(path, usecols=list(STORE_COLUMNS), dtype=STORE_COLUMNS,
+                                     chunksize=chunksize, low_memory=False):
+                chunk = chunk[list(STORE_COLUMNS)]
+                groups = chunk['YEAR'].to_numpy(dtype=np.int64) * 100 + chunk['MONTH'].to_numpy(dtype=np.int64)
+                for group in np.unique(groups):
+                    part = chunk[groups == group]
+                    year, month = divmod(int(group), 100)
+                    key = partition_key(year, month)
+                    if key not in writers:
+                        directory = self._dir(year, month)
+                        os.makedirs(directory, exist_ok=True)
+                        entry = self.partitions.get(key, {'parts': []})
+                        ext = 'csv' if pa is None else 'arrow'
+                        name = f"part-{len(entry['parts']):03d}.{ext}"
+                        writers[key] = _PartWriter(os.path.join(directory, name))
+                        states[key] = FlightAggregates()
+                    writers[key].write(part)
+                    states[key].update(part)
+                    stats[key] = _merge_stats(stats.get(key), _chunk_stats(part))
+                rows += len(chunk)
+                if progress is not None:
+                    progress(rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        # Estados e catálogo por último: uma parte só conta depois de registrada
+        for key, writer in writers.items():
+            year, month = parse_period(key)
+            entry = self.partitions.get(key, {'year': year, 'month': month, 'parts': [],
+                                              'stats': None})
+            state_path = os.path.join(self._dir(year, month), STATE_FILE)
+            state, sources = states[key], []
+            if os.path.exists(state_path) and entry['parts']:
+                previous, sources = load_state(state_path)
+                state = previous.merge(state)
+            save_state(state, state_path, sources + [source])
+            entry['parts'].append({'file': os.path.relpath(writer.path, self.root),
+                                   'rows': writer.rows, 'source': source})
+            entry['stats'] = _merge_stats(entry['stats'], stats[key])
+            entry['state'] = os.path.relpath(state_path, self.root)
+            self.partitions[key] = entry
+        self.catalog['sources'].append(source)
+        self._save_catalog()
+        return sorted(writers)
+
+    def select(self, start=None, end=None, where=None):
+        """
+        Chaves das partições que cruzam o intervalo [``start``, ``end``]
+        (tuplas (ano, mês); mês None = ano inteiro) e cujas estatísticas podem
+        satisfazer ``where``: {coluna: (mín, máx)} ou {'AIRLINE': [códigos]}
+        """
+        lo = (start[0], start[1] or 1) if start else (0, 0)
+        hi = (end[0], end[1] or 12) if end else (9999, 99)
+        selected = []
+        for key, entry in sorted(self.partitions.items()):
+            if not lo <= (entry['year'], entry['month']) <= hi:
+                continue
+            if where and not self._may_match(entry['stats'], where):
+                continue
+            selected.append(key)
+        return selected
+
+    @staticmethod
+    def _may_match(stats, where):
+        for column, condition in where.items():
+            if column == 'AIRLINE':
+                if not set(condition) & set(stats['airlines']):
+                    return False
+                continue
+            bounds = stats['columns'].get(column)
+            if bounds is None:
+                return False
+            low, high = condition
+            if (high is not None and bounds[0] > high) or (low is not None and bounds[1] < low):
+                return False
+        return True
+
+    def state(self, keys):
+        """
+        ``FlightAggregates`` das partições ``keys`` (soma dos estados mensais)
+        """
+        state = FlightAggregates()
+        for key in keys:
+            state.merge(load_state(os.path.join(self.root, self.partitions[key]['state']))[0])
+        return state
+
+    def read(self, keys, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Itera sobre os voos das partições ``keys`` em chunks, com os tipos de
+        ``STORE_COLUMNS``
+        """
+        columns = list(columns or STORE_COLUMNS)
+        dtypes = {c: STORE_COLUMNS[c] for c in columns}
+        for key in keys:
+            for part in self.partitions[key]['parts']:
+                path = os.path.join(self.root, part['file'])
+                if path.endswith('.csv'):
+                    yield from pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+                    continue
+                with pa.memory_map(path) as source:
+                    reader = ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i).select(columns)
+                        yield batch.to_pandas().astype(dtypes)
+
+    def rows(self, keys):
+        return sum(self.partitions[key]['stats']['rows'] for key in keys)
+
+
+def build_range(store, keys, airlines, airports, cube_path=None, propagation=False,
+                chunksize=DEFAULT_CHUNKSIZE, series_path=None, bootstrap=False):
+    """
+    DataFrames de ``OUTPUT_FILES`` das partições ``keys``; grava o cubo em
+    ``cube_path`` e as séries horárias em ``series_path`` se informados.
+    As partições têm de ser de um mesmo ano (``ValueError`` se não forem).
+    """
+    years = sorted({store.partitions[key]['year'] for key in keys})
+    if len(years) > 1:
+        raise ValueError(f"as partições cobrem os anos {', '.join(map(str, years))}; "
+                         "gere um ano por vez (--per-year ou --from/--to no mesmo ano)")
+    state = store.state(keys)
+    outputs = build_outputs(state, airlines, airports)
+    if bootstrap:
+        outputs.update(bootstrap_reports(state, airlines, airports))
+    if cube_path or propagation or series_path:
+        cube = CubeBuilder() if cube_path else None
+        legs = Legs() if propagation else None
+        series = SeriesBuilder() if series_path else None
+        for chunk in store.read(keys, chunksize=chunksize):
+            if cube is not None:
+                cube.update(chunk)
+            if legs is not None:
+                legs.update(chunk)
+            if series is not None:
+                series.update(chunk)
+        if cube is not None:
+            save_cube(cube.build(), cube_path, airports)
+        if series is not None:
+            save_series(series.build(), series_path)
+        if legs is not None:
+            legs.finish()
+            outputs.update(propagation_reports(legs, propagate(legs), airlines, airports))
+    return outputs, state.rows
+
+
+def write_build(outputs, output_dir):
+    """
+    Grava CSVs, snapshot e manifesto como o ``python -m pipeline``
+    """
+    written = write_outputs(outputs, output_dir)
+    write_snapshot({key: df for key, df in outputs.items()
+                    if key in written or current_snapshot(output_dir, key) is None},
+                   output_dir)
+    # Resumo do primeiro paint do dashboard
+    write_summary(outputs, output_dir)
+    update_manifest(output_dir, outputs)
+    return written
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline.partitions',
+                                     description='Store de voos particionado por ano e mês')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='Incorpora um flights.csv ao store')
+    ingest.add_argument('--flights', required=True, help='Caminho do flights.csv do DOT')
+    ingest.add_argument('--store', default='store', help='Pasta do store (padrão: store)')
+    ingest.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+
+    listing = commands.add_parser('list', help='Lista as partições e suas estatísticas')
+    listing.add_argument('--store', default='store', help='Pasta do store (padrão: store)')
+
+    build = commands.add_parser('build', help='Gera os arquivos do dashboard a partir do store')
+    build.add_argument('--store', default='store', help='Pasta do store (padrão: store)')
+    build.add_argument('--output', default='data', help='Pasta de saída (padrão: data)')
+    build.add_argument('--from', dest='start', help='Primeiro período (AAAA ou AAAA-MM)')
+    build.add_argument('--to', dest='end', help='Último período (AAAA ou AAAA-MM)')
+    build.add_argument('--per-year', action='store_true',
+                       help='Uma pasta por ano em --output (ex.: data/2016), usada pelo seletor '
+                            'de ano do dashboard')
+    build.add_argument('--airlines', help='Caminho do airlines.csv')
+    build.add_argument('--airports', help='Caminho do airports.csv')
+    build.add_argument('--cube', action='store_true', help='Grava também o cubo OLAP (cube.npz)')
+    build.add_argument('--propagation', action='store_true',
+                       help='Gera também a propagação de atrasos (lê os voos das partições)')
+    build.add_argument('--series', action='store_true',
+                       help='Grava também as séries horárias por companhia (series.npz)')
+    build.add_argument('--bootstrap', action='store_true',
+                       help='Gera também os intervalos de confiança dos rankings (bootstrap)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    try:
+        store = PartitionStore(args.store)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    if args.command == 'ingest':
+        def progress(rows):
+            print(f"  {rows:,} voos lidos ({time.perf_counter() - start:.1f}s)", flush=True)
+
+        try:
+            keys = store.ingest(args.flights, args.chunksize, progress)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"{len(keys)} partições atualizadas em {args.store}/: {', '.join(keys)} "
+              f"({time.perf_counter() - start:.1f}s)")
+
+    elif args.command == 'list':
+        print(f"{'Partição':<10} {'Voos':>12} {'Cancel.':>9} {'Partes':>7}  Atraso chegada (mín–máx)")
+        for key, entry in sorted(store.partitions.items()):
+            stats = entry['stats']
+            low, high = stats['columns'].get('ARRIVAL_DELAY', [float('nan')] * 2)
+            print(f"{key:<10} {stats['rows']:>12,} {stats['cancelled']:>9,} "
+                  f"{len(entry['parts']):>7}  {low:.0f} – {high:.0f}")
+
+    else:
+        airlines, airports = load_reference(args.airlines, args.airports)
+        lo = parse_period(args.start) if args.start else None
+        hi = parse_period(args.end) if args.end else None
+        if args.per_year:
+            years = [y for y in store.years() if (not lo or y >= lo[0]) and (not hi or y <= hi[0])]
+            targets = [(os.path.join(args.output, str(y)), store.select((y, None), (y, None)))
+                       for y in years]
+        else:
+            targets = [(args.output, store.select(lo, hi))]
+        for output_dir, keys in targets:
+            if not keys:
+                print(f"Nenhuma partição selecionada para {output_dir}")
+                continue
+            cube_path = os.path.join(output_dir, 'cube.npz') if args.cube else None
+            series_path = os.path.join(output_dir, 'series.npz') if args.series else None
+            os.makedirs(output_dir, exist_ok=True)
+            try:
+                outputs, rows = build_range(store, keys, airlines, airports, cube_path,
+                                            args.propagation, series_path=series_path,
+                                            bootstrap=args.bootstrap)
+            except ValueError as e:
+                sys.exit(f"{output_dir}: {e}")
+            written = write_build(outputs, output_dir)
+            print(f"{output_dir}/: {len(keys)} partições, {rows:,} voos, "
+                  f"{len(written)} arquivos atualizados ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
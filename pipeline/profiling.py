@@ -0,0 +1,182 @@
+"""
+Instrumentação opcional do dashboard (tempos, payloads, caches e memória).
+
+Um ``Profiler`` por rerun acumula:
+
+* tempo de cada etapa (``with profiler.stage('load_data'): ...``);
+* tamanho e tempo de serialização de cada figura e tabela enviada ao
+  navegador (``profiler.figure`` / ``profiler.table``);
+* estatísticas dos caches (``profiler.cache``) e o RSS do processo.
+
+``finish()`` fecha o rerun e emite um registro JSON por linha no logger
+``dashboard.profile``. O registro vai para o stderr ou, com
+``DASHBOARD_PROFILE_LOG=<arquivo>``, é acrescentado ao arquivo, fácil de
+coletar por qualquer agregador de logs.
+
+Desligado, o dashboard usa ``NULL_PROFILER``: ``stage`` devolve sempre o
+mesmo context manager vazio e os demais métodos não fazem nada. Em
+particular, as figuras e tabelas não são serializadas uma segunda vez, então
+o custo fica em uma chamada de método por ponto instrumentado.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+logger = logging.getLogger('dashboard.profile')
+
+_NULL_CONTEXT = contextlib.nullcontext()
+_local = threading.local()
+
+
+def rss_mb():
+    """
+    RSS atual do processo em MB (Linux, via /proc); nos demais sistemas, o
+    RSS máximo. None se indisponível.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def table_payload(df):
+    """
+    Bytes de ``df`` serializado como o Streamlit envia (Arrow IPC); sem
+    pyarrow, o tamanho em memória
+    """
+    # Import local: o módulo é carregado antes do primeiro paint do dashboard
+    try:
+        import pyarrow as pa
+    except ImportError:  # pragma: no cover - dependência opcional
+        return int(df.memory_usage(deep=True).sum())
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def configure_logging():
+    """
+    Handler do logger de profiling (uma vez): stderr ou o arquivo de
+    ``DASHBOARD_PROFILE_LOG``, só com a mensagem JSON
+    """
+    if logger.handlers:
+        return logger
+    path = os.environ.get('DASHBOARD_PROFILE_LOG')
+    handler = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class NullProfiler:
+    """
+    Profiler desligado: todos os pontos de instrumentação são no-ops
+    """
+
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_CONTEXT
+
+    def figure(self, name, fig):
+        pass
+
+    def table(self, name, df):
+        pass
+
+    def cache(self, name, stats):
+        pass
+
+    def finish(self):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler(NullProfiler):
+    """
+    Medições de um rerun do dashboard
+    """
+
+    enabled = True
+
+    def __init__(self, session=None):
+        self.session = session
+        self.started = time.perf_counter()
+        self.stages = []      # (nome, segundos), na ordem de término
+        self.payloads = []    # (tipo, nome, bytes, segundos de serialização)
+        self.caches = {}
+        self.record = None
+        configure_logging()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def figure(self, name, fig):
+        # Mesma serialização do st.plotly_chart (JSON da figura)
+        start = time.perf_counter()
+        size = len(fig.to_json())
+        self.payloads.append(('figura', name, size, time.perf_counter() - start))
+
+    def table(self, name, df):
+        start = time.perf_counter()
+        size = table_payload(df)
+        self.payloads.append(('tabela', name, size, time.perf_counter() - start))
+
+    def cache(self, name, stats):
+        self.caches[name] = dict(stats)
+
+    def finish(self):
+        """
+        Encerra o rerun e emite o registro estruturado; retorna o registro
+        """
+        self.record = {
+            'event': 'dashboard_rerun',
+            'session': self.session,
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            'rss_mb': round(rss_mb() or 0, 1),
+            'stages': [{'name': n, 'seconds': round(s, 4)} for n, s in self.stages],
+            'payloads': [{'kind': k, 'name': n, 'bytes': b, 'seconds': round(s, 4)}
+                         for k, n, b, s in self.payloads],
+            'caches': self.caches,
+        }
+        logger.info(json.dumps(self.record, ensure_ascii=False, default=str))
+        return self.record
+
+
+def activate(profiler):
+    """
+    Define o profiler do rerun na thread atual (a do script do Streamlit)
+    """
+    _local.profiler = profiler
+    return profiler
+
+
+def current():
+    return getattr(_local, 'profiler', NULL_PROFILER)
@@ -0,0 +1,214 @@
+"""
+Registro preguiçoso dos datasets do dashboard.
+
+Cada dataset é lido só quando alguém o pede (``get``) ou quando a página
+antecipa os que vai usar (``prefetch``). As leituras rodam em paralelo num
+pool de threads e cada uma tem o próprio cache e o próprio erro: um CSV
+corrompido derruba apenas o gráfico ou relatório que depende dele.
+
+As versões vêm de uma função (hashes do manifesto, marcas de refresh do
+warehouse). Um dataset já carregado cuja versão mudou é relido em segundo
+plano. Até a nova leitura terminar, ``get`` continua devolvendo a anterior;
+se ela falhar, a versão anterior é mantida e o erro fica em ``errors()``.
+"""
+
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+
+
+class DatasetError(Exception):
+    """
+    Falha ao carregar um dataset específico
+    """
+
+    def __init__(self, key, error):
+        super().__init__(f"{key}: {error}")
+        self.key = key
+        self.error = error
+
+
+class DatasetRegistry:
+    """
+    Datasets carregados sob demanda por ``reader(key)`` e versionados por
+    ``versions()`` (dict chave -> versão)
+    """
+
+    def __init__(self, reader, versions, workers=DEFAULT_WORKERS):
+        self.reader = reader
+        self.versions = versions
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dataset')
+        self._known = {}
+        self._current = {}   # chave -> (versão, future) em uso
+        self._pending = {}   # chave -> (versão, future) da releitura em andamento
+        self._failed = {}    # chave -> (versão, exceção) da última releitura com erro
+        self._lock = threading.Lock()
+        self.hits = 0        # ``get`` com o dataset já carregado
+        self.misses = 0      # ``get`` que precisou esperar a leitura
+
+    def _submit(self, key):
+        return self._executor.submit(self.reader, key)
+
+    def _promote(self):
+        # Troca as releituras concluídas (chamado com o lock)
+        for key, (version, future) in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[key]
+            if future.exception() is None:
+                self._current[key] = version, future
+                self._failed.pop(key, None)
+            else:
+                self._failed[key] = version, future.exception()
+
+    def _ensure(self, key):
+        if key not in self._current:
+            self._current[key] = self._known.get(key), self._submit(key)
+        return self._current[key][1]
+
+    def refresh(self):
+        """
+        Relê as versões e agenda a releitura dos datasets carregados que
+        mudaram; retorna o dict de versões
+        """
+        versions = self.versions()
+        with self._lock:
+            self._known = versions
+            self._promote()
+            for key, (version, future) in list(self._current.items()):
+                new = versions.get(key)
+                if new is None or new == version:
+                    continue
+                if future.done() and future.exception() is not None:
+                    # A carga inicial falhou: não há versão anterior a preservar
+                    self._current[key] = new, self._submit(key)
+                elif self._pending.get(key, (None,))[0] != new and \
+                        self._failed.get(key, (None,))[0] != new:
+                    self._pending[key] = new, self._submit(key)
+        return versions
+
+    def prefetch(self, keys):
+        """
+        Inicia (em paralelo) a leitura dos datasets ainda não carregados
+        """
+        with self._lock:
+            for key in keys:
+                self._ensure(key)
+
+    def get(self, key):
+        """
+        DataFrame de ``key``, esperando a leitura se necessário; levanta
+        ``DatasetError`` se a carga falhou
+        """
+        with self._lock:
+            self._promote()
+            future = self._ensure(key)
+            if future.done():
+                self.hits += 1
+            else:
+                self.misses += 1
+        try:
+            return future.result()
+        except Exception as e:
+            raise DatasetError(key, e) from e
+
+    def latest(self, key):
+        """
+        (versão, DataFrame) de ``key``, esperando a releitura em andamento em
+        vez de devolver a versão anterior (que volta se a releitura falhar)
+        """
+        with self._lock:
+            self._promote()
+            self._ensure(key)
+            current, pending = self._current[key], self._pending.get(key)
+        if pending is not None and pending[1].exception() is None:
+            current = pending
+        version, future = current
+        try:
+            return version, future.result()
+        except Exception as e:
+            raise DatasetError(key, e) from e
+
+    def version(self, key):
+        """
+        Versão do dataset em uso (None se ainda não pedido)
+        """
+        with self._lock:
+            self._promote()
+            return self._current.get(key, (None,))[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._current),
+        }
+
+    @property
+    def reloading(self):
+        with self._lock:
+            return any(not future.done() for _, future in self._pending.values())
+
+    def stale(self):
+        """
+        Releituras que falharam (chave -> exceção); a versão anterior
+        continua em uso
+        """
+        with self._lock:
+            self._promote()
+            return {key: error for key, (_, error) in self._failed.items()}
+
+    def errors(self):
+        """
+        Erros por chave: cargas que falharam e releituras cuja versão
+        anterior continua em uso
+        """
+        errors = self.stale()
+        with self._lock:
+            for key, (_, future) in self._current.items():
+                if future.done() and future.exception() is not None:
+                    errors[key] = future.exception()
+            return errors
+
+
+class Datasets(Mapping):
+    """
+    Visão de dicionário sobre o registro: ``data[key]`` carrega sob demanda.
+    ``overrides`` (ex.: dados recalculados pelos filtros) têm precedência e
+    evitam ler os arquivos correspondentes.
+    """
+
+    def __init__(self, registry, keys, overrides=None):
+        self.registry = registry
+        self.names = list(keys)
+        self.overrides = dict(overrides or {})
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        if key not in self.names:
+            raise KeyError(key)
+        return self.registry.get(key)
+
+    def __contains__(self, key):
+        return key in self.overrides or key in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def version(self, key):
+        return None if key in self.overrides else self.registry.version(key)
+
+    def override(self, frames):
+        return Datasets(self.registry, self.names, {**self.overrides, **frames})
+
+    def prefetch(self, keys=None):
+        keys = self.names if keys is None else keys
+        self.registry.prefetch([key for key in keys if key not in self.overrides])
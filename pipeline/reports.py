@@ -0,0 +1,570 @@
+"""
+Geração dos relatórios e dados de gráficos a partir do estado agregado.
+
+Cada função recebe um ``FlightAggregates`` (e as tabelas de referência de
+companhias e aeroportos) e devolve um DataFrame com exatamente as colunas
+que o dashboard espera em ``data/``.
+"""
+
+import calendar
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import sketch
+from .aggregation import (
+    CANCELLATION_CODES,
+    DELAY_CAUSES,
+    M,
+)
+
+
+# Arquivos gerados, na mesma chave usada por load_data() no dashboard
+OUTPUT_FILES = {
+    'relatorio_01': 'relatorio_01_ranking_performance_airlines.csv',
+    'relatorio_02': 'relatorio_02_rotas_criticas.csv',
+    'relatorio_03': 'relatorio_03_sazonalidade_mensal.csv',
+    'relatorio_04': 'relatorio_04_causas_cancelamento_atraso.csv',
+    'grafico_01': 'grafico_01_dados.csv',
+    'grafico_02': 'grafico_02_dados.csv',
+    'grafico_03_volumes': 'grafico_03_matriz_volumes.csv',
+    'grafico_03_atrasos': 'grafico_03_matriz_atrasos.csv',
+    'grafico_04_principais': 'grafico_04_causas_principais.csv',
+    'grafico_04_menores': 'grafico_04_causas_menores.csv',
+    'percentis_atraso': 'percentis_atraso.csv',
+    'rotas': 'rotas_todas.csv',
+    'aeroportos': 'aeroportos_coordenadas.csv',
+    # Intervalos de confiança dos rankings (python -m pipeline.bootstrap)
+    'incerteza_companhias': 'incerteza_ranking_companhias.csv',
+    'incerteza_rotas': 'incerteza_rotas_criticas.csv',
+    # Etapa de propagação de atrasos (python -m pipeline.propagation)
+    'propagacao_hora': 'propagacao_atrasos_hora.csv',
+    'propagacao_pernas': 'propagacao_atrasos_pernas.csv',
+    'propagacao_aeroportos': 'propagacao_atrasos_aeroportos.csv',
+    'propagacao_companhias': 'propagacao_atrasos_companhias.csv',
+}
+
+# Rótulos que o pd.read_csv leria como números (ex.: pernas "1"…"7" sem a
+# linha "8+"): sempre lidos como texto, como no snapshot
+CSV_DTYPES = {
+    'propagacao_pernas': {'Perna no Dia': str},
+}
+
+# Percentis de cauda do atraso na chegada publicados junto das médias
+TAIL_QUANTILES = {'p90_arrival_delay': 0.90, 'p95_arrival_delay': 0.95, 'p99_arrival_delay': 0.99}
+
+# Parâmetros das métricas (ver aba Metodologia do dashboard)
+CANCELLATION_WEIGHT_AIRLINE = 10
+CANCELLATION_WEIGHT_ROUTE = 15
+MIN_ROUTE_FLIGHTS = 100
+TOP_CRITICAL_ROUTES = 20
+TOP_AIRLINES_CHART = 12
+MAIN_CAUSE_THRESHOLD = 3.0
+CANCELLATION_SEVERITY = 100
+
+AIRLINE_CHART_COLUMNS = [
+    'airline_key', 'total_flights', 'avg_arrival_delay', 'median_arrival_delay',
+    'avg_departure_delay', 'total_cancelled', 'total_diverted', 'total_distance',
+    'avg_distance', 'avg_flight_time', 'on_time_flights', 'on_time_rate',
+    'cancellation_rate', 'diversion_rate', 'performance_score', 'airline_code',
+    'airline_name', 'performance_category',
+] + list(TAIL_QUANTILES)
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+DELAY_CAUSE_NAMES = {
+    'AIR_SYSTEM_DELAY': 'Sistema Aéreo Nacional',
+    'SECURITY_DELAY': 'Questões de Segurança',
+    'AIRLINE_DELAY': 'Problemas da Companhia Aérea',
+    'LATE_AIRCRAFT_DELAY': 'Aeronave Atrasada',
+    'WEATHER_DELAY': 'Condições Meteorológicas',
+}
+
+# Rótulos curtos usados na coluna "Principal Causa de Atraso" do relatório 3
+DELAY_CAUSE_SHORT_NAMES = {
+    'AIR_SYSTEM_DELAY': 'Sistema Aéreo',
+    'SECURITY_DELAY': 'Segurança',
+    'AIRLINE_DELAY': 'Companhia Aérea',
+    'LATE_AIRCRAFT_DELAY': 'Aeronave Atrasada',
+    'WEATHER_DELAY': 'Meteorologia',
+}
+
+CANCELLATION_NAMES = {
+    'A': 'Airline/Carrier',
+    'B': 'Weather',
+    'C': 'National Air System',
+    'D': 'Security',
+}
+
+CONTROLLABLE_CAUSES = {'Aeronave Atrasada', 'Problemas da Companhia Aérea', 'Airline/Carrier'}
+
+
+def load_reference(airlines_path=None, airports_path=None):
+    """
+    Carrega as tabelas de referência (airlines.csv e airports.csv do Kaggle)
+    """
+    airlines = pd.DataFrame(columns=['IATA_CODE', 'AIRLINE'])
+    airports = pd.DataFrame(columns=['IATA_CODE', 'AIRPORT', 'CITY', 'STATE'])
+    if airlines_path:
+        airlines = pd.read_csv(airlines_path, dtype=str)
+    if airports_path:
+        airports = pd.read_csv(airports_path, dtype={'IATA_CODE': str, 'CITY': str, 'STATE': str})
+    return airlines, airports
+
+
+def _safe_div(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+
+def _pct(num, den):
+    return np.round(_safe_div(num, den) * 100, 2)
+
+
+def _add_tail_quantiles(df, sketches):
+    values = sketch.quantiles(sketches, list(TAIL_QUANTILES.values()))
+    for j, column in enumerate(TAIL_QUANTILES):
+        df[column] = np.round(values[:, j], 1)
+    return df
+
+
+def _std(table):
+    n = table[:, M['arr_count']].astype(np.float64)
+    s = table[:, M['arr_sum']].astype(np.float64)
+    ss = table[:, M['arr_sumsq']].astype(np.float64)
+    var = _safe_div(ss - s * s / np.where(n > 0, n, 1), n - 1)
+    return np.sqrt(np.maximum(var, 0))
+
+
+def _trend(series):
+    """
+    Variação percentual em relação ao mês anterior
+    """
+    return (series / series.shift(1) - 1) * 100
+
+
+def monthly_metrics(state):
+    """
+    Métricas mensais (grafico_01_dados.csv)
+    """
+    t = state.by_month
+    months = np.flatnonzero(t[:, M['flights']])
+    t = t[months]
+    year = state.year or 2015
+
+    df = pd.DataFrame({
+        'month': months + 1,
+        'month_name': [calendar.month_name[m + 1] for m in months],
+        'total_flights': t[:, M['flights']],
+        'avg_arrival_delay': np.round(_safe_div(t[:, M['arr_sum']], t[:, M['arr_count']]), 2),
+        'median_arrival_delay': sketch.median(state.month_sketch[months]),
+        'std_arrival_delay': np.round(_std(t), 2),
+        'avg_departure_delay': np.round(_safe_div(t[:, M['dep_sum']], t[:, M['dep_count']]), 2),
+        'total_cancelled': t[:, M['cancelled']],
+        'total_diverted': t[:, M['diverted']],
+        'avg_distance': np.round(_safe_div(t[:, M['distance_sum']], t[:, M['flights']]), 2),
+        'on_time_flights': t[:, M['on_time']],
+        'on_time_rate': _pct(t[:, M['on_time']], t[:, M['flights']]),
+        'cancellation_rate': _pct(t[:, M['cancelled']], t[:, M['flights']]),
+        'date_label': [f"{year}-{m + 1:02d}-01" for m in months],
+    })
+    df['delay_trend'] = _trend(df['avg_arrival_delay'])
+    df['volume_trend'] = _trend(df['total_flights'])
+    return _add_tail_quantiles(df, state.month_sketch[months])
+
+
+def airline_metrics(state, airlines):
+    """
+    Métricas por companhia aérea para todas as companhias do arquivo,
+    ordenadas pelo código IATA
+    """
+    codes = np.array(state.airlines.keys, dtype=object)
+    order = np.argsort(codes, kind='stable')
+    t = state.by_airline[order]
+    codes = codes[order]
+
+    names = dict(zip(airlines['IATA_CODE'], airlines['AIRLINE']))
+    # airline_key segue a ordem do airlines.csv (chave substituta da dim_airline)
+    keys = {code: i + 1 for i, code in enumerate(airlines['IATA_CODE'])}
+
+    df = pd.DataFrame({
+        'airline_key': [keys.get(c, len(keys) + 1 + i) for i, c in enumerate(codes)],
+        'total_flights': t[:, M['flights']],
+        'avg_arrival_delay': np.round(_safe_div(t[:, M['arr_sum']], t[:, M['arr_count']]), 2),
+        'median_arrival_delay': sketch.median(state.airline_sketch[order]),
+        'avg_departure_delay': np.round(_safe_div(t[:, M['dep_sum']], t[:, M['dep_count']]), 2),
+        'total_cancelled': t[:, M['cancelled']],
+        'total_diverted': t[:, M['diverted']],
+        'total_distance': t[:, M['distance_sum']],
+        'avg_distance': np.round(_safe_div(t[:, M['distance_sum']], t[:, M['flights']]), 2),
+        'avg_flight_time': np.round(_safe_div(t[:, M['elapsed_sum']], t[:, M['elapsed_count']]), 2),
+        'on_time_flights': t[:, M['on_time']],
+        'on_time_rate': _pct(t[:, M['on_time']], t[:, M['flights']]),
+        'cancellation_rate': _pct(t[:, M['cancelled']], t[:, M['flights']]),
+        'diversion_rate': _pct(t[:, M['diverted']], t[:, M['flights']]),
+        'airline_code': codes,
+        'airline_name': [names.get(c, c) for c in codes],
+    })
+    return _add_tail_quantiles(df, state.airline_sketch[order])
+
+
+def performance_category(score):
+    if score >= 80:
+        return 'Excelente'
+    if score >= 70:
+        return 'Boa'
+    if score >= 60:
+        return 'Regular'
+    return 'Ruim'
+
+
+def score_airlines(metrics, top=TOP_AIRLINES_CHART):
+    """
+    Score de performance 0-100 (pontualidade 40%, atraso médio 35%,
+    cancelamentos 25%), normalizado sobre todas as companhias de ``metrics``;
+    retorna as ``top`` de maior volume ordenadas pelo score
+    """
+    df = metrics.copy()
+    delay = df['avg_arrival_delay']
+    cancel = df['cancellation_rate']
+    delay_range = (delay.max() - delay.min()) or 1
+    cancel_range = (cancel.max() - cancel.min()) or 1
+
+    df['performance_score'] = (
+        40 * df['on_time_rate'] / df['on_time_rate'].max()
+        + 35 * (delay.max() - delay) / delay_range
+        + 25 * (cancel.max() - cancel) / cancel_range
+    ).round(2)
+
+    df = df.nlargest(top, 'total_flights')
+    df = df.sort_values('performance_score', ascending=False, kind='stable')
+    df['performance_category'] = df['performance_score'].apply(performance_category)
+    return df.reset_index(drop=True)
+
+
+def airline_chart_data(metrics):
+    """
+    Dados do gráfico 2 (grafico_02_dados.csv)
+    """
+    return score_airlines(metrics)[AIRLINE_CHART_COLUMNS]
+
+
+def airline_ranking(metrics):
+    """
+    Relatório 1: ranking de performance (menor score = melhor)
+    """
+    df = metrics.copy()
+    df['score'] = (df['avg_arrival_delay']
+                   + df['cancellation_rate'] * CANCELLATION_WEIGHT_AIRLINE
+                   + (100 - df['on_time_rate'])).round(2)
+    df = df.sort_values('score', kind='stable').reset_index(drop=True)
+
+    return pd.DataFrame({
+        'Ranking': np.arange(1, len(df) + 1),
+        'Código': df['airline_code'],
+        'Companhia Aérea': df['airline_name'],
+        'Total Voos': df['total_flights'],
+        'Taxa Pontualidade (%)': df['on_time_rate'],
+        'Atraso Médio (min)': df['avg_arrival_delay'],
+        'Taxa Cancelamento (%)': df['cancellation_rate'],
+        'Taxa Desvio (%)': df['diversion_rate'],
+        'Score Performance': df['score'],
+    })
+
+
+def route_metrics(state, airports):
+    """
+    Métricas de todas as rotas (origem, destino), com score de criticidade
+    """
+    t = state.by_route
+    keys = state.routes.keys
+    airline_codes = np.array(state.airlines.keys, dtype=object)
+    order = np.argsort(airline_codes, kind='stable')
+
+    operators = []
+    for row in state.route_airline[:, order] > 0:
+        operators.append(', '.join(airline_codes[order][row]))
+
+    df = route_rows([o for o, _ in keys], [d for _, d in keys], t, operators, airports)
+    return df.sort_values(['origin', 'dest'], kind='stable').reset_index(drop=True)
+
+
+def route_rows(origin, dest, t, operators, airports):
+    """
+    Linhas de ``rotas_todas.csv`` a partir das somas ``t`` (rotas ×
+    ``MEASURES``) e das companhias operadoras de cada rota (sem ordenar)
+    """
+    cities = dict(zip(airports['IATA_CODE'], airports['CITY']))
+    states = dict(zip(airports['IATA_CODE'], airports['STATE']))
+
+    df = pd.DataFrame({
+        'origin': origin,
+        'dest': dest,
+        'total_flights': t[:, M['flights']],
+        'avg_arrival_delay': np.round(_safe_div(t[:, M['arr_sum']], t[:, M['arr_count']]), 2),
+        'cancellation_rate': _pct(t[:, M['cancelled']], t[:, M['flights']]),
+        'avg_distance': np.round(_safe_div(t[:, M['distance_sum']], t[:, M['flights']]), 2),
+        'airlines': operators,
+    })
+    df['origin_city'] = df['origin'].map(cities)
+    df['origin_state'] = df['origin'].map(states)
+    df['dest_city'] = df['dest'].map(cities)
+    df['dest_state'] = df['dest'].map(states)
+    df['criticality_score'] = route_criticality(df)
+    return df
+
+
+def route_criticality(routes):
+    """
+    Score de criticidade das rotas: atraso médio + taxa de cancelamento × 15
+    """
+    return (routes['avg_arrival_delay']
+            + routes['cancellation_rate'] * CANCELLATION_WEIGHT_ROUTE).round(2)
+
+
+def airport_coordinates(routes, airports):
+    """
+    Coordenadas dos aeroportos que aparecem nas rotas (lookup do mapa de
+    rotas); vazio se a referência não tem LATITUDE/LONGITUDE
+    """
+    columns = ['airport', 'city', 'state', 'latitude', 'longitude']
+    if not {'LATITUDE', 'LONGITUDE'} <= set(airports.columns):
+        return pd.DataFrame(columns=columns)
+    codes = pd.unique(pd.concat([routes['origin'], routes['dest']]).astype(str))
+    ref = airports.drop_duplicates('IATA_CODE').set_index('IATA_CODE')
+    ref = ref.reindex(np.sort(codes))
+    return pd.DataFrame({
+        'airport': ref.index,
+        'city': ref['CITY'].to_numpy(),
+        'state': ref['STATE'].to_numpy(),
+        'latitude': np.round(pd.to_numeric(ref['LATITUDE'], errors='coerce').to_numpy(), 4),
+        'longitude': np.round(pd.to_numeric(ref['LONGITUDE'], errors='coerce').to_numpy(), 4),
+    })
+
+
+def critical_routes(routes):
+    """
+    Relatório 2: top 20 rotas mais críticas com volume mínimo de 100 voos
+    """
+    df = routes[routes['total_flights'] >= MIN_ROUTE_FLIGHTS]
+    df = df.sort_values('criticality_score', ascending=False, kind='stable')
+    df = df.head(TOP_CRITICAL_ROUTES).reset_index(drop=True)
+
+    return pd.DataFrame({
+        'Ranking': np.arange(1, len(df) + 1),
+        'Origem': df['origin'],
+        'Cidade Origem': df['origin_city'],
+        'Estado Origem': df['origin_state'],
+        'Destino': df['dest'],
+        'Cidade Destino': df['dest_city'],
+        'Estado Destino': df['dest_state'],
+        'Total Voos': df['total_flights'],
+        'Atraso Médio (min)': df['avg_arrival_delay'],
+        'Taxa Cancelamento (%)': df['cancellation_rate'],
+        'Distância (milhas)': df['avg_distance'],
+        'Companhias Operadoras': df['airlines'],
+        'Score Criticidade': df['criticality_score'],
+    })
+
+
+def seasonality_report(monthly, late, cause_minutes):
+    """
+    Relatório 3: sazonalidade mensal. ``late`` e ``cause_minutes`` (meses ×
+    ``DELAY_CAUSES``) estão alinhados às linhas de ``monthly``
+    """
+    main_cause = np.asarray(cause_minutes).argmax(axis=1)
+
+    score = (monthly['avg_arrival_delay']
+             + monthly['cancellation_rate'] * CANCELLATION_WEIGHT_AIRLINE
+             + (100 - monthly['on_time_rate'])).round(2)
+
+    return pd.DataFrame({
+        'Mês': monthly['month'],
+        'Nome do Mês': monthly['month_name'],
+        'Total Voos': monthly['total_flights'],
+        'Voos Pontuais': monthly['on_time_flights'],
+        'Voos Atrasados': late,
+        'Voos Cancelados': monthly['total_cancelled'],
+        'Atraso Médio (min)': monthly['avg_arrival_delay'],
+        'Principal Causa de Atraso': [DELAY_CAUSE_SHORT_NAMES[DELAY_CAUSES[j]] for j in main_cause],
+        'Score Criticidade': score,
+    })
+
+
+def cause_metrics(state):
+    """
+    Consolida cancelamentos (por código DOT) e atrasos (por tipo) em uma
+    tabela única com ocorrências, impacto médio, severidade e meses críticos
+    """
+    rows = []
+    for j, column in enumerate(DELAY_CAUSES):
+        count = state.cause_count[:, j]
+        minutes = state.cause_minutes[:, j]
+        total = int(count.sum())
+        rows.append({
+            'problem_type': 'Atraso',
+            'cause_name': DELAY_CAUSE_NAMES[column],
+            'total_occurrences': total,
+            'avg_impact': minutes.sum() / total if total else 0.0,
+            'severity_score': float(minutes.sum()),
+            'monthly': count,
+        })
+    for j, code in enumerate(CANCELLATION_CODES):
+        count = state.cancel_reason[:, j]
+        total = int(count.sum())
+        rows.append({
+            'problem_type': 'Cancelamento',
+            'cause_name': CANCELLATION_NAMES[code],
+            'total_occurrences': total,
+            'avg_impact': 0.0,
+            'severity_score': float(total * CANCELLATION_SEVERITY),
+            'monthly': count,
+        })
+
+    df = pd.DataFrame(rows)
+    df['category'] = df['problem_type'] + ': ' + df['cause_name']
+    df['percentage'] = _pct(df['total_occurrences'], df['total_occurrences'].sum())
+    df['critical_months'] = [
+        ', '.join(calendar.month_name[m + 1] for m in np.argsort(-monthly, kind='stable')[:3])
+        for monthly in df.pop('monthly')
+    ]
+    return df.sort_values('severity_score', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def causes_report(causes, total_flights):
+    """
+    Relatório 4: causas de cancelamento e atraso por severidade
+    """
+    return pd.DataFrame({
+        'Ranking': np.arange(1, len(causes) + 1),
+        'Tipo de Problema': causes['problem_type'],
+        'Causa': causes['cause_name'],
+        'Quantidade de Ocorrências': causes['total_occurrences'],
+        'Percentual do Total (%)': np.round(_safe_div(causes['total_occurrences'], total_flights) * 100, 3),
+        'Impacto Médio (min)': causes['avg_impact'].round(1),
+        'Meses Críticos': causes['critical_months'],
+    })
+
+
+def causes_chart_data(causes):
+    """
+    Dados do gráfico 4: causas principais (≥ 3%) com as menores agrupadas
+    em "Outros", e a tabela das causas menores
+    """
+    columns = ['category', 'problem_type', 'cause_name', 'total_occurrences',
+               'avg_impact', 'severity_score', 'percentage']
+    main = causes[causes['percentage'] >= MAIN_CAUSE_THRESHOLD][columns]
+    minor = causes[causes['percentage'] < MAIN_CAUSE_THRESHOLD][columns].reset_index(drop=True)
+
+    if len(minor):
+        others = pd.DataFrame([{
+            'category': 'Outros',
+            'problem_type': 'Diversos',
+            'cause_name': 'Causas Menores',
+            'total_occurrences': minor['total_occurrences'].sum(),
+            'avg_impact': minor['avg_impact'].mean(),
+            'severity_score': minor['severity_score'].sum(),
+            'percentage': round(minor['percentage'].sum(), 2),
+        }])
+        main = pd.concat([main, others], ignore_index=True)
+
+    main = main.reset_index(drop=True)
+    main['controllability'] = np.where(
+        main['cause_name'].isin(CONTROLLABLE_CAUSES), 'Controlável', 'Não Controlável')
+    return main, minor
+
+
+def day_hour_matrices(state):
+    """
+    Matrizes 7 × 24 do gráfico 3: volume e atraso médio (voos não cancelados)
+    """
+    t = state.by_day_hour
+    volumes = t[:, M['flights']].reshape(7, 24)
+    delays = np.round(_safe_div(t[:, M['arr_sum']], t[:, M['arr_count']]), 2).reshape(7, 24)
+
+    hours = [str(h) for h in range(24)]
+    df_volumes = pd.DataFrame(volumes, columns=hours)
+    df_volumes.insert(0, 'day_name', DAY_NAMES)
+    df_delays = pd.DataFrame(delays, columns=hours)
+    df_delays.insert(0, 'day_name', DAY_NAMES)
+    return df_volumes, df_delays
+
+
+def delay_percentiles(state):
+    """
+    Mediana e percentis de cauda do atraso na chegada por companhia, mês,
+    rota e hora de partida, em formato longo
+    """
+    groups = [
+        ('airline', state.airlines.keys, state.airline_sketch),
+        ('month', [str(m + 1) for m in range(len(state.month_sketch))], state.month_sketch),
+        ('route', [f"{o}-{d}" for o, d in state.routes.keys], state.route_sketch),
+        ('hour', [str(h) for h in range(len(state.hour_sketch))], state.hour_sketch),
+    ]
+    frames = []
+    for dimension, keys, sketches in groups:
+        df = pd.DataFrame({
+            'dimension': dimension,
+            'key': keys,
+            'arrival_delay_count': sketches.sum(axis=1, dtype=np.int64),
+            'median_arrival_delay': sketch.median(sketches),
+        })
+        df = _add_tail_quantiles(df, sketches)
+        frames.append(df[df['arrival_delay_count'] > 0].sort_values('key', kind='stable'))
+    return pd.concat(frames, ignore_index=True)
+
+
+def build_outputs(state, airlines, airports):
+    """
+    Monta os DataFrames de todos os arquivos de ``OUTPUT_FILES``
+    """
+    monthly = monthly_metrics(state)
+    airlines_df = airline_metrics(state, airlines)
+    routes = route_metrics(state, airports)
+    causes = cause_metrics(state)
+    volumes, delays = day_hour_matrices(state)
+    main_causes, minor_causes = causes_chart_data(causes)
+    months = monthly['month'].to_numpy() - 1
+
+    return {
+        'relatorio_01': airline_ranking(airlines_df),
+        'relatorio_02': critical_routes(routes),
+        'relatorio_03': seasonality_report(monthly, state.by_month[months, M['late']],
+                                           state.cause_minutes[months]),
+        'relatorio_04': causes_report(causes, state.rows),
+        'grafico_01': monthly,
+        'grafico_02': airline_chart_data(airlines_df),
+        'grafico_03_volumes': volumes,
+        'grafico_03_atrasos': delays,
+        'grafico_04_principais': main_causes,
+        'grafico_04_menores': minor_causes,
+        'percentis_atraso': delay_percentiles(state),
+        'rotas': routes,
+        'aeroportos': airport_coordinates(routes, airports),
+    }
+
+
+def write_outputs(outputs, output_dir):
+    """
+    Grava os DataFrames em CSV com os nomes de arquivo usados pelo dashboard.
+    Arquivos cujo conteúdo não mudou não são reescritos; retorna as chaves
+    dos arquivos efetivamente gravados.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for key, df in outputs.items():
+        path = os.path.join(output_dir, OUTPUT_FILES[key])
+        content = df.to_csv(index=False)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8', newline='') as f:
+                if f.read() == content:
+                    continue
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.replace(tmp, path)
+        written.append(key)
+    return written
@@ -0,0 +1,263 @@
+"""
+Geometria do mapa de rotas do dashboard, agregada no servidor.
+
+O mapa desenha cada ligação como um arco colorido pela criticidade. Quantas
+ligações aparecem depende do zoom, que é a área escolhida:
+
+* ``regiao`` e ``estado``: as rotas são agrupadas pelo par (não
+  direcionado) de regiões ou estados das pontas. Cada par vira um arco entre
+  os centroides dos grupos, ponderados pelos voos dos aeroportos. O volume
+  e as taxas do arco são somados ou ponderados pelos voos;
+* ``rota``: um arco por par de aeroportos (ida e volta juntas). Por padrão,
+  esse nível só é usado quando a área é uma região ou um estado.
+
+As coordenadas vêm do dataset ``aeroportos`` (gerado pelo pipeline a partir
+do airports.csv). ``AirportLookup`` projeta cada aeroporto uma única vez
+(equiretangular corrigida pela latitude média dos EUA). ``RouteMap`` guarda,
+para cada nível, o grupo de cada ponta de rota e o centroide de cada grupo,
+então uma vista é só ``np.unique`` + ``bincount`` sobre as rotas
+selecionadas.
+
+O payload é limitado de duas formas: no máximo ``max_arcs`` arcos (os de
+mais voos) e ``max_points`` vértices no total. Os arcos são curvas de Bézier
+quadráticas com poucos vértices, e as coordenadas vão arredondadas. O
+dashboard desenha tudo em WebGL (``Scattergl``): um trace por faixa de
+criticidade e espessura, com os arcos separados por NaN. Assim o número de
+traces não cresce com o número de rotas.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+
+from .reports import CANCELLATION_WEIGHT_ROUTE
+from .routes import criticality_score
+
+LEVELS = {'regiao': 'Região', 'estado': 'Estado', 'rota': 'Rota'}
+# Latitude de referência da projeção (centro dos EUA contíguos)
+REFERENCE_LAT = 38.0
+# Enquadramento inicial do país: EUA contíguos (lon, lat)
+COUNTRY_VIEW = ((-125.0, -66.5), (24.0, 49.5))
+MAX_ARCS = 2500
+MAX_POINTS = 30_000
+ARC_POINTS = 16
+MIN_ARC_POINTS = 4
+# Altura do arco como fração da distância entre as pontas
+ARC_BEND = 0.18
+COORD_DECIMALS = 2
+
+
+def project(lon, lat):
+    """
+    (x, y) da projeção equiretangular usada no mapa
+    """
+    return (np.asarray(lon, dtype=np.float64) * np.cos(np.radians(REFERENCE_LAT)),
+            np.asarray(lat, dtype=np.float64))
+
+
+class AirportLookup:
+    """
+    Coordenadas projetadas dos aeroportos, consultadas por código IATA
+    """
+
+    def __init__(self, airports):
+        airports = airports.dropna(subset=['latitude', 'longitude'])
+        airports = airports.drop_duplicates('airport').sort_values('airport')
+        self.codes = airports['airport'].astype(str).to_numpy()
+        self.x, self.y = project(airports['longitude'], airports['latitude'])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def index(self, codes):
+        """
+        Posição de cada código no lookup (-1 se sem coordenadas)
+        """
+        codes = np.asarray(codes, dtype=str)
+        if not len(self.codes):
+            return np.full(len(codes), -1)
+        pos = np.minimum(np.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return np.where(self.codes[pos] == codes, pos, -1)
+
+
+def criticality_bins(score, bins=5):
+    """
+    Faixa (0 = menos crítica) de cada score pelos quantis dos próprios
+    scores e os limites das faixas
+    """
+    if not len(score):
+        return np.zeros(0, dtype=np.int64), np.zeros(bins + 1)
+    edges = np.quantile(score, np.linspace(0, 1, bins + 1))
+    return np.clip(np.searchsorted(edges[1:-1], score, side='right'), 0, bins - 1), edges
+
+
+def bezier_arcs(x0, y0, x1, y1, points):
+    """
+    Vértices (n × points) dos arcos quadráticos entre as pontas, curvados à
+    esquerda do sentido (x0, y0) -> (x1, y1)
+    """
+    dx, dy = x1 - x0, y1 - y0
+    cx = (x0 + x1) / 2 - ARC_BEND * dy
+    cy = (y0 + y1) / 2 + ARC_BEND * dx
+    t = np.linspace(0.0, 1.0, points)[None, :]
+    a, b, c = (1 - t) ** 2, 2 * (1 - t) * t, t ** 2
+    xs = a * x0[:, None] + b * cx[:, None] + c * x1[:, None]
+    ys = a * y0[:, None] + b * cy[:, None] + c * y1[:, None]
+    return xs, ys
+
+
+def polylines(xs, ys):
+    """
+    Arcos (n × k) concatenados em um só traço, separados por NaN
+    """
+    gap = np.full((len(xs), 1), np.nan)
+    return (np.round(np.hstack([xs, gap]).ravel(), COORD_DECIMALS),
+            np.round(np.hstack([ys, gap]).ravel(), COORD_DECIMALS))
+
+
+class RouteMap:
+    """
+    Grupos e centroides de cada nível sobre uma ``RouteTable``
+    """
+
+    def __init__(self, table, airports):
+        self.table = table
+        lookup = AirportLookup(airports)
+        pos = lookup.index(table.airports)
+        located = pos >= 0
+        n_airports = len(table.airports)
+        x, y = np.full(n_airports, np.nan), np.full(n_airports, np.nan)
+        x[located], y[located] = lookup.x[pos[located]], lookup.y[pos[located]]
+        self.located = located[table.origin_code] & located[table.dest_code]
+
+        # Voos de cada aeroporto (partidas + chegadas) ponderam os centroides
+        weight = (np.bincount(table.origin_code, table.flights, n_airports)
+                  + np.bincount(table.dest_code, table.flights, n_airports))
+        weight = np.where(located, np.maximum(weight, 1), 0)
+
+        airport_state = np.zeros(n_airports, dtype=np.int64)
+        airport_state[table.origin_code] = table.origin_state
+        airport_state[table.dest_code] = table.dest_state
+        airport_region = np.zeros(n_airports, dtype=np.int64)
+        airport_region[table.origin_code] = table.origin_region
+        airport_region[table.dest_code] = table.dest_region
+
+        self.ends = {
+            'regiao': (table.origin_region, table.dest_region),
+            'estado': (table.origin_state, table.dest_state),
+            'rota': (table.origin_code, table.dest_code),
+        }
+        self.labels = {'regiao': table.regions, 'estado': table.states, 'rota': table.airports}
+        self.nodes = {'rota': (np.nan_to_num(x), np.nan_to_num(y))}
+        for level, group in (('regiao', airport_region), ('estado', airport_state)):
+            n = len(self.labels[level])
+            total = np.bincount(group, weight, n)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.nodes[level] = (np.bincount(group, weight * np.nan_to_num(x), n) / total,
+                                     np.bincount(group, weight * np.nan_to_num(y), n) / total)
+        # Grupos de cada aeroporto, para enquadrar a área escolhida
+        self._airport_groups = {'regiao': airport_region, 'estado': airport_state}
+        self._airport_xy = x, y
+
+    def __len__(self):
+        return int(self.located.sum())
+
+    def areas(self):
+        """
+        Áreas de zoom: (None, None) = país, ('regiao', nome), ('estado', sigla)
+        """
+        return ([(None, None)]
+                + [('regiao', name) for name in self.table.regions]
+                + [('estado', name) for name in self.table.states])
+
+    @staticmethod
+    def level_for(area):
+        """
+        Nível de agregação automático: estados no país inteiro, rotas numa
+        região ou num estado
+        """
+        return 'estado' if area[0] is None else 'rota'
+
+    def bounds(self, area):
+        """
+        ((xmin, xmax), (ymin, ymax)) do enquadramento da área
+        """
+        kind, name = area
+        if kind is None:
+            (lon0, lon1), (lat0, lat1) = COUNTRY_VIEW
+            (x0, x1), (y0, y1) = project([lon0, lon1], [lat0, lat1])
+            return (x0, x1), (y0, y1)
+        x, y = self._airport_xy
+        code = np.searchsorted(self.labels[kind], name)
+        inside = (self._airport_groups[kind] == code) & ~np.isnan(x)
+        if not inside.any():
+            return self.bounds((None, None))
+        xs, ys = x[inside], y[inside]
+        pad = max(xs.max() - xs.min(), ys.max() - ys.min(), 2.0) * 0.15
+        return (xs.min() - pad, xs.max() + pad), (ys.min() - pad, ys.max() + pad)
+
+    def view(self, area=(None, None), level=None, weights=None, min_flights=0,
+             max_arcs=MAX_ARCS, max_points=MAX_POINTS):
+        """
+        Arcos e nós da área no nível pedido (automático se None); ``weights``
+        (atraso, cancelamento) muda o score de criticidade
+        """
+        table = self.table
+        level = level or self.level_for(area)
+        kind, name = area
+        mask = self.located & (table.flights >= min_flights)
+        if kind is not None:
+            mask &= table.select(**{'regions' if kind == 'regiao' else 'states': [name]})
+
+        g0, g1 = (ends[mask] for ends in self.ends[level])
+        flights = table.flights[mask].astype(np.float64)
+        completed = flights * (1 - np.nan_to_num(table.cancel[mask]) / 100)
+        delay = np.nan_to_num(table.delay[mask])
+        cancel = np.nan_to_num(table.cancel[mask])
+
+        # Par não direcionado; rotas dentro do mesmo grupo ficam só no nó
+        n = len(self.labels[level])
+        a, b = np.minimum(g0, g1).astype(np.int64), np.maximum(g0, g1).astype(np.int64)
+        node_flights = np.bincount(g0, flights, n) + np.bincount(g1, flights, n)
+        cross = a != b
+        pairs, inverse = np.unique(a[cross] * n + b[cross], return_inverse=True)
+        arc_flights = np.bincount(inverse, flights[cross], len(pairs))
+        arc_completed = np.bincount(inverse, completed[cross], len(pairs))
+        arc_routes = np.bincount(inverse, minlength=len(pairs))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arc_delay = np.bincount(inverse, delay[cross] * completed[cross], len(pairs)) / arc_completed
+            arc_cancel = np.bincount(inverse, cancel[cross] * flights[cross], len(pairs)) / arc_flights
+        arc_delay, arc_cancel = np.round(np.nan_to_num(arc_delay), 2), np.round(arc_cancel, 2)
+        score = criticality_score(arc_delay, arc_cancel,
+                                  *(weights or (1.0, CANCELLATION_WEIGHT_ROUTE)))
+
+        # Mais voos primeiro; o excedente fica fora do payload
+        order = np.argsort(-arc_flights, kind='stable')[:max_arcs]
+        pairs, a_arc, b_arc = pairs[order], pairs[order] // n, pairs[order] % n
+        points = int(np.clip(max_points // max(len(order), 1), MIN_ARC_POINTS, ARC_POINTS))
+        nx, ny = self.nodes[level]
+        xs, ys = bezier_arcs(nx[a_arc], ny[a_arc], nx[b_arc], ny[b_arc], points)
+
+        labels = self.labels[level]
+        used = np.flatnonzero(node_flights > 0)
+        return SimpleNamespace(
+            level=level,
+            area=area,
+            bounds=self.bounds(area),
+            arcs=SimpleNamespace(
+                xs=xs, ys=ys,
+                origin=labels[a_arc], dest=labels[b_arc],
+                flights=arc_flights[order].astype(np.int64),
+                routes=arc_routes[order],
+                delay=arc_delay[order],
+                cancel=arc_cancel[order],
+                score=score[order],
+            ),
+            nodes=SimpleNamespace(
+                x=nx[used], y=ny[used], label=labels[used],
+                flights=node_flights[used].astype(np.int64),
+            ),
+            total_arcs=len(arc_flights),
+            routes=int(mask.sum()),
+            points=points,
+        )
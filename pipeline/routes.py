@@ -0,0 +1,274 @@
+"""
+Tabela de rotas do explorador do dashboard.
+
+``RouteTable`` guarda todas as rotas em arrays (uma coluna por métrica e
+códigos inteiros para os textos) e monta os índices uma única vez:
+
+* listas de rotas por aeroporto de origem, de destino, estado, região e
+  companhia operadora (formato CSR, como em ``pipeline.filters``);
+* termos ordenados (códigos IATA e palavras das cidades) para busca por
+  prefixo com ``searchsorted``;
+* permutações de ordenação por métrica, calculadas na primeira vez que a
+  métrica é pedida.
+
+Uma consulta combina os filtros em uma máscara booleana e devolve só a página
+pedida, já ordenada. O navegador nunca recebe a tabela inteira; a
+exportação (``chunks``) percorre a mesma seleção e ordem em partes.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .reports import CANCELLATION_WEIGHT_ROUTE
+
+# Regiões do Census Bureau (EUA) por estado; territórios à parte
+REGIONS = {
+    **dict.fromkeys(['CT', 'ME', 'MA', 'NH', 'RI', 'VT', 'NJ', 'NY', 'PA'], 'Nordeste'),
+    **dict.fromkeys(['IL', 'IN', 'MI', 'OH', 'WI', 'IA', 'KS', 'MN', 'MO', 'NE', 'ND', 'SD'],
+                    'Centro-Oeste'),
+    **dict.fromkeys(['DE', 'FL', 'GA', 'MD', 'NC', 'SC', 'VA', 'DC', 'WV', 'AL', 'KY', 'MS',
+                     'TN', 'AR', 'LA', 'OK', 'TX'], 'Sul'),
+    **dict.fromkeys(['AZ', 'CO', 'ID', 'MT', 'NV', 'NM', 'UT', 'WY', 'AK', 'CA', 'HI', 'OR',
+                     'WA'], 'Oeste'),
+    **dict.fromkeys(['PR', 'VI', 'GU', 'AS', 'MP', 'TT'], 'Territórios'),
+}
+UNKNOWN = 'N/D'
+
+# Métricas ordenáveis: coluna exibida -> atributo da tabela
+SORT_COLUMNS = {
+    'Score Criticidade': 'score',
+    'Total Voos': 'flights',
+    'Atraso Médio (min)': 'delay',
+    'Taxa Cancelamento (%)': 'cancel',
+    'Distância (milhas)': 'distance',
+    'Origem': 'origin',
+    'Destino': 'dest',
+}
+
+
+def criticality_score(delay, cancel, delay_weight=1.0, cancel_weight=CANCELLATION_WEIGHT_ROUTE):
+    """
+    Score de criticidade vetorizado: atraso médio + taxa de cancelamento × 15
+    (ou com os pesos informados)
+    """
+    return np.round(delay_weight * np.asarray(delay, dtype=np.float64)
+                    + cancel_weight * np.asarray(cancel, dtype=np.float64), 2)
+
+
+def _encode(values):
+    # factorize (hash) e ordena só os rótulos distintos
+    codes, labels = pd.factorize(pd.Series(values).fillna(UNKNOWN).astype(str), sort=True)
+    return np.asarray(labels, dtype=str), codes.astype(np.int32)
+
+
+def _csr(codes, routes, n_labels):
+    """
+    Rotas de cada código: ``rows[offsets[c]:offsets[c + 1]]`` (ordenadas)
+    """
+    order = np.lexsort((routes, codes))
+    counts = np.bincount(codes, minlength=n_labels)
+    return routes[order].astype(np.int32), np.concatenate([[0], np.cumsum(counts)])
+
+
+def _terms(labels):
+    """
+    Termos de busca de cada rótulo: o rótulo inteiro e cada palavra, em
+    minúsculas. Retorna (código do rótulo, termo) em arrays paralelos.
+    """
+    codes, terms = [], []
+    for code, label in enumerate(labels):
+        text = label.lower()
+        words = {text, *text.replace('-', ' ').replace('/', ' ').split()}
+        codes.extend([code] * len(words))
+        terms.extend(sorted(words))
+    return np.array(codes, dtype=np.int64), np.array(terms, dtype=str)
+
+
+class RouteTable:
+    """
+    Todas as rotas (origem, destino) com métricas, índices e ordenações
+    prontos para consultas paginadas
+    """
+
+    def __init__(self, routes):
+        """
+        ``routes`` no formato de ``reports.route_metrics`` (um registro por
+        rota)
+        """
+        routes = routes.reset_index(drop=True)
+        n = len(routes)
+        self.size = n
+        self.origin = routes['origin'].astype(str).to_numpy()
+        self.dest = routes['dest'].astype(str).to_numpy()
+        self.flights = routes['total_flights'].to_numpy(dtype=np.int64)
+        self.delay = routes['avg_arrival_delay'].to_numpy(dtype=np.float64)
+        self.cancel = routes['cancellation_rate'].to_numpy(dtype=np.float64)
+        self.distance = routes['avg_distance'].to_numpy(dtype=np.float64)
+        self.score = criticality_score(self.delay, self.cancel)
+
+        self.cities, city = _encode(np.concatenate([routes['origin_city'], routes['dest_city']]))
+        self.origin_city, self.dest_city = city[:n], city[n:]
+        self.states, state = _encode(np.concatenate([routes['origin_state'], routes['dest_state']]))
+        self.origin_state, self.dest_state = state[:n], state[n:]
+        self.regions, region = _encode([REGIONS.get(s, UNKNOWN) for s in self.states[state]])
+        self.origin_region, self.dest_region = region[:n], region[n:]
+        self.airports, airport = _encode(np.concatenate([self.origin, self.dest]))
+        self.origin_code, self.dest_code = airport[:n], airport[n:]
+
+        # Companhias operadoras: um par (companhia, rota) por operação
+        operators = routes['airlines'].fillna('').astype(str).str.split(', ')
+        pairs = operators.explode()
+        pairs = pairs[pairs != '']
+        self.airlines, airline = _encode(pairs.to_numpy())
+        self.operators = operators.str.join(', ').to_numpy()
+
+        ids = np.arange(n, dtype=np.int64)
+        both = np.concatenate([ids, ids])
+        self._index = {
+            'origin': _csr(self.origin_code, ids, len(self.airports)),
+            'dest': _csr(self.dest_code, ids, len(self.airports)),
+            'state': _csr(state, both, len(self.states)),
+            'region': _csr(region, both, len(self.regions)),
+            'airline': _csr(airline, pairs.index.to_numpy(dtype=np.int64), len(self.airlines)),
+        }
+        self._build_search(airport, city, both)
+        self._orders = {}
+
+    def _build_search(self, airport, city, both):
+        terms, routes = [], []
+        for labels, codes in ((self.airports, airport), (self.cities, city)):
+            label, term = _terms(labels)
+            order = np.argsort(label, kind='stable')
+            label, term = label[order], term[order]
+            offsets = np.searchsorted(label, np.arange(len(labels) + 1))
+            counts = np.diff(offsets)[codes]
+            # Expande os termos de cada rótulo para as rotas que o usam
+            starts = np.repeat(offsets[codes] - np.cumsum(counts) + counts, counts)
+            terms.append(term[starts + np.arange(counts.sum())])
+            routes.append(np.repeat(both, counts))
+        terms, routes = np.concatenate(terms), np.concatenate(routes)
+        order = np.argsort(terms, kind='stable')
+        self._terms, self._term_routes = terms[order], routes[order]
+
+    def __len__(self):
+        return self.size
+
+    def scores(self, delay_weight=1.0, cancel_weight=CANCELLATION_WEIGHT_ROUTE):
+        """
+        Score de criticidade de todas as rotas com outros pesos
+        """
+        if (delay_weight, cancel_weight) == (1.0, CANCELLATION_WEIGHT_ROUTE):
+            return self.score
+        return criticality_score(self.delay, self.cancel, delay_weight, cancel_weight)
+
+    def _postings(self, dimension, labels, values):
+        rows, offsets = self._index[dimension]
+        codes = np.searchsorted(labels, values)
+        codes = codes[(codes < len(labels)) & (labels[np.minimum(codes, len(labels) - 1)] == values)]
+        if not len(codes):
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate([rows[offsets[c]:offsets[c + 1]] for c in codes])
+
+    def search(self, text):
+        """
+        Rotas com algum termo (código IATA ou palavra da cidade, na origem
+        ou no destino) iniciado por ``text``; todas as palavras precisam casar
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for word in text.lower().split():
+            lo = np.searchsorted(self._terms, word, side='left')
+            hi = np.searchsorted(self._terms, word + '\U0010ffff', side='left')
+            found = np.zeros(self.size, dtype=bool)
+            found[self._term_routes[lo:hi]] = True
+            mask &= found
+        return mask
+
+    def select(self, text=None, origins=None, dests=None, states=None, regions=None,
+               airlines=None, min_flights=0):
+        """
+        Máscara das rotas que atendem a todos os filtros informados
+        (listas de valores; estado e região casam origem ou destino)
+        """
+        mask = self.flights >= min_flights
+        for dimension, labels, values in (('origin', self.airports, origins),
+                                          ('dest', self.airports, dests),
+                                          ('state', self.states, states),
+                                          ('region', self.regions, regions),
+                                          ('airline', self.airlines, airlines)):
+            if values:
+                keep = np.zeros(self.size, dtype=bool)
+                keep[self._postings(dimension, labels, np.asarray(values, dtype=str))] = True
+                mask &= keep
+        if text and text.strip():
+            mask &= self.search(text)
+        return mask
+
+    def order(self, column, descending=True, weights=None):
+        """
+        Permutação estável das rotas pela coluna (NaN por último); ``weights``
+        (atraso, cancelamento) muda o score de criticidade
+        """
+        if column != 'Score Criticidade' or weights == (1.0, CANCELLATION_WEIGHT_ROUTE):
+            weights = None
+        key = column, descending, weights
+        if key not in self._orders:
+            if len(self._orders) > 32:
+                self._orders.clear()
+            values = getattr(self, SORT_COLUMNS[column])
+            if weights is not None:
+                values = self.scores(*weights)
+            if values.dtype.kind not in 'fi':
+                # Posição do rótulo na ordem alfabética: negar a chave inverte
+                # a ordem mantendo os empates na ordem original
+                values = pd.factorize(values, sort=True)[0]
+            order = np.argsort(-values if descending else values, kind='stable')
+            self._orders[key] = order
+        return self._orders[key]
+
+    def frame(self, ids, score=None):
+        """
+        DataFrame das rotas ``ids`` com as colunas do relatório de rotas;
+        ``score`` substitui o score de criticidade padrão
+        """
+        score = self.score if score is None else score
+        return pd.DataFrame({
+            'Origem': self.origin[ids],
+            'Cidade Origem': self.cities[self.origin_city[ids]],
+            'Estado Origem': self.states[self.origin_state[ids]],
+            'Destino': self.dest[ids],
+            'Cidade Destino': self.cities[self.dest_city[ids]],
+            'Estado Destino': self.states[self.dest_state[ids]],
+            'Região': [f"{a} → {b}" if a != b else a for a, b in
+                       zip(self.regions[self.origin_region[ids]], self.regions[self.dest_region[ids]])],
+            'Total Voos': self.flights[ids],
+            'Atraso Médio (min)': self.delay[ids],
+            'Taxa Cancelamento (%)': self.cancel[ids],
+            'Distância (milhas)': self.distance[ids],
+            'Companhias Operadoras': self.operators[ids],
+            'Score Criticidade': score[ids],
+        })
+
+    def page(self, mask=None, sort='Score Criticidade', descending=True, page=0, page_size=50,
+             weights=None):
+        """
+        Página ``page`` (a partir de 0) das rotas de ``mask`` ordenadas por
+        ``sort``. Retorna (DataFrame, total de rotas selecionadas).
+        """
+        order = self.order(sort, descending, weights)
+        ids = order if mask is None else order[mask[order]]
+        start = page * page_size
+        score = None if weights is None else self.scores(*weights)
+        return self.frame(ids[start:start + page_size], score), len(ids)
+
+    def chunks(self, mask=None, sort='Score Criticidade', descending=True, weights=None,
+               rows=50_000):
+        """
+        Todas as rotas de ``mask`` na ordem de ``sort``, em DataFrames de até
+        ``rows`` linhas (exportação em partes); seleção vazia gera uma parte
+        vazia, com as colunas
+        """
+        order = self.order(sort, descending, weights)
+        ids = order if mask is None else order[mask[order]]
+        score = None if weights is None else self.scores(*weights)
+        return (self.frame(ids[start:start + rows], score)
+                for start in range(0, max(len(ids), 1), rows))
@@ -0,0 +1,761 @@
+"""
+Serviço local de consultas agregadas compartilhado pelas réplicas do dashboard.
+
+Sem o serviço, cada réplica do Streamlit carrega os datasets, o cubo OLAP e as
+séries e guarda a sua própria cópia. Com ele, um único processo mantém esses
+dados e responde as consultas de que os ``create_*_chart`` precisam:
+
+* ``/years`` e ``/versions?year=``: anos disponíveis e versões dos
+  artefatos (hashes do manifesto), em JSON;
+* ``/summary?year=``: o ``resumo.json`` do primeiro paint do dashboard;
+* ``/dataset/<chave>?year=``: um dataset de ``OUTPUT_FILES``. Sem o
+  dataset ``rotas``, a tabela de rotas vem do cubo;
+* ``/filters?year=`` (JSON) e ``/slice?year=&airlines=&months=&airports=``:
+  opções dos filtros da barra lateral e os dados recalculados pelo
+  ``DashboardFilters`` para uma seleção;
+* ``/series?year=`` (JSON) e ``/series/query?...``: período e volumes das
+  séries horárias e a consulta downsampled do ``SeriesStore``;
+* ``/stats``: contadores do serviço.
+
+As respostas tabulares são binárias e compactas. Um cabeçalho JSON curto é
+seguido de um stream Arrow IPC por DataFrame, comprimido com zstd quando o
+pyarrow tem o codec. Cada resposta codificada fica num cache LRU indexado pela
+versão do artefato de origem. Uma consulta repetida por outra réplica não
+recalcula nem recodifica nada. Os filtros e as séries de um ano são montados
+uma vez por versão do cubo ou das séries; as consultas que chegam enquanto
+isso esperam essa montagem.
+
+O servidor é HTTP/1.1 com keep-alive, em TCP ou em socket Unix
+(``--listen unix:/caminho``), e atende cada conexão numa thread. O
+``ServiceClient`` mantém um pool de conexões reutilizadas entre os reruns. O
+dashboard usa o serviço quando ``DASHBOARD_SERVICE`` aponta para ele. Os
+datasets chegam pelo mesmo ``DatasetRegistry`` da leitura de arquivos, e os
+filtros e as séries chegam por ``RemoteFilters`` e ``RemoteSeriesStore``.
+
+``loadtest`` simula N usuários simultâneos. Cada sessão abre a página (versões,
+filtros e todos os datasets) e depois muda os filtros algumas vezes (slice e
+série). No fim, o comando reporta p50, p99 e vazão por tipo de consulta.
+
+Uso:
+    python -m pipeline.service serve --data data --listen 127.0.0.1:8765
+    python -m pipeline.service serve --data data --listen unix:/tmp/voos.sock
+    DASHBOARD_SERVICE=http://127.0.0.1:8765 streamlit run streamlit_app.py
+    python -m pipeline.service loadtest --url http://127.0.0.1:8765 --users 32 --sessions 5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .cube import load_cube, route_frame
+from .filters import DashboardFilters
+from .manifest import CUBE_FILE, SERIES_FILE, artifact_versions
+from .registry import DatasetError, DatasetRegistry
+from .reports import OUTPUT_FILES
+from .snapshot import read_dataset
+from .startup import read_summary
+from .timeseries import METHODS, METRICS, POINT_BUDGET, load_series
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+DATA_DIR = 'data'
+DEFAULT_LISTEN = '127.0.0.1:8765'
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30.0
+# Respostas codificadas mantidas em memória pelo servidor
+RESPONSE_CACHE_SIZE = 256
+# Intervalo mínimo entre duas leituras do manifesto de um ano
+REFRESH_SECONDS = 1.0
+
+MAGIC = b'AGG1'
+BINARY_TYPE = 'application/vnd.flights.frames'
+JSON_TYPE = 'application/json'
+
+
+class ServiceError(Exception):
+    """
+    Erro de uma consulta ao serviço, com o status HTTP correspondente
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _codec():
+    for name in ('zstd', 'lz4'):
+        if pa.Codec.is_available(name):
+            return name
+    return None
+
+
+def encode_frames(frames, meta=None):
+    """
+    DataFrames (dict nome -> DataFrame) no formato binário do serviço
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado; o serviço precisa dele")
+    options = ipc.IpcWriteOptions(compression=_codec())
+    blobs = []
+    for name, df in frames.items():
+        table = pa.Table.from_pandas(df)
+        sink = pa.BufferOutputStream()
+        with ipc.new_stream(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        blobs.append((name, sink.getvalue().to_pybytes()))
+    header = json.dumps({'meta': meta or {}, 'frames': [[name, len(blob)] for name, blob in blobs]},
+                        ensure_ascii=False).encode('utf-8')
+    return b''.join([MAGIC, struct.pack('>I', len(header)), header] + [blob for _, blob in blobs])
+
+
+def decode_frames(content):
+    """
+    Inverso de ``encode_frames``: (dict nome -> DataFrame, meta)
+    """
+    if content[:4] != MAGIC:
+        raise ValueError("resposta fora do formato do serviço")
+    size, = struct.unpack('>I', content[4:8])
+    header = json.loads(content[8:8 + size].decode('utf-8'))
+    frames, offset = {}, 8 + size
+    for name, length in header['frames']:
+        reader = ipc.open_stream(pa.py_buffer(content[offset:offset + length]))
+        frames[name] = reader.read_all().to_pandas()
+        offset += length
+    return frames, header['meta']
+
+
+def parse_address(text):
+    """
+    'unix:/tmp/voos.sock' -> ('unix', caminho); 'http://host:porta' ou
+    'host:porta' -> ('tcp', (host, porta))
+    """
+    if text.startswith('unix:'):
+        return 'unix', text[len('unix:'):]
+    if '://' in text:
+        text = urlsplit(text).netloc
+    host, _, port = text.rpartition(':')
+    return 'tcp', (host or '127.0.0.1', int(port))
+
+
+def _list(params, name, convert=str):
+    # "a,b" ou parâmetro ausente/vazio (None = sem filtro)
+    value = params.get(name, [''])[0]
+    return [convert(v) for v in value.split(',')] if value else None
+
+
+def _year(params):
+    value = params.get('year', [''])[0]
+    return int(value) if value else None
+
+
+class _YearData:
+    """
+    Registro, filtros e séries de uma pasta de dados
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.registry = DatasetRegistry(lambda key: read_dataset(directory, key),
+                                        lambda: self.file_versions())
+        self.versions = {}
+        self.checked = 0.0
+        self.filters = None, None   # (versão do cubo, DashboardFilters)
+        self.series = None, None    # (versão das séries, SeriesStore)
+        self.lock = threading.Lock()
+        # Uma construção de filtros/séries por versão: as consultas que
+        # chegam durante ela esperam o resultado em vez de refazê-lo
+        self.filters_lock = threading.Lock()
+        self.series_lock = threading.Lock()
+
+    def file_versions(self):
+        versions = artifact_versions(self.directory)
+        for key, name in (('cube', CUBE_FILE), ('series', SERIES_FILE)):
+            path = os.path.join(self.directory, name)
+            if key not in versions and os.path.exists(path):
+                # Arquivo gravado fora do pipeline (ou manifesto sem ele)
+                stat = os.stat(path)
+                versions[key] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if 'rotas' not in versions and 'cube' in versions:
+            versions['rotas'] = 'cube:' + versions['cube']
+        return versions
+
+
+class AggregateService:
+    """
+    Dados de ``data_dir`` (e das pastas por ano) carregados uma vez e
+    compartilhados por todas as conexões
+    """
+
+    def __init__(self, data_dir=DATA_DIR, cache_size=RESPONSE_CACHE_SIZE):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self._years = {}
+        self._responses = OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_sent = 0
+
+    def years(self):
+        """
+        Anos com pasta própria (``python -m pipeline.partitions build --per-year``)
+        """
+        try:
+            names = os.listdir(self.data_dir)
+        except OSError:
+            return []
+        return sorted(int(name) for name in names if name.isdigit() and len(name) == 4
+                      and os.path.exists(os.path.join(self.data_dir, name, 'manifest.json')))
+
+    def _data(self, year):
+        with self._lock:
+            data = self._years.get(year)
+            if data is not None:
+                return data
+        if year is not None and year not in self.years():
+            raise ServiceError(404, f"ano {year} não encontrado em {self.data_dir}/")
+        directory = self.data_dir if year is None else os.path.join(self.data_dir, str(year))
+        with self._lock:
+            return self._years.setdefault(year, _YearData(directory))
+
+    def versions(self, year=None):
+        """
+        Versões dos artefatos do ano; relê o manifesto no máximo a cada
+        ``REFRESH_SECONDS``
+        """
+        data = self._data(year)
+        with data.lock:
+            if time.monotonic() - data.checked >= REFRESH_SECONDS:
+                data.versions = data.registry.refresh()
+                data.checked = time.monotonic()
+            return data.versions
+
+    def filters(self, year=None):
+        """
+        ``DashboardFilters`` sobre o cubo do ano (None sem cubo)
+        """
+        data = self._data(year)
+        version = self.versions(year).get('cube')
+        with data.filters_lock:
+            if data.filters[0] == version:
+                return data.filters[1]
+            if version is None:
+                return None
+            try:
+                ranking = data.registry.get('relatorio_01')
+                names = dict(zip(ranking['Código'], ranking['Companhia Aérea']))
+            except DatasetError:
+                names = {}
+            filters = DashboardFilters(load_cube(os.path.join(data.directory, CUBE_FILE)), names)
+            data.filters = version, filters
+        return filters
+
+    def series_store(self, year=None):
+        """
+        ``SeriesStore`` do ano (None sem ``series.npz``)
+        """
+        data = self._data(year)
+        version = self.versions(year).get('series')
+        with data.series_lock:
+            if data.series[0] == version:
+                return data.series[1]
+            store = None if version is None else load_series(os.path.join(data.directory, SERIES_FILE))
+            data.series = version, store
+        return store
+
+    def dataset(self, key, year=None):
+        """
+        (versão, DataFrame) do dataset; uma releitura em andamento é
+        esperada, para a versão corresponder aos dados devolvidos
+        """
+        if key not in OUTPUT_FILES:
+            raise ServiceError(404, f"dataset desconhecido: {key}")
+        versions = self.versions(year)
+        data = self._data(year)
+        try:
+            return data.registry.latest(key)
+        except DatasetError as e:
+            filters = self.filters(year) if key == 'rotas' else None
+            if filters is None:
+                raise ServiceError(404, str(e)) from e
+            return versions.get('rotas'), route_frame(filters.summary)
+
+    def _cached(self, key, build):
+        # Resposta codificada em cache (chave inclui a versão de origem)
+        with self._lock:
+            content = self._responses.get(key)
+            if content is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return content
+            self.misses += 1
+        content = build()
+        with self._lock:
+            self._responses[key] = content
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return content
+
+    def handle(self, path, params):
+        """
+        Responde uma consulta: (content-type, corpo)
+        """
+        with self._lock:
+            self.requests += 1
+        year = _year(params)
+        if path == '/years':
+            return JSON_TYPE, self.years()
+        if path == '/versions':
+            return JSON_TYPE, self.versions(year)
+        if path == '/summary':
+            summary = read_summary(self._data(year).directory)
+            if summary is None:
+                raise ServiceError(404, "resumo.json indisponível")
+            return JSON_TYPE, summary
+        if path == '/stats':
+            return JSON_TYPE, self.stats()
+        if path.startswith('/dataset/'):
+            key = path[len('/dataset/'):]
+            # A versão da chave é a dos dados lidos, não a do manifesto: o
+            # manifesto pode estar à frente da releitura
+            version, df = self.dataset(key, year)
+            return BINARY_TYPE, self._cached(('dataset', year, key, version),
+                                             lambda: encode_frames({key: df}))
+        if path == '/filters':
+            filters = self.filters(year)
+            if filters is None:
+                raise ServiceError(404, "cubo OLAP indisponível")
+            return JSON_TYPE, {
+                'airlines': filters.airlines,
+                'months': filters.months,
+                'airports': filters.airports,
+                'airline_names': filters.airline_names,
+                'airport_info': filters.airport_info,
+            }
+        if path == '/slice':
+            selection = {'airlines': _list(params, 'airlines'),
+                         'months': _list(params, 'months', int),
+                         'airports': _list(params, 'airports')}
+            filters = self.filters(year)
+            if filters is None:
+                raise ServiceError(404, "cubo OLAP indisponível")
+            key = ('slice', year, self.versions(year).get('cube'),
+                   tuple(tuple(v) if v is not None else None for v in selection.values()))
+            return BINARY_TYPE, self._cached(key, lambda: encode_frames(filters.datasets(**selection)))
+        if path == '/series':
+            store = self.series_store(year)
+            if store is None:
+                raise ServiceError(404, "séries horárias indisponíveis")
+            first, last = store.span
+            return JSON_TYPE, {'span': [int(first.astype(np.int64)), int(last.astype(np.int64))],
+                               'volumes': store.volumes()}
+        if path == '/series/query':
+            store = self.series_store(year)
+            if store is None:
+                raise ServiceError(404, "séries horárias indisponíveis")
+            try:
+                args = (params['airline'][0], int(params['start'][0]), int(params['end'][0]),
+                        params.get('metric', ['atraso'])[0],
+                        int(params.get('budget', [POINT_BUDGET])[0]),
+                        params.get('method', ['lttb'])[0])
+            except (KeyError, ValueError) as e:
+                raise ServiceError(400, f"parâmetros inválidos: {e}") from e
+            if args[3] not in METRICS or args[5] not in METHODS:
+                raise ServiceError(400, f"métrica ou método inválido: {args[3]}, {args[5]}")
+
+            def build():
+                x, y, info = store.query(*args)
+                return encode_frames({'series': pd.DataFrame({'x': x.astype(np.int64), 'y': y})},
+                                     info)
+            return BINARY_TYPE, self._cached(('series', year, self.versions(year).get('series'))
+                                             + args, build)
+        raise ServiceError(404, f"consulta desconhecida: {path}")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'requests': self.requests, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / total if total else 0.0,
+                    'cached': len(self._responses), 'bytes_sent': self.bytes_sent,
+                    'years': [year for year in self._years]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas: sem isso, o Nagle + ACK
+    # atrasado somam ~40 ms a cada resposta numa conexão keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            content_type, body = self.server.service.handle(url.path, parse_qs(url.query))
+            status = 200
+        except ServiceError as e:
+            status, content_type, body = e.status, JSON_TYPE, {'error': str(e)}
+        except Exception as e:
+            status, content_type, body = 500, JSON_TYPE, {'error': f"{type(e).__name__}: {e}"}
+        if content_type == JSON_TYPE:
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.service._lock:
+            self.server.service.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass  # uma linha por consulta atrapalharia o loadtest
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, listen=DEFAULT_LISTEN):
+    """
+    Servidor HTTP (TCP ou socket Unix) do ``service``; ``serve_forever`` para
+    atender
+    """
+    kind, address = parse_address(listen)
+    if kind == 'unix':
+        if os.path.exists(address):
+            os.unlink(address)
+        server = _UnixHTTPServer(address, _Handler)
+    else:
+        server = ThreadingHTTPServer(address, _Handler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class ServiceClient:
+    """
+    Cliente do serviço com até ``size`` conexões keep-alive, criadas sob
+    demanda e reutilizadas entre os reruns
+    """
+
+    def __init__(self, url, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        self.url = url
+        self.kind, self.address = parse_address(url)
+        self.timeout = timeout
+        # None = vaga livre; conexões devolvidas ficam no topo e são reusadas antes
+        self._pool = queue.LifoQueue()
+        for _ in range(size):
+            self._pool.put(None)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self.kind == 'unix':
+            return _UnixHTTPConnection(self.address, self.timeout)
+        return http.client.HTTPConnection(*self.address, timeout=self.timeout)
+
+    def request(self, path, params=None):
+        """
+        GET no serviço: objeto JSON ou (dict de DataFrames, meta)
+        """
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        target = path + ('?' + urlencode(params) if params else '')
+        conn = self._pool.get()
+        try:
+            # Uma conexão ociosa pode ter sido fechada pelo servidor: tenta de novo com outra
+            for attempt in range(2):
+                if conn is None:
+                    conn = self._connect()
+                try:
+                    conn.request('GET', target)
+                    response = conn.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, OSError):
+                    conn.close()
+                    conn = None
+                    if attempt:
+                        raise
+        finally:
+            self._pool.put(conn)
+        if response.getheader('Content-Type') == BINARY_TYPE:
+            return decode_frames(body)
+        content = json.loads(body.decode('utf-8'))
+        if response.status != 200:
+            raise ServiceError(response.status, content.get('error', response.reason))
+        return content
+
+    def years(self):
+        return self.request('/years')
+
+    def versions(self, year=None):
+        """
+        Versões dos artefatos do ano (reaproveitadas por ``REFRESH_SECONDS``)
+        """
+        with self._lock:
+            checked, versions = self._versions.get(year, (0.0, None))
+        if versions is None or time.monotonic() - checked >= REFRESH_SECONDS:
+            versions = self.request('/versions', {'year': year})
+            with self._lock:
+                self._versions[year] = time.monotonic(), versions
+        return versions
+
+    def summary(self, year=None):
+        """
+        Resumo pré-calculado do ano (``resumo.json``)
+        """
+        return self.request('/summary', {'year': year})
+
+    def dataset(self, key, year=None):
+        frames, _ = self.request(f'/dataset/{key}', {'year': year})
+        return frames[key]
+
+    def registry(self, year=None):
+        """
+        ``DatasetRegistry`` cujas leituras e versões vêm do serviço
+        """
+        return DatasetRegistry(lambda key: self.dataset(key, year), lambda: self.versions(year))
+
+    def slice(self, year=None, airlines=None, months=None, airports=None):
+        def join(values):
+            return None if values is None else ','.join(str(v) for v in values)
+        frames, _ = self.request('/slice', {'year': year, 'airlines': join(airlines),
+                                            'months': join(months), 'airports': join(airports)})
+        return frames
+
+    def stats(self):
+        return self.request('/stats')
+
+
+class RemoteFilters:
+    """
+    Mesma interface de ``DashboardFilters`` usada pelo dashboard, com o cubo
+    no serviço
+    """
+
+    summary = None
+
+    def __init__(self, client, year=None):
+        self.client = client
+        self.year = year
+        options = client.request('/filters', {'year': year})
+        self.airlines = options['airlines']
+        self.months = options['months']
+        self.airports = options['airports']
+        self.airline_names = options['airline_names']
+        self.airport_info = options['airport_info']
+
+    def datasets(self, airlines=None, months=None, airports=None):
+        return self.client.slice(self.year, airlines, months, airports)
+
+
+class RemoteSeriesStore:
+    """
+    Mesma interface de ``SeriesStore`` usada pelo dashboard, com as séries
+    no serviço
+    """
+
+    def __init__(self, client, year=None):
+        self.client = client
+        self.year = year
+        meta = client.request('/series', {'year': year})
+        first, last = meta['span']
+        self.span = np.datetime64(first, 'h'), np.datetime64(last, 'h')
+        self._volumes = meta['volumes']
+        self.requests = 0
+
+    def volumes(self):
+        return dict(self._volumes)
+
+    def query(self, airline, start, end, metric='atraso', budget=POINT_BUDGET, method='lttb'):
+        start = int(np.datetime64(start, 'h').astype(np.int64))
+        end = int(np.datetime64(end, 'h').astype(np.int64))
+        frames, info = self.client.request('/series/query', {
+            'year': self.year, 'airline': airline, 'start': start, 'end': end,
+            'metric': metric, 'budget': budget, 'method': method})
+        self.requests += 1
+        series = frames['series']
+        return series['x'].to_numpy().astype('datetime64[h]'), series['y'].to_numpy(), info
+
+    def stats(self):
+        return {'requests': self.requests}
+
+
+def _session(client, year, interactions, rng, timings):
+    """
+    Uma sessão simulada: abre a página e muda os filtros ``interactions``
+    vezes; cada consulta registra (tipo, segundos) em ``timings``
+    """
+    def timed(kind, function, *args):
+        start = time.perf_counter()
+        try:
+            result = function(*args)
+        except Exception as e:
+            timings.append((kind, time.perf_counter() - start, e))
+            return None
+        timings.append((kind, time.perf_counter() - start, None))
+        return result
+
+    versions = timed('versions', client.request, '/versions', {'year': year}) or {}
+    for key in OUTPUT_FILES:
+        if key in versions:
+            timed('dataset', client.dataset, key, year)
+    options = timed('filters', client.request, '/filters', {'year': year}) if 'cube' in versions else None
+    series = timed('series', client.request, '/series', {'year': year}) if 'series' in versions else None
+
+    for _ in range(interactions):
+        if options is not None:
+            airlines = rng.sample(options['airlines'], rng.randint(0, min(3, len(options['airlines']))))
+            first = rng.choice(options['months'])
+            last = rng.choice([m for m in options['months'] if m >= first])
+            airport = rng.choice(options['airports']) if rng.random() < 0.3 else None
+            timed('slice', client.slice, year, airlines or None,
+                  list(range(first, last + 1)), [airport] if airport else None)
+        if series is not None:
+            first, last = series['span']
+            start = rng.randint(first, last)
+            end = rng.randint(start, last)
+            timed('series:query', client.request, '/series/query', {
+                'year': year, 'airline': rng.choice(list(series['volumes'])),
+                'start': start, 'end': end, 'metric': rng.choice(list(METRICS)),
+                'method': rng.choice(METHODS)})
+
+
+def loadtest(url, users=16, sessions=5, interactions=5, year=None, pool=None, seed=0):
+    """
+    ``users`` usuários simultâneos, cada um com ``sessions`` sessões; retorna
+    {tipo: {'count', 'errors', 'p50_ms', 'p99_ms', 'max_ms'}} e o tempo total
+    """
+    client = ServiceClient(url, size=pool or users)
+    timings = []
+
+    def user(index):
+        rng = random.Random(seed * 1_000_003 + index)
+        for _ in range(sessions):
+            _session(client, year, interactions, rng, timings)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    groups = defaultdict(list)
+    errors = defaultdict(list)
+    for kind, seconds, error in timings:
+        for name in (kind, 'total'):
+            groups[name].append(seconds)
+            if error is not None:
+                errors[name].append(error)
+    summary = {}
+    for kind, values in groups.items():
+        ms = np.array(values) * 1000
+        summary[kind] = {'count': len(ms), 'errors': len(errors.get(kind, [])),
+                         'p50_ms': float(np.percentile(ms, 50)),
+                         'p99_ms': float(np.percentile(ms, 99)),
+                         'max_ms': float(ms.max())}
+    return summary, elapsed, {kind: str(e[0]) for kind, e in errors.items() if e}
+
+
+def format_loadtest(summary, elapsed):
+    lines = [f"{'consulta':<14}{'n':>8}{'erros':>7}{'p50 ms':>10}{'p99 ms':>10}{'máx ms':>10}"]
+    for kind in sorted(summary, key=lambda k: (k == 'total', k)):
+        s = summary[kind]
+        lines.append(f"{kind:<14}{s['count']:>8}{s['errors']:>7}{s['p50_ms']:>10.1f}"
+                     f"{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+    total = summary.get('total', {}).get('count', 0)
+    lines.append(f"{total:,} consultas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s)")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.service',
+        description='Serviço compartilhado de consultas agregadas do dashboard',
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Sobe o serviço')
+    serve.add_argument('--data', default=DATA_DIR, help='Pasta dos dados (padrão: %(default)s)')
+    serve.add_argument('--listen', default=DEFAULT_LISTEN,
+                       help='host:porta ou unix:/caminho/do.sock (padrão: %(default)s)')
+    serve.add_argument('--cache-size', type=int, default=RESPONSE_CACHE_SIZE,
+                       help='Respostas codificadas em cache (padrão: %(default)s)')
+
+    load = commands.add_parser('loadtest', help='Simula usuários simultâneos')
+    load.add_argument('--url', default=f'http://{DEFAULT_LISTEN}',
+                      help='Endereço do serviço (padrão: %(default)s)')
+    load.add_argument('--users', type=int, default=16,
+                      help='Usuários simultâneos (padrão: %(default)s)')
+    load.add_argument('--sessions', type=int, default=5,
+                      help='Sessões por usuário (padrão: %(default)s)')
+    load.add_argument('--interactions', type=int, default=5,
+                      help='Mudanças de filtro por sessão (padrão: %(default)s)')
+    load.add_argument('--pool', type=int, default=None,
+                      help='Conexões do cliente (padrão: uma por usuário)')
+    load.add_argument('--year', type=int, default=None, help='Ano (padrão: conjunto principal)')
+    load.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if pa is None:
+        sys.exit("pyarrow não está instalado; instale-o para usar o serviço")
+
+    if args.command == 'serve':
+        service = AggregateService(args.data, args.cache_size)
+        server = make_server(service, args.listen)
+        print(f"Servindo {args.data}/ em {args.listen} (Ctrl+C para parar)", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    summary, elapsed, errors = loadtest(args.url, args.users, args.sessions, args.interactions,
+                                        args.year, args.pool, args.seed)
+    print(f"{args.users} usuários × {args.sessions} sessões em {args.url}")
+    print(format_loadtest(summary, elapsed))
+    for kind, error in errors.items():
+        print(f"  {kind}: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Snapshot colunar dos arquivos de ``data/`` (Arrow IPC / Feather v2).
+
+Cada dataset é gravado sem compressão em ``data/snapshot/<nome>.arrow``,
+com tipos explícitos no schema e colunas de texto codificadas como
+dicionário (category no pandas). A leitura usa memory map: as colunas
+numéricas são abertas sem cópia e sem inferência de tipos, ao contrário do
+``pd.read_csv``. O pyarrow é opcional; sem ele (ou sem snapshot) o
+dashboard continua lendo os CSVs.
+
+Cada snapshot guarda no schema o SHA-256 do CSV de que foi gerado. Se o
+manifesto registra outro hash para o CSV (ele foi regenerado depois do
+snapshot), o snapshot está defasado e a leitura volta ao CSV.
+
+Uso (gera o snapshot a partir dos CSVs existentes):
+    python -m pipeline.snapshot data
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+from .reports import CSV_DTYPES, OUTPUT_FILES
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+SNAPSHOT_DIR = 'snapshot'
+# Metadado do schema com o SHA-256 do CSV de origem
+SOURCE_KEY = b'source_sha256'
+
+
+def available():
+    return pa is not None
+
+
+def snapshot_path(data_dir, key):
+    name = os.path.splitext(OUTPUT_FILES[key])[0] + '.arrow'
+    return os.path.join(data_dir, SNAPSHOT_DIR, name)
+
+
+def _to_table(df, source=None):
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object or pd.api.types.is_string_dtype(df[column]):
+            df[column] = df[column].astype('category')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if source is not None:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               SOURCE_KEY: source.encode()})
+    return table
+
+
+def _manifest_checksum(data_dir, key):
+    from .manifest import load_manifest
+
+    try:
+        manifest = load_manifest(data_dir)
+    except ValueError:
+        return None
+    return ((manifest or {}).get('artifacts', {}).get(key) or {}).get('sha256')
+
+
+def snapshot_source(path):
+    """
+    SHA-256 do CSV de origem gravado no snapshot (None em snapshots antigos)
+    """
+    with pa.memory_map(path) as source:
+        metadata = ipc.open_file(source).schema.metadata or {}
+    value = metadata.get(SOURCE_KEY)
+    return value.decode() if value else None
+
+
+def current_snapshot(data_dir, key, checksum=None):
+    """
+    Caminho do snapshot de ``key`` se ele existir e tiver sido gerado do CSV
+    atual (hash ``checksum`` ou, sem ele, o do manifesto); senão None
+    """
+    if pa is None:
+        return None
+    path = snapshot_path(data_dir, key)
+    if not os.path.exists(path):
+        return None
+    expected = checksum or _manifest_checksum(data_dir, key)
+    if expected is not None and snapshot_source(path) != expected:
+        return None
+    return path
+
+
+def write_snapshot(outputs, data_dir):
+    """
+    Grava cada DataFrame de ``outputs`` como arquivo Arrow (escrita atômica),
+    com o hash do CSV já gravado em ``data_dir``
+    """
+    from .manifest import file_checksum
+
+    if pa is None:
+        return []
+    os.makedirs(os.path.join(data_dir, SNAPSHOT_DIR), exist_ok=True)
+    for key, df in outputs.items():
+        path = snapshot_path(data_dir, key)
+        csv = os.path.join(data_dir, OUTPUT_FILES[key])
+        table = _to_table(df, file_checksum(csv) if os.path.exists(csv) else None)
+        tmp = path + '.tmp'
+        with pa.OSFile(tmp, 'wb') as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+    return list(outputs)
+
+
+def read_snapshot(data_dir, key, checksum=None):
+    """
+    Abre o snapshot de ``key`` via memory map; retorna None se não existir
+    ou estiver defasado em relação ao CSV (ver ``current_snapshot``)
+    """
+    path = current_snapshot(data_dir, key, checksum)
+    if path is None:
+        return None
+    with pa.memory_map(path) as source:
+        table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def read_dataset(data_dir, key, checksum=None):
+    """
+    Lê um dataset do snapshot colunar e, se não houver snapshot atual, do CSV
+    """
+    df = read_snapshot(data_dir, key, checksum)
+    if df is None:
+        df = pd.read_csv(os.path.join(data_dir, OUTPUT_FILES[key]), dtype=CSV_DTYPES.get(key))
+    return df
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    data_dir = argv[0] if argv else 'data'
+    if pa is None:
+        sys.exit("pyarrow não está instalado; instale-o para gerar o snapshot")
+
+    outputs = {}
+    for key, name in OUTPUT_FILES.items():
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            outputs[key] = pd.read_csv(path, dtype=CSV_DTYPES.get(key))
+    write_snapshot(outputs, data_dir)
+    print(f"{len(outputs)} datasets gravados em {os.path.join(data_dir, SNAPSHOT_DIR)}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+"""
+Group-by fora da memória (out-of-core) para agregados de alta cardinalidade.
+
+Rota × dia ou rota × hora × companhia passam facilmente de dezenas de
+milhões de grupos, mais do que cabe na RAM dos hosts do dashboard.
+``SpillingGroupBy`` agrega com memória limitada:
+
+1. cada chunk é reduzido aos seus grupos (chave int64 empacotada + somas
+   inteiras de ``MEASURES``) e os grupos são distribuídos por hash em
+   ``fanout`` partições;
+2. os grupos parciais ficam em buffers na memória. Os grupos do chunk
+   entram em fatias que cabem no que resta do orçamento (``memory_mb``);
+   ao atingi-lo, os buffers são compactados (somando chaves repetidas) e,
+   se ainda ocuparem mais da metade do orçamento, são despejados (*spill*)
+   em um arquivo por partição;
+3. no fim, cada partição é lida e reduzida separadamente. Uma partição maior
+   que o orçamento é redistribuída em subpartições com outra semente de hash
+   (até ``MAX_DEPTH`` níveis).
+
+O hash usa só as dimensões iniciais da chave (``partition_dims``). Com as
+rotas, todos os grupos de uma rota caem na mesma partição, e cada partição
+pode ser resumida por rota sozinha. As somas são inteiras, então o resultado
+é exato e independe do orçamento. Muda só a ordem: partição por partição,
+com as chaves ordenadas dentro de cada uma.
+
+O orçamento limita os buffers (``stats['peak_mb']`` nunca passa dele). O
+pico do processo soma a isso o chunk em leitura e os seus grupos reduzidos
+(até ``--chunksize`` linhas de ``8 × (1 + len(MEASURES))`` bytes por
+granularidade) e a cópia de uma partição durante a compactação; com
+orçamentos de poucos MB, reduza também o ``--chunksize``.
+
+``route_reports`` usa o motor para gerar ``relatorio_02`` e ``rotas``
+(idênticos aos de ``build_outputs``) e as tabelas detalhadas de ``GRAINS``,
+gravadas em CSV partição por partição.
+
+Uso:
+    python -m pipeline.spill --flights raw/flights.csv --airports raw/airports.csv \\
+        --memory-mb 256 --grains rota_dia rota_hora_companhia --output data
+    python -m pipeline.spill --store store --from 2015 --to 2016 --memory-mb 512 --output data
+
+Em ``rotas_dia.csv`` o dia leva o ano (``year``, ``month``, ``day``), então
+períodos de vários anos não somam o mesmo dia de anos diferentes.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import (
+    DEFAULT_CHUNKSIZE, FLIGHT_COLUMNS, MEASURES, M, KeyIndex, flight_measures,
+)
+from .manifest import update_manifest
+from .reports import (
+    _pct,
+    _safe_div,
+    airport_coordinates,
+    critical_routes,
+    load_reference,
+    route_rows,
+    write_outputs,
+)
+from .snapshot import current_snapshot, write_snapshot
+
+DEFAULT_MEMORY_MB = 256
+DEFAULT_FANOUT = 16
+MAX_DEPTH = 3
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+# Colunas lidas do flights.csv: as da agregação mais o dia do mês
+SPILL_COLUMNS = {**FLIGHT_COLUMNS, 'DAY': 'int8'}
+
+# Bits de cada dimensão na chave empacotada (a soma cabe em 63 bits)
+KEY_BITS = {'origin': 14, 'dest': 14, 'airline': 8, 'year': 12, 'month': 4, 'day': 5, 'hour': 5}
+
+# Granularidades disponíveis; 'rota_companhia' é a base de relatorio_02/rotas
+GRAINS = {
+    'rota_companhia': ('origin', 'dest', 'airline'),
+    'rota_dia': ('origin', 'dest', 'year', 'month', 'day'),
+    'rota_hora_companhia': ('origin', 'dest', 'hour', 'airline'),
+}
+# Tabelas detalhadas gravadas com --grains
+GRAIN_FILES = {
+    'rota_dia': 'rotas_dia.csv',
+    'rota_hora_companhia': 'rotas_hora_companhia.csv',
+}
+ROUTE_DIMS = 2
+
+
+def _reduce(keys, values):
+    """
+    Soma as linhas de ``values`` com a mesma chave; chaves ordenadas
+    """
+    if len(keys) == 0:
+        return keys, values
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    return keys[starts], np.add.reduceat(values[order], starts, axis=0)
+
+
+class SpillingGroupBy:
+    """
+    Soma de medidas inteiras por chave composta, com orçamento de memória e
+    spill para disco por partição de hash
+    """
+
+    def __init__(self, bits, partition_dims=None, n_measures=len(MEASURES),
+                 memory_mb=DEFAULT_MEMORY_MB, fanout=DEFAULT_FANOUT, workdir=None):
+        if sum(bits) > 63:
+            raise ValueError(f"chave de {sum(bits)} bits não cabe em int64")
+        self.bits = list(bits)
+        self.n_measures = n_measures
+        self.budget = int(memory_mb * 2 ** 20)
+        self.fanout = fanout
+        # Bits à direita das dimensões usadas no hash
+        self._shift = sum(self.bits[partition_dims or len(self.bits):])
+        self._dir = tempfile.mkdtemp(prefix='spill-', dir=workdir)
+        self._buffers = [[] for _ in range(fanout)]
+        self._buffered = 0
+        self.stats = {'groups_in': 0, 'spills': 0, 'spilled_bytes': 0, 'repartitions': 0,
+                      'peak_mb': 0.0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def pack(self, codes):
+        """
+        Empacota os códigos de cada dimensão (inteiros ≥ 0) em chaves int64
+        """
+        key = np.zeros(len(codes[0]), dtype=np.int64)
+        for values, bits in zip(codes, self.bits):
+            values = np.asarray(values, dtype=np.int64)
+            if len(values) and (values.min() < 0 or values.max() >= 1 << bits):
+                raise ValueError(f"código fora do intervalo de {bits} bits")
+            key = (key << bits) | values
+        return key
+
+    def unpack(self, keys):
+        codes = []
+        for bits in reversed(self.bits):
+            codes.append(keys & ((1 << bits) - 1))
+            keys = keys >> bits
+        return codes[::-1]
+
+    def _partition(self, keys, depth):
+        h = ((keys >> self._shift).astype(np.uint64) ^ np.uint64(depth)) * _GOLDEN
+        return ((h >> np.uint64(40)) % np.uint64(self.fanout)).astype(np.int64)
+
+    def _split(self, keys, values, depth):
+        part = self._partition(keys, depth)
+        order = np.argsort(part, kind='stable')
+        bounds = np.searchsorted(part[order], np.arange(self.fanout + 1))
+        keys, values = keys[order], values[order]
+        for p in range(self.fanout):
+            a, b = bounds[p], bounds[p + 1]
+            if b > a:
+                yield p, keys[a:b], values[a:b]
+
+    def add(self, codes, values):
+        """
+        Incorpora as linhas ``values`` (n × medidas) com as chaves ``codes``
+        (uma sequência de códigos por dimensão)
+        """
+        keys, values = _reduce(self.pack(codes), np.asarray(values, dtype=np.int64))
+        self.stats['groups_in'] += len(keys)
+        row_bytes = keys.itemsize + values.itemsize * self.n_measures
+        start = 0
+        while start < len(keys):
+            # Só o que cabe no orçamento restante entra nos buffers
+            end = start + max((self.budget - self._buffered) // row_bytes, 1)
+            for p, k, v in self._split(keys[start:end], values[start:end], 0):
+                self._buffers[p].append((k, v))
+                self._buffered += k.nbytes + v.nbytes
+            start = end
+            self.stats['peak_mb'] = max(self.stats['peak_mb'], self._buffered / 2 ** 20)
+            if self.budget - self._buffered < row_bytes:
+                self._compact()
+                if self._buffered > self.budget // 2:
+                    self._spill()
+
+    def _compact(self):
+        self._buffered = 0
+        for p, buffer in enumerate(self._buffers):
+            if len(buffer) > 1:
+                keys, values = _reduce(np.concatenate([k for k, _ in buffer]),
+                                       np.concatenate([v for _, v in buffer]))
+                self._buffers[p] = [(keys, values)]
+            self._buffered += sum(k.nbytes + v.nbytes for k, v in self._buffers[p])
+
+    def _path(self, name):
+        return os.path.join(self._dir, f"{name}.bin")
+
+    def _append(self, path, keys, values):
+        rows = np.column_stack([keys, values])
+        with open(path, 'ab') as f:
+            rows.tofile(f)
+        self.stats['spilled_bytes'] += rows.nbytes
+
+    def _spill(self):
+        for p, buffer in enumerate(self._buffers):
+            for keys, values in buffer:
+                self._append(self._path(p), keys, values)
+            self._buffers[p] = []
+        self._buffered = 0
+        self.stats['spills'] += 1
+
+    def _finish(self, name, buffer, depth):
+        path = self._path(name)
+        on_disk = os.path.getsize(path) if os.path.exists(path) else 0
+        in_memory = sum(k.nbytes + v.nbytes for k, v in buffer)
+        if on_disk + in_memory <= self.budget or depth >= MAX_DEPTH:
+            parts = list(buffer)
+            if on_disk:
+                rows = np.fromfile(path, dtype=np.int64).reshape(-1, 1 + self.n_measures)
+                parts.append((rows[:, 0], rows[:, 1:]))
+                os.remove(path)
+            if parts:
+                yield _reduce(np.concatenate([k for k, _ in parts]),
+                              np.concatenate([v for _, v in parts]))
+            return
+
+        # Partição maior que o orçamento: redistribui com outra semente
+        self.stats['repartitions'] += 1
+        width = 1 + self.n_measures
+        rows = np.memmap(path, dtype=np.int64, mode='r').reshape(-1, width)
+        block = max(self.budget // (4 * 8 * width), 1)
+        sources = [(rows[i:i + block, 0], rows[i:i + block, 1:])
+                   for i in range(0, len(rows), block)] + list(buffer)
+        for keys, values in sources:
+            for q, k, v in self._split(np.array(keys), np.array(values), depth + 1):
+                self._append(self._path(f"{name}-{q}"), k, v)
+        del rows, sources
+        os.remove(path)
+        for q in range(self.fanout):
+            yield from self._finish(f"{name}-{q}", [], depth + 1)
+
+    def results(self):
+        """
+        Itera sobre (chaves, somas) reduzidas, uma partição por vez
+        """
+        for p in range(self.fanout):
+            buffer, self._buffers[p] = self._buffers[p], []
+            yield from self._finish(str(p), buffer, 0)
+        self._buffered = 0
+
+
+class RouteAggregates:
+    """
+    Group-bys por rota (uma granularidade de ``GRAINS`` cada), alimentados
+    numa única passada pelos voos, com o orçamento dividido entre eles
+    """
+
+    def __init__(self, grains=('rota_companhia',), memory_mb=DEFAULT_MEMORY_MB,
+                 fanout=DEFAULT_FANOUT, workdir=None):
+        self.airports = KeyIndex()
+        self.airlines = KeyIndex()
+        self.rows = 0
+        share = memory_mb / len(grains)
+        self.groups = {grain: SpillingGroupBy([KEY_BITS[d] for d in GRAINS[grain]], ROUTE_DIMS,
+                                              memory_mb=share, fanout=fanout, workdir=workdir)
+                       for grain in grains}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for groupby in self.groups.values():
+            groupby.close()
+
+    def _encode(self, index, column):
+        codes, uniques = pd.factorize(column)
+        return index.lookup(uniques)[codes]
+
+    def update(self, chunk):
+        if len(chunk) == 0:
+            return
+        self.rows += len(chunk)
+        values = flight_measures(chunk)
+        dims = {
+            'origin': self._encode(self.airports, chunk['ORIGIN_AIRPORT']),
+            'dest': self._encode(self.airports, chunk['DESTINATION_AIRPORT']),
+            'airline': self._encode(self.airlines, chunk['AIRLINE']),
+            'year': chunk['YEAR'].to_numpy(dtype=np.int64),
+            'month': chunk['MONTH'].to_numpy(dtype=np.int64),
+            'hour': np.minimum(chunk['SCHEDULED_DEPARTURE'].to_numpy(dtype=np.int64) // 100, 23),
+        }
+        if 'DAY' in chunk:
+            dims['day'] = chunk['DAY'].to_numpy(dtype=np.int64)
+        for grain, groupby in self.groups.items():
+            groupby.add([dims[d] for d in GRAINS[grain]], values)
+
+    def labels(self, grain, keys):
+        """
+        Colunas de rótulos (códigos IATA, ano, mês, dia, hora) das chaves ``keys``
+        """
+        codes = self.groups[grain].unpack(keys)
+        airports = np.array(self.airports.keys, dtype=object)
+        airlines = np.array(self.airlines.keys, dtype=object)
+        columns = {}
+        for dim, code in zip(GRAINS[grain], codes):
+            if dim in ('origin', 'dest'):
+                columns[dim] = airports[code]
+            elif dim == 'airline':
+                columns[dim] = airlines[code]
+            else:
+                columns[dim] = code
+        return columns
+
+
+def detail_frame(labels, t):
+    """
+    Linhas de uma tabela detalhada: rótulos + métricas das somas ``t``
+    """
+    df = pd.DataFrame(labels)
+    df['total_flights'] = t[:, M['flights']]
+    df['total_cancelled'] = t[:, M['cancelled']]
+    df['total_diverted'] = t[:, M['diverted']]
+    df['avg_arrival_delay'] = np.round(_safe_div(t[:, M['arr_sum']], t[:, M['arr_count']]), 2)
+    df['avg_departure_delay'] = np.round(_safe_div(t[:, M['dep_sum']], t[:, M['dep_count']]), 2)
+    df['on_time_rate'] = _pct(t[:, M['on_time']], t[:, M['flights']])
+    df['cancellation_rate'] = _pct(t[:, M['cancelled']], t[:, M['flights']])
+    return df
+
+
+def _route_partition(aggregates, keys, t, airports):
+    """
+    Linhas de ``rotas`` de uma partição de 'rota_companhia' (todas as
+    companhias de cada rota estão na mesma partição)
+    """
+    labels = aggregates.labels('rota_companhia', keys)
+    route = keys >> KEY_BITS['airline']
+    starts = np.flatnonzero(np.r_[True, route[1:] != route[:-1]])
+    totals = np.add.reduceat(t, starts, axis=0)
+    pairs = pd.DataFrame({'route': np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(keys)])),
+                          'airline': labels['airline']})
+    operators = (pairs.sort_values(['route', 'airline'], kind='stable')
+                 .groupby('route', sort=True)['airline'].agg(', '.join))
+    return route_rows(labels['origin'][starts], labels['dest'][starts], totals,
+                      operators.tolist(), airports)
+
+
+def route_reports(aggregates, airports):
+    """
+    ``relatorio_02``, ``rotas`` e ``aeroportos`` a partir de
+    ``RouteAggregates`` com a granularidade 'rota_companhia' (uma partição
+    por vez na memória)
+    """
+    frames = [_route_partition(aggregates, keys, t, airports)
+              for keys, t in aggregates.groups['rota_companhia'].results()]
+    routes = pd.concat(frames, ignore_index=True) if frames else route_rows(
+        [], [], np.zeros((0, len(MEASURES)), dtype=np.int64), [], airports)
+    routes = routes.sort_values(['origin', 'dest'], kind='stable').reset_index(drop=True)
+    return {'relatorio_02': critical_routes(routes), 'rotas': routes,
+            'aeroportos': airport_coordinates(routes, airports)}
+
+
+def write_detail(aggregates, grain, path):
+    """
+    Grava a tabela detalhada ``grain`` em CSV, uma partição por vez
+    (ordenada dentro de cada partição); retorna o número de linhas
+    """
+    tmp = path + '.tmp'
+    rows = 0
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        for keys, t in aggregates.groups[grain].results():
+            df = detail_frame(aggregates.labels(grain, keys), t)
+            df.to_csv(f, index=False, header=rows == 0)
+            rows += len(df)
+        if rows == 0:
+            detail_frame({d: [] for d in GRAINS[grain]},
+                         np.zeros((0, len(MEASURES)), dtype=np.int64)).to_csv(f, index=False)
+    os.replace(tmp, path)
+    return rows
+
+
+def read_chunks(args):
+    """
+    Chunks de voos do --flights ou das partições selecionadas do --store
+    """
+    if args.store:
+        from .partitions import PartitionStore, STORE_COLUMNS, parse_period
+
+        store = PartitionStore(args.store)
+        keys = store.select(parse_period(args.start) if args.start else None,
+                            parse_period(args.end) if args.end else None)
+        columns = [c for c in STORE_COLUMNS if c in SPILL_COLUMNS]
+        return store.read(keys, columns, args.chunksize)
+    return pd.read_csv(args.flights, usecols=list(SPILL_COLUMNS), dtype=SPILL_COLUMNS,
+                       chunksize=args.chunksize, low_memory=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.spill',
+        description='Relatórios de rotas com group-by fora da memória (spill para disco)',
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--flights', help='Caminho do flights.csv do DOT')
+    source.add_argument('--store', help='Store particionado (pipeline.partitions)')
+    parser.add_argument('--from', dest='start', help='Com --store: primeiro período (AAAA ou AAAA-MM)')
+    parser.add_argument('--to', dest='end', help='Com --store: último período (AAAA ou AAAA-MM)')
+    parser.add_argument('--airports', help='Caminho do airports.csv (cidades e estados)')
+    parser.add_argument('--output', default='data', help='Pasta de saída (padrão: data)')
+    parser.add_argument('--grains', nargs='*', default=[], choices=list(GRAIN_FILES),
+                        help='Tabelas detalhadas a gravar (ex.: rota_dia rota_hora_companhia)')
+    parser.add_argument('--memory-mb', type=float, default=DEFAULT_MEMORY_MB,
+                        help='Orçamento de memória dos grupos parciais (padrão: %(default)s)')
+    parser.add_argument('--fanout', type=int, default=DEFAULT_FANOUT,
+                        help='Partições de hash (padrão: %(default)s)')
+    parser.add_argument('--workdir', help='Pasta dos arquivos de spill (padrão: temporária do sistema)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    _, airports = load_reference(None, args.airports)
+    grains = ['rota_companhia'] + args.grains
+
+    try:
+        chunks = read_chunks(args)
+    except ValueError as e:
+        sys.exit(str(e))
+    with RouteAggregates(grains, args.memory_mb, args.fanout, args.workdir) as aggregates:
+        for chunk in chunks:
+            aggregates.update(chunk)
+            print(f"  {aggregates.rows:,} voos processados ({time.perf_counter() - start:.1f}s)",
+                  flush=True)
+
+        for grain in args.grains:
+            path = os.path.join(args.output, GRAIN_FILES[grain])
+            os.makedirs(args.output, exist_ok=True)
+            rows = write_detail(aggregates, grain, path)
+            print(f"{path}: {rows:,} grupos")
+        outputs = route_reports(aggregates, airports)
+
+        for grain, groupby in aggregates.groups.items():
+            s = groupby.stats
+            print(f"  {grain}: pico {s['peak_mb']:.2f} MB, {s['spills']} spills "
+                  f"({s['spilled_bytes'] / 2 ** 20:.0f} MB), {s['repartitions']} redistribuições")
+
+    written = write_outputs(outputs, args.output)
+    write_snapshot({key: df for key, df in outputs.items()
+                    if key in written or current_snapshot(args.output, key) is None},
+                   args.output)
+    update_manifest(args.output, outputs)
+    print(f"{len(written)} arquivos atualizados em {args.output}/ "
+          f"({aggregates.rows:,} voos, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+"""
+Partida rápida do dashboard: resumo pré-calculado, imports adiados e
+benchmark do tempo até o primeiro paint.
+
+Este módulo só usa a biblioteca padrão. Numa réplica recém-criada, o
+dashboard lê ``resumo.json`` e desenha o cabeçalho e as métricas principais
+antes de importar pandas, NumPy e Plotly e antes de ler qualquer dataset. Em
+seguida, ele dispara a leitura dos datasets em segundo plano e substitui o
+resumo pelos valores calculados (que seguem os filtros).
+
+``resumo.json`` (período, voos, companhias, pontualidade, atraso médio e
+rotas) é gravado pelo pipeline junto dos CSVs e tem poucas centenas de bytes.
+Um resumo desatualizado só afeta o primeiro paint.
+
+``LazyModule`` adia o import de um módulo até o primeiro acesso a um
+atributo. Ao contrário do ``importlib.util.LazyLoader``, ele não entra em
+``sys.modules``, então um import normal do mesmo módulo em outra thread (as
+leituras em segundo plano) não esbarra num módulo pela metade.
+
+``bench`` mede a partida a frio. Para cada execução, o comando sobe um
+``streamlit run`` novo sobre a pasta de dados, abre a sessão pelo websocket
+do Streamlit (como o navegador) e registra o instante de cada marco, contado
+desde o lançamento do processo:
+
+* ``servidor``: o health check responde;
+* ``cabecalho``: chega o título da página (primeiro paint);
+* ``metricas``: chega a primeira métrica;
+* ``pagina``: o script termina;
+* ``rerun``: duração de um segundo run na mesma sessão (imports e caches
+  quentes).
+
+Uso:
+    python -m pipeline.startup summary data
+    python -m pipeline.startup bench --data data --runs 3
+"""
+
+import argparse
+import base64
+import importlib
+import json
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+SUMMARY_FILE = 'resumo.json'
+SUMMARY_VERSION = 1
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'streamlit_app.py')
+MILESTONES = ('servidor', 'cabecalho', 'metricas', 'pagina', 'rerun')
+DEFAULT_RUNS = 3
+DEFAULT_TIMEOUT = 180.0
+
+
+class LazyModule:
+    """
+    Módulo importado no primeiro acesso a um atributo
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        state = 'carregado' if self._module is not None else 'adiado'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def period_of(monthly):
+    """
+    Ano(s) da série mensal (``date_label``); '' se a coluna falta
+    """
+    if 'date_label' not in monthly:
+        return ''
+    years = sorted({str(label)[:4] for label in monthly['date_label']})
+    if not years:
+        return ''
+    return years[0] if len(years) == 1 else f"{years[0]}–{years[-1]}"
+
+
+def headline_values(monthly, ranking):
+    """
+    Números das métricas do topo a partir da série mensal e do ranking
+    """
+    total = int(monthly['total_flights'].sum())
+    completed = monthly['total_flights'] - monthly['total_cancelled']
+    delay = float((monthly['avg_arrival_delay'] * completed).sum()) / max(int(completed.sum()), 1)
+    return {
+        'flights': total,
+        'airlines': int(len(ranking)),
+        'on_time_pct': 100 * int(monthly['on_time_flights'].sum()) / max(total, 1),
+        'avg_delay': delay,
+    }
+
+
+def build_summary(outputs):
+    """
+    Conteúdo de ``resumo.json`` a partir dos datasets do pipeline; None se
+    a série mensal ou o ranking faltam
+    """
+    monthly, ranking = outputs.get('grafico_01'), outputs.get('relatorio_01')
+    if monthly is None or ranking is None:
+        return None
+    routes = outputs.get('rotas')
+    return {
+        'version': SUMMARY_VERSION,
+        'period': period_of(monthly),
+        **headline_values(monthly, ranking),
+        'routes': None if routes is None else int(len(routes)),
+    }
+
+
+def write_summary(outputs, data_dir):
+    """
+    Grava ``resumo.json`` (escrita atômica); retorna o caminho ou None sem
+    os datasets necessários
+    """
+    summary = build_summary(outputs)
+    if summary is None:
+        return None
+    path = os.path.join(data_dir, SUMMARY_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+    os.replace(tmp, path)
+    return path
+
+
+def read_summary(data_dir):
+    """
+    Resumo de ``data_dir`` ou None (ausente, ilegível ou de outra versão)
+    """
+    try:
+        with open(os.path.join(data_dir, SUMMARY_FILE), encoding='utf-8') as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return summary if summary.get('version') == SUMMARY_VERSION else None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class _WebSocket:
+    """
+    Cliente websocket mínimo (RFC 6455, só frames binários) para a sessão do
+    Streamlit, sem dependências além da biblioteca padrão
+    """
+
+    def __init__(self, port, path='/_stcore/stream', timeout=DEFAULT_TIMEOUT):
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+                           "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n")
+                          .encode())
+        self.buffer = b''
+        while b'\r\n\r\n' not in self.buffer:
+            self._recv()
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        if b' 101 ' not in head.split(b'\r\n')[0]:
+            raise ConnectionError(f"handshake recusado: {head.splitlines()[0]!r}")
+
+    def _recv(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("conexão fechada pelo servidor")
+        self.buffer += chunk
+
+    def _take(self, n):
+        while len(self.buffer) < n:
+            self._recv()
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        return data
+
+    def send(self, payload):
+        n = len(payload)
+        if n < 126:
+            header = bytes([0x82, 0x80 | n])
+        elif n < 65536:
+            header = bytes([0x82, 0x80 | 126]) + struct.pack('>H', n)
+        else:
+            header = bytes([0x82, 0x80 | 127]) + struct.pack('>Q', n)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def receive(self):
+        message = b''
+        while True:
+            first, second = self._take(2)
+            size = second & 0x7f
+            if size == 126:
+                size, = struct.unpack('>H', self._take(2))
+            elif size == 127:
+                size, = struct.unpack('>Q', self._take(8))
+            payload = self._take(size)
+            opcode = first & 0x0f
+            if opcode == 8:
+                raise ConnectionError("conexão fechada pelo servidor")
+            if opcode in (9, 10):
+                continue  # ping/pong
+            message += payload
+            if first & 0x80:
+                return message
+
+    def close(self):
+        self.sock.close()
+
+
+def _rerun(ws, start, timings, prefix=''):
+    """
+    Pede um run do script e registra os marcos até ``script_finished``
+    """
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    message = BackMsg()
+    message.rerun_script.query_string = ''
+    message.rerun_script.page_script_hash = ''
+    ws.send(message.SerializeToString())
+    while True:
+        msg = ForwardMsg.FromString(ws.receive())
+        kind = msg.WhichOneof('type')
+        now = time.perf_counter() - start
+        if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+            element = msg.delta.new_element
+            name = element.WhichOneof('type')
+            if name == 'markdown' and '<h1 class="main-header">' in element.markdown.body:
+                timings.setdefault(prefix + 'cabecalho', now)
+            elif name == 'metric':
+                timings.setdefault(prefix + 'metricas', now)
+        elif kind == 'script_finished':
+            timings[prefix + 'pagina'] = now
+            return
+
+
+def measure_startup(data_dir, app=APP_FILE, timeout=DEFAULT_TIMEOUT):
+    """
+    Uma partida a frio do dashboard sobre ``data_dir``: segundos até cada
+    marco de ``MILESTONES``
+    """
+    port = _free_port()
+    env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    env.pop('DASHBOARD_SERVICE', None)
+    with tempfile.TemporaryDirectory() as workdir:
+        # O dashboard lê data/ relativo à pasta de trabalho
+        os.symlink(os.path.abspath(data_dir), os.path.join(workdir, 'data'))
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', os.path.abspath(app),
+             '--server.headless', 'true', '--server.port', str(port),
+             '--server.fileWatcherType', 'none', '--browser.gatherUsageStats', 'false'],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            timings = {}
+            while 'servidor' not in timings:
+                if process.poll() is not None:
+                    raise RuntimeError("o streamlit terminou antes de responder")
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError("o streamlit não respondeu ao health check")
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health',
+                                           timeout=1).read()
+                    timings['servidor'] = time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+            ws = _WebSocket(port, timeout=timeout)
+            try:
+                _rerun(ws, start, timings)
+                second = {}
+                before = time.perf_counter() - start
+                _rerun(ws, start, second, prefix='rerun:')
+                timings['rerun'] = second['rerun:pagina'] - before
+            finally:
+                ws.close()
+        finally:
+            process.terminate()
+            process.wait()
+    return timings
+
+
+def format_bench(runs):
+    lines = [f"{'marco':<12}{'mín (s)':>10}{'mediana (s)':>13}{'máx (s)':>10}"]
+    for name in MILESTONES:
+        values = [run[name] for run in runs if name in run]
+        if values:
+            lines.append(f"{name:<12}{min(values):>10.2f}{statistics.median(values):>13.2f}"
+                         f"{max(values):>10.2f}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline.startup',
+                                     description='Resumo de partida e benchmark do primeiro paint')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    summary = commands.add_parser('summary', help='(Re)gera resumo.json a partir dos datasets')
+    summary.add_argument('data', nargs='?', default='data', help='Pasta dos dados (padrão: data)')
+
+    bench = commands.add_parser('bench', help='Mede a partida a frio do dashboard')
+    bench.add_argument('--data', default='data', help='Pasta dos dados (padrão: %(default)s)')
+    bench.add_argument('--runs', type=int, default=DEFAULT_RUNS,
+                       help='Partidas medidas (padrão: %(default)s)')
+    bench.add_argument('--app', default=APP_FILE, help='Script do dashboard')
+    bench.add_argument('--json', help='Grava as medições neste arquivo JSON')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'summary':
+        from .snapshot import read_dataset
+
+        outputs = {}
+        for key in ('grafico_01', 'relatorio_01', 'rotas'):
+            try:
+                outputs[key] = read_dataset(args.data, key)
+            except OSError:
+                pass
+        path = write_summary(outputs, args.data)
+        if path is None:
+            sys.exit(f"{args.data} não tem grafico_01 e relatorio_01; rode o pipeline antes")
+        print(f"{path}: {json.dumps(read_summary(args.data), ensure_ascii=False)}")
+        return
+
+    runs = []
+    for i in range(args.runs):
+        timings = measure_startup(args.data, args.app)
+        runs.append(timings)
+        print(f"  partida {i + 1}: " + ", ".join(f"{name} {timings[name]:.2f}s"
+                                                   for name in MILESTONES if name in timings),
+              flush=True)
+    print(format_bench(runs))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'data': args.data, 'runs': runs}, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Persistência do estado agregado para atualização incremental.
+
+O ``FlightAggregates`` é gravado em um .npz (somente arrays, sem pickle).
+Ao chegar um novo mês de voos, basta carregar o estado, incorporar apenas
+as novas linhas e regenerar os CSVs: o custo é proporcional aos dados
+novos, não ao histórico.
+"""
+
+import os
+
+import numpy as np
+
+from .aggregation import FlightAggregates, KeyIndex
+
+# Versão do formato; estados de versões anteriores exigem reagregação completa
+STATE_VERSION = 2
+
+# Tabelas do FlightAggregates persistidas no arquivo
+ARRAY_FIELDS = (
+    'by_month', 'by_airline', 'by_route', 'by_day_hour', 'route_airline',
+    'cause_count', 'cause_minutes', 'cancel_reason',
+    'month_sketch', 'airline_sketch', 'route_sketch', 'hour_sketch',
+)
+
+
+def source_id(path):
+    """
+    Identificador de um arquivo de entrada (nome e tamanho), usado para
+    impedir que o mesmo arquivo seja incorporado duas vezes
+    """
+    return f"{os.path.basename(path)}:{os.path.getsize(path)}"
+
+
+def save_state(state, path, sources=()):
+    """
+    Grava o estado em ``path`` de forma atômica (arquivo temporário + rename)
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    routes = state.routes.keys
+    arrays = {name: getattr(state, name) for name in ARRAY_FIELDS}
+    arrays.update(
+        version=np.array([STATE_VERSION], dtype=np.int64),
+        year=np.array([state.year if state.year is not None else -1], dtype=np.int64),
+        rows=np.array([state.rows], dtype=np.int64),
+        airlines=np.array(state.airlines.keys, dtype=str),
+        airports=np.array(state.airports.keys, dtype=str),
+        route_origin=np.array([o for o, _ in routes], dtype=str),
+        route_dest=np.array([d for _, d in routes], dtype=str),
+        sources=np.array(list(sources), dtype=str),
+    )
+    tmp = path + '.tmp.npz'
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_state(path):
+    """
+    Carrega um estado gravado por ``save_state``.
+    Retorna (estado, lista de arquivos já incorporados)
+    """
+    state = FlightAggregates()
+    with np.load(path, allow_pickle=False) as f:
+        if 'version' not in f or int(f['version'][0]) != STATE_VERSION:
+            raise ValueError(f"{path} foi gravado por outra versão do pipeline; "
+                             "refaça a agregação completa")
+        for name in ARRAY_FIELDS:
+            setattr(state, name, f[name].astype(getattr(state, name).dtype))
+        year = int(f['year'][0])
+        state.year = year if year >= 0 else None
+        state.rows = int(f['rows'][0])
+        state.airlines = KeyIndex(f['airlines'].tolist())
+        state.airports = KeyIndex(f['airports'].tolist())
+        state.routes = KeyIndex(zip(f['route_origin'].tolist(), f['route_dest'].tolist()))
+        sources = f['sources'].tolist()
+    return state, sources
@@ -0,0 +1,493 @@
+"""
+Gerador determinístico de voos sintéticos no formato do flights.csv do DOT.
+
+Produz ``flights.csv``, ``airlines.csv`` e ``airports.csv`` com as mesmas
+colunas dos arquivos do Kaggle, em qualquer escala (de 1M a 100M+ linhas),
+para testes de escala e benchmarks sem depender do download manual. A mesma
+combinação (linhas, semente, ano) gera sempre o mesmo arquivo, byte a byte.
+
+As distribuições seguem o ano de 2015:
+
+* participação, pontualidade e cancelamento por companhia e volume,
+  atrasos e cancelamentos por mês calibrados pelos relatórios de ``data/``;
+* 60 aeroportos com pesos por movimento, fuso horário e coordenadas; os
+  destinos favorecem os hubs da companhia e penalizam a distância;
+* cada aeronave (TAIL_NUMBER) faz uma rotação por dia: a origem de cada
+  perna é o destino da anterior, os horários respeitam o tempo de solo e o
+  atraso de chegada que excede a folga passa para a perna seguinte (ver
+  ``pipeline.propagation``);
+* causas de atraso (incluindo LATE_AIRCRAFT_DELAY) preenchidas só para
+  atrasos de chegada a partir de 15 minutos, como no DOT.
+
+O arquivo é gerado e gravado um dia por vez, com um gerador aleatório próprio
+por dia. A memória depende do tamanho de um dia, não do total.
+
+Uso:
+    python -m pipeline.synthetic --rows 5000000 --output raw/synthetic
+"""
+
+import argparse
+import calendar
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+DEFAULT_SEED = 2015
+DEFAULT_YEAR = 2015
+
+# Código, nome, voos em 2015, pontualidade (%), cancelamento (%), hubs
+AIRLINES = [
+    ('WN', 'Southwest Airlines Co.', 1261855, 80.44, 1.27, ('MDW', 'LAS', 'BWI', 'PHX', 'DAL', 'HOU')),
+    ('DL', 'Delta Air Lines Inc.', 875881, 86.45, 0.44, ('ATL', 'MSP', 'DTW', 'SLC', 'JFK')),
+    ('AA', 'American Airlines Inc.', 725984, 80.95, 1.50, ('DFW', 'ORD', 'MIA', 'LAX', 'JFK')),
+    ('OO', 'Skywest Airlines Inc.', 588353, 80.39, 1.69, ('SLC', 'DEN', 'ORD', 'SFO', 'LAX')),
+    ('EV', 'Atlantic Southeast Airlines', 571977, 78.57, 2.66, ('ATL', 'IAH', 'EWR', 'ORD')),
+    ('UA', 'United Air Lines Inc.', 515723, 78.81, 1.27, ('ORD', 'IAH', 'DEN', 'SFO', 'EWR', 'IAD')),
+    ('MQ', 'American Eagle Airlines Inc.', 294632, 74.73, 5.10, ('DFW', 'ORD', 'MIA')),
+    ('B6', 'JetBlue Airways', 267048, 76.68, 1.60, ('JFK', 'BOS', 'FLL', 'MCO')),
+    ('US', 'US Airways Inc.', 198715, 80.16, 2.05, ('CLT', 'PHL', 'PHX', 'DCA')),
+    ('AS', 'Alaska Airlines Inc.', 172521, 87.11, 0.39, ('SEA', 'PDX', 'ANC')),
+    ('NK', 'Spirit Air Lines', 117379, 69.88, 1.71, ('FLL', 'LAS', 'DTW', 'ORD')),
+    ('F9', 'Frontier Airlines Inc.', 90836, 74.02, 0.65, ('DEN',)),
+    ('HA', 'Hawaiian Airlines Inc.', 76272, 89.20, 0.22, ('HNL', 'OGG')),
+    ('VX', 'Virgin America', 61903, 80.61, 0.86, ('SFO', 'LAX')),
+]
+
+# Código, nome, cidade, estado, latitude, longitude, fuso (UTC), partidas/ano (milhares)
+AIRPORTS = [
+    ('ATL', 'Hartsfield-Jackson Atlanta International Airport', 'Atlanta', 'GA', 33.64, -84.43, -5, 346),
+    ('ORD', "Chicago O'Hare International Airport", 'Chicago', 'IL', 41.98, -87.90, -6, 285),
+    ('DFW', 'Dallas/Fort Worth International Airport', 'Dallas-Fort Worth', 'TX', 32.90, -97.04, -6, 239),
+    ('DEN', 'Denver International Airport', 'Denver', 'CO', 39.86, -104.67, -7, 196),
+    ('LAX', 'Los Angeles International Airport', 'Los Angeles', 'CA', 33.94, -118.41, -8, 194),
+    ('SFO', 'San Francisco International Airport', 'San Francisco', 'CA', 37.62, -122.37, -8, 148),
+    ('PHX', 'Phoenix Sky Harbor International Airport', 'Phoenix', 'AZ', 33.43, -112.01, -7, 146),
+    ('IAH', 'George Bush Intercontinental Airport', 'Houston', 'TX', 29.98, -95.34, -6, 146),
+    ('LAS', 'McCarran International Airport', 'Las Vegas', 'NV', 36.08, -115.15, -8, 133),
+    ('MSP', 'Minneapolis-Saint Paul International Airport', 'Minneapolis', 'MN', 44.88, -93.22, -6, 112),
+    ('MCO', 'Orlando International Airport', 'Orlando', 'FL', 28.43, -81.31, -5, 110),
+    ('SEA', 'Seattle-Tacoma International Airport', 'Seattle', 'WA', 47.45, -122.31, -8, 110),
+    ('DTW', 'Detroit Metropolitan Airport', 'Detroit', 'MI', 42.21, -83.35, -5, 108),
+    ('BOS', 'Gen. Edward Lawrence Logan International Airport', 'Boston', 'MA', 42.36, -71.01, -5, 107),
+    ('EWR', 'Newark Liberty International Airport', 'Newark', 'NJ', 40.69, -74.17, -5, 101),
+    ('CLT', 'Charlotte Douglas International Airport', 'Charlotte', 'NC', 35.21, -80.94, -5, 100),
+    ('LGA', 'LaGuardia Airport', 'New York', 'NY', 40.78, -73.87, -5, 99),
+    ('SLC', 'Salt Lake City International Airport', 'Salt Lake City', 'UT', 40.79, -111.98, -7, 97),
+    ('JFK', 'John F. Kennedy International Airport', 'New York', 'NY', 40.64, -73.78, -5, 93),
+    ('BWI', 'Baltimore-Washington International Airport', 'Baltimore', 'MD', 39.18, -76.67, -5, 86),
+    ('MDW', 'Chicago Midway International Airport', 'Chicago', 'IL', 41.79, -87.75, -6, 80),
+    ('DCA', 'Ronald Reagan Washington National Airport', 'Arlington', 'VA', 38.85, -77.04, -5, 76),
+    ('FLL', 'Fort Lauderdale-Hollywood International Airport', 'Ft. Lauderdale', 'FL', 26.07, -80.15, -5, 74),
+    ('SAN', 'San Diego International Airport', 'San Diego', 'CA', 32.73, -117.19, -8, 72),
+    ('MIA', 'Miami International Airport', 'Miami', 'FL', 25.79, -80.29, -5, 72),
+    ('PHL', 'Philadelphia International Airport', 'Philadelphia', 'PA', 39.87, -75.24, -5, 70),
+    ('TPA', 'Tampa International Airport', 'Tampa', 'FL', 27.98, -82.53, -5, 68),
+    ('PDX', 'Portland International Airport', 'Portland', 'OR', 45.59, -122.60, -8, 56),
+    ('HOU', 'William P. Hobby Airport', 'Houston', 'TX', 29.65, -95.28, -6, 48),
+    ('BNA', 'Nashville International Airport', 'Nashville', 'TN', 36.12, -86.68, -6, 46),
+    ('IAD', 'Washington Dulles International Airport', 'Chantilly', 'VA', 38.94, -77.46, -5, 45),
+    ('STL', 'St. Louis Lambert International Airport', 'St. Louis', 'MO', 38.75, -90.37, -6, 44),
+    ('HNL', 'Honolulu International Airport', 'Honolulu', 'HI', 21.32, -157.92, -10, 43),
+    ('OAK', 'Oakland International Airport', 'Oakland', 'CA', 37.72, -122.22, -8, 41),
+    ('DAL', 'Dallas Love Field', 'Dallas', 'TX', 32.85, -96.85, -6, 40),
+    ('AUS', 'Austin-Bergstrom International Airport', 'Austin', 'TX', 30.19, -97.67, -6, 40),
+    ('RDU', 'Raleigh-Durham International Airport', 'Raleigh', 'NC', 35.88, -78.79, -5, 37),
+    ('MCI', 'Kansas City International Airport', 'Kansas City', 'MO', 39.30, -94.71, -6, 36),
+    ('SNA', 'John Wayne Airport', 'Santa Ana', 'CA', 33.68, -117.87, -8, 36),
+    ('MSY', 'Louis Armstrong New Orleans International Airport', 'New Orleans', 'LA', 29.99, -90.26, -6, 35),
+    ('SJC', 'Norman Y. Mineta San José International Airport', 'San Jose', 'CA', 37.36, -121.93, -8, 34),
+    ('SMF', 'Sacramento International Airport', 'Sacramento', 'CA', 38.70, -121.59, -8, 33),
+    ('SAT', 'San Antonio International Airport', 'San Antonio', 'TX', 29.53, -98.47, -6, 31),
+    ('CLE', 'Cleveland Hopkins International Airport', 'Cleveland', 'OH', 41.41, -81.85, -5, 30),
+    ('IND', 'Indianapolis International Airport', 'Indianapolis', 'IN', 39.72, -86.29, -5, 27),
+    ('CMH', 'Port Columbus International Airport', 'Columbus', 'OH', 40.00, -82.89, -5, 27),
+    ('PIT', 'Pittsburgh International Airport', 'Pittsburgh', 'PA', 40.49, -80.23, -5, 25),
+    ('ABQ', 'Albuquerque International Sunport', 'Albuquerque', 'NM', 35.04, -106.61, -7, 20),
+    ('MKE', 'General Mitchell International Airport', 'Milwaukee', 'WI', 42.95, -87.90, -6, 20),
+    ('JAX', 'Jacksonville International Airport', 'Jacksonville', 'FL', 30.49, -81.69, -5, 20),
+    ('BUR', 'Bob Hope Airport', 'Burbank', 'CA', 34.20, -118.36, -8, 18),
+    ('OKC', 'Will Rogers World Airport', 'Oklahoma City', 'OK', 35.39, -97.60, -6, 16),
+    ('OGG', 'Kahului Airport', 'Kahului', 'HI', 20.90, -156.43, -10, 15),
+    ('ANC', 'Ted Stevens Anchorage International Airport', 'Anchorage', 'AK', 61.17, -149.99, -9, 15),
+    ('BDL', 'Bradley International Airport', 'Windsor Locks', 'CT', 41.94, -72.68, -5, 15),
+    ('ONT', 'Ontario International Airport', 'Ontario', 'CA', 34.06, -117.60, -8, 14),
+    ('MEM', 'Memphis International Airport', 'Memphis', 'TN', 35.04, -89.98, -6, 14),
+    ('SJU', 'Luis Muñoz Marín International Airport', 'San Juan', 'PR', 18.44, -66.00, -4, 12),
+    ('TUS', 'Tucson International Airport', 'Tucson', 'AZ', 32.12, -110.94, -7, 12),
+    ('BOI', 'Boise Airport', 'Boise', 'ID', 43.56, -116.22, -7, 10),
+]
+
+# Sazonalidade de 2015: volume, chance de atraso e de cancelamento por mês
+MONTH_VOLUME = [469968, 429191, 504312, 485151, 496993, 503897,
+                520718, 510536, 464946, 486165, 467972, 479230]
+MONTH_DELAY = [1.05, 1.20, 1.00, 0.90, 1.00, 1.30, 1.10, 1.00, 0.70, 0.70, 0.85, 1.10]
+MONTH_CANCEL = [1.65, 3.08, 1.41, 0.60, 0.74, 1.17, 0.59, 0.64, 0.29, 0.32, 0.63, 1.08]
+
+# Motivos de cancelamento do DOT: companhia, clima, sistema aéreo, segurança
+CANCELLATION_SHARES = {'A': 0.27, 'B': 0.50, 'C': 0.2298, 'D': 0.0002}
+# Causa do atraso de chegada que não veio da perna anterior (ocorrências em 2015)
+CAUSE_SHARES = {'AIRLINE_DELAY': 0.47, 'AIR_SYSTEM_DELAY': 0.467, 'WEATHER_DELAY': 0.06,
+                'SECURITY_DELAY': 0.003}
+
+FLIGHT_COLUMNS = [
+    'YEAR', 'MONTH', 'DAY', 'DAY_OF_WEEK', 'AIRLINE', 'FLIGHT_NUMBER', 'TAIL_NUMBER',
+    'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'SCHEDULED_DEPARTURE', 'DEPARTURE_TIME',
+    'DEPARTURE_DELAY', 'TAXI_OUT', 'WHEELS_OFF', 'SCHEDULED_TIME', 'ELAPSED_TIME', 'AIR_TIME',
+    'DISTANCE', 'WHEELS_ON', 'TAXI_IN', 'SCHEDULED_ARRIVAL', 'ARRIVAL_TIME', 'ARRIVAL_DELAY',
+    'DIVERTED', 'CANCELLED', 'CANCELLATION_REASON', 'AIR_SYSTEM_DELAY', 'SECURITY_DELAY',
+    'AIRLINE_DELAY', 'LATE_AIRCRAFT_DELAY', 'WEATHER_DELAY',
+]
+
+# Rotação diária: até MAX_LEGS pernas, tempo de solo mínimo + exponencial
+MAX_LEGS = 7
+LEG_PROBABILITY = 0.45
+MIN_TURN = 25
+MEAN_EXTRA_TURN = 20
+# Hubs da companhia recebem peso extra como destino; a distância penaliza
+HUB_WEIGHT = 6.0
+DISTANCE_SCALE = 1500.0
+# Atraso considerado causado (DOT): chegada com 15 minutos ou mais
+CAUSE_THRESHOLD = 15
+DIVERSION_RATE = 0.0026
+
+
+def minutes_to_hhmm(minutes):
+    minutes = np.asarray(minutes) % 1440
+    return (minutes // 60) * 100 + minutes % 60
+
+
+def _nullable(values, mask):
+    # Inteiro com ausentes (Int64): grava "-3" em vez de "-3.0" e "" para ausente
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64)).astype(np.int64)
+    return pd.arrays.IntegerArray(values, ~mask)
+
+
+def write_csv(f, df):
+    """
+    Acrescenta ``df`` (sem cabeçalho) ao arquivo binário ``f``; usa o writer
+    do pyarrow se disponível (mesmo conteúdo, bem mais rápido)
+    """
+    if pa is not None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pa_csv.write_csv(table, f, pa_csv.WriteOptions(include_header=False, quoting_style='none'))
+    else:
+        df.to_csv(f, index=False, header=False, encoding='utf-8')
+
+
+def _distances(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return np.rint(3958.8 * 2 * np.arcsin(np.sqrt(a))).astype(np.int64)
+
+
+class FlightGenerator:
+    """
+    Voos sintéticos de um ano, gerados um dia por vez
+    """
+
+    def __init__(self, rows, seed=DEFAULT_SEED, year=DEFAULT_YEAR):
+        self.rows = int(rows)
+        self.seed = int(seed)
+        self.year = int(year)
+
+        self.airline_codes = np.array([a[0] for a in AIRLINES])
+        shares = np.array([a[2] for a in AIRLINES], dtype=np.float64)
+        self.airline_cum = np.cumsum(shares / shares.sum())
+        # Chance de atraso gerado no próprio voo (a cascata soma o restante)
+        self.airline_late = np.array([(100 - a[3]) / 100 * 0.8 for a in AIRLINES])
+        self.airline_cancel = np.array([a[4] / 100 for a in AIRLINES])
+
+        self.airport_codes = np.array([a[0] for a in AIRPORTS])
+        lat = np.array([a[4] for a in AIRPORTS])
+        lon = np.array([a[5] for a in AIRPORTS])
+        self.tz = np.array([a[6] for a in AIRPORTS], dtype=np.int64) * 60
+        weight = np.array([a[7] for a in AIRPORTS], dtype=np.float64)
+        self.origin_cum = np.cumsum(weight / weight.sum())
+        self.distance = _distances(lat, lon)
+
+        # Destino por (companhia, origem): peso × hub × penalidade de distância
+        position = {code: i for i, code in enumerate(self.airport_codes)}
+        prob = weight[None, None, :] * np.exp(-self.distance / DISTANCE_SCALE)[None, :, :]
+        prob = np.repeat(prob, len(AIRLINES), axis=0)
+        for a, airline in enumerate(AIRLINES):
+            hubs = [position[h] for h in airline[5]]
+            prob[a, :, hubs] *= HUB_WEIGHT
+        idx = np.arange(len(AIRPORTS))
+        prob[:, idx, idx] = 0
+        self.dest_cum = np.cumsum(prob / prob.sum(axis=2, keepdims=True), axis=2)
+
+        # Primeira partida local da rotação (minutos): concentrada de manhã
+        hours = np.arange(5, 22)
+        start = np.exp(-(hours - 7) ** 2 / 12) + 0.1
+        self.start_hours, self.start_cum = hours, np.cumsum(start / start.sum())
+
+        # Voos por dia, proporcionais ao volume do mês (soma exata = rows)
+        self.dates = [datetime.date(self.year, m, d) for m in range(1, 13)
+                      for d in range(1, calendar.monthrange(self.year, m)[1] + 1)]
+        weight = np.array([MONTH_VOLUME[d.month - 1] / calendar.monthrange(self.year, d.month)[1]
+                           for d in self.dates])
+        exact = self.rows * weight / weight.sum()
+        counts = np.floor(exact).astype(np.int64)
+        counts[np.argsort(counts - exact, kind='stable')[:self.rows - counts.sum()]] += 1
+        self.day_rows = counts
+
+        # Frota nominal por companhia (os nomes das aeronaves vêm dela)
+        legs = 1 + (MAX_LEGS - 1) * LEG_PROBABILITY
+        self.fleet = np.ceil(counts.max() / legs * 1.2 * shares / shares.sum()).astype(np.int64) + 1
+
+    def __len__(self):
+        return self.rows
+
+    def _sample(self, rng, cum, size):
+        return np.minimum(np.searchsorted(cum, rng.random(size), side='right'), len(cum) - 1)
+
+    def _rotations(self, rng, date, count):
+        """
+        ``count`` rotações (aeronave × dia) em arrays (rotação, perna); -1
+        marca pernas inexistentes
+        """
+        month = date.month - 1
+        airline = self._sample(rng, self.airline_cum, count)
+        legs = 1 + rng.binomial(MAX_LEGS - 1, LEG_PROBABILITY, count)
+
+        # Aeronaves distintas por companhia no dia
+        tail = np.empty(count, dtype=np.int64)
+        for a in range(len(AIRLINES)):
+            ids = np.flatnonzero(airline == a)
+            tail[ids] = rng.permutation(max(self.fleet[a], len(ids)))[:len(ids)]
+
+        shape = count, MAX_LEGS
+        origin = np.empty(shape, dtype=np.int64)
+        dest = np.empty(shape, dtype=np.int64)
+        dep = np.empty(shape, dtype=np.int64)      # partida prevista (UTC, minutos)
+        sched = np.empty(shape, dtype=np.int64)    # duração prevista
+        dep_delay = np.empty(shape, dtype=np.float64)
+        arr_delay = np.empty(shape, dtype=np.float64)
+        passed = np.zeros(shape, dtype=np.float64)
+        cancelled = rng.random(shape) < (self.airline_cancel[airline] * MONTH_CANCEL[month])[:, None]
+        diverted = ~cancelled & (rng.random(shape) < DIVERSION_RATE)
+
+        here = self._sample(rng, self.origin_cum, count)
+        start = self.start_hours[self._sample(rng, self.start_cum, count)] * 60
+        clock = start + rng.integers(0, 60, count) - self.tz[here]
+        carried = np.zeros(count)
+        for k in range(MAX_LEGS):
+            to = np.minimum((rng.random(count)[:, None] > self.dest_cum[airline, here]).sum(axis=1),
+                            len(AIRPORTS) - 1)
+            distance = self.distance[here, to]
+            origin[:, k], dest[:, k], dep[:, k] = here, to, clock
+            sched[:, k] = np.rint(30 + distance / 7.5 + rng.normal(0, 4, count)).astype(np.int64)
+
+            # Atraso gerado: maior chance e cauda mais longa ao longo do dia
+            local = clock + self.tz[here]
+            p_late = self.airline_late[airline] * MONTH_DELAY[month] * (0.7 + 0.035 * (local // 60 - 5))
+            late = rng.random(count) < np.clip(p_late, 0.02, 0.9)
+            own = np.where(late, 10 + rng.exponential(50, count), np.minimum(rng.normal(-3, 4, count), 9))
+            passed[:, k] = carried
+            delay = np.rint(np.maximum(own, carried))
+            dep_delay[:, k] = delay
+            arr_delay[:, k] = delay + np.rint(rng.normal(-6, 9, count))
+
+            # Próxima perna: sai do destino depois do tempo de solo
+            turn = MIN_TURN + np.rint(rng.exponential(MEAN_EXTRA_TURN, count)).astype(np.int64)
+            flown = ~cancelled[:, k] & ~diverted[:, k]
+            carried = np.where(flown, np.maximum(arr_delay[:, k], 0) - turn, 0).clip(0)
+            clock = clock + sched[:, k] + turn
+            here = to
+
+        # Pernas além do número sorteado ou que sairiam depois da meia-noite local
+        local_dep = dep + self.tz[origin]
+        exists = (np.arange(MAX_LEGS)[None, :] < legs[:, None]) & (local_dep < 1440)
+        exists = np.cumprod(exists, axis=1).astype(bool)
+        return {
+            'airline': airline, 'tail': tail, 'exists': exists, 'origin': origin, 'dest': dest,
+            'dep': dep, 'sched': sched, 'dep_delay': dep_delay, 'arr_delay': arr_delay,
+            'passed': passed, 'cancelled': cancelled, 'diverted': diverted,
+        }
+
+    def day(self, i):
+        """
+        DataFrame com os voos do dia ``i`` (0 = 1º de janeiro), ordenados
+        por horário previsto de partida
+        """
+        date = self.dates[i]
+        rng = np.random.default_rng([self.seed, self.year, i])
+        target = int(self.day_rows[i])
+        expected = 1 + (MAX_LEGS - 1) * LEG_PROBABILITY
+        parts, total = [], 0
+        while total < target:
+            r = self._rotations(rng, date, int((target - total) / expected * 1.2) + 8)
+            parts.append(r)
+            total += int(r['exists'].sum())
+
+        # Concatena as rotações e corta nas ``target`` primeiras pernas
+        flat = {}
+        offset = 0
+        for r in parts:
+            rot, leg = np.nonzero(r['exists'])
+            for name in ('origin', 'dest', 'dep', 'sched', 'dep_delay', 'arr_delay', 'passed',
+                         'cancelled', 'diverted'):
+                flat.setdefault(name, []).append(r[name][rot, leg])
+            flat.setdefault('airline', []).append(r['airline'][rot])
+            flat.setdefault('tail', []).append(r['tail'][rot])
+            flat.setdefault('rotation', []).append(rot + offset)
+            offset += len(r['airline'])
+        flat = {name: np.concatenate(values)[:target] for name, values in flat.items()}
+        return self._frame(rng, date, flat)
+
+    def _frame(self, rng, date, f):
+        n = len(f['dep'])
+        cancelled, diverted = f['cancelled'], f['diverted']
+        flown = ~cancelled
+        arrived = flown & ~diverted
+        tz_origin, tz_dest = self.tz[f['origin']], self.tz[f['dest']]
+        sched_dep = f['dep'] + tz_origin
+        sched_arr = f['dep'] + f['sched'] + tz_dest
+
+        taxi_out = np.rint(8 + rng.exponential(8, n))
+        taxi_in = np.rint(3 + rng.exponential(5, n))
+        elapsed = f['sched'] + (f['arr_delay'] - f['dep_delay'])
+        air_time = np.maximum(elapsed - taxi_out - taxi_in, 15)
+        elapsed = air_time + taxi_out + taxi_in
+        dep_time = sched_dep + f['dep_delay']
+        wheels_off = dep_time + taxi_out
+        wheels_on = wheels_off + air_time - tz_origin + tz_dest
+
+        def when(values, mask):
+            return _nullable(minutes_to_hhmm(np.nan_to_num(values).astype(np.int64)), mask)
+
+        # Causas (só atrasos de chegada >= 15 min): aeronave atrasada até o
+        # atraso herdado; o restante vai para uma causa sorteada ou, às
+        # vezes, é dividido com uma segunda
+        caused = arrived & (f['arr_delay'] >= CAUSE_THRESHOLD)
+        late_aircraft = np.minimum(np.rint(f['passed']), f['arr_delay']).clip(0)
+        rest = f['arr_delay'] - late_aircraft
+        names = list(CAUSE_SHARES)
+        cause_cum = np.cumsum(list(CAUSE_SHARES.values()))
+        first = np.floor(rest * np.where(rng.random(n) < 0.6, 1.0, rng.random(n)))
+        split = np.zeros((n, len(names)))
+        rows = np.arange(n)
+        split[rows, self._sample(rng, cause_cum, n)] += first
+        split[rows, self._sample(rng, cause_cum, n)] += rest - first
+        causes = {name: split[:, j] for j, name in enumerate(names)}
+        causes['LATE_AIRCRAFT_DELAY'] = late_aircraft
+
+        reasons = np.array(list(CANCELLATION_SHARES))
+        reason = reasons[self._sample(rng, np.cumsum(list(CANCELLATION_SHARES.values())), n)]
+
+        df = pd.DataFrame({
+            'YEAR': np.full(n, date.year, dtype=np.int64),
+            'MONTH': np.full(n, date.month, dtype=np.int64),
+            'DAY': np.full(n, date.day, dtype=np.int64),
+            'DAY_OF_WEEK': np.full(n, date.isoweekday(), dtype=np.int64),
+            'AIRLINE': self.airline_codes[f['airline']],
+            'FLIGHT_NUMBER': rng.integers(1, 7000, n),
+            'TAIL_NUMBER': np.char.add(np.char.add('N', (f['tail'] + 100).astype(str)),
+                                       self.airline_codes[f['airline']]),
+            'ORIGIN_AIRPORT': self.airport_codes[f['origin']],
+            'DESTINATION_AIRPORT': self.airport_codes[f['dest']],
+            'SCHEDULED_DEPARTURE': minutes_to_hhmm(sched_dep),
+            'DEPARTURE_TIME': when(dep_time, flown),
+            'DEPARTURE_DELAY': _nullable(f['dep_delay'], flown),
+            'TAXI_OUT': _nullable(taxi_out, flown),
+            'WHEELS_OFF': when(wheels_off, flown),
+            'SCHEDULED_TIME': f['sched'],
+            'ELAPSED_TIME': _nullable(elapsed, arrived),
+            'AIR_TIME': _nullable(air_time, arrived),
+            'DISTANCE': self.distance[f['origin'], f['dest']],
+            'WHEELS_ON': when(wheels_on, arrived),
+            'TAXI_IN': _nullable(taxi_in, arrived),
+            'SCHEDULED_ARRIVAL': minutes_to_hhmm(sched_arr),
+            'ARRIVAL_TIME': when(sched_arr + f['arr_delay'], arrived),
+            'ARRIVAL_DELAY': _nullable(f['arr_delay'], arrived),
+            'DIVERTED': diverted.astype(np.int64),
+            'CANCELLED': cancelled.astype(np.int64),
+            'CANCELLATION_REASON': np.where(cancelled, reason, ''),
+            **{name: _nullable(causes[name], caused) for name in
+               ('AIR_SYSTEM_DELAY', 'SECURITY_DELAY', 'AIRLINE_DELAY', 'LATE_AIRCRAFT_DELAY',
+                'WEATHER_DELAY')},
+        }, columns=FLIGHT_COLUMNS)
+        order = np.lexsort((f['rotation'], df['SCHEDULED_DEPARTURE'].to_numpy()))
+        return df.iloc[order]
+
+    def days(self):
+        for i in range(len(self.dates)):
+            yield self.day(i)
+
+    def airlines_frame(self):
+        return pd.DataFrame([a[:2] for a in AIRLINES], columns=['IATA_CODE', 'AIRLINE'])
+
+    def airports_frame(self):
+        return pd.DataFrame(
+            [(a[0], a[1], a[2], a[3], 'USA', a[4], a[5]) for a in AIRPORTS],
+            columns=['IATA_CODE', 'AIRPORT', 'CITY', 'STATE', 'COUNTRY', 'LATITUDE', 'LONGITUDE'])
+
+
+def generate(output_dir, rows, seed=DEFAULT_SEED, year=DEFAULT_YEAR, progress=None):
+    """
+    Grava flights.csv, airlines.csv e airports.csv sintéticos em
+    ``output_dir``; retorna o caminho do flights.csv
+    """
+    generator = FlightGenerator(rows, seed, year)
+    os.makedirs(output_dir, exist_ok=True)
+    generator.airlines_frame().to_csv(os.path.join(output_dir, 'airlines.csv'), index=False)
+    generator.airports_frame().to_csv(os.path.join(output_dir, 'airports.csv'), index=False)
+
+    path = os.path.join(output_dir, 'flights.csv')
+    tmp = path + '.tmp'
+    written = 0
+    with open(tmp, 'wb') as f:
+        f.write((','.join(FLIGHT_COLUMNS) + '\n').encode())
+        for df in generator.days():
+            write_csv(f, df)
+            written += len(df)
+            if progress is not None:
+                progress(written)
+    os.replace(tmp, path)
+    return path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.synthetic',
+        description='Gera voos sintéticos no formato do flights.csv do DOT',
+    )
+    parser.add_argument('--rows', type=int, default=1_000_000,
+                        help='Número de voos (padrão: %(default)s)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help='Semente; a mesma semente gera o mesmo arquivo (padrão: %(default)s)')
+    parser.add_argument('--year', type=int, default=DEFAULT_YEAR, help='Ano dos voos (padrão: %(default)s)')
+    parser.add_argument('--output', default='raw/synthetic', help='Pasta de saída (padrão: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    step = max(args.rows // 20, 1)
+    mark = [step]
+
+    def progress(rows):
+        if rows >= mark[0] or rows == args.rows:
+            print(f"  {rows:,} voos gerados ({time.perf_counter() - start:.1f}s)", flush=True)
+            mark[0] = rows + step
+
+    print(f"Gerando {args.rows:,} voos sintéticos (semente {args.seed}) em {args.output}/...")
+    path = generate(args.output, args.rows, args.seed, args.year, progress)
+    print(f"{path} gravado ({os.path.getsize(path) / 1e6:,.0f} MB, "
+          f"{time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
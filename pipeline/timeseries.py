@@ -0,0 +1,344 @@
+"""
+Séries diárias e horárias por companhia, com downsampling no servidor.
+
+O pipeline grava em ``series.npz`` as somas inteiras (voos, cancelados,
+chegadas e minutos de atraso) de cada companhia × hora prevista de
+partida. Um ano com 14 companhias tem cerca de 120 mil linhas; a série
+diária sai das mesmas somas.
+
+``SeriesStore.query`` devolve, para a janela de tempo pedida, no máximo
+``budget`` pontos por trace:
+
+* a resolução depende do zoom: horária enquanto a janela tiver até
+  ``budget × OVERSAMPLE`` horas, diária acima disso;
+* se ainda sobrarem mais pontos que o orçamento, a série é reduzida por
+  LTTB (*Largest-Triangle-Three-Buckets*, preserva a forma da curva) ou por
+  mínimo/máximo por bucket (preserva os picos);
+* as séries completas ficam em cache por (companhia, resolução, métrica) e
+  as consultas num LRU por (série, janela, orçamento, método). Voltar a um
+  zoom já visto não recalcula nada.
+
+O payload e o tempo de renderização ficam constantes, seja qual for a
+granularidade ou o número de anos.
+
+Uso:
+    python -m pipeline.timeseries --flights raw/flights.csv --output data/series.npz
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import DEFAULT_CHUNKSIZE, KeyIndex
+from .spill import _reduce
+
+# Colunas do flights.csv usadas nas séries
+SERIES_COLUMNS = {
+    'YEAR': 'int16',
+    'MONTH': 'int8',
+    'DAY': 'int8',
+    'AIRLINE': 'category',
+    'SCHEDULED_DEPARTURE': 'int16',
+    'ARRIVAL_DELAY': 'float32',
+    'CANCELLED': 'int8',
+}
+
+SERIES_MEASURES = ('flights', 'cancelled', 'arr_count', 'arr_sum')
+SM = {name: i for i, name in enumerate(SERIES_MEASURES)}
+
+METRICS = {
+    'atraso': 'Atraso médio na chegada (min)',
+    'voos': 'Voos',
+    'cancelamento': 'Taxa de cancelamento (%)',
+}
+METHODS = ('lttb', 'minmax')
+
+POINT_BUDGET = 500
+OVERSAMPLE = 8
+QUERY_CACHE_SIZE = 256
+
+_HOUR_BITS = 32
+
+
+def hour_index(chunk):
+    """
+    Hora prevista de partida de cada voo, em horas desde 1970-01-01
+    """
+    years = chunk['YEAR'].to_numpy(dtype=np.int64) - 1970
+    months = chunk['MONTH'].to_numpy(dtype=np.int64) - 1
+    days = chunk['DAY'].to_numpy(dtype=np.int64) - 1
+    date = (years.astype('datetime64[Y]').astype('datetime64[M]') + months).astype('datetime64[D]') + days
+    hour = np.minimum(chunk['SCHEDULED_DEPARTURE'].to_numpy(dtype=np.int64) // 100, 23)
+    return date.astype(np.int64) * 24 + hour
+
+
+def lttb(x, y, budget):
+    """
+    Índices dos ``budget`` pontos escolhidos por Largest-Triangle-Three-Buckets
+    """
+    n = len(x)
+    if budget >= n or n < 3:
+        return np.arange(n)
+    if budget < 3:
+        return np.array([0, n - 1])
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    selected = np.empty(budget, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            cx = x[edges[i + 1]:edges[i + 2]].mean()
+            cy = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, budget):
+    """
+    Índices do primeiro e do último ponto e do mínimo e do máximo de cada um
+    de ``(budget - 2) // 2`` buckets
+    """
+    n = len(y)
+    if budget >= n:
+        return np.arange(n)
+    if budget < 4:
+        return np.array([0, n - 1])
+    buckets = (budget - 2) // 2
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket, np.arange(buckets))
+    ends = np.r_[starts[1:], n]
+    return np.unique(np.r_[0, order[starts], order[ends - 1], n - 1])
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': minmax}
+
+
+class SeriesBuilder:
+    """
+    Acumula as somas por companhia × hora a partir dos chunks do flights.csv
+    """
+
+    def __init__(self):
+        self.airlines = KeyIndex()
+        self._keys = []
+        self._values = []
+        self.rows = 0
+
+    def update(self, chunk):
+        if len(chunk) == 0:
+            return
+        self.rows += len(chunk)
+        codes, uniques = pd.factorize(chunk['AIRLINE'])
+        airline = self.airlines.lookup(uniques)[codes]
+        arr = chunk['ARRIVAL_DELAY'].to_numpy(dtype=np.float64, na_value=np.nan)
+        arr_ok = ~np.isnan(arr)
+
+        values = np.empty((len(chunk), len(SERIES_MEASURES)), dtype=np.int64)
+        values[:, SM['flights']] = 1
+        values[:, SM['cancelled']] = chunk['CANCELLED'].to_numpy(dtype=np.int64)
+        values[:, SM['arr_count']] = arr_ok
+        values[:, SM['arr_sum']] = np.where(arr_ok, arr, 0).astype(np.int64)
+
+        keys, values = _reduce((airline << _HOUR_BITS) | hour_index(chunk), values)
+        self._keys.append(keys)
+        self._values.append(values)
+
+    def build(self):
+        """
+        Arrays da série: rótulos das companhias e linhas ordenadas por
+        (companhia, hora)
+        """
+        keys, values = _reduce(np.concatenate(self._keys or [np.zeros(0, np.int64)]),
+                               np.concatenate(self._values or
+                                              [np.zeros((0, len(SERIES_MEASURES)), np.int64)]))
+        # Companhias em ordem alfabética (códigos determinísticos)
+        labels = sorted(self.airlines.keys)
+        remap = np.array([labels.index(k) for k in self.airlines.keys], dtype=np.int64)
+        airline = remap[keys >> _HOUR_BITS] if len(remap) else keys >> _HOUR_BITS
+        hour = keys & ((1 << _HOUR_BITS) - 1)
+        order = np.lexsort((hour, airline))
+        return {'airlines': np.array(labels, dtype=str), 'airline': airline[order].astype(np.int16),
+                'hour': hour[order], 'values': values[order],
+                'measures': np.array(SERIES_MEASURES)}
+
+
+def save_series(arrays, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    np.savez(path, **arrays)
+
+
+def load_series(path):
+    with np.load(path, allow_pickle=False) as f:
+        if tuple(f['measures'].tolist()) != SERIES_MEASURES:
+            raise ValueError(f"{path} foi gravado com outras medidas; gere a série novamente")
+        return SeriesStore(f['airlines'].tolist(), f['airline'], f['hour'], f['values'])
+
+
+class SeriesStore:
+    """
+    Séries por companhia com consultas downsampled e cacheadas
+    """
+
+    def __init__(self, airlines, airline, hour, values, cache_size=QUERY_CACHE_SIZE):
+        self.airlines = list(airlines)
+        self.hour = np.asarray(hour, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.int64)
+        bounds = np.searchsorted(np.asarray(airline), np.arange(len(self.airlines) + 1))
+        self._rows = {code: (bounds[i], bounds[i + 1]) for i, code in enumerate(self.airlines)}
+        self.cache_size = cache_size
+        self._series = {}
+        self._queries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.hour)
+
+    @property
+    def span(self):
+        """
+        (primeira, última) hora da série como datetime64[h]
+        """
+        if not len(self.hour):
+            return None
+        return (np.datetime64(int(self.hour.min()), 'h'), np.datetime64(int(self.hour.max()), 'h'))
+
+    def volumes(self):
+        """
+        Voos por companhia, em ordem decrescente
+        """
+        totals = {code: int(self.values[a:b, SM['flights']].sum())
+                  for code, (a, b) in self._rows.items()}
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    @staticmethod
+    def resolution_for(start, end, budget=POINT_BUDGET):
+        """
+        'hora' se a janela [start, end] (horas) tem até budget × OVERSAMPLE
+        horas; senão 'dia'
+        """
+        return 'hora' if end - start + 1 <= budget * OVERSAMPLE else 'dia'
+
+    def series(self, airline, resolution, metric):
+        """
+        Série completa (x em horas desde 1970, y) de uma companhia; em cache
+        """
+        key = airline, resolution, metric
+        cached = self._series.get(key)
+        if cached is not None:
+            return cached
+        a, b = self._rows.get(airline, (0, 0))
+        x, t = self.hour[a:b], self.values[a:b]
+        if resolution == 'dia' and len(x):
+            day = x // 24
+            starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+            x, t = day[starts] * 24, np.add.reduceat(t, starts, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'atraso':
+                y = t[:, SM['arr_sum']] / t[:, SM['arr_count']]
+            elif metric == 'cancelamento':
+                y = 100 * t[:, SM['cancelled']] / t[:, SM['flights']]
+            else:
+                y = t[:, SM['flights']].astype(np.float64)
+        valid = ~np.isnan(y)
+        cached = x[valid], y[valid]
+        with self._lock:
+            self._series[key] = cached
+        return cached
+
+    def query(self, airline, start, end, metric='atraso', budget=POINT_BUDGET, method='lttb'):
+        """
+        Pontos da companhia na janela [start, end] (datetime64 ou horas desde
+        1970), no máximo ``budget``: (x datetime64[h], y, info)
+        """
+        start = int(np.datetime64(start, 'h').astype(np.int64)) if not isinstance(start, int) else start
+        end = int(np.datetime64(end, 'h').astype(np.int64)) if not isinstance(end, int) else end
+        resolution = self.resolution_for(start, end, budget)
+        key = airline, resolution, metric, start, end, budget, method
+        with self._lock:
+            cached = self._queries.get(key)
+            if cached is not None:
+                self._queries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        x, y = self.series(airline, resolution, metric)
+        # Na série diária, x é a meia-noite do dia: a janela começa no dia de start
+        first = start - start % 24 if resolution == 'dia' else start
+        lo, hi = np.searchsorted(x, [first, end + 1])
+        x, y = x[lo:hi], y[lo:hi]
+        keep = DOWNSAMPLERS[method](x, y, budget)
+        result = (x[keep].astype('datetime64[h]'), y[keep],
+                  {'resolution': resolution, 'raw_points': len(x), 'points': len(keep)})
+        with self._lock:
+            self._queries[key] = result
+            while len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+        return result
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'series': len(self._series), 'queries': len(self._queries)}
+
+
+def build_series(path, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Lê o flights.csv e devolve os arrays de ``series.npz``
+    """
+    builder = SeriesBuilder()
+    for chunk in pd.read_csv(path, usecols=list(SERIES_COLUMNS), dtype=SERIES_COLUMNS,
+                             chunksize=chunksize, low_memory=False):
+        builder.update(chunk)
+        if progress is not None:
+            progress(builder.rows)
+    return builder.build()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pipeline.timeseries',
+        description='Séries diárias/horárias por companhia para o dashboard',
+    )
+    parser.add_argument('--flights', required=True, help='Caminho do flights.csv do DOT')
+    parser.add_argument('--output', default='data/series.npz',
+                        help='Arquivo de saída (padrão: %(default)s)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help='Linhas por chunk de leitura (padrão: %(default)s)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from .manifest import update_manifest
+
+    args = parse_args(argv)
+    start = time.perf_counter()
+
+    def progress(rows):
+        print(f"  {rows:,} voos lidos ({time.perf_counter() - start:.1f}s)", flush=True)
+
+    arrays = build_series(args.flights, args.chunksize, progress)
+    save_series(arrays, args.output)
+    update_manifest(os.path.dirname(args.output) or '.')
+    print(f"{args.output}: {len(arrays['hour']):,} linhas companhia × hora "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,815 @@
+"""
+Data warehouse local em SQLite (esquema estrela descrito na aba Metodologia).
+
+Tabelas:
+
+* ``fact_flights``: um registro por voo, com chaves para as dimensões e as
+  medidas do DOT (atrasos, distância, tempo de voo, causas);
+* ``dim_airline``, ``dim_airport``, ``dim_date``, ``dim_flight_status`` e
+  ``dim_cancellation_reason``.
+
+Cada dataset do dashboard (``relatorio_01..04`` e ``grafico_01..04``) é uma
+view SQL ``v_<chave>``, materializada na tabela ``mv_<chave>`` por
+``refresh_views``. O dashboard lê as tabelas ``mv_*`` por um pool de
+conexões e qualquer consulta ad hoc (``sqlite3 data/warehouse.db``) enxerga
+os mesmos dados. Medianas e percentis nas views são exatos (funções de
+janela), não aproximados por sketch; as demais colunas arredondam como o
+pipeline (``_round``). As views mensais agrupam por (ano, mês), então cargas
+de anos diferentes não se somam.
+
+Uso:
+    python -m pipeline.warehouse load --flights raw/flights.csv \\
+        --airlines raw/airlines.csv --airports raw/airports.csv --db data/warehouse.db
+    python -m pipeline.warehouse refresh --db data/warehouse.db [relatorio_01 ...]
+"""
+
+import argparse
+import calendar
+import math
+import queue
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from .aggregation import (
+    CANCELLATION_CODES,
+    DEFAULT_CHUNKSIZE,
+    DELAY_CAUSES,
+    FLIGHT_COLUMNS,
+    ON_TIME_THRESHOLD,
+    _int_column,
+)
+from .reports import (
+    CANCELLATION_NAMES,
+    CANCELLATION_SEVERITY,
+    CANCELLATION_WEIGHT_AIRLINE,
+    CANCELLATION_WEIGHT_ROUTE,
+    CONTROLLABLE_CAUSES,
+    DAY_NAMES,
+    DELAY_CAUSE_NAMES,
+    DELAY_CAUSE_SHORT_NAMES,
+    MAIN_CAUSE_THRESHOLD,
+    MIN_ROUTE_FLIGHTS,
+    TAIL_QUANTILES,
+    TOP_AIRLINES_CHART,
+    TOP_CRITICAL_ROUTES,
+    load_reference,
+)
+from .state import source_id
+
+# Colunas extras do flights.csv gravadas na tabela fato
+WAREHOUSE_COLUMNS = {**FLIGHT_COLUMNS, 'DAY': 'int8', 'FLIGHT_NUMBER': 'int32',
+                     'TAIL_NUMBER': 'category'}
+
+FLIGHT_STATUS = (
+    (1, 'Pontual', f'Chegada com atraso de até {ON_TIME_THRESHOLD} minutos'),
+    (2, 'Atrasado', f'Chegada com atraso acima de {ON_TIME_THRESHOLD} minutos'),
+    (3, 'Cancelado', 'Voo cancelado'),
+    (4, 'Desviado', 'Voo desviado para outro aeroporto'),
+    (5, 'Sem Registro', 'Voo realizado sem atraso de chegada registrado'),
+)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS dim_airline (
+    airline_key INTEGER PRIMARY KEY,
+    iata_code TEXT NOT NULL UNIQUE,
+    airline_name TEXT
+);
+CREATE TABLE IF NOT EXISTS dim_airport (
+    airport_key INTEGER PRIMARY KEY,
+    iata_code TEXT NOT NULL UNIQUE,
+    airport_name TEXT,
+    city TEXT,
+    state TEXT,
+    country TEXT,
+    latitude REAL,
+    longitude REAL
+);
+CREATE TABLE IF NOT EXISTS dim_date (
+    date_key INTEGER PRIMARY KEY,
+    full_date TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    quarter INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    month_name TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    day_of_week INTEGER NOT NULL,
+    day_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dim_flight_status (
+    status_key INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS dim_cancellation_reason (
+    reason_key INTEGER PRIMARY KEY,
+    reason_code TEXT NOT NULL UNIQUE,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS fact_flights (
+    flight_id INTEGER PRIMARY KEY,
+    date_key INTEGER NOT NULL REFERENCES dim_date (date_key),
+    airline_key INTEGER NOT NULL REFERENCES dim_airline (airline_key),
+    origin_airport_key INTEGER NOT NULL REFERENCES dim_airport (airport_key),
+    destination_airport_key INTEGER NOT NULL REFERENCES dim_airport (airport_key),
+    status_key INTEGER NOT NULL REFERENCES dim_flight_status (status_key),
+    cancellation_reason_key INTEGER REFERENCES dim_cancellation_reason (reason_key),
+    flight_number INTEGER,
+    tail_number TEXT,
+    scheduled_departure INTEGER,
+    departure_hour INTEGER NOT NULL,
+    departure_delay INTEGER,
+    arrival_delay INTEGER,
+    elapsed_time INTEGER,
+    distance INTEGER NOT NULL,
+    cancelled INTEGER NOT NULL,
+    diverted INTEGER NOT NULL,
+    {', '.join(f'{c.lower()} INTEGER' for c in DELAY_CAUSES)}
+);
+CREATE TABLE IF NOT EXISTS etl_sources (
+    source_id TEXT PRIMARY KEY,
+    loaded_at TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mv_refresh_log (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+"""
+
+# Índices criados depois da carga inicial (inserção em massa sem índices)
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ix_fact_date ON fact_flights (date_key)',
+    'CREATE INDEX IF NOT EXISTS ix_fact_airline ON fact_flights (airline_key)',
+    'CREATE INDEX IF NOT EXISTS ix_fact_route ON fact_flights (origin_airport_key, destination_airport_key)',
+    'CREATE INDEX IF NOT EXISTS ix_fact_destination ON fact_flights (destination_airport_key)',
+    'CREATE INDEX IF NOT EXISTS ix_fact_status ON fact_flights (status_key)',
+    'CREATE INDEX IF NOT EXISTS ix_fact_cancellation ON fact_flights (cancellation_reason_key)',
+    'CREATE INDEX IF NOT EXISTS ix_date_month ON dim_date (month, day_of_week)',
+)
+
+_FACT_COLUMNS = (
+    'date_key', 'airline_key', 'origin_airport_key', 'destination_airport_key',
+    'status_key', 'cancellation_reason_key', 'flight_number', 'tail_number',
+    'scheduled_departure', 'departure_hour', 'departure_delay', 'arrival_delay',
+    'elapsed_time', 'distance', 'cancelled', 'diverted',
+) + tuple(c.lower() for c in DELAY_CAUSES)
+
+
+def connect(path, readonly=False):
+    """
+    Abre o warehouse (WAL: leituras do dashboard não bloqueiam um refresh)
+    """
+    if readonly:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+    try:
+        conn.execute('SELECT sqrt(4)')
+    except sqlite3.OperationalError:
+        # SQLite compilado sem as funções matemáticas
+        conn.create_function('sqrt', 1, lambda x: None if x is None else math.sqrt(x),
+                             deterministic=True)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Pool de conexões somente leitura; ``size`` conexões no máximo, criadas
+    sob demanda e reutilizadas entre as execuções do script
+    """
+
+    def __init__(self, path, size=4):
+        self.path = path
+        # None = vaga livre; conexões devolvidas ficam no topo e são reusadas antes
+        self._pool = queue.LifoQueue()
+        for _ in range(size):
+            self._pool.put(None)
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        if conn is None:
+            try:
+                conn = connect(self.path, readonly=True)
+            except Exception:
+                self._pool.put(None)
+                raise
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+
+def create_schema(conn):
+    """
+    Cria tabelas e dimensões estáticas (idempotente)
+    """
+    conn.executescript(SCHEMA)
+    conn.executemany('INSERT OR IGNORE INTO dim_flight_status VALUES (?, ?, ?)', FLIGHT_STATUS)
+    conn.executemany('INSERT OR IGNORE INTO dim_cancellation_reason VALUES (?, ?, ?)',
+                     [(i + 1, code, CANCELLATION_NAMES[code])
+                      for i, code in enumerate(CANCELLATION_CODES)])
+    conn.commit()
+
+
+def load_dimensions(conn, airlines, airports):
+    """
+    Carrega airlines.csv e airports.csv; airline_key segue a ordem do
+    airlines.csv, como no grafico_02
+    """
+    for code, name in zip(airlines['IATA_CODE'], airlines['AIRLINE']):
+        conn.execute('INSERT INTO dim_airline (iata_code, airline_name) VALUES (?, ?) '
+                     'ON CONFLICT (iata_code) DO UPDATE SET airline_name = excluded.airline_name',
+                     (code, name))
+    columns = ['IATA_CODE', 'AIRPORT', 'CITY', 'STATE', 'COUNTRY', 'LATITUDE', 'LONGITUDE']
+    rows = airports.reindex(columns=columns).astype(object)
+    rows = rows.where(rows.notna(), None)
+    conn.executemany(
+        'INSERT INTO dim_airport (iata_code, airport_name, city, state, country, latitude, longitude) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (iata_code) DO UPDATE SET '
+        'airport_name = excluded.airport_name, city = excluded.city, state = excluded.state, '
+        'country = excluded.country, latitude = excluded.latitude, longitude = excluded.longitude',
+        rows.itertuples(index=False, name=None))
+    conn.commit()
+
+
+def _keys(conn, table, key, codes):
+    """
+    Chaves substitutas de ``codes``, inserindo os códigos ainda desconhecidos
+    """
+    codes = [str(c) for c in codes]
+    conn.executemany(f'INSERT OR IGNORE INTO {table} (iata_code) VALUES (?)', [(c,) for c in codes])
+    known = dict(conn.execute(f'SELECT iata_code, {key} FROM {table}'))
+    return np.array([known[c] for c in codes], dtype=np.int64)
+
+
+def _encode(conn, table, key, column):
+    codes, uniques = pd.factorize(column)
+    return _keys(conn, table, key, uniques)[codes]
+
+
+def _nullable(values, valid):
+    out = values.tolist()
+    for i in np.flatnonzero(~valid):
+        out[i] = None
+    return out
+
+
+def _load_dates(conn, year, month, day, weekday):
+    dates = np.unique(np.column_stack([year, month, day, weekday]), axis=0)
+    conn.executemany(
+        'INSERT OR IGNORE INTO dim_date VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(int(y * 10000 + m * 100 + d), f'{y:04d}-{m:02d}-{d:02d}', int(y), (int(m) - 1) // 3 + 1,
+          int(m), calendar.month_name[m], int(d), int(w), DAY_NAMES[w - 1])
+         for y, m, d, w in dates])
+
+
+def load_chunk(conn, chunk):
+    """
+    Grava um chunk do flights.csv na tabela fato
+    """
+    year = chunk['YEAR'].to_numpy(dtype=np.int64)
+    month = chunk['MONTH'].to_numpy(dtype=np.int64)
+    day = chunk['DAY'].to_numpy(dtype=np.int64)
+    _load_dates(conn, year, month, day, chunk['DAY_OF_WEEK'].to_numpy(dtype=np.int64))
+
+    cancelled = chunk['CANCELLED'].to_numpy(dtype=np.int64)
+    diverted = chunk['DIVERTED'].to_numpy(dtype=np.int64)
+    arr, arr_ok = _int_column(chunk['ARRIVAL_DELAY'])
+    status = np.select(
+        [cancelled == 1, diverted == 1, arr_ok & (arr <= ON_TIME_THRESHOLD), arr_ok],
+        [3, 4, 1, 2], default=5)
+    reason = chunk['CANCELLATION_REASON'].to_numpy(dtype=object)
+    reason_key = np.zeros(len(chunk), dtype=np.int64)
+    for i, code in enumerate(CANCELLATION_CODES):
+        reason_key[(cancelled == 1) & (reason == code)] = i + 1
+
+    scheduled = chunk['SCHEDULED_DEPARTURE'].to_numpy(dtype=np.int64)
+    tail = chunk['TAIL_NUMBER'].astype(object)
+    columns = [
+        (year * 10000 + month * 100 + day).tolist(),
+        _encode(conn, 'dim_airline', 'airline_key', chunk['AIRLINE']).tolist(),
+        _encode(conn, 'dim_airport', 'airport_key', chunk['ORIGIN_AIRPORT']).tolist(),
+        _encode(conn, 'dim_airport', 'airport_key', chunk['DESTINATION_AIRPORT']).tolist(),
+        status.tolist(),
+        _nullable(reason_key, reason_key > 0),
+        chunk['FLIGHT_NUMBER'].to_numpy(dtype=np.int64).tolist(),
+        tail.where(tail.notna(), None).tolist(),
+        scheduled.tolist(),
+        np.minimum(scheduled // 100, 23).tolist(),
+        _nullable(*_int_column(chunk['DEPARTURE_DELAY'])),
+        _nullable(arr, arr_ok),
+        _nullable(*_int_column(chunk['ELAPSED_TIME'])),
+        chunk['DISTANCE'].to_numpy(dtype=np.int64).tolist(),
+        cancelled.tolist(),
+        diverted.tolist(),
+    ] + [_nullable(*_int_column(chunk[c])) for c in DELAY_CAUSES]
+
+    conn.executemany(
+        f"INSERT INTO fact_flights ({', '.join(_FACT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(_FACT_COLUMNS))})",
+        zip(*columns))
+
+
+def load_flights(conn, path, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Acrescenta os voos de ``path`` à tabela fato (uma transação por
+    arquivo). Retorna o número de voos carregados.
+    """
+    source = source_id(path)
+    if conn.execute('SELECT 1 FROM etl_sources WHERE source_id = ?', (source,)).fetchone():
+        raise ValueError(f"{path} já foi carregado no warehouse")
+
+    rows = 0
+    with conn:
+        for chunk in pd.read_csv(path, usecols=list(WAREHOUSE_COLUMNS), dtype=WAREHOUSE_COLUMNS,
+                                 chunksize=chunksize, low_memory=False):
+            load_chunk(conn, chunk)
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+        conn.execute("INSERT INTO etl_sources VALUES (?, datetime('now'), ?)", (source, rows))
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+    conn.commit()
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+_FACT_DATE = 'fact_flights f JOIN dim_date d ON d.date_key = f.date_key'
+_ON_TIME = f'CASE WHEN f.arrival_delay <= {ON_TIME_THRESHOLD} THEN 1 ELSE 0 END'
+_LATE = f'CASE WHEN f.arrival_delay > {ON_TIME_THRESHOLD} THEN 1 ELSE 0 END'
+
+
+def _quantile_view(key, source):
+    """
+    Mediana e percentis exatos do atraso na chegada por ``key`` (mesma
+    definição de posição dos sketches: ⌊q·(n − 1)⌋ e média dos centrais)
+    """
+    tails = ',\n    '.join(
+        f'MAX(CASE WHEN r = CAST({q!r} * (n - 1) AS INTEGER) THEN v END) * 1.0 AS {name}'
+        for name, q in TAIL_QUANTILES.items())
+    return f"""
+WITH ranked AS (
+    SELECT {key} AS key, f.arrival_delay AS v,
+           ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY f.arrival_delay) - 1 AS r,
+           COUNT(*) OVER (PARTITION BY {key}) AS n
+    FROM {source}
+    WHERE f.arrival_delay IS NOT NULL
+)
+SELECT key,
+    AVG(CASE WHEN r = (n - 1) / 2 OR r = n / 2 THEN v END) AS median_arrival_delay,
+    {tails}
+FROM ranked
+GROUP BY key
+"""
+
+
+def _round(expr, digits):
+    """
+    ROUND com o desempate do ``np.round`` do pipeline (metade para o par);
+    o ROUND do SQLite leva a metade para longe do zero
+    """
+    scale = f'{10 ** digits}.0'
+    x = f'(({expr}) * {scale})'
+    return (f'(CASE WHEN ABS({x} - CAST({x} AS INTEGER)) = 0.5 THEN 2 * ROUND({x} / 2) '
+            f'ELSE ROUND({x}) END / {scale})')
+
+
+def _pct(num, den, digits=2):
+    # Mesma ordem de operações do pipeline: num / den * 100
+    return _round(f'1.0 * {num} / {den} * 100', digits)
+
+
+def _tail_columns(alias):
+    return ', '.join(f'{_round(f"{alias}.{name}", 1)} AS {name}' for name in TAIL_QUANTILES)
+
+
+def _cause_month_view():
+    """
+    Ocorrências e minutos por causa e mês, em formato longo (uma linha por
+    causa × ano × mês); ``cause_order`` segue a ordem de ``reports.cause_metrics``
+    """
+    sums = []
+    for column in DELAY_CAUSES:
+        c = column.lower()
+        sums.append(f'SUM(CASE WHEN f.{c} > 0 THEN 1 ELSE 0 END) AS n_{c}')
+        sums.append(f'SUM(CASE WHEN f.{c} > 0 THEN f.{c} ELSE 0 END) AS min_{c}')
+    for i, code in enumerate(CANCELLATION_CODES):
+        sums.append(f'SUM(CASE WHEN f.cancellation_reason_key = {i + 1} THEN 1 ELSE 0 END) AS n_{code}')
+
+    selects = []
+    for order, column in enumerate(DELAY_CAUSES, start=1):
+        c = column.lower()
+        selects.append(
+            f"SELECT 'Atraso' AS problem_type, '{DELAY_CAUSE_NAMES[column]}' AS cause_name, "
+            f"'{DELAY_CAUSE_SHORT_NAMES[column]}' AS short_name, {order} AS cause_order, "
+            f"year, month, n_{c} AS occurrences, min_{c} AS minutes FROM m")
+    for order, code in enumerate(CANCELLATION_CODES, start=len(DELAY_CAUSES) + 1):
+        selects.append(
+            f"SELECT 'Cancelamento', '{CANCELLATION_NAMES[code]}', NULL, {order}, "
+            f"year, month, n_{code}, 0 FROM m")
+    return (f"WITH m AS (SELECT d.year AS year, d.month AS month, {', '.join(sums)} "
+            f"FROM {_FACT_DATE} GROUP BY d.year, d.month)\n"
+            + '\nUNION ALL\n'.join(selects))
+
+
+def _matrix_view(cell):
+    """
+    Matriz dia da semana × hora (voos não cancelados, como no pipeline)
+    """
+    columns = ',\n    '.join(cell.format(h=h) + f' AS "{h}"' for h in range(24))
+    return f"""
+SELECT MIN(d.day_name) AS day_name,
+    {columns}
+FROM {_FACT_DATE}
+WHERE f.cancelled = 0
+GROUP BY d.day_of_week
+ORDER BY d.day_of_week
+"""
+
+
+def _score(alias, weight):
+    return _round(f'{alias}.avg_arrival_delay + {alias}.cancellation_rate * {weight} '
+                  f'+ (100 - {alias}.on_time_rate)', 2)
+
+
+_CONTROLLABLE = ', '.join(f"'{c}'" for c in sorted(CONTROLLABLE_CAUSES))
+_CAUSE_COLUMNS = 'category, problem_type, cause_name, total_occurrences, avg_impact, severity_score, percentage'
+
+# Views auxiliares (não materializadas)
+HELPER_VIEWS = {
+    'v_monthly_metrics': f"""
+SELECT d.year AS year, d.month AS month, MIN(d.month_name) AS month_name,
+    COUNT(*) AS total_flights,
+    {_round('AVG(f.arrival_delay)', 2)} AS avg_arrival_delay,
+    COUNT(f.arrival_delay) AS arr_count,
+    SUM(f.arrival_delay) AS arr_sum,
+    SUM(f.arrival_delay * f.arrival_delay) AS arr_sumsq,
+    {_round('AVG(f.departure_delay)', 2)} AS avg_departure_delay,
+    SUM(f.cancelled) AS total_cancelled,
+    SUM(f.diverted) AS total_diverted,
+    {_round('AVG(f.distance)', 2)} AS avg_distance,
+    SUM({_ON_TIME}) AS on_time_flights,
+    SUM({_LATE}) AS late_flights,
+    {_pct(f'SUM({_ON_TIME})', 'COUNT(*)')} AS on_time_rate,
+    {_pct('SUM(f.cancelled)', 'COUNT(*)')} AS cancellation_rate
+FROM {_FACT_DATE}
+GROUP BY d.year, d.month
+""",
+    'v_month_quantiles': _quantile_view('d.year * 100 + d.month', _FACT_DATE),
+    'v_airline_metrics': f"""
+SELECT a.airline_key AS airline_key, a.iata_code AS airline_code,
+    COALESCE(a.airline_name, a.iata_code) AS airline_name,
+    COUNT(*) AS total_flights,
+    {_round('AVG(f.arrival_delay)', 2)} AS avg_arrival_delay,
+    {_round('AVG(f.departure_delay)', 2)} AS avg_departure_delay,
+    SUM(f.cancelled) AS total_cancelled,
+    SUM(f.diverted) AS total_diverted,
+    SUM(f.distance) AS total_distance,
+    {_round('AVG(f.distance)', 2)} AS avg_distance,
+    {_round('AVG(f.elapsed_time)', 2)} AS avg_flight_time,
+    SUM({_ON_TIME}) AS on_time_flights,
+    {_pct(f'SUM({_ON_TIME})', 'COUNT(*)')} AS on_time_rate,
+    {_pct('SUM(f.cancelled)', 'COUNT(*)')} AS cancellation_rate,
+    {_pct('SUM(f.diverted)', 'COUNT(*)')} AS diversion_rate
+FROM fact_flights f JOIN dim_airline a ON a.airline_key = f.airline_key
+GROUP BY a.airline_key
+""",
+    'v_airline_quantiles': _quantile_view('f.airline_key', 'fact_flights f'),
+    'v_route_metrics': f"""
+SELECT f.origin_airport_key AS origin_airport_key,
+    f.destination_airport_key AS destination_airport_key,
+    MIN(o.iata_code) AS origin, MIN(o.city) AS origin_city, MIN(o.state) AS origin_state,
+    MIN(t.iata_code) AS dest, MIN(t.city) AS dest_city, MIN(t.state) AS dest_state,
+    COUNT(*) AS total_flights,
+    {_round('AVG(f.arrival_delay)', 2)} AS avg_arrival_delay,
+    {_pct('SUM(f.cancelled)', 'COUNT(*)')} AS cancellation_rate,
+    {_round('AVG(f.distance)', 2)} AS avg_distance
+FROM fact_flights f
+JOIN dim_airport o ON o.airport_key = f.origin_airport_key
+JOIN dim_airport t ON t.airport_key = f.destination_airport_key
+GROUP BY f.origin_airport_key, f.destination_airport_key
+""",
+    'v_cause_month': _cause_month_view(),
+    'v_causes': f"""
+WITH totals AS (
+    SELECT problem_type, cause_name, cause_order,
+        SUM(occurrences) AS total_occurrences, SUM(minutes) AS total_minutes
+    FROM v_cause_month
+    GROUP BY cause_order
+), ranked AS (
+    -- Com mais de um ano carregado, o mês leva o ano
+    SELECT c.cause_order,
+        CASE WHEN (SELECT COUNT(DISTINCT year) FROM dim_date) > 1
+             THEN n.month_name || ' ' || c.year ELSE n.month_name END AS month_name,
+        ROW_NUMBER() OVER (PARTITION BY c.cause_order
+                           ORDER BY c.occurrences DESC, c.year, c.month) AS k
+    FROM v_cause_month c
+    JOIN (SELECT DISTINCT month, month_name FROM dim_date) n ON n.month = c.month
+    ORDER BY c.cause_order, k
+), months AS (
+    SELECT cause_order, group_concat(month_name, ', ') AS critical_months
+    FROM ranked WHERE k <= 3
+    GROUP BY cause_order
+)
+SELECT t.problem_type || ': ' || t.cause_name AS category,
+    t.problem_type, t.cause_name, t.total_occurrences,
+    CASE WHEN t.problem_type = 'Atraso' AND t.total_occurrences > 0
+         THEN 1.0 * t.total_minutes / t.total_occurrences ELSE 0.0 END AS avg_impact,
+    CASE WHEN t.problem_type = 'Atraso' THEN 1.0 * t.total_minutes
+         ELSE t.total_occurrences * {float(CANCELLATION_SEVERITY)} END AS severity_score,
+    {_pct('t.total_occurrences', 'SUM(t.total_occurrences) OVER ()')} AS percentage,
+    m.critical_months, t.cause_order
+FROM totals t LEFT JOIN months m ON m.cause_order = t.cause_order
+""",
+}
+
+# Um dataset do dashboard por view, na mesma chave de OUTPUT_FILES/load_data
+VIEWS = {
+    'relatorio_01': f"""
+SELECT ROW_NUMBER() OVER (ORDER BY score, airline_code) AS "Ranking",
+    airline_code AS "Código",
+    airline_name AS "Companhia Aérea",
+    total_flights AS "Total Voos",
+    on_time_rate AS "Taxa Pontualidade (%)",
+    avg_arrival_delay AS "Atraso Médio (min)",
+    cancellation_rate AS "Taxa Cancelamento (%)",
+    diversion_rate AS "Taxa Desvio (%)",
+    score AS "Score Performance"
+FROM (SELECT a.*, {_score('a', CANCELLATION_WEIGHT_AIRLINE)} AS score FROM v_airline_metrics a)
+ORDER BY 1
+""",
+    'relatorio_02': f"""
+WITH top AS (
+    SELECT r.*, {_round(f'r.avg_arrival_delay + r.cancellation_rate * {CANCELLATION_WEIGHT_ROUTE}', 2)}
+               AS criticality_score
+    FROM v_route_metrics r
+    WHERE r.total_flights >= {MIN_ROUTE_FLIGHTS}
+    ORDER BY criticality_score DESC, r.origin, r.dest
+    LIMIT {TOP_CRITICAL_ROUTES}
+), operators AS (
+    SELECT origin_airport_key, destination_airport_key, group_concat(code, ', ') AS airlines
+    FROM (
+        SELECT r.origin_airport_key, r.destination_airport_key, a.iata_code AS code
+        FROM (
+            -- CROSS JOIN fixa a ordem: das 20 rotas para a fato pelo índice de rota
+            SELECT DISTINCT t.origin_airport_key, t.destination_airport_key, f.airline_key
+            FROM top t
+            CROSS JOIN fact_flights f ON f.origin_airport_key = t.origin_airport_key
+                                     AND f.destination_airport_key = t.destination_airport_key
+        ) r
+        JOIN dim_airline a ON a.airline_key = r.airline_key
+        ORDER BY 1, 2, 3
+    )
+    GROUP BY origin_airport_key, destination_airport_key
+)
+SELECT ROW_NUMBER() OVER (ORDER BY t.criticality_score DESC, t.origin, t.dest) AS "Ranking",
+    t.origin AS "Origem", t.origin_city AS "Cidade Origem", t.origin_state AS "Estado Origem",
+    t.dest AS "Destino", t.dest_city AS "Cidade Destino", t.dest_state AS "Estado Destino",
+    t.total_flights AS "Total Voos",
+    t.avg_arrival_delay AS "Atraso Médio (min)",
+    t.cancellation_rate AS "Taxa Cancelamento (%)",
+    t.avg_distance AS "Distância (milhas)",
+    o.airlines AS "Companhias Operadoras",
+    t.criticality_score AS "Score Criticidade"
+FROM top t
+JOIN operators o ON o.origin_airport_key = t.origin_airport_key
+                AND o.destination_airport_key = t.destination_airport_key
+ORDER BY 1
+""",
+    'relatorio_03': f"""
+WITH main AS (
+    SELECT year, month, short_name FROM (
+        SELECT year, month, short_name,
+            ROW_NUMBER() OVER (PARTITION BY year, month ORDER BY minutes DESC, cause_order) AS k
+        FROM v_cause_month WHERE problem_type = 'Atraso'
+    ) WHERE k = 1
+)
+SELECT m.month AS "Mês",
+    m.month_name AS "Nome do Mês",
+    m.total_flights AS "Total Voos",
+    m.on_time_flights AS "Voos Pontuais",
+    m.late_flights AS "Voos Atrasados",
+    m.total_cancelled AS "Voos Cancelados",
+    m.avg_arrival_delay AS "Atraso Médio (min)",
+    c.short_name AS "Principal Causa de Atraso",
+    {_score('m', CANCELLATION_WEIGHT_AIRLINE)} AS "Score Criticidade"
+FROM v_monthly_metrics m LEFT JOIN main c ON c.year = m.year AND c.month = m.month
+ORDER BY m.year, m.month
+""",
+    'relatorio_04': f"""
+SELECT ROW_NUMBER() OVER (ORDER BY severity_score DESC, cause_order) AS "Ranking",
+    problem_type AS "Tipo de Problema",
+    cause_name AS "Causa",
+    total_occurrences AS "Quantidade de Ocorrências",
+    {_pct('total_occurrences', '(SELECT COUNT(*) FROM fact_flights)', 3)} AS "Percentual do Total (%)",
+    {_round('avg_impact', 1)} AS "Impacto Médio (min)",
+    critical_months AS "Meses Críticos"
+FROM v_causes
+ORDER BY 1
+""",
+    'grafico_01': f"""
+SELECT m.month, m.month_name, m.total_flights, m.avg_arrival_delay,
+    q.median_arrival_delay,
+    {_round('sqrt(MAX((m.arr_sumsq - 1.0 * m.arr_sum * m.arr_sum / m.arr_count) / (m.arr_count - 1), 0))', 2)}
+        AS std_arrival_delay,
+    m.avg_departure_delay, m.total_cancelled, m.total_diverted, m.avg_distance,
+    m.on_time_flights, m.on_time_rate, m.cancellation_rate,
+    printf('%04d-%02d-01', m.year, m.month) AS date_label,
+    (m.avg_arrival_delay / LAG(m.avg_arrival_delay) OVER (ORDER BY m.year, m.month) - 1) * 100
+        AS delay_trend,
+    (1.0 * m.total_flights / LAG(m.total_flights) OVER (ORDER BY m.year, m.month) - 1) * 100
+        AS volume_trend,
+    {_tail_columns('q')}
+FROM v_monthly_metrics m LEFT JOIN v_month_quantiles q ON q.key = m.year * 100 + m.month
+ORDER BY m.year, m.month
+""",
+    'grafico_02': f"""
+WITH scored AS (
+    SELECT a.*, {_round('''
+        40 * a.on_time_rate / MAX(a.on_time_rate) OVER ()
+        + 35 * (MAX(a.avg_arrival_delay) OVER () - a.avg_arrival_delay)
+             / COALESCE(NULLIF(MAX(a.avg_arrival_delay) OVER () - MIN(a.avg_arrival_delay) OVER (), 0), 1)
+        + 25 * (MAX(a.cancellation_rate) OVER () - a.cancellation_rate)
+             / COALESCE(NULLIF(MAX(a.cancellation_rate) OVER () - MIN(a.cancellation_rate) OVER (), 0), 1)''',
+        2)} AS performance_score
+    FROM v_airline_metrics a
+), top AS (
+    SELECT * FROM scored ORDER BY total_flights DESC, airline_code LIMIT {TOP_AIRLINES_CHART}
+)
+SELECT t.airline_key, t.total_flights, t.avg_arrival_delay, q.median_arrival_delay,
+    t.avg_departure_delay, t.total_cancelled, t.total_diverted, t.total_distance,
+    t.avg_distance, t.avg_flight_time, t.on_time_flights, t.on_time_rate,
+    t.cancellation_rate, t.diversion_rate, t.performance_score, t.airline_code,
+    t.airline_name,
+    CASE WHEN t.performance_score >= 80 THEN 'Excelente'
+         WHEN t.performance_score >= 70 THEN 'Boa'
+         WHEN t.performance_score >= 60 THEN 'Regular'
+         ELSE 'Ruim' END AS performance_category,
+    {_tail_columns('q')}
+FROM top t LEFT JOIN v_airline_quantiles q ON q.key = t.airline_key
+ORDER BY t.performance_score DESC, t.total_flights DESC
+""",
+    'grafico_03_volumes': _matrix_view('SUM(CASE WHEN f.departure_hour = {h} THEN 1 ELSE 0 END)'),
+    'grafico_03_atrasos': _matrix_view(
+        _round('AVG(CASE WHEN f.departure_hour = {h} THEN f.arrival_delay END)', 2)),
+    'grafico_04_principais': f"""
+SELECT {_CAUSE_COLUMNS},
+    CASE WHEN cause_name IN ({_CONTROLLABLE}) THEN 'Controlável' ELSE 'Não Controlável' END
+        AS controllability
+FROM (
+    SELECT {_CAUSE_COLUMNS}, 0 AS grp, cause_order
+    FROM v_causes WHERE percentage >= {MAIN_CAUSE_THRESHOLD}
+    UNION ALL
+    SELECT 'Outros', 'Diversos', 'Causas Menores', SUM(total_occurrences), AVG(avg_impact),
+        SUM(severity_score), {_round('SUM(percentage)', 2)}, 1, 0
+    FROM v_causes WHERE percentage < {MAIN_CAUSE_THRESHOLD}
+    HAVING COUNT(*) > 0
+)
+ORDER BY grp, severity_score DESC, cause_order
+""",
+    'grafico_04_menores': f"""
+SELECT {_CAUSE_COLUMNS}
+FROM v_causes WHERE percentage < {MAIN_CAUSE_THRESHOLD}
+ORDER BY severity_score DESC, cause_order
+""",
+    'rotas': f"""
+WITH operators AS (
+    SELECT origin_airport_key, destination_airport_key, group_concat(code, ', ') AS airlines
+    FROM (
+        SELECT DISTINCT f.origin_airport_key, f.destination_airport_key, a.iata_code AS code
+        FROM fact_flights f
+        JOIN dim_airline a ON a.airline_key = f.airline_key
+        ORDER BY 1, 2, 3
+    )
+    GROUP BY origin_airport_key, destination_airport_key
+)
+SELECT r.origin, r.dest, r.total_flights, r.avg_arrival_delay, r.cancellation_rate,
+    r.avg_distance, o.airlines, r.origin_city, r.origin_state, r.dest_city, r.dest_state,
+    {_round(f'r.avg_arrival_delay + r.cancellation_rate * {CANCELLATION_WEIGHT_ROUTE}', 2)}
+        AS criticality_score
+FROM v_route_metrics r
+JOIN operators o ON o.origin_airport_key = r.origin_airport_key
+                AND o.destination_airport_key = r.destination_airport_key
+ORDER BY r.origin, r.dest
+""",
+}
+
+
+def create_views(conn):
+    """
+    (Re)cria as views com as definições atuais do código
+    """
+    for name, sql in list(HELPER_VIEWS.items()) + [(f'v_{k}', v) for k, v in VIEWS.items()]:
+        conn.execute(f'DROP VIEW IF EXISTS {name}')
+        conn.execute(f'CREATE VIEW {name} AS {sql}')
+    conn.commit()
+
+
+def refresh_views(conn, keys=None, progress=None):
+    """
+    Materializa as views ``v_<chave>`` em ``mv_<chave>`` (todas, ou só
+    ``keys``). Cada tabela é trocada em uma transação, então leitores veem
+    sempre a versão anterior completa ou a nova.
+    """
+    create_views(conn)
+    for key in keys or VIEWS:
+        start = time.perf_counter()
+        with conn:
+            conn.execute(f'DROP TABLE IF EXISTS mv_{key}')
+            conn.execute(f'CREATE TABLE mv_{key} AS SELECT * FROM v_{key}')
+            rows = conn.execute(f'SELECT COUNT(*) FROM mv_{key}').fetchone()[0]
+            seconds = time.perf_counter() - start
+            conn.execute("INSERT OR REPLACE INTO mv_refresh_log VALUES (?, datetime('now'), ?, ?)",
+                         (f'mv_{key}', rows, seconds))
+        if progress:
+            progress(key, rows, seconds)
+
+
+def view_versions(pool):
+    """
+    Marca da última materialização de cada view (muda a cada refresh),
+    usada pelo dashboard para reler só as views atualizadas
+    """
+    with pool.connection() as conn:
+        rows = conn.execute('SELECT view_name, refreshed_at, rows, seconds FROM mv_refresh_log')
+        return {name[len('mv_'):]: tuple(version) for name, *version in rows}
+
+
+def read_view(pool, key):
+    """
+    Dataset materializado ``mv_<chave>``, na ordem em que foi gravado
+    """
+    return pool.query(f'SELECT * FROM mv_{key} ORDER BY rowid')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pipeline.warehouse',
+                                     description='Data warehouse SQLite em esquema estrela')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = commands.add_parser('load', help='Carrega um flights.csv na tabela fato e atualiza as views')
+    load.add_argument('--flights', required=True, help='Caminho do flights.csv do DOT')
+    load.add_argument('--airlines', help='Caminho do airlines.csv')
+    load.add_argument('--airports', help='Caminho do airports.csv')
+    load.add_argument('--db', default='data/warehouse.db', help='Arquivo SQLite (padrão: %(default)s)')
+    load.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    load.add_argument('--no-refresh', action='store_true', help='Não materializa as views ao final')
+
+    refresh = commands.add_parser('refresh', help='Materializa as views (todas ou as informadas)')
+    refresh.add_argument('--db', default='data/warehouse.db')
+    refresh.add_argument('views', nargs='*', metavar='VIEW',
+                         help=f"Datasets a atualizar: {', '.join(VIEWS)}")
+    args = parser.parse_args(argv)
+    unknown = set(getattr(args, 'views', ())) - set(VIEWS)
+    if unknown:
+        parser.error(f"views desconhecidas: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    conn = connect(args.db)
+    create_schema(conn)
+
+    def refreshed(key, rows, seconds):
+        print(f"  mv_{key}: {rows} linhas ({seconds:.1f}s)", flush=True)
+
+    if args.command == 'load':
+        airlines, airports = load_reference(args.airlines, args.airports)
+        load_dimensions(conn, airlines, airports)
+        print(f"Carregando {args.flights} em {args.db}...")
+        try:
+            rows = load_flights(conn, args.flights, args.chunksize, progress=lambda n: print(
+                f"  {n:,} voos carregados ({time.perf_counter() - start:.1f}s)", flush=True))
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"{rows:,} voos carregados")
+        if args.no_refresh:
+            return
+    print("Materializando views...")
+    refresh_views(conn, getattr(args, 'views', None), progress=refreshed)
+    print(f"Concluído em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Cenários "what-if" dos scores com pesos escolhidos pelo usuário.
+
+Os scores de companhias (relatorio_01 e grafico_02) e de rotas (relatorio_02)
+são combinações lineares de métricas por entidade que já estão nos datasets:
+pontualidade, atraso médio e taxa de cancelamento. ``AirlineScores`` guarda
+essas métricas em arrays e recalcula os scores e a ordenação de todas as
+companhias em uma passada vetorizada por conjunto de pesos. As rotas usam
+``RouteTable.scores``. Com os pesos padrão, os resultados coincidem com os
+arquivos exportados.
+"""
+
+import numpy as np
+
+from .reports import (
+    CANCELLATION_WEIGHT_AIRLINE,
+    CANCELLATION_WEIGHT_ROUTE,
+    MIN_ROUTE_FLIGHTS,
+    TOP_CRITICAL_ROUTES,
+)
+
+# Pesos padrão (os mesmos das fórmulas da aba Metodologia)
+DEFAULT_WEIGHTS = {
+    # relatorio_01: atraso + cancelamento × 10 + (100 - pontualidade); menor = melhor
+    'ranking_delay': 1.0,
+    'ranking_cancellation': float(CANCELLATION_WEIGHT_AIRLINE),
+    'ranking_punctuality': 1.0,
+    # grafico_02: score 0-100 normalizado; maior = melhor
+    'chart_punctuality': 40.0,
+    'chart_delay': 35.0,
+    'chart_cancellation': 25.0,
+    # relatorio_02: atraso + cancelamento × 15; maior = mais crítica
+    'route_delay': 1.0,
+    'route_cancellation': float(CANCELLATION_WEIGHT_ROUTE),
+}
+
+CATEGORY_BINS = [-np.inf, 60, 70, 80, np.inf]
+CATEGORY_LABELS = np.array(['Ruim', 'Regular', 'Boa', 'Excelente'])
+
+
+def is_default(weights):
+    return all(weights.get(k, v) == v for k, v in DEFAULT_WEIGHTS.items())
+
+
+def performance_categories(scores):
+    """
+    ``reports.performance_category`` vetorizado
+    """
+    return CATEGORY_LABELS[np.searchsorted(CATEGORY_BINS, scores, side='right') - 1]
+
+
+class AirlineScores:
+    """
+    Métricas base por companhia (colunas do relatorio_01) em arrays
+    """
+
+    def __init__(self, ranking):
+        self.ranking = ranking.reset_index(drop=True)
+        self.code = self.ranking['Código'].astype(str).to_numpy()
+        self.flights = self.ranking['Total Voos'].to_numpy(dtype=np.int64)
+        self.on_time = self.ranking['Taxa Pontualidade (%)'].to_numpy(dtype=np.float64)
+        self.delay = self.ranking['Atraso Médio (min)'].to_numpy(dtype=np.float64)
+        self.cancel = self.ranking['Taxa Cancelamento (%)'].to_numpy(dtype=np.float64)
+
+    def ranking_scores(self, weights):
+        return np.round(weights['ranking_delay'] * self.delay
+                        + weights['ranking_cancellation'] * self.cancel
+                        + weights['ranking_punctuality'] * (100 - self.on_time), 2)
+
+    def chart_scores(self, weights):
+        # Normalização sobre todas as companhias, como em reports.score_airlines
+        delay_range = (self.delay.max() - self.delay.min()) or 1
+        cancel_range = (self.cancel.max() - self.cancel.min()) or 1
+        return np.round(weights['chart_punctuality'] * self.on_time / self.on_time.max()
+                        + weights['chart_delay'] * (self.delay.max() - self.delay) / delay_range
+                        + weights['chart_cancellation'] * (self.cancel.max() - self.cancel)
+                        / cancel_range, 2)
+
+    def ranking_frame(self, weights):
+        """
+        relatorio_01 reordenado pelos pesos (empates pelo código)
+        """
+        score = self.ranking_scores(weights)
+        order = np.lexsort((self.code, score))
+        df = self.ranking.iloc[order].reset_index(drop=True)
+        df['Score Performance'] = score[order]
+        df['Ranking'] = np.arange(1, len(df) + 1)
+        return df
+
+    def chart_frame(self, chart, weights):
+        """
+        grafico_02 (mesmas companhias) com score, categoria e ordem
+        recalculados
+        """
+        score = dict(zip(self.code, self.chart_scores(weights)))
+        df = chart.copy()
+        df['performance_score'] = df['airline_code'].map(score)
+        df['performance_category'] = performance_categories(df['performance_score'].to_numpy())
+        order = np.lexsort((-df['total_flights'].to_numpy(), -df['performance_score'].to_numpy()))
+        return df.iloc[order].reset_index(drop=True)
+
+
+def route_weights(weights):
+    return weights['route_delay'], weights['route_cancellation']
+
+
+def critical_routes_frame(table, weights, min_flights=MIN_ROUTE_FLIGHTS, top=TOP_CRITICAL_ROUTES):
+    """
+    relatorio_02 recalculado sobre todas as rotas de ``table`` (``RouteTable``)
+    """
+    score = table.scores(*route_weights(weights))
+    ids = np.flatnonzero(table.flights >= min_flights)
+    # Score decrescente; empates por origem e destino
+    ids = ids[np.lexsort((table.dest[ids], table.origin[ids], -score[ids]))][:top]
+    df = table.frame(ids, score)
+    df = df.drop(columns=['Região'])
+    df.insert(0, 'Ranking', np.arange(1, len(df) + 1))
+    return df
+
+
+def rerank_routes(report, weights):
+    """
+    Sem a tabela de todas as rotas: reordena só as rotas já presentes no
+    relatorio_02 (aproximação; rotas fora do top 20 original não entram)
+    """
+    delay, cancel = route_weights(weights)
+    df = report.copy()
+    df['Score Criticidade'] = np.round(delay * df['Atraso Médio (min)']
+                                       + cancel * df['Taxa Cancelamento (%)'], 2)
+    order = np.lexsort((df['Destino'].to_numpy(dtype=str), df['Origem'].to_numpy(dtype=str),
+                        -df['Score Criticidade'].to_numpy()))
+    df = df.iloc[order].reset_index(drop=True)
+    df['Ranking'] = np.arange(1, len(df) + 1)
+    return df
+
+
+def whatif_datasets(data, weights, routes=None):
+    """
+    Datasets afetados pelos pesos: relatorio_01, grafico_02 e relatorio_02
+    (sobre ``routes``, a ``RouteTable`` de todas as rotas do recorte exibido,
+    se houver)
+    """
+    airlines = AirlineScores(data['relatorio_01'])
+    frames = {
+        'relatorio_01': airlines.ranking_frame(weights),
+        'grafico_02': airlines.chart_frame(data['grafico_02'], weights),
+    }
+    if routes is not None:
+        frames['relatorio_02'] = critical_routes_frame(routes, weights)
+    else:
+        frames['relatorio_02'] = rerank_routes(data['relatorio_02'], weights)
+    return frames
+
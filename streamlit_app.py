@@ -1,14 +1,35 @@
+import calendar
+import os
+import tempfile
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
-from PIL import Image
+
+from pipeline.profiling import NULL_PROFILER, Profiler, activate, current
+from pipeline.registry import DatasetError, DatasetRegistry, Datasets
+from pipeline.startup import LazyModule, headline_values, period_of, read_summary
+
+# pandas, NumPy e Plotly (e os módulos do pipeline, importados nas funções
+# que os usam) só carregam depois do primeiro paint, que vem do resumo
+# pré-calculado (data/resumo.json)
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+go = LazyModule('plotly.graph_objects')
+subplots = LazyModule('plotly.subplots')
+
+DATA_DIR = 'data'
+CUBE_PATH = os.path.join(DATA_DIR, 'cube.npz')
+WAREHOUSE_PATH = os.path.join(DATA_DIR, 'warehouse.db')
+# Serviço compartilhado de consultas (python -m pipeline.service serve)
+SERVICE_URL = os.environ.get('DASHBOARD_SERVICE')
+# Exportações das tabelas (pipeline.download): pasta dos arquivos e maior
+# arquivo entregue pelo botão de download (o Streamlit guarda os bytes em
+# memória até o clique)
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), 'dashboard_exportacoes')
+DOWNLOAD_MAX_MB = 200
 
 # Configuração da página
 st.set_page_config(
-    page_title="Dashboard - Análise de Voos 2015",
+    page_title="Dashboard - Análise de Voos",
     page_icon="✈️",
     layout="wide",
     initial_sidebar_state="expanded"
@@ -54,43 +75,580 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# Função para carregar dados com cache
-@st.cache_data
-def load_data():
+@st.cache_resource
+def get_service_client():
+    """
+    Cliente do serviço de consultas agregadas (None sem ``DASHBOARD_SERVICE``)
+    """
+    if not SERVICE_URL:
+        return None
+    from pipeline.service import ServiceClient
+    return ServiceClient(SERVICE_URL)
+
+
+@st.cache_resource
+def get_warehouse_pool():
+    """
+    Pool de conexões do warehouse SQLite (data/warehouse.db), se existir
+    """
+    if not os.path.exists(WAREHOUSE_PATH):
+        return None
+    from pipeline.warehouse import ConnectionPool
+    return ConnectionPool(WAREHOUSE_PATH)
+
+
+def warehouse_versions():
     """
-    Carrega todos os dados dos relatórios e gráficos
+    Marca do último refresh de cada view materializada ({} sem warehouse)
     """
+    pool = get_warehouse_pool()
+    if pool is None:
+        return {}
+    from pipeline.warehouse import view_versions
     try:
-        data = {}
-
-        # Relatórios
-        data['relatorio_01'] = pd.read_csv('data/relatorio_01_ranking_performance_airlines.csv')
-        data['relatorio_02'] = pd.read_csv('data/relatorio_02_rotas_criticas.csv')
-        data['relatorio_03'] = pd.read_csv('data/relatorio_03_sazonalidade_mensal.csv')
-        data['relatorio_04'] = pd.read_csv('data/relatorio_04_causas_cancelamento_atraso.csv')
-
-        # Dados para gráficos
-        data['grafico_01'] = pd.read_csv('data/grafico_01_dados.csv')
-        data['grafico_02'] = pd.read_csv('data/grafico_02_dados.csv')
-        data['grafico_03_volumes'] = pd.read_csv('data/grafico_03_matriz_volumes.csv')
-        data['grafico_03_atrasos'] = pd.read_csv('data/grafico_03_matriz_atrasos.csv')
-        data['grafico_04_principais'] = pd.read_csv('data/grafico_04_causas_principais.csv')
-        data['grafico_04_menores'] = pd.read_csv('data/grafico_04_causas_menores.csv')
-
-        return data
+        return view_versions(pool)
+    except Exception:
+        return {}
+
+
+DATASET_KEYS = ['relatorio_01', 'relatorio_02', 'relatorio_03', 'relatorio_04',
+                'grafico_01', 'grafico_02', 'grafico_03_volumes', 'grafico_03_atrasos',
+                'grafico_04_principais', 'grafico_04_menores', 'rotas', 'aeroportos',
+                'propagacao_hora', 'propagacao_aeroportos', 'propagacao_companhias',
+                'incerteza_companhias', 'incerteza_rotas']
+
+# Datasets exibidos pela página (os demais só são lidos se pedidos)
+PAGE_KEYS = ['relatorio_01', 'relatorio_02', 'relatorio_03', 'relatorio_04',
+             'grafico_01', 'grafico_02', 'grafico_03_atrasos', 'grafico_04_principais', 'rotas',
+             'propagacao_hora', 'propagacao_aeroportos', 'propagacao_companhias',
+             'incerteza_companhias', 'incerteza_rotas']
+
+# Lidos logo após o primeiro paint: os do cabeçalho e os que os filtros do
+# cubo não recalculam
+EARLY_KEYS = ['relatorio_01', 'grafico_01', 'rotas', 'aeroportos',
+              'propagacao_hora', 'propagacao_aeroportos', 'propagacao_companhias',
+              'incerteza_companhias', 'incerteza_rotas']
+
+
+def available_years():
+    """
+    Anos com pasta própria em data/ (``python -m pipeline.partitions build
+    --per-year``), em ordem crescente
+    """
+    client = get_service_client()
+    if client is not None:
+        from pipeline.service import ServiceError
+        try:
+            return client.years()
+        except (ServiceError, OSError):
+            return []
+    try:
+        names = os.listdir(DATA_DIR)
+    except OSError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit() and len(name) == 4
+                  and os.path.exists(os.path.join(DATA_DIR, name, 'manifest.json')))
+
+
+def data_dir(year=None):
+    """
+    Pasta dos datasets do ano (None = data/, o conjunto principal)
+    """
+    return DATA_DIR if year is None else os.path.join(DATA_DIR, str(year))
+
+
+def sidebar_year():
+    """
+    Seletor de ano da barra lateral (só com pastas por ano em data/);
+    None = conjunto principal de data/
+    """
+    years = available_years()
+    if not years:
+        return None
+    year = st.sidebar.selectbox(
+        "📅 Ano",
+        [None] + years[::-1],
+        format_func=lambda y: "Consolidado" if y is None else str(y),
+        key='year',
+    )
+    st.sidebar.markdown("---")
+    return year
+
+
+@st.cache_resource
+def get_registry(source, directory):
+    """
+    Registro preguiçoso dos datasets: views materializadas do warehouse
+    (``source='warehouse'``) ou arquivos de ``directory`` versionados pelo
+    manifesto
+    """
+    from pipeline.manifest import artifact_versions
+    from pipeline.snapshot import read_dataset
+    if source == 'warehouse':
+        from pipeline.warehouse import VIEWS, read_view
+        pool = get_warehouse_pool()
+
+        def read(key):
+            # Datasets sem view (ex.: propagação de atrasos) vêm de data/
+            return read_view(pool, key) if key in VIEWS else read_dataset(directory, key)
+
+        def versions():
+            files = artifact_versions(directory)
+            return {**{k: v for k, v in files.items() if k not in VIEWS}, **warehouse_versions()}
+
+        return DatasetRegistry(read, versions)
+    return DatasetRegistry(lambda key: read_dataset(directory, key),
+                           lambda: artifact_versions(directory))
+
+
+@st.cache_resource
+def get_service_registry(year=None):
+    """
+    Registro dos datasets do ano servidos pelo serviço de consultas
+    """
+    return get_service_client().registry(year)
+
+
+def load_data(year=None):
+    """
+    Dados dos relatórios e gráficos do ano (None = data/), carregados sob
+    demanda. Datasets regenerados (hash novo no manifesto ou refresh do
+    warehouse) são relidos em segundo plano sem reiniciar o servidor.
+    """
+    if get_service_client() is not None:
+        registry = get_service_registry(year)
+    elif year is not None:
+        # O warehouse cobre só o conjunto principal
+        registry = get_registry('files', data_dir(year))
+    else:
+        # Pasta resolvida a cada chamada: benchmark e exportação trocam DATA_DIR
+        registry = get_registry('warehouse' if warehouse_versions() else 'files', data_dir())
+    try:
+        registry.refresh()
     except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
+        st.warning(f"Não foi possível verificar novas versões dos dados: {e}")
+    if registry.reloading:
+        st.toast("Nova versão dos dados detectada; atualizando em segundo plano...")
+    for key, error in registry.stale().items():
+        st.warning(f"Falha ao recarregar {key}; exibindo a versão anterior: {error}")
+    return Datasets(registry, DATASET_KEYS)
+
+
+def dataset_or_error(data, key):
+    """
+    ``data[key]`` ou None, exibindo o erro só na seção que depende do dataset
+    """
+    try:
+        return data[key]
+    except DatasetError as e:
+        st.error(f"Dados indisponíveis ({e.key}): {e.error}")
         return None
 
 
+def show_chart(figures, builder, data, keys, selection):
+    """
+    Exibe a figura (via cache de figuras); a falha de um dataset afeta só
+    este gráfico
+    """
+    profiler = current()
+    try:
+        with profiler.stage(f'figura:{builder.__name__}'):
+            fig = figures.figure(builder, data, keys, selection)
+    except DatasetError as e:
+        st.error(f"Dados indisponíveis ({e.key}): {e.error}")
+        return
+    profiler.figure(builder.__name__, fig)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def show_table(name, df, chunks=None, total=None, **kwargs):
+    """
+    ``st.dataframe`` com o tamanho do payload registrado pelo profiler e a
+    exportação da tabela. ``chunks()`` devolve as partes da tabela completa
+    (padrão: o próprio ``df``) e ``total`` o número de linhas.
+    """
+    from pipeline.download import frame_chunks
+    current().table(name, df)
+    st.dataframe(df, **kwargs)
+    download_section(name, chunks or (lambda: frame_chunks(df)),
+                     len(df) if total is None else total)
+
+
+@st.cache_resource
+def get_export_jobs():
+    """
+    Exportações em segundo plano, compartilhadas pelas sessões
+    """
+    from pipeline.download import ExportJobs
+    return ExportJobs(EXPORT_DIR)
+
+
+def fragment(run_every):
+    """
+    ``st.fragment`` que se atualiza sozinho; sem ele, a função roda junto
+    com a página
+    """
+    try:
+        return st.fragment(run_every=run_every)
+    except AttributeError:  # Streamlit < 1.37
+        return lambda function: function
+
+
+def download_section(name, chunks, total):
+    """
+    Exportação da tabela em CSV, Parquet ou XLSX, com os filtros e a
+    ordenação atuais. As partes são gravadas numa thread do pool; o script
+    só agenda o job e acompanha o progresso.
+    """
+    from pipeline.download import available_formats
+    key = f'export_{name}'
+    jobs = get_export_jobs()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        fmt = st.selectbox("Formato da exportação", available_formats(), key=f'{key}_format',
+                           label_visibility='collapsed')
+    with col2:
+        if st.button(f"⬇️ Exportar {total:,} linhas", key=f'{key}_start'):
+            previous = jobs.get(st.session_state.get(key))
+            if previous is not None:
+                previous.cancel()
+            st.session_state[key] = jobs.submit(name, chunks(), fmt, total).id
+    job = jobs.get(st.session_state.get(key))
+    if job is None:
+        return
+    if job.done:
+        export_result(key, job)
+    else:
+        export_progress(key, job)
+
+
+@fragment(run_every=1)
+def export_progress(key, job):
+    """
+    Progresso da exportação, atualizado a cada segundo; ao terminar, a
+    página é refeita para mostrar o download
+    """
+    if job.done:
+        st.rerun()
+    st.progress(job.fraction, text=f"Gravando {job.file_name}: {job.rows:,} de "
+                                   f"{job.total:,} linhas")
+    if st.button("Cancelar", key=f'{key}_cancel'):
+        job.cancel()
+    if not hasattr(st, 'fragment'):
+        st.button("🔄 Atualizar", key=f'{key}_refresh')
+
+
+def export_result(key, job):
+    """
+    Botão de download do arquivo pronto (ou o erro da exportação)
+    """
+    from pipeline.download import ExportCancelled
+    if isinstance(job.error, ExportCancelled):
+        st.caption("Exportação cancelada.")
+        return
+    if job.error is not None:
+        st.error(f"Falha na exportação: {job.error}")
+        return
+    size = job.size / 2 ** 20
+    if size > DOWNLOAD_MAX_MB:
+        st.info(f"Arquivo de {size:,.0f} MB ({job.rows:,} linhas) gravado em `{job.path}`; "
+                f"grande demais para o download pelo navegador.")
+        return
+    st.download_button(f"💾 Baixar {job.file_name} ({job.rows:,} linhas, {size:,.1f} MB)",
+                       file_reader(job.path), file_name=job.file_name, mime=job.mime,
+                       key=f'{key}_download')
+
+
+def file_reader(path):
+    """
+    Conteúdo do arquivo lido só no clique (download diferido do Streamlit);
+    nas versões sem ele, os bytes
+    """
+    try:
+        from streamlit.runtime.media_file_manager import MediaFileManager
+        deferred = hasattr(MediaFileManager, 'add_deferred')
+    except ImportError:
+        deferred = False
+
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read if deferred else read()
+
+
+def uncertainty_section(data, key, top=None):
+    """
+    Intervalos de confiança (bootstrap) e estabilidade do ranking de um
+    relatório; ``top`` limita às primeiras posições
+    """
+    with st.expander("📏 Incerteza do Ranking (bootstrap, IC 95%)"):
+        try:
+            df = data[key]
+        except DatasetError as e:
+            if isinstance(e.error, FileNotFoundError):
+                st.info("Intervalos disponíveis após rodar o bootstrap: "
+                        "`python -m pipeline ... --bootstrap` ou "
+                        "`python -m pipeline.bootstrap --state state/flights_state.npz ...`")
+            else:
+                st.error(f"Dados indisponíveis ({e.key}): {e.error}")
+            return
+        if top is not None:
+            df = df[df['Ranking'] <= top]
+        st.caption("Percentis 2,5% e 97,5% das reamostras dos voos de cada entidade no período "
+                   "completo, com os pesos padrão (não seguem os filtros nem o what-if). "
+                   "Faixas de ranking largas e baixa chance de manter a posição indicam "
+                   "posições que podem mudar só pelo acaso, típico de poucos voos.")
+        show_table(key, df, use_container_width=True, hide_index=True)
+
+
+def profiling_enabled():
+    """
+    Instrumentação ligada por ``DASHBOARD_PROFILE=1`` ou ``?profile=1`` na URL
+    """
+    if os.environ.get('DASHBOARD_PROFILE', '0') not in ('', '0'):
+        return True
+    try:
+        return st.query_params.get('profile') == '1'
+    except AttributeError:  # Streamlit < 1.30
+        return st.experimental_get_query_params().get('profile') == ['1']
+
+
+def start_profiler():
+    """
+    Profiler do rerun (``NULL_PROFILER`` se a instrumentação está desligada)
+    """
+    if not profiling_enabled():
+        return activate(NULL_PROFILER)
+    session = st.session_state.setdefault('_profile_session', os.urandom(4).hex())
+    return activate(Profiler(session))
+
+
+def diagnostics_panel(profiler, figures, registry):
+    """
+    Fecha o rerun do profiler e exibe o painel de diagnóstico na barra
+    lateral (só com a instrumentação ligada)
+    """
+    if not profiler.enabled:
+        return
+    profiler.cache('figuras', figures.stats())
+    profiler.cache('datasets', registry.stats())
+    record = profiler.finish()
+
+    with st.sidebar.expander("🩺 Diagnóstico", expanded=False):
+        col1, col2 = st.columns(2)
+        col1.metric("Rerun", f"{record['total_seconds']:.2f} s")
+        col2.metric("RSS", f"{record['rss_mb']:,.0f} MB")
+        st.markdown("**Etapas**")
+        st.dataframe(pd.DataFrame(record['stages']), use_container_width=True, hide_index=True)
+        if record['payloads']:
+            st.markdown("**Payloads enviados ao navegador**")
+            payloads = pd.DataFrame(record['payloads'])
+            payloads['kb'] = (payloads.pop('bytes') / 1024).round(1)
+            st.dataframe(payloads, use_container_width=True, hide_index=True)
+        st.markdown("**Caches**")
+        caches = pd.DataFrame(record['caches']).T
+        st.dataframe(caches, use_container_width=True)
+
+
+def cube_path(year=None):
+    return CUBE_PATH if year is None else os.path.join(data_dir(year), 'cube.npz')
+
+
+def series_path(year=None):
+    return os.path.join(data_dir(year), 'series.npz')
+
+
+def npz_version(key, path, year=None):
+    """
+    Hash do artefato .npz no manifesto (ou tamanho e mtime do arquivo); None
+    se o arquivo não existe
+    """
+    from pipeline.manifest import artifact_versions
+    if not os.path.exists(path):
+        return None
+    try:
+        version = artifact_versions(data_dir(year)).get(key)
+    except ValueError:
+        version = None
+    if version is None:
+        # Arquivo gravado fora do pipeline (ou manifesto sem ele)
+        stat = os.stat(path)
+        version = f"{stat.st_size}:{stat.st_mtime_ns}"
+    return version
+
+
+def cube_version(year=None):
+    """
+    Hash do cubo no manifesto (ou tamanho e mtime do arquivo); None sem cubo
+    """
+    return service_version('cube', year) if SERVICE_URL else \
+        npz_version('cube', cube_path(year), year)
+
+
+def series_version(year=None):
+    """
+    Hash das séries horárias no manifesto (ou tamanho e mtime); None sem elas
+    """
+    return service_version('series', year) if SERVICE_URL else \
+        npz_version('series', series_path(year), year)
+
+
+def service_version(key, year=None):
+    """
+    Versão do artefato no serviço de consultas (None se indisponível)
+    """
+    from pipeline.service import ServiceError
+    try:
+        return get_service_client().versions(year).get(key)
+    except (ServiceError, OSError):
+        return None
+
+
+@st.cache_resource
+def get_figure_cache():
+    """
+    Cache LRU das figuras, compartilhado entre sessões e reruns
+    """
+    from pipeline.figcache import FigureCache
+    return FigureCache()
+
+
+@st.cache_resource(max_entries=2)
+def load_flight_cube(version, year=None):
+    """
+    Carrega o cubo OLAP gerado pelo pipeline (data/cube.npz ou o do ano);
+    ``version`` (hash do cubo) recarrega o arquivo quando ele é regenerado
+    """
+    from pipeline.cube import load_cube
+    if version is None:
+        return None
+    try:
+        return load_cube(cube_path(year))
+    except Exception as e:
+        st.warning(f"Cubo OLAP indisponível, usando os CSVs: {e}")
+        return None
+
+
+@st.cache_resource(max_entries=2)
+def load_series_store(version, year=None):
+    """
+    Séries horárias por companhia (data/series.npz ou a do ano), com o
+    cache de consultas downsampled; None sem o arquivo
+    """
+    if version is None:
+        return None
+    try:
+        if SERVICE_URL:
+            from pipeline.service import RemoteSeriesStore
+            return RemoteSeriesStore(get_service_client(), year)
+        from pipeline.timeseries import load_series
+        return load_series(series_path(year))
+    except Exception as e:
+        st.warning(f"Séries horárias indisponíveis: {e}")
+        return None
+
+
+@st.cache_resource(max_entries=2)
+def load_dashboard_filters(version, airline_names=(), year=None):
+    """
+    Índices dos filtros da barra lateral sobre o cubo (None sem o cubo);
+    com o serviço de consultas, o cubo fica nele
+    """
+    if SERVICE_URL and version is not None:
+        from pipeline.service import RemoteFilters, ServiceError
+        try:
+            return RemoteFilters(get_service_client(), year)
+        except (ServiceError, OSError) as e:
+            st.warning(f"Filtros indisponíveis no serviço de consultas: {e}")
+            return None
+    cube = load_flight_cube(version, year)
+    if cube is None:
+        return None
+    from pipeline.filters import DashboardFilters
+    return DashboardFilters(cube, dict(airline_names))
+
+
+def sidebar_filters(filters):
+    """
+    Widgets de filtro da barra lateral; retorna os argumentos de
+    ``DashboardFilters.datasets`` (None = sem filtro na dimensão)
+    """
+    st.sidebar.header("🔎 Filtros")
+
+    airlines = st.sidebar.multiselect(
+        "Companhias Aéreas",
+        filters.airlines,
+        format_func=lambda code: f"{code} - {filters.airline_names.get(code, code)}",
+        placeholder="Todas",
+    )
+    first, last = st.sidebar.select_slider(
+        "Meses",
+        options=filters.months,
+        value=(filters.months[0], filters.months[-1]),
+        format_func=lambda m: calendar.month_abbr[m],
+    )
+    airport = st.sidebar.selectbox(
+        "Aeroporto (origem ou destino)",
+        [None] + filters.airports,
+        format_func=lambda code: "Todos" if code is None else
+        f"{code} - {filters.airport_info.get(code, ('',))[0]}".rstrip(' -'),
+    )
+    st.sidebar.markdown("---")
+
+    months = list(range(first, last + 1))
+    return {
+        'airlines': airlines or None,
+        'months': None if months == filters.months else months,
+        'airports': None if airport is None else [airport],
+    }
+
+
+# Sliders de pesos: (grupo, chave, rótulo, máximo, passo)
+WEIGHT_SLIDERS = [
+    ("Ranking de companhias (menor = melhor)", 'ranking_delay', "Atraso médio", 5.0, 0.1),
+    ("Ranking de companhias (menor = melhor)", 'ranking_cancellation', "Taxa de cancelamento", 30.0, 0.5),
+    ("Ranking de companhias (menor = melhor)", 'ranking_punctuality', "100 − pontualidade", 5.0, 0.1),
+    ("Score do gráfico 2 (0-100, maior = melhor)", 'chart_punctuality', "Pontualidade", 100.0, 1.0),
+    ("Score do gráfico 2 (0-100, maior = melhor)", 'chart_delay', "Atraso médio", 100.0, 1.0),
+    ("Score do gráfico 2 (0-100, maior = melhor)", 'chart_cancellation', "Cancelamentos", 100.0, 1.0),
+    ("Criticidade de rotas (maior = pior)", 'route_delay', "Atraso médio", 5.0, 0.1),
+    ("Criticidade de rotas (maior = pior)", 'route_cancellation', "Taxa de cancelamento", 50.0, 0.5),
+]
+
+
+def reset_weights():
+    from pipeline.whatif import DEFAULT_WEIGHTS
+    for key, value in DEFAULT_WEIGHTS.items():
+        st.session_state[f'weight_{key}'] = value
+
+
+def sidebar_weights():
+    """
+    Sliders dos pesos dos scores (cenário what-if); retorna o dict de pesos
+    """
+    from pipeline.whatif import DEFAULT_WEIGHTS
+    weights = {}
+    with st.sidebar.expander("⚖️ Pesos dos Scores (what-if)"):
+        group = None
+        for title, key, label, maximum, step in WEIGHT_SLIDERS:
+            if title != group:
+                st.caption(title)
+                group = title
+            weights[key] = st.slider(label, 0.0, maximum, DEFAULT_WEIGHTS[key], step,
+                                     key=f'weight_{key}')
+        st.button("Restaurar padrões", on_click=reset_weights)
+    return weights
+
+
 def create_temporal_trend_chart(data):
     """
     Cria gráfico de tendência temporal de atrasos
     """
     df = data['grafico_01']
+    period = period_label(data)
 
     # Criando subplot com eixo secundário
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig = subplots.make_subplots(specs=[[{"secondary_y": True}]])
 
     # Linha principal - Atraso médio
     fig.add_trace(
@@ -137,7 +695,7 @@ def create_temporal_trend_chart(data):
     fig.update_yaxes(title_text="Volume (milhares) / Pontualidade (%)", secondary_y=True)
 
     fig.update_layout(
-        title="Tendência Temporal de Atrasos ao Longo de 2015",
+        title="Tendência Temporal de Atrasos" + (f" ao Longo de {period}" if period else ""),
         height=500,
         hovermode='x unified'
     )
@@ -193,7 +751,8 @@ def create_heatmap_chart(data):
     """
     df_atrasos = data['grafico_03_atrasos'].set_index('day_name')
 
-    # Convertendo colunas para numérico
+    # Convertendo colunas para numérico (horas sem voos chegam como None
+    # das views do warehouse)
     for col in df_atrasos.columns:
         df_atrasos[col] = pd.to_numeric(df_atrasos[col], errors='coerce')
 
@@ -251,42 +810,582 @@ def create_causes_pie_chart(data):
     return fig
 
 
+def create_propagation_chart(data):
+    """
+    Cria gráfico de atraso herdado vs gerado por hora de partida
+    """
+    df = data['propagacao_hora']
+    hours = [f"{h:02d}:00" for h in df['hour']]
+
+    fig = subplots.make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Barras empilhadas - atraso médio de partida decomposto
+    fig.add_trace(
+        go.Bar(
+            x=hours,
+            y=df['Atraso Gerado Médio (min)'],
+            name='Gerado no voo (min)',
+            marker_color='#45b7d1'
+        ),
+        secondary_y=False,
+    )
+    fig.add_trace(
+        go.Bar(
+            x=hours,
+            y=df['Atraso Herdado Médio (min)'],
+            name='Herdado da perna anterior (min)',
+            marker_color='#ff6b6b'
+        ),
+        secondary_y=False,
+    )
+
+    # Linha - participação do atraso herdado
+    fig.add_trace(
+        go.Scatter(
+            x=hours,
+            y=df['Atraso Herdado (%)'],
+            mode='lines+markers',
+            name='Atraso Herdado (%)',
+            line=dict(color='#feca57', width=3),
+            marker=dict(size=6)
+        ),
+        secondary_y=True,
+    )
+
+    fig.update_layout(
+        title="Propagação de Atrasos: Herdado vs Gerado por Hora de Partida",
+        barmode='stack',
+        height=500,
+        hovermode='x unified'
+    )
+    fig.update_xaxes(title_text="Hora Prevista de Partida")
+    fig.update_yaxes(title_text="Atraso Médio de Partida (min)", secondary_y=False)
+    fig.update_yaxes(title_text="Atraso Herdado (%)", range=[0, 100], secondary_y=True)
+
+    return fig
+
+
+def propagation_section(data, figures, selection):
+    """
+    Gráfico e tabelas de atraso herdado pelas rotações das aeronaves
+    """
+    from pipeline.download import frame_chunks
+    try:
+        airports = data['propagacao_aeroportos']
+        airlines = data['propagacao_companhias']
+    except DatasetError as e:
+        if isinstance(e.error, FileNotFoundError):
+            st.info("Análise disponível após rodar a etapa de propagação: "
+                    "`python -m pipeline.propagation --flights raw/flights.csv ...`")
+        else:
+            st.error(f"Dados indisponíveis ({e.key}): {e.error}")
+        return
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        show_chart(figures, create_propagation_chart, data, ['propagacao_hora'], selection)
+
+    with col2:
+        inherited = airlines['Atraso Herdado Total (min)'].sum()
+        delay = (airlines['Atraso Médio Partida (min)'] * airlines['Total Voos']).sum()
+        st.markdown("""
+        ### ✈️ **Rotações das Aeronaves:**
+        """)
+
+        st.markdown(f"""
+        <div class="highlight-metric">
+        <strong>🔗 Atraso Herdado:</strong><br>
+        {inherited / delay * 100 if delay else 0:.1f}% dos minutos de atraso na partida
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("""
+        <div class="insight-item">
+        <strong>Herdado:</strong><br>
+        Atraso trazido pela perna anterior da mesma aeronave, descontada a folga de solo
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("""
+        <div class="insight-item">
+        <strong>Gerado:</strong><br>
+        Restante do atraso de partida, originado no próprio voo
+        </div>
+        """, unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**🛫 Aeroportos que mais recebem atraso herdado**")
+        show_table('propagacao_aeroportos', airports.head(20),
+                   chunks=lambda: frame_chunks(airports), total=len(airports),
+                   use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("**🏢 Atraso herdado por companhia**")
+        show_table('propagacao_companhias', airlines, use_container_width=True, hide_index=True)
+
+
+def create_series_chart(traces, metric):
+    """
+    Cria gráfico das séries por companhia (traces já reduzidos no servidor)
+    """
+    from pipeline.timeseries import METRICS
+    fig = go.Figure()
+    for airline, (x, y) in traces.items():
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines', name=airline, line=dict(width=1.5)))
+
+    fig.update_xaxes(title_text="Data")
+    fig.update_yaxes(title_text=METRICS[metric])
+    fig.update_layout(
+        title=f"{METRICS[metric]} por Companhia",
+        height=450,
+        hovermode='x unified'
+    )
+    return fig
+
+
+def series_section(store, airline_names):
+    """
+    Séries diárias/horárias por companhia: a janela escolhida define a
+    resolução e cada trace chega ao navegador com no máximo POINT_BUDGET
+    pontos
+    """
+    from pipeline.timeseries import METHODS, METRICS, POINT_BUDGET
+    if store is None:
+        st.info("Séries disponíveis após gerar `series.npz`: "
+                "`python -m pipeline ... --series data/series.npz`")
+        return
+
+    first, last = store.span
+    first = pd.Timestamp(first).normalize().to_pydatetime()
+    last = pd.Timestamp(last).normalize().to_pydatetime()
+    volumes = list(store.volumes())
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        airlines = st.multiselect(
+            "Companhias", volumes, default=volumes[:3], key='series_airlines',
+            format_func=lambda code: f"{code} - {airline_names.get(code, code)}",
+        )
+    with col2:
+        metric = st.selectbox("Métrica", list(METRICS), format_func=METRICS.get, key='series_metric')
+    with col3:
+        method = st.radio("Redução", METHODS, horizontal=True, key='series_method',
+                          format_func={'lttb': 'LTTB', 'minmax': 'Mín/Máx'}.get)
+    # A janela é o zoom: janelas curtas usam a série horária, longas a diária
+    start, end = st.slider("Janela", min_value=first, max_value=last, value=(first, last),
+                           step=pd.Timedelta(days=1).to_pytimedelta(), format="DD/MM/YYYY",
+                           key='series_window')
+    start = np.datetime64(start, 'h')
+    end = np.datetime64(end, 'h') + np.timedelta64(23, 'h')
+
+    traces, info = {}, None
+    with current().stage('series:consulta'):
+        for airline in airlines:
+            x, y, info = store.query(airline, start, end, metric, POINT_BUDGET, method)
+            traces[airline] = x, y
+    fig = create_series_chart(traces, metric)
+    current().figure('create_series_chart', fig)
+    current().cache('series', store.stats())
+    st.plotly_chart(fig, use_container_width=True)
+    if info is not None:
+        resolution = {'hora': 'horária', 'dia': 'diária'}[info['resolution']]
+        st.caption(f"Resolução {resolution}: até {POINT_BUDGET} pontos por companhia "
+                   f"(última: {info['points']:,} de {info['raw_points']:,}).")
+
+
+@st.cache_resource(max_entries=2)
+def build_route_table(version, _data, _filters):
+    """
+    Tabela indexada de todas as rotas: dataset ``rotas`` (arquivo ou view do
+    warehouse) ou, sem ele, o cubo. ``version`` identifica a origem, o ano e
+    a versão (None sem manifesto, por isso o ano na chave).
+    """
+    from pipeline.cube import route_frame
+    from pipeline.routes import RouteTable
+    if version[0] == 'rotas':
+        return RouteTable(_data['rotas'])
+    return RouteTable(route_frame(_filters.summary))
+
+
+def load_route_table(data, filters, year=None):
+    """
+    Tabela de rotas em cache (None se não há dataset de rotas nem cubo)
+    """
+    try:
+        routes = data['rotas']
+    except DatasetError:
+        routes = None
+    if routes is not None:
+        version = 'rotas', year, data.version('rotas')
+    elif filters is not None and filters.summary is not None:
+        version = 'cube', year, cube_version(year)
+    else:
+        return None
+    return build_route_table(version, data, filters)
+
+
+def route_explorer(table, weights=None):
+    """
+    Explorador de rotas: busca, filtros, ordenação e paginação feitos no
+    servidor; só a página atual vai para o navegador
+    """
+    from pipeline.routes import SORT_COLUMNS
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        text = st.text_input("Buscar (código IATA ou cidade)", key='routes_text',
+                             placeholder="ex.: ATL, chicago, san fr")
+    with col2:
+        regions = st.multiselect("Região (origem ou destino)", list(table.regions),
+                                 key='routes_regions', placeholder="Todas")
+    with col3:
+        airlines = st.multiselect("Companhia operadora", list(table.airlines),
+                                  key='routes_airlines', placeholder="Todas")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        origins = st.multiselect("Origem", list(table.airports), key='routes_origins',
+                                 placeholder="Todas")
+    with col2:
+        dests = st.multiselect("Destino", list(table.airports), key='routes_dests',
+                               placeholder="Todos")
+    with col3:
+        states = st.multiselect("Estado (origem ou destino)", list(table.states),
+                                key='routes_states', placeholder="Todos")
+    with col4:
+        min_flights = st.number_input("Mínimo de voos", min_value=0, value=100, step=50,
+                                      key='routes_min_flights')
+
+    mask = table.select(text=text, origins=origins, dests=dests, states=states,
+                        regions=regions, airlines=airlines, min_flights=min_flights)
+    total = int(mask.sum())
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort = st.selectbox("Ordenar por", list(SORT_COLUMNS), key='routes_sort')
+    with col2:
+        descending = st.radio("Ordem", ["Decrescente", "Crescente"], horizontal=True,
+                              key='routes_order') == "Decrescente"
+    with col3:
+        page_size = st.selectbox("Rotas por página", [25, 50, 100], index=1, key='routes_page_size')
+    with col4:
+        pages = max(1, -(-total // page_size))
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1,
+                               key='routes_page')
+
+    df, total = table.page(mask, sort, descending, min(page, pages) - 1, page_size, weights)
+    delay, cancel = weights or (1, 15)
+    st.caption(f"{total:,} de {len(table):,} rotas • Score de criticidade = "
+               f"{delay:g} × Atraso Médio + {cancel:g} × Taxa Cancelamento")
+    show_table('rotas', df, chunks=lambda: table.chunks(mask, sort, descending, weights),
+               total=total, use_container_width=True, hide_index=True)
+
+
+# Mapa de rotas: cores das faixas de criticidade (menos -> mais crítica),
+# espessuras por faixa de volume e teto do payload da figura
+CRITICALITY_COLORS = ['#1a9850', '#91cf60', '#fee08b', '#fc8d59', '#d73027']
+ARC_WIDTHS = [1.0, 2.0, 3.5]
+ROUTE_MAP_MAX_KB = 600
+
+
+@st.cache_resource(max_entries=2)
+def build_route_map(version, _table, _airports):
+    """
+    Grupos e centroides do mapa de rotas; ``version`` identifica a tabela
+    de rotas e o lookup de coordenadas
+    """
+    from pipeline.routemap import RouteMap
+    return RouteMap(_table, _airports)
+
+
+def load_route_map(data, table, year=None):
+    """
+    Mapa de rotas em cache (None sem tabela de rotas ou sem coordenadas)
+    """
+    if table is None:
+        return None
+    try:
+        airports = data['aeroportos']
+    except DatasetError:
+        return None
+    if not len(airports):
+        return None
+    version = data.version('rotas') or cube_version(year), data.version('aeroportos')
+    return build_route_map(version, table, airports)
+
+
+def create_route_map_chart(view):
+    """
+    Cria o mapa de rotas em WebGL: um trace por faixa de criticidade e de
+    volume (arcos separados por NaN), os pontos médios para o hover e os nós
+    """
+    from pipeline.routemap import LEVELS, criticality_bins, polylines
+    arcs, nodes = view.arcs, view.nodes
+    fig = go.Figure()
+    color, edges = criticality_bins(arcs.score, len(CRITICALITY_COLORS))
+    width, _ = criticality_bins(arcs.flights, len(ARC_WIDTHS))
+    for c, rgb in enumerate(CRITICALITY_COLORS):
+        name = f"{edges[c]:.1f} – {edges[c + 1]:.1f}"
+        for w, line_width in enumerate(ARC_WIDTHS):
+            ids = np.flatnonzero((color == c) & (width == w))
+            if not len(ids):
+                continue
+            x, y = polylines(arcs.xs[ids], arcs.ys[ids])
+            fig.add_trace(go.Scattergl(
+                x=x, y=y, mode='lines', line=dict(color=rgb, width=line_width),
+                opacity=0.75, name=name, legendgroup=name, showlegend=w == len(ARC_WIDTHS) - 1,
+                hoverinfo='skip'
+            ))
+
+    middle = arcs.xs.shape[1] // 2
+    fig.add_trace(go.Scattergl(
+        x=np.round(arcs.xs[:, middle], 2), y=np.round(arcs.ys[:, middle], 2), mode='markers',
+        marker=dict(size=5, color=[CRITICALITY_COLORS[c] for c in color]),
+        customdata=np.column_stack([arcs.flights, arcs.delay, arcs.cancel, arcs.score, arcs.routes]),
+        text=[f"{a} ↔ {b}" for a, b in zip(arcs.origin, arcs.dest)],
+        hovertemplate="<b>%{text}</b><br>Voos: %{customdata[0]:,}<br>"
+                      "Atraso médio: %{customdata[1]:.1f} min<br>"
+                      "Cancelamento: %{customdata[2]:.2f}%<br>"
+                      "Score: %{customdata[3]:.1f}<br>Rotas: %{customdata[4]}<extra></extra>",
+        showlegend=False
+    ))
+
+    size = 6 + 24 * np.sqrt(nodes.flights / max(nodes.flights.max(), 1)) if len(nodes.x) else []
+    fig.add_trace(go.Scattergl(
+        x=np.round(nodes.x, 2), y=np.round(nodes.y, 2),
+        mode='markers+text' if view.level != 'rota' else 'markers',
+        marker=dict(size=size, color='rgba(31, 119, 180, 0.6)', line=dict(width=1, color='white')),
+        text=nodes.label, textposition='top center', customdata=nodes.flights,
+        hovertemplate="<b>%{text}</b><br>Voos (partidas + chegadas): %{customdata:,}<extra></extra>",
+        showlegend=False
+    ))
+
+    (x0, x1), (y0, y1) = view.bounds
+    fig.update_xaxes(visible=False, range=[x0, x1])
+    fig.update_yaxes(visible=False, range=[y0, y1], scaleanchor='x')
+    fig.update_layout(
+        title=f"Rotas por {LEVELS[view.level]} (cor = score de criticidade)",
+        height=650,
+        plot_bgcolor='#f8f9fa',
+        legend_title_text="Score de criticidade",
+        uirevision=f"{view.area}:{view.level}",
+        margin=dict(l=10, r=10, t=60, b=10)
+    )
+    return fig
+
+
+def route_map_section(route_map, weights=None):
+    """
+    Mapa de rotas: a área escolhida é o zoom e define a agregação (estados
+    no país, rotas numa região ou estado); a figura fica abaixo de
+    ``ROUTE_MAP_MAX_KB``
+    """
+    from pipeline.routemap import LEVELS, MAX_ARCS, MAX_POINTS, MIN_ARC_POINTS
+    areas = route_map.areas()
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        area = st.selectbox(
+            "Área (zoom)", areas, key='map_area',
+            format_func=lambda a: "EUA (todas as rotas)" if a[0] is None else
+            f"{LEVELS[a[0]]}: {a[1]}",
+        )
+    with col2:
+        level = st.radio("Agrupamento", [None] + list(LEVELS), horizontal=True, key='map_level',
+                         format_func=lambda level: "Automático" if level is None else LEVELS[level])
+    with col3:
+        min_flights = st.number_input("Mínimo de voos", min_value=0, value=0, step=50,
+                                      key='map_min_flights')
+
+    max_arcs, max_points = MAX_ARCS, MAX_POINTS
+    while True:
+        with current().stage('mapa:agregacao'):
+            view = route_map.view(area, level, weights, min_flights, max_arcs, max_points)
+        fig = create_route_map_chart(view)
+        payload = len(fig.to_json())
+        if payload <= ROUTE_MAP_MAX_KB * 1024 or len(view.arcs.flights) <= 50:
+            break
+        # Acima do teto: primeiro menos vértices por arco, depois menos arcos
+        # (os de menos voos saem primeiro)
+        if view.points > MIN_ARC_POINTS:
+            max_points = len(view.arcs.flights) * (view.points // 2)
+        else:
+            max_arcs = len(view.arcs.flights) // 2
+    current().figure('create_route_map_chart', fig)
+    st.plotly_chart(fig, use_container_width=True)
+    shown = len(view.arcs.flights)
+    st.caption(f"{shown:,} de {view.total_arcs:,} ligações ({view.routes:,} rotas) • "
+               f"{view.points} vértices por arco • figura com {payload / 1024:,.0f} KB"
+               + (" • ligações com menos voos omitidas" if shown < view.total_arcs else ""))
+
+
+def period_label(data):
+    """
+    Ano(s) cobertos pelos dados, lido da série mensal do pipeline
+    (``date_label``; a série filtrada pelo cubo não tem a coluna); '' se
+    indisponível
+    """
+    registry = getattr(data, 'registry', None)
+    try:
+        monthly = registry.get('grafico_01') if registry is not None else data['grafico_01']
+    except DatasetError:
+        return ''
+    return period_of(monthly)
+
+
+def headline_metrics(data):
+    """
+    Métricas do topo da página calculadas da série mensal e do ranking
+    (seguem o ano e os filtros); None se os datasets faltam
+    """
+    try:
+        monthly = data['grafico_01']
+        ranking = data['relatorio_01']
+    except DatasetError:
+        return None
+    return format_metrics(headline_values(monthly, ranking))
+
+
+def format_metrics(values):
+    """
+    Textos das métricas do topo a partir de ``headline_values`` (ou do
+    resumo pré-calculado)
+    """
+    total = values['flights']
+    return {
+        'flights': f"{total / 1e6:.1f}M" if total >= 1e6 else f"{total:,}",
+        'airlines': str(values['airlines']),
+        'on_time': f"{values['on_time_pct']:.1f}%",
+        'delay': f"{values['avg_delay']:.1f} min",
+    }
+
+
+def load_summary(year=None):
+    """
+    Resumo pré-calculado do ano (data/resumo.json ou o do serviço) para o
+    primeiro paint; None se indisponível
+    """
+    client = get_service_client()
+    if client is None:
+        return read_summary(data_dir(year))
+    from pipeline.service import ServiceError
+    try:
+        return client.summary(year)
+    except (ServiceError, OSError):
+        return None
+
+
+def show_header(placeholder, period):
+    """
+    Título e subtítulo da página no ``st.empty()`` do cabeçalho
+    """
+    title = f"✈️ Dashboard - Análise de Voos {period}".rstrip()
+    with placeholder.container():
+        st.markdown(f'<h1 class="main-header">{title}</h1>', unsafe_allow_html=True)
+
+        st.markdown(f"""
+        <div style='text-align: center; margin-bottom: 2rem;'>
+            <h3>Data Warehouse - Tópicos Especiais em Banco de Dados</h3>
+            <p><em>Análise completa de performance do setor aéreo americano{f' em {period}' if period else ''}</em></p>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def show_metrics(placeholder, metrics):
+    """
+    Métricas principais no ``st.empty()`` logo abaixo do cabeçalho
+    """
+    with placeholder.container():
+        st.header("📊 Métricas Principais")
+        col1, col2, col3, col4 = st.columns(4)
+
+        with col1:
+            st.metric("Total de Voos", metrics['flights'], "Analisados")
+        with col2:
+            st.metric("Companhias", metrics['airlines'], "Avaliadas")
+        with col3:
+            st.metric("Pontualidade Média", metrics['on_time'], "≤ 15min atraso")
+        with col4:
+            st.metric("Atraso Médio", metrics['delay'], "Chegada")
+
+
 # INTERFACE PRINCIPAL
 def main():
-    # Header principal
-    st.markdown('<h1 class="main-header">✈️ Dashboard - Análise de Voos 2015</h1>',
-                unsafe_allow_html=True)
-
-    st.markdown("""
-    <div style='text-align: center; margin-bottom: 2rem;'>
-        <h3>Data Warehouse - Tópicos Especiais em Banco de Dados</h3>
-        <p><em>Análise completa de performance do setor aéreo americano em 2015</em></p>
-    </div>
-    """, unsafe_allow_html=True)
-
-    # Carregamento dos dados
-    with st.spinner('Carregando dados do Data Warehouse...'):
-        data = load_data()
-
-    if data is None:
-        st.error("Falha ao carregar os dados. Verifique os arquivos na pasta 'data/'.")
-        return
+    # Instrumentação opcional (DASHBOARD_PROFILE=1 ou ?profile=1)
+    profiler = start_profiler()
+
+    # Ano selecionado: cada ano gerado pelo store particionado tem sua pasta
+    year = sidebar_year()
+
+    # Primeiro paint da sessão (por ano): cabeçalho e métricas do resumo
+    # pré-calculado, antes de ler os datasets; os valores reais substituem
+    # o resumo mais abaixo
+    header, metrics_panel = st.empty(), st.empty()
+    painted = st.session_state.setdefault('painted_years', set())
+    summary = load_summary(year) if year not in painted else None
+    if summary is not None:
+        show_header(header, str(year) if year is not None else summary['period'])
+        show_metrics(metrics_panel, format_metrics(summary))
+
+    # Datasets carregados sob demanda; cada seção trata a falha do seu
+    with profiler.stage('load_data'):
+        data = load_data(year)
+    # Leitura em segundo plano do que os filtros do cubo não recalculam
+    data.prefetch(EARLY_KEYS)
+
+    period = str(year) if year is not None else period_label(data)
+    show_header(header, period)
+
+    # Com o cubo disponível, gráficos e relatórios seguem os filtros da barra lateral
+    try:
+        ranking = data['relatorio_01']
+        airline_names = tuple(zip(ranking['Código'], ranking['Companhia Aérea']))
+    except DatasetError:
+        airline_names = ()
+    with profiler.stage('filtros'):
+        filters = load_dashboard_filters(cube_version(year), airline_names, year)
+    selection = {}
+    if filters is not None:
+        selection = sidebar_filters(filters)
+        # Sem filtro ativo, os arquivos já são o resultado: nada a recalcular
+        if any(value is not None for value in selection.values()):
+            with profiler.stage('filtros:recalculo'):
+                data = data.override(filters.datasets(**selection))
+    else:
+        st.sidebar.caption("Filtros disponíveis após gerar o cubo OLAP "
+                           "(`python -m pipeline ... --cube data/cube.npz`)")
+    # Leitura paralela do que a página ainda vai exibir
+    data.prefetch(PAGE_KEYS)
+
+    # Pesos personalizados recalculam scores e rankings a partir das métricas base
+    from pipeline.whatif import is_default, route_weights, whatif_datasets
+    weights = sidebar_weights()
+    with profiler.stage('rotas'):
+        routes = load_route_table(data, filters, year)
+    if not is_default(weights):
+        try:
+            with profiler.stage('what-if'):
+                # Com filtro ativo, o relatorio_02 é recalculado sobre as rotas do recorte
+                filtered = any(value is not None for value in selection.values())
+                whatif_routes = filters.route_table(**selection) if filtered else routes
+                data = data.override(whatif_datasets(data, weights, whatif_routes))
+        except DatasetError:
+            pass  # a seção do dataset com erro já avisa
+
+    metrics = headline_metrics(data) or dict.fromkeys(['flights', 'airlines', 'on_time', 'delay'], '–')
 
     # Sidebar com informações do projeto
     st.sidebar.header("📋 Informações do Projeto")
 
-    st.sidebar.markdown("""
+    st.sidebar.markdown(f"""
     **Fonte dos Dados:**
     - U.S. Department of Transportation
     - Bureau of Transportation Statistics
-    - Ano: 2015
+    - Ano: {period or 'n/d'}
     - **[🔗 Link de Acesso aos Dados](https://www.kaggle.com/datasets/usdot/flight-delays?ref=hackernoon.com)**
 
     **Volume Analisado:**
-    - 5.8+ milhões de voos
-    - 14 companhias aéreas
-    - 7,465 rotas diferentes
-    - 1.8+ milhões de problemas catalogados
+    - {metrics['flights']} voos
+    - {metrics['airlines']} companhias aéreas
+    - {f"{len(routes):,}" if routes is not None else '–'} rotas diferentes
 
     **Integrantes da Equipe:**
     - Arthur Rodrigues
@@ -305,23 +1404,25 @@ def main():
         unsafe_allow_html=True
     )
 
-    # Métricas principais
-    st.header("📊 Métricas Principais")
-    col1, col2, col3, col4 = st.columns(4)
+    # Métricas principais (no lugar das do resumo)
+    show_metrics(metrics_panel, metrics)
+    painted.add(year)
 
-    with col1:
-        st.metric("Total de Voos", "5.8M+", "Analisados")
-    with col2:
-        st.metric("Companhias", "14", "Avaliadas")
-    with col3:
-        st.metric("Pontualidade Média", "79.0%", "≤ 15min atraso")
-    with col4:
-        st.metric("Atraso Médio", "4.4 min", "Chegada")
+    active = [name for name, value in selection.items() if value is not None]
+    if active:
+        labels = {'airlines': 'companhias', 'months': 'meses', 'airports': 'aeroporto'}
+        st.info("🔎 Gráficos e relatórios filtrados por: "
+                + ", ".join(labels[name] for name in active)
+                + ". Os destaques em texto se referem ao ano completo.")
+
+    figures = get_figure_cache()
 
     # Tabs principais
-    tab1, tab2, tab3 = st.tabs(["📋 Relatórios Tabulares", "📈 Análises Gráficas", "🔍 Metodologia"])
+    tab1, tab2, tab_routes, tab_map, tab3 = st.tabs([
+        "📋 Relatórios Tabulares", "📈 Análises Gráficas", "🧭 Explorador de Rotas",
+        "🗺️ Mapa de Rotas", "🔍 Metodologia"])
 
-    with tab1:
+    with tab1, profiler.stage('aba:relatorios'):
         st.header("📋 Relatórios Tabulares")
 
         # Sub-tabs para relatórios
@@ -344,7 +1445,10 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
-            st.dataframe(data['relatorio_01'], use_container_width=True, height=400)
+            report = dataset_or_error(data, 'relatorio_01')
+            if report is not None:
+                show_table('relatorio_01', report, use_container_width=True, height=400)
+            uncertainty_section(data, 'incerteza_companhias')
 
             with st.expander("📊 Metodologia do Ranking"):
                 st.markdown("""
@@ -376,7 +1480,10 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
-            st.dataframe(data['relatorio_02'], use_container_width=True, height=400)
+            report = dataset_or_error(data, 'relatorio_02')
+            if report is not None:
+                show_table('relatorio_02', report, use_container_width=True, height=400)
+            uncertainty_section(data, 'incerteza_rotas', top=20)
 
             with st.expander("📊 Metodologia das Rotas Críticas"):
                 st.markdown("""
@@ -412,13 +1519,15 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
-            st.dataframe(data['relatorio_03'], use_container_width=True, height=400)
+            report = dataset_or_error(data, 'relatorio_03')
+            if report is not None:
+                show_table('relatorio_03', report, use_container_width=True, height=400)
 
             with st.expander("📊 Metodologia da Sazonalidade"):
                 st.markdown("""
                 **Metodologia de Análise Temporal:**
 
-                A análise considera todos os voos realizados em 2015 agrupados por mês, calculando métricas consolidadas de performance para cada período. São analisados indicadores de volume operacional, pontualidade, atrasos médios, cancelamentos e principais causas de problemas operacionais. A metodologia permite identificação de meses críticos e períodos de melhor performance.
+                A análise considera todos os voos do período selecionado agrupados por mês, calculando métricas consolidadas de performance para cada período. São analisados indicadores de volume operacional, pontualidade, atrasos médios, cancelamentos e principais causas de problemas operacionais. A metodologia permite identificação de meses críticos e períodos de melhor performance.
 
                 **Métricas de Sazonalidade:**
 
@@ -448,7 +1557,9 @@ def main():
             </div>
             """, unsafe_allow_html=True)
 
-            st.dataframe(data['relatorio_04'], use_container_width=True, height=400)
+            report = dataset_or_error(data, 'relatorio_04')
+            if report is not None:
+                show_table('relatorio_04', report, use_container_width=True, height=400)
 
             with st.expander("📊 Metodologia das Causas"):
                 st.markdown("""
@@ -469,7 +1580,7 @@ def main():
                 Os problemas são categorizados por níveis de severidade baseados no impacto operacional, permitindo foco em causas que geram maior disrução. Cancelamentos recebem peso maior devido ao impacto total na experiência do passageiro, enquanto atrasos são ponderados pela duração média do impacto.
                 """)
 
-    with tab2:
+    with tab2, profiler.stage('aba:graficos'):
         st.header("📈 Análises Gráficas Interativas")
 
         # Gráfico 1: Tendência Temporal
@@ -477,8 +1588,8 @@ def main():
 
         col1, col2 = st.columns([3, 1])
         with col1:
-            fig1 = create_temporal_trend_chart(data)
-            st.plotly_chart(fig1, use_container_width=True)
+            show_chart(figures, create_temporal_trend_chart, data, ['grafico_01'],
+                       {**selection, 'year': year})
 
         with col2:
             st.markdown("""
@@ -516,8 +1627,7 @@ def main():
 
         col1, col2 = st.columns([3, 1])
         with col1:
-            fig2 = create_airline_performance_chart(data)
-            st.plotly_chart(fig2, use_container_width=True)
+            show_chart(figures, create_airline_performance_chart, data, ['grafico_02'], selection)
 
         with col2:
             st.markdown("""
@@ -559,8 +1669,7 @@ def main():
 
         col1, col2 = st.columns([3, 1])
         with col1:
-            fig3 = create_heatmap_chart(data)
-            st.plotly_chart(fig3, use_container_width=True)
+            show_chart(figures, create_heatmap_chart, data, ['grafico_03_atrasos'], selection)
 
         with col2:
             st.markdown("""
@@ -602,8 +1711,7 @@ def main():
 
         col1, col2 = st.columns([3, 1])
         with col1:
-            fig4 = create_causes_pie_chart(data)
-            st.plotly_chart(fig4, use_container_width=True)
+            show_chart(figures, create_causes_pie_chart, data, ['grafico_04_principais'], selection)
 
         with col2:
             st.markdown("""
@@ -638,6 +1746,34 @@ def main():
             - **Investimento**: Tecnologia e processos
             """)
 
+        st.markdown("---")
+
+        # Gráfico 5: Propagação de Atrasos
+        st.subheader("🔗 5. Propagação de Atrasos (Efeito Cascata)")
+        propagation_section(data, figures, selection)
+
+        st.markdown("---")
+        st.subheader("⏱️ 6. Séries Diárias e Horárias por Companhia")
+        series_section(load_series_store(series_version(year), year),
+                       dict(airline_names))
+
+    with tab_routes, profiler.stage('aba:rotas'):
+        st.header("🧭 Explorador de Rotas")
+        if routes is None:
+            st.info("Explorador disponível após regenerar os dados com o pipeline "
+                    "(`rotas_todas.csv`) ou gerar o cubo OLAP.")
+        else:
+            route_explorer(routes, route_weights(weights))
+
+    with tab_map, profiler.stage('aba:mapa'):
+        st.header("🗺️ Mapa de Rotas")
+        route_map = load_route_map(data, routes, year)
+        if route_map is None:
+            st.info("Mapa disponível após regenerar os dados com o pipeline a partir de um "
+                    "airports.csv com LATITUDE/LONGITUDE (`aeroportos_coordenadas.csv`).")
+        else:
+            route_map_section(route_map, route_weights(weights))
+
     with tab3:
         st.header("🔍 Metodologia e Documentação Técnica")
 
@@ -645,7 +1781,7 @@ def main():
         ## 🏗️ Arquitetura do Data Warehouse
 
         ### Modelagem Dimensional (Esquema Estrela)
-        - **Tabela Fato**: `fact_flights` (5.8M+ registros)
+        - **Tabela Fato**: `fact_flights` (um registro por voo)
         - **Dimensões**: `dim_airline`, `dim_airport`, `dim_date`, `dim_flight_status`, `dim_cancellation_reason`
 
         ### Processo ETL
@@ -694,6 +1830,8 @@ def main():
         conceitos de Data Warehouse, modelagem dimensional e análise de dados.
         """)
 
+    diagnostics_panel(profiler, figures, data.registry)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""
+Dados sintéticos pequenos (``pipeline.synthetic``) compartilhados pelos
+testes. Cada arquivo é gerado uma vez por sessão.
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline.synthetic import generate
+
+ROWS = 4000
+
+
+@pytest.fixture(scope='session')
+def raw(tmp_path_factory):
+    """
+    Pasta com flights.csv (2015), airlines.csv e airports.csv sintéticos
+    """
+    directory = tmp_path_factory.mktemp('raw')
+    generate(str(directory), ROWS, year=2015)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def raw_2016(tmp_path_factory):
+    """
+    flights.csv sintético de 2016
+    """
+    directory = tmp_path_factory.mktemp('raw_2016')
+    return generate(str(directory), ROWS // 4, seed=2016, year=2016)
+
+
+@pytest.fixture(scope='session')
+def data_dir(raw, tmp_path_factory):
+    """
+    Pasta de dados gerada pelo ``python -m pipeline`` sobre ``raw``, com
+    cubo e propagação
+    """
+    from pipeline.__main__ import main
+
+    directory = tmp_path_factory.mktemp('data')
+    main(['--flights', str(raw / 'flights.csv'), '--output', str(directory), '--propagation',
+          '--cube', str(directory / 'cube.npz')] + reference_args(raw))
+    return directory
+
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    ``streamlit_app`` importado em modo bare
+    """
+    from pipeline.benchmark import _import_app
+
+    return _import_app()
+
+
+def split_months(path, directory, groups):
+    """
+    Grava um CSV por grupo de meses de ``path`` (mesmas colunas e textos do
+    original); retorna os caminhos
+    """
+    flights = pd.read_csv(path, dtype=str, keep_default_na=False)
+    paths = []
+    for i, months in enumerate(groups):
+        part = flights[flights['MONTH'].astype(int).isin(months)]
+        target = os.path.join(directory, f"flights_{i}.csv")
+        part.to_csv(target, index=False)
+        paths.append(target)
+    return paths
+
+
+def reference_args(raw):
+    return ['--airlines', str(raw / 'airlines.csv'), '--airports', str(raw / 'airports.csv')]
+
+
+def read_outputs(directory):
+    """
+    {arquivo: DataFrame} dos CSVs de ``OUTPUT_FILES`` gravados em ``directory``
+    """
+    from pipeline.reports import OUTPUT_FILES
+
+    return {name: pd.read_csv(os.path.join(directory, name)) for name in OUTPUT_FILES.values()
+            if os.path.exists(os.path.join(directory, name))}
+
+
+def assert_same_outputs(expected, actual):
+    assert sorted(expected) == sorted(actual)
+    for name in expected:
+        pd.testing.assert_frame_equal(expected[name], actual[name], obj=name)
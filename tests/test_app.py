@@ -0,0 +1,34 @@
+import pandas as pd
+
+from pipeline.benchmark import _point_app
+
+
+def test_load_data_follows_data_dir(app, data_dir):
+    _point_app(app, str(data_dir))
+    monthly = app.load_data()['grafico_01']
+    expected = pd.read_csv(data_dir / 'grafico_01_dados.csv')
+    assert monthly['total_flights'].sum() == expected['total_flights'].sum()
+
+
+def test_heatmap_accepts_missing_hours(app, data_dir):
+    # Horas sem voos vêm das views do warehouse como None (coluna object)
+    delays = pd.read_csv(data_dir / 'grafico_03_matriz_atrasos.csv').astype(object)
+    delays.iloc[0, 1:] = None
+    fig = app.create_heatmap_chart({'grafico_03_atrasos': delays})
+    z = pd.DataFrame(fig.data[0].z)
+    assert z.dtypes.map(pd.api.types.is_float_dtype).all()
+    assert z.iloc[0].isna().all()
+
+
+class _Routes(dict):
+    # Datasets sem manifesto: versão None
+    def version(self, key):
+        return None
+
+
+def test_route_table_is_cached_per_year(app, data_dir):
+    routes = pd.read_csv(data_dir / 'rotas_todas.csv')
+    first = app.load_route_table(_Routes(rotas=routes), None, 2015)
+    second = app.load_route_table(_Routes(rotas=routes.iloc[:5]), None, 2016)
+    assert len(first) == len(routes)
+    assert len(second) == 5
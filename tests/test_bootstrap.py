@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import bootstrap as bs
+from pipeline import sketch
+from pipeline.aggregation import ON_TIME_THRESHOLD, M, aggregate_flights, flight_measures
+from pipeline.reports import load_reference
+
+
+def toy_flights(n, rng, cancel=0.05, late=0.3, late_mean=40):
+    """
+    Voos de uma entidade: cancelados, pontuais e atrasados (cauda exponencial)
+    """
+    status = rng.choice(3, size=n, p=[cancel, 1 - cancel - late, late])
+    delay = np.where(status == 1, rng.integers(-20, ON_TIME_THRESHOLD + 1, size=n),
+                     ON_TIME_THRESHOLD + 1 + np.rint(rng.exponential(late_mean, size=n)))
+    return pd.DataFrame({
+        'CANCELLED': (status == 0).astype(np.int64),
+        'DIVERTED': 0,
+        'DISTANCE': 500,
+        'ARRIVAL_DELAY': np.where(status == 0, np.nan, delay),
+        'DEPARTURE_DELAY': np.where(status == 0, np.nan, delay),
+        'ELAPSED_TIME': np.where(status == 0, np.nan, 90.0),
+    })
+
+
+def toy_table(entities):
+    """
+    (tabela de medidas, sketches) com uma linha por DataFrame de voos
+    """
+    table = np.stack([flight_measures(df).sum(axis=0) for df in entities])
+    sketches = sketch.empty(len(entities))
+    for i, df in enumerate(entities):
+        delays = df['ARRIVAL_DELAY'].dropna().to_numpy(dtype=np.int64)
+        sketch.update(sketches, np.full(len(delays), i), delays)
+    return table, sketches
+
+
+@pytest.fixture(scope='module')
+def toy():
+    rng = np.random.default_rng(7)
+    return toy_table([toy_flights(400, rng), toy_flights(300, rng, cancel=0.1),
+                      toy_flights(500, rng, late=0.9, late_mean=400)])
+
+
+def test_seed_reproduces_results(toy):
+    observed = np.array([3, 2, 1], dtype=np.int32)
+    first = bs.bootstrap(*toy, bs.route_score, observed, resamples=150, seed=11, descending=True)
+    again = bs.bootstrap(*toy, bs.route_score, observed, resamples=150, seed=11, descending=True)
+    other = bs.bootstrap(*toy, bs.route_score, observed, resamples=150, seed=12, descending=True)
+    for name in first:
+        np.testing.assert_array_equal(first[name], again[name], err_msg=name)
+    assert not np.array_equal(first['score_low'], other['score_low'])
+
+
+def test_intervals_contain_observed_metrics(raw, monkeypatch):
+    # Poucos voos por rota nos dados sintéticos: baixa o mínimo do relatório 2
+    monkeypatch.setattr(bs, 'MIN_ROUTE_FLIGHTS', 20)
+    state = aggregate_flights(str(raw / 'flights.csv'))
+    airlines, airports = load_reference(raw / 'airlines.csv', raw / 'airports.csv')
+    reports = bs.bootstrap_reports(state, airlines, airports, resamples=300)
+    checked = 0
+    for df in reports.values():
+        assert len(df)
+        for low in [c for c in df.columns if c.endswith(' IC95 Inf')]:
+            label = low[:-len(' IC95 Inf')]
+            high = f'{label} IC95 Sup'
+            assert (df[low] <= df[label] + 0.01).all(), low
+            assert (df[label] <= df[high] + 0.01).all(), high
+            checked += 1
+    assert checked == 5 + 4  # companhias e rotas: métricas, score e posição
+
+
+def test_rank_interval_of_separated_entity(toy):
+    # A terceira entidade (90% de atrasos longos) é a rota mais crítica
+    table = toy[0]
+    observed = bs.rank_rows(bs.route_score({
+        'avg_arrival_delay': table[:, M['arr_sum']] / table[:, M['arr_count']],
+        'cancellation_rate': 100 * table[:, M['cancelled']] / table[:, M['flights']],
+    }), descending=True)
+    assert observed[2] == 1
+    result = bs.bootstrap(*toy, bs.route_score, observed, resamples=300, descending=True)
+    assert (result['rank_low'] <= observed).all() and (observed <= result['rank_high']).all()
+    assert result['rank_low'][2] == result['rank_high'][2] == 1
+    assert result['rank_same'][2] == 100
+
+
+def test_matches_per_flight_bootstrap():
+    rng = np.random.default_rng(3)
+    flights = toy_flights(600, rng)
+    table, sketches = toy_table([flights])
+    result = bs.bootstrap(table, sketches, bs.route_score, np.array([1], dtype=np.int32),
+                          resamples=4000, seed=5, descending=True)
+
+    # Bootstrap por voo: sorteia os voos com reposição
+    cancelled = flights['CANCELLED'].to_numpy()
+    delay = flights['ARRIVAL_DELAY'].to_numpy()
+    picks = rng.integers(0, len(flights), size=(4000, len(flights)))
+    arrived = ~np.isnan(delay[picks])
+    samples = {
+        'on_time_rate': 100 * (delay[picks] <= ON_TIME_THRESHOLD).mean(axis=1),
+        'avg_arrival_delay': np.nansum(delay[picks], axis=1) / arrived.sum(axis=1),
+        'cancellation_rate': 100 * cancelled[picks].mean(axis=1),
+    }
+    for name, values in samples.items():
+        low, high = np.percentile(values, [2.5, 97.5])
+        tolerance = 0.1 * (high - low)
+        assert abs(result[f'{name}_low'][0] - low) <= tolerance, name
+        assert abs(result[f'{name}_high'][0] - high) <= tolerance, name
@@ -0,0 +1,19 @@
+import numpy as np
+
+from pipeline.cube import CM, CUBE_MEASURES, DIMENSIONS, FlightCube
+
+
+def test_sums_do_not_overflow_int32():
+    # Duas células cuja soma de distâncias passa de 2**31
+    big = 2 ** 31 - 1
+    values = np.zeros((2, len(CUBE_MEASURES)), dtype=np.int64)
+    values[:, CM['flights']] = 1
+    values[:, CM['distance_sum']] = big
+    dims = {d: np.array([0, 1] if d == 'month' else [0, 0]) for d in DIMENSIONS}
+    labels = {d: [1, 2] if d == 'month' else ['XX'] for d in DIMENSIONS}
+    cube = FlightCube(dims, labels, values)
+
+    summary = cube.rollup(('airline',))
+    assert summary.values.dtype == np.int64
+    assert summary.values[0, CM['distance_sum']] == 2 * big
+    assert cube.table(('airline',), measures=('distance_sum',))['distance_sum'][0] == 2 * big
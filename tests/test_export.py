@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.benchmark import chart_builders
+from pipeline.export import _load_app, export
+
+
+def test_figures_read_the_export_data_dir(data_dir):
+    # O app já apontado para outra pasta tem de ser redirecionado
+    _load_app('data')
+    app = _load_app(str(data_dir))
+    fig = chart_builders(app)['create_temporal_trend_chart'](app.load_data())
+    monthly = pd.read_csv(data_dir / 'grafico_01_dados.csv')
+    delay = next(trace for trace in fig.data if trace.name.startswith('Atraso'))
+    np.testing.assert_allclose(np.asarray(delay.y, dtype=float), monthly['avg_arrival_delay'])
+
+
+def test_export_uses_data_dir(data_dir, tmp_path):
+    results, _ = export(str(data_dir), str(tmp_path), formats=['html', 'csv'], workers=1,
+                        progress=None)
+    figures = {k: r for k, r in results.items() if k.startswith('figura:')}
+    assert figures and all(r['skipped'] is None for r in figures.values())
+    # A pasta tem os arquivos da propagação: a figura não pode ser pulada
+    assert os.path.exists(tmp_path / 'propagation.html')
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'grafico_01_dados.csv'),
+                                  pd.read_csv(data_dir / 'grafico_01_dados.csv'))
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from pipeline.cube import load_cube
+from pipeline.filters import DashboardFilters
+from pipeline.reports import OUTPUT_FILES
+
+FILTERED_KEYS = ('relatorio_01', 'relatorio_02', 'relatorio_03', 'relatorio_04', 'grafico_01',
+                 'grafico_02', 'grafico_03_atrasos', 'grafico_04_principais', 'grafico_04_menores')
+
+
+@pytest.fixture(scope='module')
+def filters(data_dir):
+    ranking = pd.read_csv(data_dir / OUTPUT_FILES['relatorio_01'])
+    return DashboardFilters(load_cube(str(data_dir / 'cube.npz')),
+                            dict(zip(ranking['Código'], ranking['Companhia Aérea'])))
+
+
+@pytest.mark.parametrize('key', FILTERED_KEYS)
+def test_unfiltered_cube_matches_pipeline_files(filters, data_dir, key):
+    expected = pd.read_csv(data_dir / OUTPUT_FILES[key])
+    actual = filters.datasets()[key]
+    columns = [c for c in expected.columns if c in actual.columns]
+    pd.testing.assert_frame_equal(expected[columns].reset_index(drop=True),
+                                  actual[columns].reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-6)
+
+
+def test_datasets_are_memoized_per_selection(filters):
+    selection = {'airlines': [filters.airlines[0]], 'months': [1, 2, 3]}
+    first = filters.datasets(**selection)
+    assert filters.datasets(**selection) is first
+    assert filters.datasets(airlines=[filters.airlines[1]]) is not first
+    month = first['grafico_01']
+    assert sorted(month['month']) == [1, 2, 3]
+
+
+def test_whatif_routes_follow_selection(filters):
+    from pipeline.whatif import DEFAULT_WEIGHTS, critical_routes_frame, whatif_datasets
+    airline = filters.airlines[0]
+    data = filters.datasets(airlines=[airline])
+    routes = filters.route_table(airlines=[airline])
+    assert filters.route_table(airlines=[airline]) is routes
+    assert routes.flights.sum() == data['relatorio_01']['Total Voos'].sum()
+    # Pesos padrão reproduzem o relatório filtrado
+    expected = whatif_datasets(data, DEFAULT_WEIGHTS, routes)['relatorio_02']
+    pd.testing.assert_frame_equal(expected, data['relatorio_02'], check_dtype=False)
+    # Outros pesos reordenam só as rotas da companhia selecionada
+    weights = {**DEFAULT_WEIGHTS, 'route_delay': 0.0}
+    report = critical_routes_frame(routes, weights, min_flights=1)
+    assert len(report) and set(report['Companhias Operadoras']) == {airline}
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from pipeline.__main__ import main
+from pipeline.state import load_state
+
+from conftest import assert_same_outputs, read_outputs, reference_args, split_months
+
+
+def test_incremental_run_equals_full_rebuild(raw, tmp_path):
+    full = tmp_path / 'full'
+    main(['--flights', str(raw / 'flights.csv'), '--output', str(full)] + reference_args(raw))
+
+    state = str(tmp_path / 'state.npz')
+    first, second = split_months(raw / 'flights.csv', tmp_path, [range(1, 7), range(7, 13)])
+    incremental = tmp_path / 'incremental'
+    for path in (first, second):
+        main(['--flights', path, '--state', state, '--output', str(incremental)]
+             + reference_args(raw))
+
+    assert_same_outputs(read_outputs(full), read_outputs(incremental))
+
+
+def test_incremental_run_rejects_other_year(raw, raw_2016, tmp_path):
+    state = str(tmp_path / 'state.npz')
+    output = str(tmp_path / 'data')
+    main(['--flights', str(raw / 'flights.csv'), '--state', state, '--output', output]
+         + reference_args(raw))
+    before = read_outputs(output)
+    mtime = os.path.getmtime(state)
+
+    with pytest.raises(SystemExit, match='2016'):
+        main(['--flights', raw_2016, '--state', state, '--output', output] + reference_args(raw))
+
+    assert os.path.getmtime(state) == mtime
+    assert load_state(state)[0].year == 2015
+    assert_same_outputs(before, read_outputs(output))
+
+
+def test_incremental_run_requires_existing_cube(raw, tmp_path):
+    state = str(tmp_path / 'state.npz')
+    output = str(tmp_path / 'data')
+    cube = tmp_path / 'cube.npz'
+    first, second = split_months(raw / 'flights.csv', tmp_path, [range(1, 7), range(7, 13)])
+    main(['--flights', first, '--state', state, '--output', output] + reference_args(raw))
+    mtime = os.path.getmtime(state)
+
+    with pytest.raises(SystemExit, match='cube.npz'):
+        main(['--flights', second, '--state', state, '--output', output, '--cube', str(cube)]
+             + reference_args(raw))
+
+    assert not cube.exists()
+    assert os.path.getmtime(state) == mtime
+
+
+def test_incremental_run_rejects_propagation(raw, tmp_path):
+    state = str(tmp_path / 'state.npz')
+    output = str(tmp_path / 'data')
+    first, second = split_months(raw / 'flights.csv', tmp_path, [range(1, 7), range(7, 13)])
+    main(['--flights', first, '--state', state, '--output', output] + reference_args(raw))
+    before = read_outputs(output)
+
+    with pytest.raises(SystemExit, match='--propagation'):
+        main(['--flights', second, '--state', state, '--output', output, '--propagation']
+             + reference_args(raw))
+
+    assert_same_outputs(before, read_outputs(output))
+
+
+def test_incremental_run_rejects_series(raw, tmp_path):
+    state = str(tmp_path / 'state.npz')
+    output = str(tmp_path / 'data')
+    series = tmp_path / 'series.npz'
+    first, second = split_months(raw / 'flights.csv', tmp_path, [range(1, 7), range(7, 13)])
+    main(['--flights', first, '--state', state, '--output', output] + reference_args(raw))
+
+    with pytest.raises(SystemExit, match='--series'):
+        main(['--flights', second, '--state', state, '--output', output, '--series', str(series)]
+             + reference_args(raw))
+
+    assert not series.exists()
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from pipeline.__main__ import main
+from pipeline.cube import DIMENSIONS, load_cube
+
+from conftest import assert_same_outputs, read_outputs, reference_args
+
+
+def test_parallel_run_equals_sequential(raw, tmp_path):
+    runs = {}
+    for workers in (1, 2):
+        output = tmp_path / f'workers_{workers}'
+        main(['--flights', str(raw / 'flights.csv'), '--output', str(output),
+              '--workers', str(workers), '--chunksize', '500', '--cube', str(output / 'cube.npz')]
+             + reference_args(raw))
+        runs[workers] = output
+
+    assert_same_outputs(read_outputs(runs[1]), read_outputs(runs[2]))
+    # Os códigos das células dependem da ordem de chegada; compara por rótulo
+    cells = [load_cube(str(runs[w] / 'cube.npz')).query(DIMENSIONS)
+             .sort_values(list(DIMENSIONS), ignore_index=True) for w in (1, 2)]
+    pd.testing.assert_frame_equal(*cells)
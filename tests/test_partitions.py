@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from pipeline.__main__ import main as pipeline_main
+from pipeline.partitions import PartitionStore, build_range
+from pipeline.partitions import main as partitions_main
+from pipeline.reports import load_reference
+from pipeline.state import load_state, source_id
+
+from conftest import ROWS, assert_same_outputs, read_outputs, reference_args, split_months
+
+
+@pytest.fixture(scope='module')
+def store(raw, raw_2016, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('store'))
+    for path in (raw / 'flights.csv', raw_2016):
+        partitions_main(['ingest', '--flights', str(path), '--store', root])
+    return root
+
+
+def test_year_build_equals_pipeline(raw, store, tmp_path):
+    pipeline_main(['--flights', str(raw / 'flights.csv'), '--output', str(tmp_path / 'full')]
+                  + reference_args(raw))
+    partitions_main(['build', '--store', store, '--per-year', '--output', str(tmp_path / 'years')]
+                    + reference_args(raw))
+    assert_same_outputs(read_outputs(tmp_path / 'full'), read_outputs(tmp_path / 'years' / '2015'))
+
+
+def test_build_rejects_ranges_across_years(raw, store, tmp_path):
+    partitions = PartitionStore(store)
+    keys = partitions.select((2015, 12), (2016, 1))
+    airlines, airports = load_reference(str(raw / 'airlines.csv'), str(raw / 'airports.csv'))
+    with pytest.raises(ValueError, match='2015, 2016'):
+        build_range(partitions, keys, airlines, airports)
+    with pytest.raises(SystemExit, match='2015, 2016'):
+        partitions_main(['build', '--store', store, '--output', str(tmp_path / 'data')]
+                        + reference_args(raw))
+
+
+def test_ingest_small_chunks(raw, raw_2016, tmp_path):
+    # Chunks pequenos: CANCELLATION_REASON vazio num chunk não fixa o tipo null
+    root = str(tmp_path / 'store')
+    partitions_main(['ingest', '--flights', str(raw / 'flights.csv'), '--store', root,
+                     '--chunksize', '50'])
+    partitions = PartitionStore(root)
+    keys = partitions.select((2015, 1), (2015, 12))
+    rows = sum(len(chunk) for chunk in partitions.read(keys, ['CANCELLATION_REASON'], 1000))
+    assert rows == ROWS
+
+
+def test_ingest_keeps_state_sources(raw, tmp_path):
+    root = str(tmp_path / 'store')
+    paths = split_months(raw / 'flights.csv', tmp_path, [range(1, 7), range(1, 13)])
+    for path in paths:
+        partitions_main(['ingest', '--flights', path, '--store', root])
+    state = PartitionStore(root).partitions['2015-01']['state']
+    assert load_state(os.path.join(root, state))[1] == [source_id(path) for path in paths]
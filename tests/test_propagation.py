@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.propagation import LEG_COLUMNS, MAX_LEG, Legs, propagate, propagation_reports
+from pipeline.reports import write_outputs
+from pipeline.snapshot import read_dataset
+
+# Rotações montadas à mão: (perna, aeronave, dia, origem, destino, partida e
+# chegada previstas, atraso de partida e de chegada, cancelado) e, por perna,
+# o atraso herdado, a posição no dia e a profundidade esperados
+FLIGHTS = [
+    # N1, dia 1: A → B repassa 40 - 30 = 10 min de um atraso de 25
+    ('A', 'N1', 1, 'AAA', 'BBB', 800, 900, 30, 40, 0, 0, 1, 0),
+    ('B', 'N1', 1, 'BBB', 'CCC', 930, 1100, 25, 20, 0, 10, 2, 1),
+    # Folga de 30 min absorve os 20 min de chegada
+    ('C', 'N1', 1, 'CCC', 'AAA', 1130, 1300, 5, 60, 0, 0, 3, 0),
+    # Folga negativa (parte antes da chegada prevista): sem ligação
+    ('D', 'N1', 1, 'AAA', 'BBB', 1250, 1400, 50, 50, 0, 0, 4, 0),
+    # Perna cancelada quebra a cadeia da seguinte
+    ('E', 'N1', 1, 'BBB', 'CCC', 1500, 1600, np.nan, np.nan, 1, 0, 5, 0),
+    ('F', 'N1', 1, 'CCC', 'DDD', 1610, 1700, 10, 90, 0, 0, 6, 0),
+    ('G', 'N1', 1, 'DDD', 'AAA', 1720, 1800, 80, 70, 0, 70, 7, 1),
+    ('H', 'N1', 1, 'AAA', 'BBB', 1900, 2000, 20, 0, 0, 10, 8, 2),
+    ('I', 'N1', 1, 'BBB', 'CCC', 2030, 2130, 0, 0, 0, 0, 9, 0),
+    # Outro dia: começa nova rotação mesmo com a aeronave atrasada na véspera
+    ('J', 'N1', 2, 'CCC', 'AAA', 600, 700, 20, 0, 0, 0, 1, 0),
+    # N2: cadeia de três pernas
+    ('K', 'N2', 1, 'AAA', 'BBB', 700, 800, 100, 100, 0, 0, 1, 0),
+    ('L', 'N2', 1, 'BBB', 'CCC', 830, 930, 90, 80, 0, 70, 2, 1),
+    ('M', 'N2', 1, 'CCC', 'AAA', 1000, 1100, 60, 30, 0, 50, 3, 2),
+]
+FIELDS = ['name', 'TAIL_NUMBER', 'DAY', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT',
+          'SCHEDULED_DEPARTURE', 'SCHEDULED_ARRIVAL', 'DEPARTURE_DELAY', 'ARRIVAL_DELAY',
+          'CANCELLED', 'inherited', 'leg', 'depth']
+
+
+def legs_of(flights):
+    df = pd.DataFrame(flights, columns=FIELDS)
+    df = df.assign(YEAR=2015, MONTH=1, AIRLINE='XX', DIVERTED=0, LATE_AIRCRAFT_DELAY=np.nan)
+    legs = Legs()
+    legs.update(df[list(LEG_COLUMNS)].astype(LEG_COLUMNS))
+    return df, legs.finish()
+
+
+@pytest.fixture(scope='module')
+def rotations():
+    # Fora de ordem: a montagem ordena por aeronave, dia e horário
+    flights = [FLIGHTS[i] for i in np.random.default_rng(0).permutation(len(FLIGHTS))]
+    df, legs = legs_of(flights)
+    return df, legs, propagate(legs)
+
+
+def test_inherited_delays(rotations):
+    df, _, prop = rotations
+    np.testing.assert_array_equal(prop['inherited'], df['inherited'])
+    np.testing.assert_array_equal(prop['originated'], prop['delay'] - df['inherited'])
+    np.testing.assert_array_equal(prop['leg'], df['leg'])
+    np.testing.assert_array_equal(prop['depth'], df['depth'])
+
+
+def test_links(rotations):
+    df, _, prop = rotations
+    linked = dict(zip(df['name'], prop['linked']))
+    # Ligadas: mesma aeronave e dia, folga >= 0, anterior realizada e no mesmo aeroporto
+    assert {name for name, value in linked.items() if value} == set('BCGHILM')
+
+
+def test_leg_positions_are_labels(rotations):
+    _, legs, prop = rotations
+    positions = propagation_reports(legs, prop)['propagacao_pernas']
+    # A 5ª perna (cancelada) não entra; H e I caem em "8+"
+    assert positions['Perna no Dia'].tolist() == ['1', '2', '3', '4', '6', '7', f'{MAX_LEG}+']
+    assert positions['Total Voos'].tolist() == [3, 2, 2, 1, 1, 1, 2]
+
+
+def test_leg_labels_stay_text_in_csv(tmp_path):
+    # Sem rotações longas não há "8+": o CSV relido continua com rótulos de texto
+    _, legs = legs_of([f for f in FLIGHTS if f[0] not in 'HI'])
+    positions = propagation_reports(legs, propagate(legs))['propagacao_pernas']
+    write_outputs({'propagacao_pernas': positions}, str(tmp_path))
+    df = read_dataset(str(tmp_path), 'propagacao_pernas')
+    assert df['Perna no Dia'].tolist() == ['1', '2', '3', '4', '6', '7']
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.routes import SORT_COLUMNS, RouteTable
+
+
+@pytest.fixture(scope='module')
+def table(data_dir):
+    return RouteTable(pd.read_csv(data_dir / 'rotas_todas.csv'))
+
+
+@pytest.mark.parametrize('column', ['Total Voos', 'Origem', 'Destino'])
+@pytest.mark.parametrize('descending', [False, True])
+def test_sort_keeps_ties_in_table_order(table, column, descending):
+    values = getattr(table, SORT_COLUMNS[column])
+    order = table.order(column, descending)
+    ranks = pd.factorize(values, sort=True)[0][order]
+    steps = np.diff(ranks)
+    assert np.all(steps <= 0) if descending else np.all(steps >= 0)
+    # Empates (mesmo valor) seguem a ordem da tabela nos dois sentidos
+    ties = steps == 0
+    assert ties.any()
+    assert np.all(np.diff(order)[ties] > 0)
@@ -0,0 +1,53 @@
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from pipeline import service
+from pipeline.manifest import update_manifest
+from pipeline.reports import OUTPUT_FILES
+from pipeline.service import AggregateService, decode_frames
+
+
+def test_filters_are_built_once_per_cube_version(data_dir, monkeypatch):
+    builds = []
+
+    class SlowFilters(service.DashboardFilters):
+        def __init__(self, *args):
+            builds.append(threading.get_ident())
+            time.sleep(0.2)
+            super().__init__(*args)
+
+    monkeypatch.setattr(service, 'DashboardFilters', SlowFilters)
+    svc = AggregateService(str(data_dir))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(svc.filters())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_dataset_follows_rewritten_file(data_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(service, 'REFRESH_SECONDS', 0)
+    directory = tmp_path / 'data'
+    shutil.copytree(data_dir, directory)
+    svc = AggregateService(str(directory))
+
+    def flights():
+        _, body = svc.handle('/dataset/relatorio_01', {})
+        return decode_frames(body)[0]['relatorio_01']['Total Voos'].tolist()
+
+    before = flights()
+    path = directory / OUTPUT_FILES['relatorio_01']
+    ranking = pd.read_csv(path)
+    ranking['Total Voos'] = 999999
+    ranking.to_csv(path, index=False)
+    update_manifest(str(directory))
+
+    assert flights() == [999999] * len(before)
+    assert flights() == [999999] * len(before)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from pipeline import sketch
+
+
+@pytest.fixture(scope='module')
+def delays():
+    # Cauda longa, como os atrasos do DOT, dentro da faixa dos buckets
+    rng = np.random.default_rng(0)
+    values = np.rint(rng.lognormal(2.5, 1.4, size=(20, 2000)) - 30).astype(np.int64)
+    return np.clip(values, -sketch.SKETCH_MAX_NEGATIVE, sketch.SKETCH_MAX_POSITIVE)
+
+
+def sketches_of(delays):
+    groups = np.repeat(np.arange(len(delays)), delays.shape[1])
+    sketches = sketch.empty(len(delays))
+    sketch.update(sketches, groups, delays.ravel())
+    return sketches
+
+
+@pytest.mark.parametrize('q', [0.1, 0.5, 0.9, 0.95, 0.99])
+def test_quantiles_within_relative_error(delays, q):
+    exact = np.quantile(delays, q, axis=1, method='lower')
+    approx = sketch.quantiles(sketches_of(delays), [q])[:, 0]
+    small = np.abs(exact) <= sketch.SKETCH_EXACT
+    assert np.array_equal(approx[small], exact[small])
+    assert np.all(np.abs(approx - exact) <= sketch.SKETCH_ALPHA * np.abs(exact) + 1e-9)
+
+
+def test_median_matches_pandas_for_small_delays():
+    rng = np.random.default_rng(1)
+    delays = rng.integers(-sketch.SKETCH_EXACT, sketch.SKETCH_EXACT + 1, size=(10, 500))
+    assert np.array_equal(sketch.median(sketches_of(delays)), np.median(delays, axis=1))
+
+
+def test_merge_is_a_sum(delays):
+    whole = sketches_of(delays)
+    parts = sketches_of(delays[:, :700]) + sketches_of(delays[:, 700:])
+    assert np.array_equal(whole, parts)
@@ -0,0 +1,32 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from pipeline.download import dataset_chunks
+from pipeline.manifest import main as manifest_main
+from pipeline.reports import OUTPUT_FILES
+from pipeline.snapshot import read_dataset
+
+
+@pytest.fixture
+def data_copy(data_dir, tmp_path):
+    directory = tmp_path / 'data'
+    shutil.copytree(data_dir, directory)
+    return directory
+
+
+def test_current_snapshot_is_read(data_copy):
+    df = read_dataset(str(data_copy), 'relatorio_01')
+    assert isinstance(df['Código'].dtype, pd.CategoricalDtype)
+
+
+def test_stale_snapshot_falls_back_to_csv(data_copy):
+    path = data_copy / OUTPUT_FILES['relatorio_01']
+    regenerated = pd.read_csv(path).iloc[:3]
+    regenerated.to_csv(path, index=False)
+    manifest_main([str(data_copy)])
+
+    df = read_dataset(str(data_copy), 'relatorio_01')
+    pd.testing.assert_frame_equal(df, regenerated)
+    assert len(pd.concat(dataset_chunks(str(data_copy), 'relatorio_01'))) == 3
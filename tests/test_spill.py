@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.aggregation import MEASURES, M
+
+from pipeline.partitions import main as partitions_main
+from pipeline.reports import OUTPUT_FILES
+from pipeline.spill import SPILL_COLUMNS, RouteAggregates, detail_frame
+from pipeline.spill import main as spill_main
+
+from conftest import ROWS
+
+
+def test_spill_equals_pipeline(raw, data_dir, tmp_path):
+    # Orçamento mínimo: força spills e redistribuições
+    spill_main(['--flights', str(raw / 'flights.csv'), '--airports', str(raw / 'airports.csv'),
+                '--memory-mb', '0.01', '--fanout', '4', '--output', str(tmp_path)])
+    for key in ('relatorio_02', 'rotas', 'aeroportos'):
+        pd.testing.assert_frame_equal(pd.read_csv(data_dir / OUTPUT_FILES[key]),
+                                      pd.read_csv(tmp_path / OUTPUT_FILES[key]), obj=key)
+
+
+def test_buffers_stay_within_budget(raw):
+    grains = ('rota_companhia', 'rota_dia', 'rota_hora_companhia')
+    with RouteAggregates(grains, memory_mb=0.3, fanout=4) as aggregates:
+        for chunk in pd.read_csv(raw / 'flights.csv', usecols=list(SPILL_COLUMNS),
+                                 dtype=SPILL_COLUMNS, chunksize=ROWS):
+            aggregates.update(chunk)
+        for groupby in aggregates.groups.values():
+            assert groupby.stats['spills'] > 0
+            assert groupby.stats['peak_mb'] <= 0.1
+
+
+@pytest.fixture(scope='module')
+def store(raw, raw_2016, tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('store'))
+    for path in (raw / 'flights.csv', raw_2016):
+        partitions_main(['ingest', '--flights', str(path), '--store', root])
+    return root
+
+
+def test_route_days_keep_years_apart(raw, store, tmp_path):
+    spill_main(['--store', store, '--from', '2015', '--to', '2016', '--grains', 'rota_dia',
+                '--airports', str(raw / 'airports.csv'), '--output', str(tmp_path)])
+    days = pd.read_csv(tmp_path / 'rotas_dia.csv')
+    assert days.groupby('year')['total_flights'].sum().to_dict() == {2015: ROWS, 2016: ROWS // 4}
+    assert not days.duplicated(['origin', 'dest', 'year', 'month', 'day']).any()
+
+
+def test_detail_on_time_rate_counts_cancelled_flights():
+    # Como nos relatórios: pontuais / voos (cancelados contam no denominador)
+    t = np.zeros((1, len(MEASURES)), dtype=np.int64)
+    t[0, [M['flights'], M['cancelled'], M['arr_count'], M['on_time']]] = 10, 2, 8, 4
+    df = detail_frame({'origin': ['AAA'], 'dest': ['BBB']}, t)
+    assert df.loc[0, 'on_time_rate'] == 40.0
+    assert df.loc[0, 'cancellation_rate'] == 20.0
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from pipeline.timeseries import DOWNSAMPLERS, METHODS, SeriesStore, build_series, minmax
+
+from conftest import ROWS
+
+
+@pytest.fixture(scope='module')
+def series():
+    # Passeio aleatório com picos isolados
+    rng = np.random.default_rng(0)
+    y = np.cumsum(rng.normal(size=5000))
+    y[rng.integers(0, len(y), size=20)] += rng.choice([-50, 50], size=20)
+    return np.arange(len(y), dtype=np.float64), y
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('budget', [2, 3, 4, 7, 100, 501])
+def test_keeps_endpoints_within_budget(series, method, budget):
+    x, y = series
+    keep = DOWNSAMPLERS[method](x, y, budget)
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert len(keep) <= budget
+    assert np.all(np.diff(keep) > 0)
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_short_series_is_untouched(series, method):
+    x, y = series
+    assert np.array_equal(DOWNSAMPLERS[method](x[:50], y[:50], 100), np.arange(50))
+
+
+@pytest.mark.parametrize('budget', [4, 10, 101])
+def test_minmax_keeps_bucket_extremes(series, budget):
+    x, y = series
+    keep = set(minmax(x, y, budget).tolist())
+    buckets = (budget - 2) // 2
+    bucket = np.arange(len(y)) * buckets // len(y)
+    for b in range(buckets):
+        rows = np.flatnonzero(bucket == b)
+        assert rows[np.argmin(y[rows])] in keep
+        assert rows[np.argmax(y[rows])] in keep
+    # Os picos isolados sobrevivem à redução
+    assert y[sorted(keep)].max() == y.max() and y[sorted(keep)].min() == y.min()
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_query_respects_budget(raw, method):
+    arrays = build_series(str(raw / 'flights.csv'))
+    store = SeriesStore(arrays['airlines'].tolist(), arrays['airline'], arrays['hour'],
+                        arrays['values'])
+    assert store.values[:, 0].sum() == ROWS
+    start, end = store.span
+    for airline in store.airlines:
+        x, y, info = store.query(airline, start, end, metric='voos', budget=20, method=method)
+        assert len(x) == info['points'] <= 20
+        assert info['raw_points'] <= 20 or len(x) < info['raw_points']
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from pipeline.reports import OUTPUT_FILES, TAIL_QUANTILES, load_reference
+from pipeline.warehouse import (
+    VIEWS,
+    ConnectionPool,
+    connect,
+    create_schema,
+    load_dimensions,
+    load_flights,
+    read_view,
+    refresh_views,
+)
+
+# Exatos nas views, aproximados por sketch no pipeline
+QUANTILE_COLUMNS = {'median_arrival_delay', *TAIL_QUANTILES}
+
+
+def build_warehouse(path, raw, *flights):
+    conn = connect(str(path))
+    create_schema(conn)
+    load_dimensions(conn, *load_reference(str(raw / 'airlines.csv'), str(raw / 'airports.csv')))
+    for source in flights:
+        load_flights(conn, str(source))
+    refresh_views(conn)
+    conn.close()
+    return ConnectionPool(str(path))
+
+
+def comparable(expected, actual):
+    columns = [c for c in expected.columns if c not in QUANTILE_COLUMNS]
+    actual = actual[columns].copy()
+    for column in columns:
+        if pd.api.types.is_numeric_dtype(expected[column]):
+            actual[column] = pd.to_numeric(actual[column])
+    return expected[columns], actual
+
+
+@pytest.fixture(scope='module')
+def pool(raw, tmp_path_factory):
+    return build_warehouse(tmp_path_factory.mktemp('warehouse') / 'warehouse.db', raw,
+                           raw / 'flights.csv')
+
+
+@pytest.mark.parametrize('key', VIEWS)
+def test_views_match_pipeline_files(pool, data_dir, key):
+    expected, actual = comparable(pd.read_csv(data_dir / OUTPUT_FILES[key]), read_view(pool, key))
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=0, atol=1e-9)
+
+
+def test_monthly_views_keep_years_apart(raw, raw_2016, data_dir, tmp_path):
+    pool = build_warehouse(tmp_path / 'warehouse.db', raw, raw / 'flights.csv', raw_2016)
+    monthly = read_view(pool, 'grafico_01')
+
+    assert len(monthly) == 24
+    assert monthly['date_label'].str[:4].tolist() == ['2015'] * 12 + ['2016'] * 12
+    expected, actual = comparable(pd.read_csv(data_dir / OUTPUT_FILES['grafico_01']),
+                                  monthly.iloc[:12])
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=0, atol=1e-9)